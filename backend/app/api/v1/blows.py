@@ -2,11 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 from app.db.database import get_db
+from app.db.cost_layers import produce_layers, unproduce_layers
+from app.db.costing import produce, unproduce, weighted_average
 from app.core.security import get_current_user, get_current_admin_user
 from app.models.user import User
-from app.models.transaction import Blow, Purchase
+from app.models.transaction import Blow
 from app.models.item import Item, Stock
-from sqlalchemy import func
 from app.models.stock_movement import StockMovement
 from app.schemas.operation import BlowCreate, BlowResponse, BlowUpdate
 
@@ -154,16 +155,14 @@ async def create_blow_process(
     )
     db.add(movement_to)
     
-    # Attempt to compute produced_unit_cost: last preform purchase price at or before now
-    try:
-        preform_purchase = db.query(Purchase).filter(Purchase.item_id == blow.from_item_id, Purchase.date <= func.now()).order_by(Purchase.date.desc()).first()
-        if preform_purchase and preform_purchase.unit_price is not None:
-            preform_price = float(preform_purchase.unit_price)
-            blow_cost_unit = float(blow.blow_cost_per_unit or 0)
-            db_blow.produced_unit_cost = preform_price + blow_cost_unit
-    except Exception:
-        # if anything fails, leave produced_unit_cost as None
-        pass
+    # Preforms out and bottles in at the running average cost or as FIFO layers (COSTING_METHOD):
+    # the bottles carry the cost of the preforms they were blown from plus blow_cost_per_unit
+    if weighted_average():
+        db_blow.produced_unit_cost = produce(db, blow.from_item_id, blow.input_quantity, blow.to_item_id,
+                                             output_quantity, blow.blow_cost_per_unit)
+    else:
+        db_blow.produced_unit_cost = produce_layers(db, blow.id, blow.from_item_id, blow.input_quantity,
+                                                    blow.to_item_id, output_quantity, blow.blow_cost_per_unit)
 
     db.commit()
     db.refresh(db_blow)
@@ -213,9 +212,23 @@ async def update_blow_process(
             efficiency_rate = (output_qty / blow.input_quantity) * 100
             update_data['efficiency_rate'] = efficiency_rate
     
+    old_output, old_blow_cost = blow.output_quantity, blow.blow_cost_per_unit
     for field, value in update_data.items():
         setattr(blow, field, value)
     
+    if blow.output_quantity != old_output or blow.blow_cost_per_unit != old_blow_cost:
+        # Re-cost only: take the blow back out of the costs as it was, then put it in again as it is now.
+        # Stock isn't moved here - the costs follow the blow record, as the replays do
+        if weighted_average():
+            unproduce(db, blow.from_item_id, blow.input_quantity, blow.to_item_id, old_output,
+                      old_blow_cost, blow.produced_unit_cost)
+            blow.produced_unit_cost = produce(db, blow.from_item_id, blow.input_quantity, blow.to_item_id,
+                                              blow.output_quantity, blow.blow_cost_per_unit)
+        else:
+            unproduce_layers(db, blow.id, blow.from_item_id, blow.input_quantity, blow.to_item_id, old_output)
+            blow.produced_unit_cost = produce_layers(db, blow.id, blow.from_item_id, blow.input_quantity,
+                                                     blow.to_item_id, blow.output_quantity, blow.blow_cost_per_unit)
+    
     db.commit()
     db.refresh(blow)
     return blow
@@ -272,6 +285,12 @@ async def delete_blow_process(
         )
         db.add(reverse_to_movement)
     
+    if weighted_average():
+        unproduce(db, blow.from_item_id, blow.input_quantity, blow.to_item_id, blow.output_quantity,
+                  blow.blow_cost_per_unit, blow.produced_unit_cost)
+    else:
+        unproduce_layers(db, blow.id, blow.from_item_id, blow.input_quantity, blow.to_item_id, blow.output_quantity)
+    
     # Delete the blow process record
     db.delete(blow)
     db.commit()
@@ -1,64 +1,45 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from sqlalchemy import func
 from typing import List
 from decimal import Decimal
 from datetime import datetime, timedelta
-from app.db.database import get_db
+from app.db.database import get_read_db
+from app.core.periods import Period
+from app.db.alerts import open_alert_counts
+from app.db.balances import balance_totals
+from app.db.facts import fact_totals, fact_totals_by_month
 from app.core.security import get_current_user
 from app.models.user import User
-from app.models.transaction import Purchase, Sale, Blow, Waste, SaleLineItem, PurchaseLineItem
+from app.models.transaction import Purchase, Sale
 from app.models.item import Stock
 
 router = APIRouter()
 
 @router.get("/summary")
 async def get_dashboard_summary(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get dashboard summary with key metrics - ALL TIME TOTALS"""
     
-    # Calculate total cost of units sold (COGS) - ALL TIME
-    total_purchases = db.query(func.sum(SaleLineItem.cost_basis * SaleLineItem.quantity)).join(
-        Sale, Sale.bill_number == SaleLineItem.bill_number
-    ).filter(
-        Sale.status != 'cancelled'
-    ).scalar() or 0
+    # All-time sums come from the daily rollups (app/db/facts.py)
+    facts = fact_totals(db)
+
+    # Total cost of units sold (COGS) - ALL TIME
+    total_purchases = facts["cogs"]
 
     # Total purchase revenue - ALL TIME
-    total_monthly_purchase_revenue = db.query(func.sum(PurchaseLineItem.total_price)).join(
-        Purchase, Purchase.bill_number == PurchaseLineItem.bill_number
-    ).filter(
-        Purchase.status != 'cancelled'
-    ).scalar() or 0
-    
-    # Calculate total sales - ALL TIME
-    total_sales = db.query(func.sum(SaleLineItem.total_price)).join(
-        Sale, Sale.bill_number == SaleLineItem.bill_number
-    ).filter(
-        Sale.status != 'cancelled'
-    ).scalar() or 0
-    
+    total_monthly_purchase_revenue = facts["purchase_cost"]
+
+    # Total sales - ALL TIME
+    total_sales = facts["revenue"]
+
     # Calculate profit (only for admin) - ALL TIME
     profit = None
     if current_user.role == 'admin':
-        # Get total revenue from all sales (sum of line items)
-        total_sales_revenue = db.query(func.sum(SaleLineItem.total_price)).join(
-            Sale, Sale.bill_number == SaleLineItem.bill_number
-        ).filter(
-            Sale.status != 'cancelled'
-        ).scalar() or 0
-        
-        # Get total cost from all line items sold
-        total_cost_basis = db.query(func.sum(SaleLineItem.cost_basis * SaleLineItem.quantity)).join(
-            Sale, Sale.bill_number == SaleLineItem.bill_number
-        ).filter(
-            Sale.status != 'cancelled'
-        ).scalar() or 0
-        
-        profit = float(total_sales_revenue or 0) - float(total_cost_basis or 0)
-        
+        profit = total_sales - total_purchases
+
         # Ensure profit doesn't go negative unexpectedly (data quality check)
         if profit < 0:
             import logging
@@ -68,15 +49,13 @@ async def get_dashboard_summary(
     # Total stock items (current inventory)
     total_stock_items = db.query(func.count(Stock.item_id)).filter(Stock.quantity > 0).scalar() or 0
     
-    # Pending payments (purchases) - ALL TIME
-    pending_purchase_payments = db.query(func.sum(Purchase.total_amount - Purchase.paid_amount)).filter(
-        Purchase.payment_status.in_(['pending', 'partial'])
-    ).scalar() or 0
-    
-    # Pending payments (sales) - ALL TIME
-    pending_sale_payments = db.query(func.sum(Sale.total_price - Sale.paid_amount)).filter(
-        Sale.payment_status.in_(['pending', 'partial'])
-    ).scalar() or 0
+    # Low/out/over stock warnings - the open alerts (app/db/alerts.py), not a scan of the stocks
+    stock_alerts = open_alert_counts(db)
+
+    # Pending payments - ALL TIME, from the per-party balances (app/db/balances.py)
+    balances = balance_totals(db)
+    pending_purchase_payments = balances["supplier"]["outstanding"]
+    pending_sale_payments = balances["customer"]["outstanding"]
     
     # Recent activities
     recent_purchases = db.query(Purchase).order_by(Purchase.date.desc()).limit(5).all()
@@ -87,6 +66,7 @@ async def get_dashboard_summary(
         "monthly_sales": float(total_sales),  # All-time sales
         "monthly_profit": profit,  # All-time profit
         "total_stock_items": total_stock_items,
+        "stock_alerts": stock_alerts,
         "pending_purchase_payments": float(pending_purchase_payments),
         "pending_sale_payments": float(pending_sale_payments),
         "recent_purchases": len(recent_purchases),
@@ -97,40 +77,24 @@ async def get_dashboard_summary(
 
 @router.get("/stats/monthly")
 async def get_monthly_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get monthly statistics for charts"""
     
     # Get last 6 months data
+    months = [datetime.now() - timedelta(days=30*i) for i in range(6)]
+    first = Period.month(months[-1].year, months[-1].month)
+    last = Period.month(months[0].year, months[0].month)
+    totals = fact_totals_by_month(db, first.start, last.end)
+
     monthly_data = []
-    for i in range(6):
-        date = datetime.now() - timedelta(days=30*i)
-        month = date.month
-        year = date.year
-        
-        # Calculate purchases from line items
-        purchases = db.query(func.sum(PurchaseLineItem.total_price)).join(
-            Purchase, Purchase.bill_number == PurchaseLineItem.bill_number
-        ).filter(
-            extract('month', Purchase.date) == month,
-            extract('year', Purchase.date) == year,
-            Purchase.status != 'cancelled'
-        ).scalar() or 0
-        
-        # Calculate sales from line items
-        sales = db.query(func.sum(SaleLineItem.total_price)).join(
-            Sale, Sale.bill_number == SaleLineItem.bill_number
-        ).filter(
-            extract('month', Sale.date) == month,
-            extract('year', Sale.date) == year,
-            Sale.status != 'cancelled'
-        ).scalar() or 0
-        
+    for date in months:
+        facts = totals.get((date.year, date.month), {})
         monthly_data.insert(0, {
             "month": date.strftime("%b %Y"),
-            "purchases": float(purchases),
-            "sales": float(sales)
+            "purchases": facts.get("purchase_cost", 0.0),
+            "sales": facts.get("revenue", 0.0)
         })
     
     return monthly_data
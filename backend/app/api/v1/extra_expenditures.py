@@ -4,14 +4,12 @@ from typing import List
 from datetime import datetime
 from app.db.database import get_db
 from app.core.security import get_current_user, get_current_admin_user
+from app.core.periods import Period, period_query
 from app.models.user import User
 from app.models.transaction import ExtraExpenditure
 from app.schemas.extra_expenditure import ExtraExpenditureCreate, ExtraExpenditureUpdate, ExtraExpenditureResponse
 from fastapi.responses import StreamingResponse
 import io
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from app.utils.invoice_pdf_generator import generate_expenditure_invoice_pdf
 import asyncio
 import logging
 
@@ -60,6 +58,8 @@ async def export_expenditures_excel(
     current_user: User = Depends(get_current_admin_user)
 ):
     """Export extra expenditures as Excel file"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
     try:
         # Get expenditures
         if expense_ids:
@@ -197,29 +197,24 @@ async def export_expenditures_excel(
 
 @router.get("/total")
 async def get_total_expenditures(
+    period: Period = Depends(period_query),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get total extra expenditures for current month"""
-    from sqlalchemy import extract, func
-    from datetime import datetime as dt
+    """Get total extra expenditures for the current month (or month/year, ISO week, date_from/date_to)"""
+    from sqlalchemy import func
 
-    current_month = dt.now().month
-    current_year = dt.now().year
-
-    total = db.query(func.sum(ExtraExpenditure.amount)).filter(
-        extract('month', ExtraExpenditure.date) == current_month,
-        extract('year', ExtraExpenditure.date) == current_year
-    ).scalar()
-
-    count = db.query(func.count(ExtraExpenditure.id)).filter(
-        extract('month', ExtraExpenditure.date) == current_month,
-        extract('year', ExtraExpenditure.date) == current_year
-    ).scalar()
+    total, count = db.query(
+        func.sum(ExtraExpenditure.amount),
+        func.count(ExtraExpenditure.id)
+    ).filter(
+        period.filter(ExtraExpenditure.date)
+    ).one()
 
     return {
         "total_amount": float(total) if total else 0.0,
-        "count": count or 0
+        "count": count or 0,
+        "period": period.as_dict()
     }
 
 
@@ -268,6 +263,7 @@ async def download_expenditure_invoice(
     current_user: User = Depends(get_current_user)
 ):
     """Download operating expense record as PDF invoice"""
+    from app.utils.invoice_pdf_generator import generate_expenditure_invoice_pdf
     try:
         # Get expenditure record
         expenditure = db.query(ExtraExpenditure).filter(ExtraExpenditure.id == expenditure_id).first()
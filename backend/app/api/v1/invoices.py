@@ -6,13 +6,16 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 from app.db.database import get_db
+from app.core.config import settings
 from app.core.security import get_current_user
 from app.models.user import User
 from app.models.transaction import Sale, Purchase, Blow, Waste
 from app.models.item import Item
 from app.models.party import Customer, Supplier
+from app.schemas.invoice import InvoiceBundleRequest
+from app.utils.invoice_bundle import invoice_zip, load_invoices
 from fastapi.responses import StreamingResponse
-from app.utils.invoice_pdf_generator import generate_sales_invoice_pdf, generate_purchase_invoice_pdf, generate_blow_invoice_pdf, generate_waste_invoice_pdf
+from datetime import datetime
 import logging
 import asyncio
 
@@ -30,6 +33,7 @@ async def download_sale_invoice(
     Download a professional invoice PDF for a sale bill
     Format: Similar to Care Packages invoice
     """
+    from app.utils.invoice_pdf_generator import generate_sales_invoice_pdf
     try:
         # Get sale bill
         sale = db.query(Sale).filter(Sale.bill_number == bill_number).first()
@@ -86,6 +90,7 @@ async def download_purchase_invoice(
     Download a professional invoice PDF for a purchase bill
     Format: Similar to Care Packages invoice
     """
+    from app.utils.invoice_pdf_generator import generate_purchase_invoice_pdf
     try:
         # Get purchase bill
         purchase = db.query(Purchase).filter(Purchase.bill_number == bill_number).first()
@@ -142,6 +147,7 @@ async def download_blow_invoice(
     Download a professional invoice PDF for a blow process
     Format: Similar to Sales/Purchase invoices
     """
+    from app.utils.invoice_pdf_generator import generate_blow_invoice_pdf
     try:
         # Get blow record
         blow = db.query(Blow).filter(Blow.id == blow_id).first()
@@ -186,6 +192,7 @@ async def download_waste_invoice(
     current_user: User = Depends(get_current_user)
 ):
     """Download waste record as PDF invoice"""
+    from app.utils.invoice_pdf_generator import generate_waste_invoice_pdf
     try:
         # Get waste record
         waste = db.query(Waste).filter(Waste.id == waste_id).first()
@@ -217,3 +224,30 @@ async def download_waste_invoice(
     except Exception as e:
         logger.error(f"Error generating waste invoice PDF: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
+
+
+@router.post("/bundle")
+async def download_invoice_bundle(
+    bundle: InvoiceBundleRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Download the invoices of many bills/records as one ZIP
+    PDFs are rendered in parallel and streamed as they finish; ids without an
+    invoice are listed in skipped.txt inside the ZIP
+    """
+    if len(bundle.ids) > settings.INVOICE_BUNDLE_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {settings.INVOICE_BUNDLE_MAX} invoices per bundle")
+
+    jobs, skipped = load_invoices(db, bundle.type, bundle.ids, current_user)
+    if not jobs:
+        raise HTTPException(status_code=404, detail=f"No {bundle.type} invoices found for the selected ids")
+    logger.info(f"🧾 Bundling {len(jobs)} {bundle.type} invoices ({len(skipped)} skipped)")
+
+    filename = f"{bundle.type}_invoices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        invoice_zip(jobs, skipped),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -0,0 +1,83 @@
+"""
+Payment Endpoints - record payments against sales and purchases
+"""
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from typing import List, Literal
+from app.db.database import get_db
+from app.db.payments import PaymentError, record_payments, repair_payments, settle_bills
+from app.core.security import get_current_user, get_current_admin_user
+from app.models.user import User
+from app.models.transaction import Payment
+from app.schemas.payment import PaymentCreate, PaymentResponse, SettleRequest
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+async def payment_error_handler(request: Request, exc: PaymentError):
+    """Bill writes the payments hook rejects at flush (any endpoint) are the client's 400"""
+    logger.warning(f"⚠️ {request.method} {request.url.path}: {exc}")
+    return JSONResponse({"detail": str(exc)}, status_code=400)
+
+
+@router.post("/")
+async def create_payment(
+    payment: PaymentCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Record a payment against one bill; its paid amount and payment status move with it"""
+    result = record_payments(
+        db, payment.bill_type, {payment.bill_number: payment.amount},
+        user_id=current_user.id, method=payment.method, notes=payment.notes,
+    )
+    db.commit()
+    logger.info(f"💳 {payment.bill_type} {payment.bill_number}: payment of {payment.amount} recorded")
+    return result
+
+
+@router.post("/settle")
+async def settle_selected_bills(
+    request: SettleRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Mark several bills paid in full in one go, recording what each still owed"""
+    result = settle_bills(
+        db, request.bill_type, request.bill_numbers,
+        user_id=current_user.id, method=request.method, notes=request.notes,
+    )
+    db.commit()
+    logger.info(f"💳 Marked {result['paid']} {request.bill_type} bills paid ({result['amount']:.2f})")
+    return result
+
+
+@router.get("/", response_model=List[PaymentResponse])
+async def get_bill_payments(
+    bill_type: Literal["sale", "purchase"],
+    bill_number: str = Query(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Payments recorded against a bill, oldest first"""
+    return (
+        db.query(Payment)
+        .filter(Payment.bill_type == bill_type, Payment.bill_number == bill_number)
+        .order_by(Payment.paid_at, Payment.id)
+        .all()
+    )
+
+
+@router.post("/repair")
+async def repair_bill_payments(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Bring paid_amount and payment_status of older bills in line (Admin only)"""
+    fixed = repair_payments(db)
+    db.commit()
+    return {"message": f"Fixed {sum(fixed.values())} bills", "fixed": fixed}
@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List
 from decimal import Decimal
 from app.db.database import get_db
 from app.core.security import get_current_user, get_current_admin_user
+from app.core.responses import model_list_response
+from app.core.cache import supplier_names
+from app.db.cost_layers import add_layer, remove_layers
+from app.db.costing import receive, weighted_average
 from app.models.user import User
 from app.models.transaction import Purchase, PurchaseLineItem
 from app.models.item import Stock
@@ -12,10 +16,6 @@ from app.models.party import Supplier
 from fastapi import Body
 from fastapi.responses import StreamingResponse
 import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
 import os
 from datetime import datetime
 from app.schemas.transaction import PurchaseCreate, PurchaseUpdate, PurchaseResponse
@@ -72,6 +72,7 @@ async def create_purchase(
         supplier_id=purchase.supplier_id,
         total_amount=total_amount,
         payment_status=purchase.payment_status if hasattr(purchase, 'payment_status') else 'pending',
+        paid_amount=purchase.paid_amount or 0,  # the payments hook squares it with payment_status
         created_by=current_user.id,
         due_date=purchase.due_date,
         date=purchase_date
@@ -106,6 +107,11 @@ async def create_purchase(
             stock = Stock(item_id=line_data['item_id'], quantity=line_data['quantity'])
             db.add(stock)
             after_qty = line_data['quantity']
+        if weighted_average():
+            receive(db, line_data['item_id'], line_data['quantity'], line_data['unit_price'])
+        else:
+            add_layer(db, line_data['item_id'], line_data['quantity'], line_data['unit_price'], 'purchase',
+                      purchase.bill_number, at=purchase_date)
         
         # Record stock movement
         movement = StockMovement(
@@ -134,14 +140,10 @@ async def get_purchases(
 ):
     """Get all purchases with line items"""
     try:
-        purchases = db.query(Purchase).order_by(Purchase.date.desc()).offset(skip).limit(limit).all()
-        
-        # Ensure line_items are loaded
-        for purchase in purchases:
-            if purchase.line_items is None:
-                purchase.line_items = []
+        # Line items in one extra IN query instead of one lazy load per purchase
+        purchases = db.query(Purchase).options(selectinload(Purchase.line_items)).order_by(Purchase.date.desc()).offset(skip).limit(limit).all()
         
-        return purchases
+        return model_list_response(purchases, PurchaseResponse)
     except Exception as e:
         logging.error(f"Error getting purchases: {e}", exc_info=True)
         raise HTTPException(status_code=400, detail=f"Error fetching purchases: {str(e)}")
@@ -174,7 +176,7 @@ async def update_purchase(
     
     # Non-admin users can only update payment fields
     if current_user.role != 'admin':
-        allowed_fields = {'payment_status'}
+        allowed_fields = {'payment_status', 'paid_amount'}
         if not set(update_data.keys()).issubset(allowed_fields):
             raise HTTPException(
                 status_code=403, 
@@ -183,7 +185,7 @@ async def update_purchase(
     
     # Update allowed fields
     for field, value in update_data.items():
-        if field in ['payment_status']:
+        if field in ['payment_status', 'paid_amount']:
             setattr(purchase, field, value)
     
     db.commit()
@@ -207,6 +209,10 @@ async def delete_purchase(
         stock = db.query(Stock).filter(Stock.item_id == line_item.item_id).first()
         if stock:
             stock.quantity -= line_item.quantity
+        if weighted_average():
+            receive(db, line_item.item_id, -line_item.quantity, line_item.unit_price)  # take the receipt back out
+        else:
+            remove_layers(db, line_item.item_id, line_item.quantity, 'purchase', bill_number)
     
     # Delete line items (cascade will handle this, but explicit for clarity)
     db.query(PurchaseLineItem).filter(PurchaseLineItem.bill_number == bill_number).delete()
@@ -227,6 +233,10 @@ async def download_multiple_purchases(
     current_user: User = Depends(get_current_user)
 ):
     """Generate a combined PDF containing multiple purchase bills."""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.pdfbase import pdfmetrics
     if not bill_numbers:
         raise HTTPException(status_code=400, detail="No bill numbers provided")
 
@@ -236,12 +246,12 @@ async def download_multiple_purchases(
 
     # Collect valid purchase records
     records = []
+    suppliers = supplier_names(db)
     for bill_no in bill_numbers:
         rec = db.query(Purchase).filter(Purchase.bill_number == bill_no).first()
         if not rec:
             continue
-        party = db.query(Supplier).filter(Supplier.id == rec.supplier_id).first()
-        party_name = party.name if party else rec.supplier_id
+        party_name = suppliers.get(rec.supplier_id, rec.supplier_id)
         records.append((rec, party_name, bill_no))
 
     if not records:
@@ -428,27 +438,18 @@ async def fix_paid_amounts_for_paid_purchases(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    """Fix paid_amount for purchases with payment_status='paid' but paid_amount=0.
-    Sets paid_amount equal to total_amount for these records.
+    """Bring paid_amount and payment_status of older bills in line (see POST /payments/repair).
+    Payments keep them in line on every write, so this is only needed once for old data.
     """
+    from app.db.payments import repair_payments
     try:
-        # Find all purchases with payment_status='paid' and paid_amount=0 or null
-        purchases_to_fix = db.query(Purchase).filter(
-            Purchase.payment_status == 'paid',
-            (Purchase.paid_amount == 0) | (Purchase.paid_amount == None)
-        ).all()
-        
-        count = 0
-        for purchase in purchases_to_fix:
-            purchase.paid_amount = purchase.total_amount
-            count += 1
-        
+        fixed = repair_payments(db)
         db.commit()
-        
+        count = sum(fixed.values())
         return {
-            "message": f"Fixed {count} purchases",
+            "message": f"Fixed {count} bills",
             "count": count,
-            "details": f"Set paid_amount equal to total_amount for {count} paid purchases"
+            "details": f"Set paid_amount and payment_status consistently on {fixed['purchase']} purchases and {fixed['sale']} sales"
         }
     except Exception as e:
         db.rollback()
@@ -1,62 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
-from typing import List
-from sqlalchemy import func, extract
-from datetime import datetime, timedelta
-from app.db.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
+from sqlalchemy import func
+from datetime import date, datetime, timedelta
+from app.db.database import get_db, get_read_db
 from app.core.security import get_current_admin_user, get_current_user
+from app.core.responses import json_response, model_response
+from app.core.cache import customer_names, item_names, supplier_names
+from app.core.periods import Period, business_today, period_query
+from app.db.balances import balance_totals
+from app.db.blow_yield import YieldQuery, blow_yield
+from app.db.ledger import ledger_rows, open_ledger
+from app.db.facts import expenditure_total, fact_totals
+from app.db.margins import MarginQuery, margin_rows
+from app.db.traceability import open_trace, trace_rows
+from app.db.valuation import item_valuations, valuation_totals
 from app.models.user import User
 from app.models.transaction import Purchase, Sale, Blow, Waste, ExtraExpenditure, SaleLineItem, PurchaseLineItem
 from app.models.party import Supplier, Customer
 from app.models.item import Stock, Item
 from app.models.report import WeeklyReport
-from app.schemas.ledger import LedgerResponse, LedgerEntry
+from app.schemas.ledger import LedgerResponse
+from app.utils.ledger_export import ledger_excel, ledger_json, ledger_pdf
+from app.utils.traceability_export import trace_csv, trace_excel, trace_json
+from app.utils.valuation_export import valuation_csv, valuation_excel
 from fastapi.responses import StreamingResponse, FileResponse
 import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.units import mm
 import os
-from reportlab.pdfbase import pdfmetrics
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
-import calendar
 import asyncio
 
 router = APIRouter()
 
 @router.get("/balance-sheet")
 async def get_balance_sheet(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Get balance sheet (Admin only)"""
+    # Per-party running accounts (app/db/balances.py) - no scan of sales/purchases
+    balances = balance_totals(db)
     
     # Accounts Receivable = Total unpaid sales
-    accounts_receivable = db.query(func.sum(Sale.total_price)).filter(
-        Sale.status != 'cancelled'
-    ).scalar()
-    accounts_receivable = float(accounts_receivable) if accounts_receivable else 0.0
+    accounts_receivable = balances["customer"]["outstanding"]
     
     # Accounts Payable = Total unpaid purchases
-    accounts_payable = db.query(func.sum(Purchase.total_amount)).filter(
-        Purchase.status != 'cancelled'
-    ).scalar()
-    accounts_payable = float(accounts_payable) if accounts_payable else 0.0
+    accounts_payable = balances["supplier"]["outstanding"]
     
     # Total Sales All Time
-    total_sales = db.query(func.sum(Sale.total_price)).filter(
-        Sale.status != 'cancelled'
-    ).scalar()
-    total_sales = float(total_sales) if total_sales else 0.0
+    total_sales = balances["customer"]["billed"]
     
     # Total Purchases All Time
-    total_purchases = db.query(func.sum(Purchase.total_amount)).filter(
-        Purchase.status != 'cancelled'
-    ).scalar()
-    total_purchases = float(total_purchases) if total_purchases else 0.0
+    total_purchases = balances["supplier"]["billed"]
     
     # Net Position = Assets - Liabilities
     net_position = total_sales - total_purchases
@@ -72,51 +66,21 @@ async def get_balance_sheet(
 
 @router.get("/profit")
 async def get_profit_report(
-    month: int = None,
-    year: int = None,
-    db: Session = Depends(get_db),
+    period: Period = Depends(period_query),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    """Get profit report (Admin only) - FIXED VERSION with line items support"""
-    if not month:
-        month = datetime.now().month
-    if not year:
-        year = datetime.now().year
-    
-    # Calculate sales revenue from SaleLineItem table
-    sales_revenue = db.query(func.sum(SaleLineItem.total_price)).join(
-        Sale, Sale.bill_number == SaleLineItem.bill_number
-    ).filter(
-        extract('month', Sale.date) == month,
-        extract('year', Sale.date) == year,
-    ).scalar()
-    sales_revenue = float(sales_revenue) if sales_revenue else 0.0
-    
-    # Calculate purchase costs from PurchaseLineItem table
-    purchase_costs = db.query(func.sum(PurchaseLineItem.total_price)).join(
-        Purchase, Purchase.bill_number == PurchaseLineItem.bill_number
-    ).filter(
-        extract('month', Purchase.date) == month,
-        extract('year', Purchase.date) == year,
-    ).scalar()
-    purchase_costs = float(purchase_costs) if purchase_costs else 0.0
-    
+    """Get profit report (Admin only) - month/year (default: current month), ISO week or date_from/date_to"""
+    # Period sums come from the daily rollups (app/db/facts.py)
+    facts = fact_totals(db, period.start, period.end)
+    sales_revenue = facts["revenue"]
+    purchase_costs = facts["purchase_cost"]
+
     # NOTE: Blow feature is for OPERATIONAL TRACKING of material processing, not profit calculation
     # Blow costs are NOT included in profit calculations
-    
-    # Calculate waste recovery
-    waste_recovery = db.query(func.sum(Waste.total_price)).filter(
-        extract('month', Waste.date) == month,
-        extract('year', Waste.date) == year
-    ).scalar()
-    waste_recovery = float(waste_recovery) if waste_recovery else 0.0
-
-    # Calculate extra expenditures
-    extra_expenditures = db.query(func.sum(ExtraExpenditure.amount)).filter(
-        extract('month', ExtraExpenditure.date) == month,
-        extract('year', ExtraExpenditure.date) == year
-    ).scalar()
-    extra_expenditures = float(extra_expenditures) if extra_expenditures else 0.0
+
+    waste_recovery = facts["waste_recovery"]
+    extra_expenditures = expenditure_total(db, period.start, period.end)
 
     # Totals and profit
     # Profit = Revenue - (Purchase Costs + Extra Expenditures)
@@ -127,8 +91,9 @@ async def get_profit_report(
     profit_margin = (profit / total_revenue * 100) if total_revenue > 0 else 0.0
 
     return {
-        "month": month,
-        "year": year,
+        "month": period.month_number,
+        "year": period.year,
+        "period": period.as_dict(),
         "sales_revenue": sales_revenue,
         "purchase_costs": purchase_costs,
         "waste_recovery": waste_recovery,
@@ -141,16 +106,73 @@ async def get_profit_report(
     
 
 
+@router.get("/margins")
+async def get_margin_analytics(
+    period: Period = Depends(period_query),
+    group_by: str = Query("item", description="Comma-separated: customer, item, type, size, grade, day, week, month"),
+    rollup: bool = Query(True, description="Subtotal every prefix of group_by (ROLLUP); otherwise only the grand total"),
+    top: Optional[int] = Query(None, description="Keep the best N rows under each parent row"),
+    order_by: str = Query("margin", description="Rank by quantity, revenue, cogs, blow_revenue or margin"),
+    customer: Optional[str] = Query(None, description="Drill down: only this customer id"),
+    item: Optional[str] = Query(None, description="Drill down: only this item id"),
+    item_type: Optional[str] = Query(None, alias="type", description="Drill down: only this item type"),
+    size: Optional[str] = Query(None, description="Drill down: only this size"),
+    grade: Optional[str] = Query(None, description="Drill down: only this grade"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Revenue, COGS, blow price and margin of the period's sales, grouped by any combination of dimensions (Admin only)"""
+    filters = {"customer": customer, "item": item, "type": item_type, "size": size, "grade": grade}
+    query = MarginQuery(
+        period,
+        tuple(name.strip() for name in group_by.split(",") if name.strip()),
+        rollup=rollup,
+        filters={name: value for name, value in filters.items() if value is not None},
+        order_by=order_by,
+        top=top,
+    )
+    rows = margin_rows(db.connection(), query, {"customer": customer_names(db), "item": item_names(db)})
+    return json_response({**query.header(), "rows": rows})
+
+
+@router.get("/blow-yield")
+async def get_blow_yield(
+    period: Period = Depends(period_query),
+    group_by: str = Query("pair", description="Comma-separated: pair (preform -> bottle), operator"),
+    grain: str = Query("period", description="Trend buckets: day, week, month or period (one row per group)"),
+    from_item_id: Optional[str] = Query(None, description="Only blows of this preform"),
+    to_item_id: Optional[str] = Query(None, description="Only blows into this bottle"),
+    user_id: Optional[str] = Query(None, description="Only this operator's blows"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Yield, waste and cost per good unit of the period's blows, by preform/bottle pair and operator (Admin only)"""
+    filters = {"from_item_id": from_item_id, "to_item_id": to_item_id, "user_id": user_id}
+    query = YieldQuery(
+        period,
+        tuple(name.strip() for name in group_by.split(",") if name.strip()),
+        grain=grain,
+        filters={name: value for name, value in filters.items() if value is not None},
+    )
+    operators = dict(db.query(User.id, User.username).all()) if "operator" in query.group_by else {}
+    result = blow_yield(db.connection(), query, item_names(db), operators)
+    return json_response({**query.header(), **result})
+
+
 @router.post("/pdf/bills")
 async def download_multiple_bills(
     bill_numbers: List[str] = Body(..., embed=True),
     bill_type: str = "sale",
     signature_admin: str | None = None,
     signature_ceo: str | None = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Generate a combined PDF containing multiple bills with line items."""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.pdfbase import pdfmetrics
     if not bill_numbers:
         raise HTTPException(status_code=400, detail="No bill numbers provided")
 
@@ -293,13 +315,14 @@ async def download_multiple_bills(
 
     # Collect valid records with line items
     records = []
+    items = item_names(db)
+    parties = supplier_names(db) if bill_type == 'purchase' else customer_names(db)
     for bill_no in bill_numbers:
         if bill_type == 'purchase':
             bill = db.query(Purchase).filter(Purchase.bill_number == bill_no).first()
             if not bill:
                 continue
-            party = db.query(Supplier).filter(Supplier.id == bill.supplier_id).first()
-            party_name = party.name if party else str(bill.supplier_id)
+            party_name = parties.get(bill.supplier_id, str(bill.supplier_id))
             # Get line items for this purchase
             line_items = db.query(PurchaseLineItem).filter(
                 PurchaseLineItem.bill_number == bill_no
@@ -308,8 +331,7 @@ async def download_multiple_bills(
             bill = db.query(Sale).filter(Sale.bill_number == bill_no).first()
             if not bill:
                 continue
-            party = db.query(Customer).filter(Customer.id == bill.customer_id).first()
-            party_name = party.name if party else str(bill.customer_id)
+            party_name = parties.get(bill.customer_id, str(bill.customer_id))
             # Get line items for this sale
             line_items = db.query(SaleLineItem).filter(
                 SaleLineItem.bill_number == bill_no
@@ -317,9 +339,7 @@ async def download_multiple_bills(
 
         if line_items:
             for line_item in line_items:
-                # Get item name
-                item = db.query(Item).filter(Item.id == line_item.item_id).first()
-                item_name = item.name if item else str(line_item.item_id)
+                item_name = items.get(line_item.item_id, str(line_item.item_id))
                 
                 records.append({
                     'bill_no': bill_no,
@@ -580,7 +600,7 @@ async def download_multiple_bills(
 async def export_weekly_report_excel(
     week_offset: int = 0,
     date: str = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -588,6 +608,8 @@ async def export_weekly_report_excel(
     - If date parameter provided (YYYY-MM-DD): exports data for that specific day only
     - Otherwise: exports weekly report using week_offset (0=current week, -1=last week, etc)
     """
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
     
     if date:
         # Daily report for specific date
@@ -608,38 +630,16 @@ async def export_weekly_report_excel(
         day_end = day_start + timedelta(days=7)
         report_date = None
 
-    # Calculate sales revenue
-    sales_revenue = db.query(func.sum(Sale.total_price)).filter(
-        Sale.date >= day_start,
-        Sale.date < day_end,
-        Sale.status != 'cancelled'
-    ).scalar()
-    sales_revenue = float(sales_revenue) if sales_revenue else 0.0
-
-    # Calculate purchase costs
-    purchase_costs = db.query(func.sum(Purchase.total_amount)).filter(
-        Purchase.date >= day_start,
-        Purchase.date < day_end,
-        Purchase.status != 'cancelled'
-    ).scalar()
-    purchase_costs = float(purchase_costs) if purchase_costs else 0.0
+    # Period sums come from the daily rollups (app/db/facts.py)
+    facts = fact_totals(db, day_start, day_end)
+    sales_revenue = facts["revenue"]
+    purchase_costs = facts["purchase_cost"]
 
     # NOTE: Blow feature is for OPERATIONAL TRACKING, not profit calculation
     # Blow costs are NOT included in profit calculations
-    
-    # Calculate waste recovery
-    waste_recovery = db.query(func.sum(Waste.total_price)).filter(
-        Waste.date >= day_start,
-        Waste.date < day_end
-    ).scalar()
-    waste_recovery = float(waste_recovery) if waste_recovery else 0.0
-
-    # Calculate extra expenditures
-    extra_expenditures = db.query(func.sum(ExtraExpenditure.amount)).filter(
-        ExtraExpenditure.date >= day_start,
-        ExtraExpenditure.date < day_end
-    ).scalar()
-    extra_expenditures = float(extra_expenditures) if extra_expenditures else 0.0
+
+    waste_recovery = facts["waste_recovery"]
+    extra_expenditures = expenditure_total(db, day_start, day_end)
 
     # Totals
     total_revenue = sales_revenue + waste_recovery
@@ -650,14 +650,14 @@ async def export_weekly_report_excel(
     # Get detailed transactions for daily report
     if date:
         # Fetch detailed sales
-        sales = db.query(Sale).filter(
+        sales = db.query(Sale).options(selectinload(Sale.line_items)).filter(
             Sale.date >= day_start,
             Sale.date < day_end,
             Sale.status != 'cancelled'
         ).all()
         
         # Fetch detailed purchases
-        purchases = db.query(Purchase).filter(
+        purchases = db.query(Purchase).options(selectinload(Purchase.line_items)).filter(
             Purchase.date >= day_start,
             Purchase.date < day_end,
             Purchase.status != 'cancelled'
@@ -843,19 +843,13 @@ async def export_weekly_report_excel(
                 cell.font = Font(bold=True)
             row += 1
             
+            names, customers = item_names(db), customer_names(db)
             for sale in sales:
                 ws[f'A{row}'] = sale.bill_number
-                # Get customer name - handle relationship not being loaded
-                if hasattr(sale, 'customer') and sale.customer:
-                    customer_name = sale.customer.name
-                else:
-                    # Fetch customer from DB
-                    customer = db.query(Customer).filter(Customer.id == sale.customer_id).first()
-                    customer_name = customer.name if customer else f"Customer {sale.customer_id}"
-                ws[f'B{row}'] = customer_name
+                ws[f'B{row}'] = customers.get(sale.customer_id, f"Customer {sale.customer_id}")
                 
                 # Get items for this sale
-                items_str = ", ".join([f"{li.item.name} x {li.quantity}" for li in sale.line_items]) if sale.line_items else "N/A"
+                items_str = ", ".join([f"{names.get(li.item_id, li.item_id)} x {li.quantity}" for li in sale.line_items]) if sale.line_items else "N/A"
                 ws[f'C{row}'] = items_str
                 ws[f'D{row}'] = sale.total_price
                 ws[f'D{row}'].number_format = '#,##0.00'
@@ -879,19 +873,13 @@ async def export_weekly_report_excel(
                 cell.font = Font(bold=True)
             row += 1
             
+            names, suppliers = item_names(db), supplier_names(db)
             for purchase in purchases:
                 ws[f'A{row}'] = purchase.bill_number
-                # Get supplier name - handle relationship not being loaded
-                if hasattr(purchase, 'supplier') and purchase.supplier:
-                    supplier_name = purchase.supplier.name
-                else:
-                    # Fetch supplier from DB
-                    supplier = db.query(Supplier).filter(Supplier.id == purchase.supplier_id).first()
-                    supplier_name = supplier.name if supplier else f"Supplier {purchase.supplier_id}"
-                ws[f'B{row}'] = supplier_name
+                ws[f'B{row}'] = suppliers.get(purchase.supplier_id, f"Supplier {purchase.supplier_id}")
                 
                 # Get items for this purchase
-                items_str = ", ".join([f"{li.item.name} x {li.quantity}" for li in purchase.line_items]) if purchase.line_items else "N/A"
+                items_str = ", ".join([f"{names.get(li.item_id, li.item_id)} x {li.quantity}" for li in purchase.line_items]) if purchase.line_items else "N/A"
                 ws[f'C{row}'] = items_str
                 ws[f'D{row}'] = purchase.total_amount
                 ws[f'D{row}'].number_format = '#,##0.00'
@@ -917,14 +905,7 @@ async def export_weekly_report_excel(
             
             for waste in waste_items:
                 ws[f'A{row}'] = waste.id
-                # Get item name - handle relationship not being loaded
-                if hasattr(waste, 'item') and waste.item:
-                    item_name = waste.item.name
-                else:
-                    # Fetch item from DB
-                    item = db.query(Item).filter(Item.id == waste.item_id).first()
-                    item_name = item.name if item else f"Item {waste.item_id}"
-                ws[f'B{row}'] = item_name
+                ws[f'B{row}'] = item_names(db).get(waste.item_id, f"Item {waste.item_id}")
                 ws[f'C{row}'] = waste.quantity
                 ws[f'D{row}'] = waste.price_per_unit
                 ws[f'D{row}'].number_format = '#,##0.00'
@@ -952,7 +933,7 @@ async def export_weekly_report_excel(
             for exp in extra_expenditure_items:
                 ws[f'A{row}'] = exp.id
                 ws[f'B{row}'] = exp.description or ""
-                ws[f'C{row}'] = exp.category or ""
+                ws[f'C{row}'] = exp.expense_type or ""
                 ws[f'D{row}'] = exp.amount
                 ws[f'D{row}'].number_format = '#,##0.00'
                 ws[f'E{row}'] = exp.notes or ""
@@ -997,52 +978,14 @@ async def generate_weekly_report(
     week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
     week_end = week_start + timedelta(days=7)
 
-    # Calculate sales revenue
-    sales_revenue = db.query(func.sum(Sale.total_price)).filter(
-        Sale.date >= week_start,
-        Sale.date < week_end,
-        Sale.status != 'cancelled'
-    ).scalar()
-    sales_revenue = float(sales_revenue) if sales_revenue else 0.0
-
-    # Calculate purchase costs
-    purchase_costs = db.query(func.sum(Purchase.total_amount)).filter(
-        Purchase.date >= week_start,
-        Purchase.date < week_end,
-        Purchase.status != 'cancelled'
-    ).scalar()
-    purchase_costs = float(purchase_costs) if purchase_costs else 0.0
-
-    # Calculate blow costs
-    blow_costs = db.query(func.sum(Blow.blow_cost_per_unit * Blow.quantity)).filter(
-        Blow.date_time >= week_start,
-        Blow.date_time < week_end
-    ).scalar()
-    blow_costs = float(blow_costs) if blow_costs else 0.0
-
-    # Calculate sales blow price costs (from SaleLineItem, not Sale)
-    sales_blow_costs = db.query(func.sum(SaleLineItem.blow_price * SaleLineItem.quantity)).join(
-        Sale, SaleLineItem.bill_number == Sale.bill_number
-    ).filter(
-        Sale.date >= week_start,
-        Sale.date < week_end,
-        Sale.status != 'cancelled'
-    ).scalar()
-    sales_blow_costs = float(sales_blow_costs) if sales_blow_costs else 0.0
-
-    # Calculate waste recovery
-    waste_recovery = db.query(func.sum(Waste.total_price)).filter(
-        Waste.date >= week_start,
-        Waste.date < week_end
-    ).scalar()
-    waste_recovery = float(waste_recovery) if waste_recovery else 0.0
-
-    # Calculate extra expenditures
-    extra_expenditures = db.query(func.sum(ExtraExpenditure.amount)).filter(
-        ExtraExpenditure.date >= week_start,
-        ExtraExpenditure.date < week_end
-    ).scalar()
-    extra_expenditures = float(extra_expenditures) if extra_expenditures else 0.0
+    # Period sums come from the daily rollups (app/db/facts.py)
+    facts = fact_totals(db, week_start, week_end)
+    sales_revenue = facts["revenue"]
+    purchase_costs = facts["purchase_cost"]
+    blow_costs = facts["blow_cost"]
+    sales_blow_costs = facts["blow_price"]  # blow price charged on sale line items
+    waste_recovery = facts["waste_recovery"]
+    extra_expenditures = expenditure_total(db, week_start, week_end)
 
     # Totals
     total_revenue = sales_revenue + waste_recovery
@@ -1122,7 +1065,7 @@ async def generate_weekly_report(
 @router.get("/weekly-reports")
 async def get_weekly_reports(
     limit: int = 12,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Get list of stored weekly reports (last 12 weeks by default)"""
@@ -1163,7 +1106,7 @@ async def get_weekly_reports(
 @router.get("/export-purchases-excel")
 async def export_purchases_excel(
     bill_numbers: str = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -1171,6 +1114,8 @@ async def export_purchases_excel(
     If bill_numbers provided (comma-separated), export only those.
     Otherwise export all purchases.
     """
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
     try:
         # Get purchases
         if bill_numbers:
@@ -1343,7 +1288,7 @@ async def export_purchases_excel(
 @router.get("/export-sales-excel")
 async def export_sales_excel(
     bill_numbers: str = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -1351,6 +1296,8 @@ async def export_sales_excel(
     If bill_numbers provided (comma-separated), export only those.
     Otherwise export all sales.
     """
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
     try:
         # Get sales
         if bill_numbers:
@@ -1523,7 +1470,7 @@ async def export_sales_excel(
 @router.get("/export-blow-excel")
 async def export_blow_excel(
     blow_ids: str = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -1531,6 +1478,8 @@ async def export_blow_excel(
     If blow_ids provided (comma-separated), export only those.
     Otherwise export all blow processes.
     """
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
     try:
         # Get blow records
         if blow_ids:
@@ -1679,7 +1628,7 @@ async def export_blow_excel(
 @router.get("/export-waste-excel")
 async def export_waste_excel(
     waste_ids: str = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -1687,6 +1636,8 @@ async def export_waste_excel(
     If waste_ids provided (comma-separated), export only those.
     Otherwise export all waste records.
     """
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
     try:
         # Get waste records
         if waste_ids:
@@ -1863,333 +1814,198 @@ def get_record_count(record_type: str, db: Session = Depends(get_db)):
 # LEDGER ENDPOINTS - Customer/Supplier transaction history
 # ============================================================================
 
+def _ledger_response(db: Session, party_type: str, party_id: str, period: Period, fmt: str):
+    """Stream one ledger (app/db/ledger.py) as JSON, PDF or Excel"""
+    ledger = open_ledger(db, party_type, party_id, period)
+    rows = ledger_rows(db.get_bind(), ledger)
+    if fmt == "json":
+        return StreamingResponse(ledger_json(ledger, rows), media_type="application/json")
+    if fmt == "pdf":
+        body, media_type = ledger_pdf(ledger, rows), "application/pdf"
+    else:
+        body, media_type = ledger_excel(ledger, rows), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=\"ledger_{party_id}_{period.slug}.{fmt}\""}
+    )
+
+
 @router.get("/ledger/customer/{customer_id}", response_model=LedgerResponse)
 async def get_customer_ledger(
     customer_id: str,
-    month: int = None,
-    year: int = None,
-    db: Session = Depends(get_db),
+    period: Period = Depends(period_query),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get customer account ledger for a specific month/year"""
-    if not month:
-        month = datetime.now().month
-    if not year:
-        year = datetime.now().year
-    
-    # Verify customer exists
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
-    if not customer:
-        raise HTTPException(status_code=404, detail="Customer not found")
-    
-    # Get all sales for this customer
-    sales = db.query(Sale).filter(
-        Sale.customer_id == customer_id,
-        extract('month', Sale.date) == month,
-        extract('year', Sale.date) == year
-    ).order_by(Sale.date).all()
-    
-    # Build transactions list
-    transactions = []
-    running_balance = 0.0
-    
-    for sale in sales:
-        debit = float(sale.total_price) if sale.total_price else 0.0
-        credit = 0.0
-        
-        # If paid, deduct from balance
-        if sale.payment_status == 'paid':
-            credit = debit
-            debit = 0.0
-        elif sale.payment_status == 'partial':
-            # Assume 50% paid (or calculate from actual payment data if available)
-            credit = debit * 0.5
-            debit = debit * 0.5
-        
-        running_balance += (credit - debit)
-        
-        transactions.append(LedgerEntry(
-            date=sale.date.date() if hasattr(sale.date, 'date') else sale.date,
-            reference_number=sale.bill_number,
-            description=f"Sale #{sale.bill_number}",
-            debit=debit,
-            credit=credit,
-            balance=running_balance,
-            payment_status=sale.payment_status or 'pending',
-            transaction_type='sale'
-        ))
-    
-    # Calculate totals
-    total_debit = sum(t.debit for t in transactions)
-    total_credit = sum(t.credit for t in transactions)
-    opening_balance = 0.0
-    closing_balance = running_balance
-    
-    return LedgerResponse(
-        party_id=customer_id,
-        party_name=customer.name,
-        party_type='customer',
-        month=month,
-        year=year,
-        opening_balance=opening_balance,
-        closing_balance=closing_balance,
-        total_debit=total_debit,
-        total_credit=total_credit,
-        transactions=transactions
-    )
+    """Get customer account ledger for a month/year, ISO week or date_from/date_to range (streamed)"""
+    return _ledger_response(db, 'customer', customer_id, period, "json")
 
 
 @router.get("/ledger/supplier/{supplier_id}", response_model=LedgerResponse)
 async def get_supplier_ledger(
     supplier_id: str,
-    month: int = None,
-    year: int = None,
-    db: Session = Depends(get_db),
+    period: Period = Depends(period_query),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get supplier account ledger for a specific month/year"""
-    if not month:
-        month = datetime.now().month
-    if not year:
-        year = datetime.now().year
-    
-    # Verify supplier exists
-    supplier = db.query(Supplier).filter(Supplier.id == supplier_id).first()
-    if not supplier:
-        raise HTTPException(status_code=404, detail="Supplier not found")
-    
-    # Get all purchases for this supplier
-    purchases = db.query(Purchase).filter(
-        Purchase.supplier_id == supplier_id,
-        extract('month', Purchase.date) == month,
-        extract('year', Purchase.date) == year
-    ).order_by(Purchase.date).all()
-    
-    # Build transactions list
-    transactions = []
-    running_balance = 0.0
-    
-    for purchase in purchases:
-        debit = 0.0
-        credit = float(purchase.total_amount) if purchase.total_amount else 0.0
-        
-        # If paid, deduct from balance
-        if purchase.payment_status == 'paid':
-            debit = credit
-            credit = 0.0
-        elif purchase.payment_status == 'partial':
-            # Assume 50% paid
-            debit = credit * 0.5
-            credit = credit * 0.5
-        
-        running_balance += (credit - debit)
-        
-        transactions.append(LedgerEntry(
-            date=purchase.date.date() if hasattr(purchase.date, 'date') else purchase.date,
-            reference_number=purchase.bill_number,
-            description=f"Purchase #{purchase.bill_number}",
-            debit=debit,
-            credit=credit,
-            balance=running_balance,
-            payment_status=purchase.payment_status or 'pending',
-            transaction_type='purchase'
-        ))
-    
-    # Calculate totals
-    total_debit = sum(t.debit for t in transactions)
-    total_credit = sum(t.credit for t in transactions)
-    opening_balance = 0.0
-    closing_balance = running_balance
-    
-    return LedgerResponse(
-        party_id=supplier_id,
-        party_name=supplier.name,
-        party_type='supplier',
-        month=month,
-        year=year,
-        opening_balance=opening_balance,
-        closing_balance=closing_balance,
-        total_debit=total_debit,
-        total_credit=total_credit,
-        transactions=transactions
-    )
+    """Get supplier account ledger for a month/year, ISO week or date_from/date_to range (streamed)"""
+    return _ledger_response(db, 'supplier', supplier_id, period, "json")
 
 
 @router.get("/ledger/customer/{customer_id}/pdf")
 async def get_customer_ledger_pdf(
     customer_id: str,
-    month: int = None,
-    year: int = None,
-    db: Session = Depends(get_db),
+    period: Period = Depends(period_query),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Download customer ledger as PDF"""
-    if not month:
-        month = datetime.now().month
-    if not year:
-        year = datetime.now().year
-    
-    # Get ledger data
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
-    if not customer:
-        raise HTTPException(status_code=404, detail="Customer not found")
-    
-    sales = db.query(Sale).filter(
-        Sale.customer_id == customer_id,
-        extract('month', Sale.date) == month,
-        extract('year', Sale.date) == year
-    ).order_by(Sale.date).all()
-    
-    # Generate PDF
-    pdf_buffer = io.BytesIO()
-    pdf_canvas = canvas.Canvas(pdf_buffer, pagesize=A4)
-    
-    # Title
-    pdf_canvas.setFont("Helvetica-Bold", 16)
-    pdf_canvas.drawString(50, 800, "Customer Ledger")
-    
-    # Customer info
-    pdf_canvas.setFont("Helvetica", 10)
-    pdf_canvas.drawString(50, 780, f"Customer: {customer.name}")
-    pdf_canvas.drawString(50, 765, f"Period: {calendar.month_name[month]} {year}")
-    
-    # Table headers
-    pdf_canvas.setFont("Helvetica-Bold", 9)
-    y = 740
-    pdf_canvas.drawString(50, y, "Date")
-    pdf_canvas.drawString(120, y, "Reference")
-    pdf_canvas.drawString(200, y, "Debit")
-    pdf_canvas.drawString(280, y, "Credit")
-    pdf_canvas.drawString(360, y, "Balance")
-    pdf_canvas.drawString(460, y, "Status")
-    
-    # Table data
-    pdf_canvas.setFont("Helvetica", 9)
-    y = 725
-    running_balance = 0.0
-    
-    for sale in sales:
-        debit = float(sale.total_price) if sale.total_price else 0.0
-        credit = 0.0
-        
-        if sale.payment_status == 'paid':
-            credit = debit
-            debit = 0.0
-        elif sale.payment_status == 'partial':
-            credit = debit * 0.5
-            debit = debit * 0.5
-        
-        running_balance += (credit - debit)
-        
-        sale_date = sale.date.strftime('%Y-%m-%d') if hasattr(sale.date, 'strftime') else str(sale.date)
-        
-        pdf_canvas.drawString(50, y, sale_date)
-        pdf_canvas.drawString(120, y, sale.bill_number)
-        pdf_canvas.drawString(200, y, f"{debit:.2f}")
-        pdf_canvas.drawString(280, y, f"{credit:.2f}")
-        pdf_canvas.drawString(360, y, f"{running_balance:.2f}")
-        pdf_canvas.drawString(460, y, sale.payment_status or 'pending')
-        
-        y -= 15
-        if y < 50:
-            pdf_canvas.showPage()
-            y = 750
-    
-    pdf_canvas.save()
-    pdf_buffer.seek(0)
-    
-    return StreamingResponse(
-        iter([pdf_buffer.getvalue()]),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=\"ledger_{customer_id}_{year}_{month}.pdf\""}
-    )
+    """Download customer ledger as PDF (same period parameters as the ledger)"""
+    return _ledger_response(db, 'customer', customer_id, period, "pdf")
 
 
 @router.get("/ledger/supplier/{supplier_id}/pdf")
 async def get_supplier_ledger_pdf(
     supplier_id: str,
-    month: int = None,
-    year: int = None,
-    db: Session = Depends(get_db),
+    period: Period = Depends(period_query),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Download supplier ledger as PDF"""
-    if not month:
-        month = datetime.now().month
-    if not year:
-        year = datetime.now().year
-    
-    # Get ledger data
-    supplier = db.query(Supplier).filter(Supplier.id == supplier_id).first()
-    if not supplier:
-        raise HTTPException(status_code=404, detail="Supplier not found")
-    
-    purchases = db.query(Purchase).filter(
-        Purchase.supplier_id == supplier_id,
-        extract('month', Purchase.date) == month,
-        extract('year', Purchase.date) == year
-    ).order_by(Purchase.date).all()
-    
-    # Generate PDF
-    pdf_buffer = io.BytesIO()
-    pdf_canvas = canvas.Canvas(pdf_buffer, pagesize=A4)
-    
-    # Title
-    pdf_canvas.setFont("Helvetica-Bold", 16)
-    pdf_canvas.drawString(50, 800, "Supplier Ledger")
-    
-    # Supplier info
-    pdf_canvas.setFont("Helvetica", 10)
-    pdf_canvas.drawString(50, 780, f"Supplier: {supplier.name}")
-    pdf_canvas.drawString(50, 765, f"Period: {calendar.month_name[month]} {year}")
-    
-    # Table headers
-    pdf_canvas.setFont("Helvetica-Bold", 9)
-    y = 740
-    pdf_canvas.drawString(50, y, "Date")
-    pdf_canvas.drawString(120, y, "Reference")
-    pdf_canvas.drawString(200, y, "Debit")
-    pdf_canvas.drawString(280, y, "Credit")
-    pdf_canvas.drawString(360, y, "Balance")
-    pdf_canvas.drawString(460, y, "Status")
-    
-    # Table data
-    pdf_canvas.setFont("Helvetica", 9)
-    y = 725
-    running_balance = 0.0
-    
-    for purchase in purchases:
-        debit = 0.0
-        credit = float(purchase.total_amount) if purchase.total_amount else 0.0
-        
-        if purchase.payment_status == 'paid':
-            debit = credit
-            credit = 0.0
-        elif purchase.payment_status == 'partial':
-            debit = credit * 0.5
-            credit = credit * 0.5
-        
-        running_balance += (credit - debit)
-        
-        purchase_date = purchase.date.strftime('%Y-%m-%d') if hasattr(purchase.date, 'strftime') else str(purchase.date)
-        
-        pdf_canvas.drawString(50, y, purchase_date)
-        pdf_canvas.drawString(120, y, purchase.bill_number)
-        pdf_canvas.drawString(200, y, f"{debit:.2f}")
-        pdf_canvas.drawString(280, y, f"{credit:.2f}")
-        pdf_canvas.drawString(360, y, f"{running_balance:.2f}")
-        pdf_canvas.drawString(460, y, purchase.payment_status or 'pending')
-        
-        y -= 15
-        if y < 50:
-            pdf_canvas.showPage()
-            y = 750
-    
-    pdf_canvas.save()
-    pdf_buffer.seek(0)
-    
+    """Download supplier ledger as PDF (same period parameters as the ledger)"""
+    return _ledger_response(db, 'supplier', supplier_id, period, "pdf")
+
+
+@router.get("/ledger/customer/{customer_id}/excel")
+async def get_customer_ledger_excel(
+    customer_id: str,
+    period: Period = Depends(period_query),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Download customer ledger as Excel (same period parameters as the ledger)"""
+    return _ledger_response(db, 'customer', customer_id, period, "xlsx")
+
+
+@router.get("/ledger/supplier/{supplier_id}/excel")
+async def get_supplier_ledger_excel(
+    supplier_id: str,
+    period: Period = Depends(period_query),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Download supplier ledger as Excel (same period parameters as the ledger)"""
+    return _ledger_response(db, 'supplier', supplier_id, period, "xlsx")
+
+
+# ============================================================================
+# LOT TRACEABILITY - which lots and supplier bills each sale came from (FIFO)
+# ============================================================================
+
+TRACE_MEDIA_TYPES = {
+    "json": "application/json",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+}
+
+
+def _trace_response(db: Session, item_id: str, period: Period, bill_number: Optional[str], fmt: str):
+    """Stream the traceability of one item's sales (app/db/traceability.py) as JSON, Excel or CSV"""
+    trace = open_trace(db, item_id, period, bill_number)
+    rows = trace_rows(db.get_bind(), trace)
+    render = {"json": trace_json, "xlsx": trace_excel, "csv": trace_csv}[fmt]
+    body = render(trace, rows, customer_names(db), supplier_names(db))
+    if fmt == "json":
+        return StreamingResponse(body, media_type=TRACE_MEDIA_TYPES[fmt])
+    return StreamingResponse(
+        body,
+        media_type=TRACE_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename=\"traceability_{item_id}_{period.slug}.{fmt}\""}
+    )
+
+
+@router.get("/traceability/{item_id}")
+async def get_item_traceability(
+    item_id: str,
+    period: Period = Depends(period_query),
+    bill_number: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Lots (and, for blown bottles, preform purchase bills) each sale of the item took its units from"""
+    return _trace_response(db, item_id, period, bill_number, "json")
+
+
+@router.get("/traceability/{item_id}/excel")
+async def get_item_traceability_excel(
+    item_id: str,
+    period: Period = Depends(period_query),
+    bill_number: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Download item traceability as Excel, one row per sale line, lot and origin"""
+    return _trace_response(db, item_id, period, bill_number, "xlsx")
+
+
+@router.get("/traceability/{item_id}/csv")
+async def get_item_traceability_csv(
+    item_id: str,
+    period: Period = Depends(period_query),
+    bill_number: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Download item traceability as CSV (same rows as the Excel file)"""
+    return _trace_response(db, item_id, period, bill_number, "csv")
+
+
+# ============================================================================
+# INVENTORY VALUATION - stock on hand at cost as of any day
+# ============================================================================
+
+def _valuation(db: Session, as_of: Optional[date]):
+    """(day, valued items, totals) from the cost layers (app/db/valuation.py)"""
+    as_of = as_of or business_today()
+    rows = item_valuations(db.connection(), as_of)
+    return as_of, rows, valuation_totals(rows)
+
+
+@router.get("/valuation")
+async def get_inventory_valuation(
+    as_of: Optional[date] = Query(None, description="Value stock at the close of this day (default today)"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Quantity and value at cost per item, with totals by type, size and grade"""
+    as_of, rows, totals = _valuation(db, as_of)
+    return json_response({"as_of": as_of, "items": [row._asdict() for row in rows], "totals": totals})
+
+
+@router.get("/valuation/excel")
+async def get_inventory_valuation_excel(
+    as_of: Optional[date] = Query(None, description="Value stock at the close of this day (default today)"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Download the inventory valuation as Excel (items and totals sheets)"""
+    as_of, rows, totals = _valuation(db, as_of)
+    return StreamingResponse(
+        valuation_excel(as_of, rows, totals),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f"attachment; filename=\"inventory_valuation_{as_of.isoformat()}.xlsx\""}
+    )
+
+
+@router.get("/valuation/csv")
+async def get_inventory_valuation_csv(
+    as_of: Optional[date] = Query(None, description="Value stock at the close of this day (default today)"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Download the valued items as CSV"""
+    as_of, rows, _ = _valuation(db, as_of)
     return StreamingResponse(
-        iter([pdf_buffer.getvalue()]),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=\"ledger_{supplier_id}_{year}_{month}.pdf\""}
-    )
\ No newline at end of file
+        iter([valuation_csv(rows)]),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=\"inventory_valuation_{as_of.isoformat()}.csv\""}
+    )
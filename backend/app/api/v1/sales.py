@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List
 from decimal import Decimal
 from datetime import datetime
 from app.db.database import get_db
 from app.core.security import get_current_user, get_current_admin_user
+from app.core.responses import model_list_response
+from app.db.cost_layers import consume_layers, rebuild_cost_layers, restore_layers
+from app.db.costing import FALLBACK_COST_SHARE, issue, rebuild_item_costs, receive, weighted_average
+from app.db.facts import rebuild_facts
 from app.models.user import User
 from app.models.transaction import Sale, SaleLineItem, Blow, Purchase, PurchaseLineItem
 from app.models.item import Stock
@@ -39,9 +43,11 @@ def calculate_cost_basis(item_id: int, quantity: int, unit_price: Decimal, db: S
                 cost_basis = float(latest_blow.produced_unit_cost)
                 logging.info(f"✅ Using Blow produced_unit_cost: Rs {cost_basis}")
             else:
-                # Get last preform purchase price
-                last_preform_purchase = db.query(Purchase).filter(
-                    Purchase.item_id == latest_blow.from_item_id
+                # Get last preform purchase price (prices live on the purchase line items)
+                last_preform_purchase = db.query(PurchaseLineItem).join(
+                    Purchase, Purchase.bill_number == PurchaseLineItem.bill_number
+                ).filter(
+                    PurchaseLineItem.item_id == latest_blow.from_item_id
                 ).order_by(Purchase.date.desc()).first()
                 
                 preform_price = None
@@ -235,6 +241,13 @@ async def create_sale(
     if not sale.line_items or len(sale.line_items) == 0:
         raise HTTPException(status_code=400, detail="At least one line item is required")
     
+    # Use due_date as the transaction date (allows user to select custom date)
+    sale_date = None
+    if sale.due_date:
+        sale_date = datetime.combine(sale.due_date, datetime.min.time())
+    else:
+        sale_date = datetime.utcnow()
+    
     # Calculate total price and validate stock for all items
     total_price = Decimal('0')
     line_items_data = []
@@ -256,13 +269,16 @@ async def create_sale(
         line_total = Decimal(str(line_item.quantity)) * (Decimal(str(line_item.unit_price)) + blow_price)
         total_price += line_total
         
-        # Calculate cost basis
-        cost_basis = calculate_cost_basis(
-            line_item.item_id,
-            line_item.quantity,
-            Decimal(str(line_item.unit_price)), 
-            db
-        )
+        # Calculate cost basis: the running average or the FIFO layers (COSTING_METHOD) move with the
+        # stock, so the cost is known without scanning purchase history (blown bottles included)
+        fallback = Decimal(str(line_item.unit_price)) * FALLBACK_COST_SHARE
+        if weighted_average():
+            cost_basis = issue(db, line_item.item_id, line_item.quantity, fallback=fallback)
+        else:
+            cost_basis = consume_layers(
+                db, line_item.item_id, line_item.quantity, 'sale', f"{sale.bill_number}-{line_item.item_id}",
+                at=sale_date, fallback=fallback,
+            )
         
         line_items_data.append({
             'stock': stock,
@@ -275,13 +291,6 @@ async def create_sale(
         })
     
     # Create Sale header record
-    # Use due_date as the transaction date (allows user to select custom date)
-    sale_date = None
-    if sale.due_date:
-        sale_date = datetime.combine(sale.due_date, datetime.min.time())
-    else:
-        sale_date = datetime.utcnow()
-    
     logging.info(f"📅 Creating sale with date: {sale_date}")
     
     db_sale = Sale(
@@ -290,6 +299,7 @@ async def create_sale(
         total_price=total_price,
         payment_status=sale.payment_status if hasattr(sale, 'payment_status') else 'pending',
         payment_method=sale.payment_method if hasattr(sale, 'payment_method') else None,
+        paid_amount=sale.paid_amount or 0,  # the payments hook squares it with payment_status
         created_by=current_user.id,
         due_date=sale.due_date,
         date=sale_date
@@ -352,15 +362,11 @@ async def get_sales(
     try:
         print(f"\n📊 GET /sales endpoint called")
         print(f"   skip={skip}, limit={limit}, user={current_user.username}")
-        sales = db.query(Sale).order_by(Sale.date.desc()).offset(skip).limit(limit).all()
+        # Line items in one extra IN query instead of one lazy load per sale
+        sales = db.query(Sale).options(selectinload(Sale.line_items)).order_by(Sale.date.desc()).offset(skip).limit(limit).all()
         print(f"   ✅ Returned {len(sales)} sales")
         
-        # Ensure line_items are loaded
-        for sale in sales:
-            if sale.line_items is None:
-                sale.line_items = []
-        
-        return sales
+        return model_list_response(sales, SaleResponse)
     except Exception as e:
         logging.error(f"Error getting sales: {e}", exc_info=True)
         raise HTTPException(status_code=400, detail=f"Error fetching sales: {str(e)}")
@@ -370,40 +376,18 @@ async def recalculate_cogs(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Recalculate COGS for all sales based on FIFO method"""
+    """Recalculate COGS for all sales based on FIFO method (or the weighted average, with COSTING_METHOD=wac)"""
     try:
         logging.info("🔄 Starting COGS recalculation for all sales...")
-        
-        # Get all sales ordered by date, then bill_number
-        sales = db.query(Sale).order_by(Sale.date.asc(), Sale.bill_number.asc()).all()
-        
-        logging.info(f"📊 Processing {len(sales)} sales in order:")
-        for sale in sales:
-            logging.info(f"   {sale.bill_number} (Date: {sale.date})")
-        
-        items_updated = 0
-        
-        for sale in sales:
-            for line_item in sale.line_items:
-                logging.info(f"\n🔄 Recalculating {sale.bill_number}-{line_item.item_id} (qty={line_item.quantity}, current cost_basis={line_item.cost_basis})")
-                
-                # Recalculate cost_basis for this line item, excluding this sale from the calculation
-                new_cost_basis = calculate_cost_basis(
-                    line_item.item_id,
-                    line_item.quantity,
-                    Decimal(str(line_item.unit_price)),
-                    db,
-                    exclude_bill_number=sale.bill_number  # Exclude current sale from FIFO queue
-                )
-                
-                old_cost_basis = line_item.cost_basis
-                if old_cost_basis != new_cost_basis:
-                    logging.info(f"✅ UPDATED: cost_basis {old_cost_basis} → {new_cost_basis}, COGS: {old_cost_basis * line_item.quantity} → {new_cost_basis * line_item.quantity}")
-                    line_item.cost_basis = new_cost_basis
-                    items_updated += 1
-                else:
-                    logging.info(f"⏭️  NO CHANGE: cost_basis remains {old_cost_basis}")
-        
+        # One ordered pass over the whole history instead of a FIFO scan per line item
+        if weighted_average():
+            _, items_updated = rebuild_item_costs(db.connection(), restamp=True)
+            blows_updated = 0
+        else:
+            _, items_updated, blows_updated = rebuild_cost_layers(db.connection(), restamp=True)
+        if items_updated or blows_updated:
+            # The restamp is Core UPDATEs the commit hook can't see; COGS and the blow cost facts sum those costs
+            rebuild_facts(db.connection())
         db.commit()
         
         logging.info(f"✅ COGS recalculation complete. Updated {items_updated} line items.")
@@ -446,7 +430,7 @@ async def update_sale(
     
     # Non-admin users can only update payment fields
     if current_user.role != 'admin':
-        allowed_fields = {'payment_status'}
+        allowed_fields = {'payment_status', 'paid_amount'}
         if not set(update_data.keys()).issubset(allowed_fields):
             raise HTTPException(
                 status_code=403, 
@@ -455,7 +439,7 @@ async def update_sale(
     
     # Update allowed fields
     for field, value in update_data.items():
-        if field in ['payment_status', 'payment_method']:
+        if field in ['payment_status', 'payment_method', 'paid_amount']:
             setattr(sale, field, value)
     
     db.commit()
@@ -479,6 +463,10 @@ async def delete_sale(
         stock = db.query(Stock).filter(Stock.item_id == line_item.item_id).first()
         if stock:
             stock.quantity += line_item.quantity
+        if weighted_average():
+            receive(db, line_item.item_id, line_item.quantity, line_item.cost_basis)  # back in at what it cost
+        else:
+            restore_layers(db, line_item.item_id, line_item.quantity, 'sale', line_item.id, line_item.cost_basis)
     
     # Delete line items (cascade will handle this, but explicit for clarity)
     db.query(SaleLineItem).filter(SaleLineItem.bill_number == bill_number).delete()
@@ -5,10 +5,12 @@ This module calculates opening balance, movements, and closing balance per month
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
-from datetime import datetime, timedelta
-from app.db.database import get_db
+from sqlalchemy import func
+from datetime import datetime
+from app.db.database import get_read_db
 from app.core.security import get_current_user, get_current_admin_user
+from app.core.responses import json_response
+from app.core.periods import resolve_period
 from app.models.user import User
 from app.models.item import Item, Stock
 from app.models.stock_movement import StockMovement
@@ -22,7 +24,7 @@ async def get_opening_balance(
     month: int = None,
     year: int = None,
     item_id: str = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -34,11 +36,8 @@ async def get_opening_balance(
     if year is None:
         year = datetime.now().year
     
-    # Get first day of requested month
-    month_start = datetime(year, month, 1)
-    
-    # Get the last movement BEFORE this month started
-    previous_month_end = month_start - timedelta(days=1)
+    # Opening balance = the last movement BEFORE this month started
+    period = resolve_period(month=month, year=year)
     
     result = []
     
@@ -46,7 +45,7 @@ async def get_opening_balance(
         # Single item opening balance
         last_movement = db.query(StockMovement).filter(
             StockMovement.item_id == item_id,
-            StockMovement.movement_date < month_start
+            period.before(StockMovement.movement_date)
         ).order_by(StockMovement.movement_date.desc()).first()
         
         item = db.query(Item).filter(Item.id == item_id).first()
@@ -65,7 +64,7 @@ async def get_opening_balance(
         for item in items:
             last_movement = db.query(StockMovement).filter(
                 StockMovement.item_id == item.id,
-                StockMovement.movement_date < month_start
+                period.before(StockMovement.movement_date)
             ).order_by(StockMovement.movement_date.desc()).first()
             
             opening_balance = last_movement.after_quantity if last_movement else 0
@@ -87,7 +86,7 @@ async def get_monthly_stock_statement(
     month: int = None,
     year: int = None,
     item_id: str = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -101,12 +100,7 @@ async def get_monthly_stock_statement(
     if year is None:
         year = datetime.now().year
     
-    month_start = datetime(year, month, 1)
-    # Get last day of month
-    if month == 12:
-        month_end = datetime(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        month_end = datetime(year, month + 1, 1) - timedelta(days=1)
+    period = resolve_period(month=month, year=year)
     
     result = []
     
@@ -119,15 +113,14 @@ async def get_monthly_stock_statement(
         # Opening balance
         last_movement_before = db.query(StockMovement).filter(
             StockMovement.item_id == item_id,
-            StockMovement.movement_date < month_start
+            period.before(StockMovement.movement_date)
         ).order_by(StockMovement.movement_date.desc()).first()
         opening_balance = last_movement_before.after_quantity if last_movement_before else 0
         
         # Movements in this month
         movements = db.query(StockMovement).filter(
             StockMovement.item_id == item_id,
-            extract('month', StockMovement.movement_date) == month,
-            extract('year', StockMovement.movement_date) == year
+            period.filter(StockMovement.movement_date)
         ).order_by(StockMovement.movement_date).all()
         
         # Total movements
@@ -136,7 +129,7 @@ async def get_monthly_stock_statement(
         # Closing balance
         closing_balance = opening_balance + total_movements
         
-        return {
+        return json_response({
             "item_id": item_id,
             "item_name": item.name,
             "month": f"{month}/{year}",
@@ -157,7 +150,7 @@ async def get_monthly_stock_statement(
                 }
                 for m in movements
             ]
-        }
+        })
     else:
         # All items statement
         items = db.query(Item).all()
@@ -166,15 +159,14 @@ async def get_monthly_stock_statement(
             # Opening balance
             last_movement_before = db.query(StockMovement).filter(
                 StockMovement.item_id == item.id,
-                StockMovement.movement_date < month_start
+                period.before(StockMovement.movement_date)
             ).order_by(StockMovement.movement_date.desc()).first()
             opening_balance = last_movement_before.after_quantity if last_movement_before else 0
             
             # Movements in this month
             movements = db.query(StockMovement).filter(
                 StockMovement.item_id == item.id,
-                extract('month', StockMovement.movement_date) == month,
-                extract('year', StockMovement.movement_date) == year
+                period.filter(StockMovement.movement_date)
             ).all()
             
             total_movements = sum([m.quantity_change for m in movements])
@@ -190,17 +182,17 @@ async def get_monthly_stock_statement(
                 "closing_balance": closing_balance
             })
         
-        return {
+        return json_response({
             "month": f"{month}/{year}",
             "statement_date": datetime.now().isoformat(),
             "items": result
-        }
+        })
 
 
 @router.get("/balance/cumulative-position")
 async def get_cumulative_position(
     item_id: str = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -7,8 +7,9 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import func, extract
 from datetime import datetime, timedelta, date
-from app.db.database import get_db
+from app.db.database import get_read_db
 from app.core.security import get_current_user, get_current_admin_user
+from app.core.periods import Period
 from app.models.user import User
 from app.models.item import Item, Stock
 from app.models.stock_movement import StockMovement
@@ -21,7 +22,7 @@ router = APIRouter()
 
 @router.get("/verify/month-boundary-reset")
 async def check_month_boundary_reset(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -113,7 +114,7 @@ async def verify_month_continuity(
     item_id: str,
     year: int,
     month: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -127,37 +128,35 @@ async def verify_month_continuity(
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    # Previous month
-    prev_month = month - 1 if month > 1 else 12
-    prev_year = year if month > 1 else year - 1
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="month must be between 1 and 12")
+    current = Period.month(year, month)
+    prev = current.previous()
+    following = current.next()
+    prev_month, prev_year = prev.month_number, prev.year
+    next_month, next_year = following.month_number, following.year
     
-    # Next month
-    next_month = month + 1 if month < 12 else 1
-    next_year = year if month < 12 else year + 1
-    
-    def get_month_closing(m, y):
+    def get_month_closing(period):
         """Get last movement in a month"""
         movements = db.query(StockMovement).filter(
             StockMovement.item_id == item_id,
-            extract('month', StockMovement.movement_date) == m,
-            extract('year', StockMovement.movement_date) == y
+            period.filter(StockMovement.movement_date)
         ).order_by(StockMovement.movement_date.desc()).first()
         return movements.after_quantity if movements else 0
     
-    def get_month_opening(m, y):
+    def get_month_opening(period):
         """Get first movement in a month (before_quantity)"""
         movements = db.query(StockMovement).filter(
             StockMovement.item_id == item_id,
-            extract('month', StockMovement.movement_date) == m,
-            extract('year', StockMovement.movement_date) == y
+            period.filter(StockMovement.movement_date)
         ).order_by(StockMovement.movement_date).first()
         return movements.before_quantity if movements else 0
     
     # Get balances
-    prev_closing = get_month_closing(prev_month, prev_year)
-    current_opening = get_month_opening(month, year)
-    current_closing = get_month_closing(month, year)
-    next_opening = get_month_opening(next_month, next_year)
+    prev_closing = get_month_closing(prev)
+    current_opening = get_month_opening(current)
+    current_closing = get_month_closing(current)
+    next_opening = get_month_opening(following)
     
     # Verify continuity
     continuity_pass = (
@@ -207,7 +206,7 @@ async def verify_month_continuity(
 @router.get("/verify/first-day-of-month/{item_id}")
 async def check_first_day_anomaly(
     item_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -266,7 +265,7 @@ async def check_first_day_anomaly(
 @router.get("/verify/monthly-audit-report")
 async def generate_monthly_audit_report(
     item_id: str = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -308,8 +307,7 @@ async def generate_monthly_audit_report(
             
             movements = db.query(StockMovement).filter(
                 StockMovement.item_id == item.id,
-                extract('month', StockMovement.movement_date) == month,
-                extract('year', StockMovement.movement_date) == year
+                Period.month(year, month).filter(StockMovement.movement_date)
             ).order_by(StockMovement.movement_date).all()
             
             if not movements:
@@ -333,7 +331,7 @@ async def generate_monthly_audit_report(
 
 @router.post("/verify/manual-reset-check")
 async def manual_reset_prevention_check(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
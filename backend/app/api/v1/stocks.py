@@ -1,14 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List
-from app.db.database import get_db
-from app.core.security import get_current_user
+from typing import List, Optional
+from app.db.database import SessionLocal, get_db, get_read_db
+from app.db.alerts import alert_counts, open_alerts
+from app.db.cost_layers import adjust_layers
+from app.db.costing import adjust, weighted_average
+from app.db.forecast import ForecastQuery, cached_forecast
+from app.core.config import settings
+from app.core.security import get_current_admin_user, get_current_user
+from app.core.periods import business_today
+from app.core.responses import dumps, json_response
 from app.models.user import User
-from app.models.item import Stock, Item
+from app.models.item import Stock, Item, StockThreshold
 from app.models.stock_movement import StockMovement
 from app.models.transaction import Purchase, Sale, Blow, Waste, PurchaseLineItem, SaleLineItem
-from app.schemas.item import StockResponse, ItemResponse, StockMovementResponse, StockMovementBase
+from app.schemas.item import StockResponse, ItemResponse, StockMovementResponse, StockMovementBase, StockThresholdUpdate
+import asyncio
 
 router = APIRouter()
 
@@ -18,24 +27,12 @@ async def get_all_stocks(
     current_user: User = Depends(get_current_user)
 ):
     """Get all stock items with details"""
-    stocks = db.query(Stock).all()
-    result = []
+    rows = db.query(
+        Stock.item_id, Item.name.label("item_name"), Item.type.label("item_type"),
+        Item.size, Item.grade, Item.unit, Stock.quantity, Stock.last_updated
+    ).join(Item, Item.id == Stock.item_id).all()
     
-    for stock in stocks:
-        item = db.query(Item).filter(Item.id == stock.item_id).first()
-        if item:
-            result.append({
-                "item_id": stock.item_id,
-                "item_name": item.name,
-                "item_type": item.type,
-                "size": item.size,
-                "grade": item.grade,
-                "unit": item.unit,
-                "quantity": stock.quantity,
-                "last_updated": stock.last_updated
-            })
-    
-    return result
+    return json_response([row._asdict() for row in rows])
 
 @router.post("/movements", response_model=StockMovementResponse, status_code=status.HTTP_201_CREATED)
 async def create_stock_movement(
@@ -62,6 +59,11 @@ async def create_stock_movement(
         db.add(stock)
         after_qty = movement.quantity_change
     
+    if weighted_average():
+        adjust(db, movement.item_id, movement.quantity_change)
+    else:
+        adjust_layers(db, movement.item_id, movement.quantity_change, movement.reference_id)
+    
     # Create stock movement record
     db_movement = StockMovement(
         item_id=movement.item_id,
@@ -97,6 +99,119 @@ async def get_stock_movements(
     movements = query.order_by(StockMovement.movement_date.desc()).offset(skip).limit(limit).all()
     return movements
 
+def _forecast_query(
+    horizon: int = Query(14, description="Days to forecast"),
+    lead_time: Optional[int] = Query(None, description="Supplier lead time in days (default REORDER_LEAD_TIME_DAYS)"),
+    service_level: Optional[float] = Query(None, description="Share of lead times covered without running out"),
+    history: Optional[int] = Query(None, description="Days of sales history fitted (default FORECAST_HISTORY_DAYS)"),
+    item_type: Optional[str] = Query(None, alias="type", description="Only items of this type, e.g. preform"),
+) -> ForecastQuery:
+    given = {"lead_time": lead_time, "service_level": service_level, "history": history}
+    return ForecastQuery(horizon, item_type=item_type, **{name: value for name, value in given.items() if value is not None})
+
+
+@router.get("/forecast")
+async def get_demand_forecast(
+    query: ForecastQuery = Depends(_forecast_query),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Daily demand forecast and reorder point of every item (cached until the next stock movement)"""
+    rows = cached_forecast(db.connection(), query)
+    return json_response({"as_of": business_today(), **query.header(), "items": rows})
+
+
+@router.get("/reorder-alerts")
+async def get_reorder_alerts(
+    query: ForecastQuery = Depends(_forecast_query),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Items out of stock or at their reorder point, fewest days of cover first"""
+    rows = [row for row in cached_forecast(db.connection(), query) if row["status"] != "ok"]
+    rows.sort(key=lambda row: (row["status"] != "out", row["days_of_cover"] or 0))
+    return json_response({"as_of": business_today(), **query.header(), "alerts": rows})
+
+@router.get("/alerts")
+async def get_stock_alerts(
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Items out of stock, below their minimum or above their maximum (kept current on every stock change)"""
+    alerts = open_alerts(db)
+    return json_response({"counts": alert_counts(alerts), "alerts": alerts})
+
+
+@router.get("/alerts/stream")
+async def stream_stock_alerts(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Server-sent events: the open alerts on connect and again whenever they change"""
+    def snapshot():
+        with SessionLocal() as db:
+            return open_alerts(db)
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        last = None
+        while not await request.is_disconnected():
+            # run_in_executor, not to_thread: the polls stay outside this request's query budget
+            alerts = await loop.run_in_executor(None, snapshot)
+            if alerts != last:
+                last = alerts
+                payload = dumps({"counts": alert_counts(alerts), "alerts": alerts}).decode()
+                yield f"event: alerts\ndata: {payload}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(settings.ALERT_STREAM_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/thresholds")
+async def get_stock_thresholds(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Every item's minimum and maximum stock, with the stock on hand"""
+    rows = db.query(
+        StockThreshold.item_id, Item.name.label("item_name"), StockThreshold.min_quantity,
+        StockThreshold.max_quantity, func.coalesce(Stock.quantity, 0).label("quantity")
+    ).join(Item, Item.id == StockThreshold.item_id).outerjoin(Stock, Stock.item_id == StockThreshold.item_id) \
+     .order_by(StockThreshold.item_id).all()
+    return json_response([row._asdict() for row in rows])
+
+
+@router.put("/thresholds/{item_id}")
+async def set_stock_threshold(
+    item_id: str,
+    threshold: StockThresholdUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Set an item's minimum and/or maximum stock; both empty removes them (Admin only)"""
+    if not db.query(Item.id).filter(Item.id == item_id).first():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+    low, high = threshold.min_quantity, threshold.max_quantity
+    if (low is not None and low < 0) or (high is not None and high < 0):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Thresholds cannot be negative")
+    if low is not None and high is not None and high < low:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="max_quantity must not be below min_quantity")
+
+    # The alert check at commit picks up the changed thresholds (app/db/alerts.py)
+    row = db.get(StockThreshold, item_id)
+    if low is None and high is None:
+        if row:
+            db.delete(row)
+    elif row:
+        row.min_quantity, row.max_quantity = low, high
+    else:
+        db.add(StockThreshold(item_id=item_id, min_quantity=low, max_quantity=high))
+    db.commit()
+    return {"item_id": item_id, "min_quantity": low, "max_quantity": high}
+
 # stocks.py
 
 @router.get("/items", response_model=List[ItemResponse])
@@ -107,27 +222,15 @@ async def get_all_items(
     """Get all items with current stock"""
     print(f"\n📊 GET /stocks/items endpoint called")
     print(f"   user={current_user.username}")
-    items = db.query(Item).all()
-    print(f"   ✅ Found {len(items)} items in database")
-    result = []
-
-    for item in items:
-        # Get current stock
-        stock = db.query(Stock).filter(Stock.item_id == item.id).first()
-        current_stock = stock.quantity if stock else 0
-
-        result.append({
-            "id": item.id,
-            "name": item.name,
-            "type": item.type,
-            "size": item.size,
-            "grade": item.grade,
-            "unit": item.unit,
-            "current_stock": current_stock
-        })
+    # One join instead of a stock lookup per item
+    rows = db.query(
+        Item.id, Item.name, Item.type, Item.size, Item.grade, Item.unit,
+        func.coalesce(Stock.quantity, 0).label("current_stock")
+    ).outerjoin(Stock, Stock.item_id == Item.id).all()
+    result = [row._asdict() for row in rows]
     
     print(f"   ✅ Returning {len(result)} items to client")
-    return result
+    return json_response(result)
 
 @router.post("/items/auto-create")
 async def auto_create_item(
@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 from app.db.database import get_db
+from app.db.cost_layers import consume_layers, restore_layers
+from app.db.costing import issue, receive, weighted_average
 from app.core.security import get_current_user, get_current_admin_user
 from app.models.user import User
 from app.models.transaction import Waste
@@ -42,6 +44,10 @@ async def create_waste(
     before_qty = stock.quantity
     stock.quantity -= waste.quantity
     after_qty = stock.quantity
+    if weighted_average():
+        issue(db, waste.item_id, waste.quantity)
+    else:
+        consume_layers(db, waste.item_id, waste.quantity, 'waste', waste.id)
     
     # Record stock movement
     movement = StockMovement(
@@ -96,6 +102,7 @@ async def update_waste(
         raise HTTPException(status_code=404, detail="Waste record not found")
     
     update_data = waste_update.dict(exclude_unset=True)
+    old_quantity = waste.quantity
     for field, value in update_data.items():
         setattr(waste, field, value)
     
@@ -103,6 +110,15 @@ async def update_waste(
     if 'quantity' in update_data or 'price_per_unit' in update_data:
         waste.total_price = waste.quantity * waste.price_per_unit
     
+    if waste.quantity != old_quantity:
+        # Re-cost only (stock isn't moved here): the old issue goes back, the new one goes out
+        if weighted_average():
+            receive(db, waste.item_id, old_quantity)
+            issue(db, waste.item_id, waste.quantity)
+        else:
+            restore_layers(db, waste.item_id, old_quantity, 'waste', waste.id)
+            consume_layers(db, waste.item_id, waste.quantity, 'waste', waste.id)
+    
     db.commit()
     db.refresh(waste)
     return waste
@@ -118,6 +134,12 @@ async def delete_waste(
     if not waste:
         raise HTTPException(status_code=404, detail="Waste record not found")
     
+    # The costs follow the waste records: its issue goes back (stock is left as it is)
+    if weighted_average():
+        receive(db, waste.item_id, waste.quantity)
+    else:
+        restore_layers(db, waste.item_id, waste.quantity, 'waste', waste.id)
+    
     db.delete(waste)
     db.commit()
     return {"message": "Waste record deleted successfully"}
@@ -0,0 +1,95 @@
+"""
+In-process caches
+Reference-data catalogs (id -> name for items, customers, suppliers) that are
+read on almost every report and invoice but change rarely.
+
+Entries are dropped after any commit that touched the model and otherwise
+expire after CATALOG_CACHE_TTL seconds, which bounds staleness when several
+worker processes each hold their own copy.
+"""
+
+from app.core.metrics import record_cache_lookup
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from typing import Dict, Optional, Tuple
+import threading
+import time
+
+CATALOG_CACHE_TTL = 300.0
+
+_lock = threading.Lock()
+_catalogs: Dict[str, Tuple[float, Dict[str, str]]] = {}
+
+
+def _catalog_models() -> Dict[str, type]:
+    # Imported lazily - models import the database module, which imports core
+    from app.models.item import Item
+    from app.models.party import Customer, Supplier
+    return {"items": Item, "customers": Customer, "suppliers": Supplier}
+
+
+def catalog_names(db: Session, catalog: str) -> Dict[str, str]:
+    """id -> name for a catalog ("items", "customers", "suppliers"), loaded with one query"""
+    now = time.monotonic()
+    with _lock:
+        entry = _catalogs.get(catalog)
+    hit = entry is not None and now - entry[0] < CATALOG_CACHE_TTL
+    record_cache_lookup(f"catalog_{catalog}", hit)
+    if hit:
+        return entry[1]
+
+    model = _catalog_models()[catalog]
+    names = {str(row_id): name for row_id, name in db.query(model.id, model.name).all()}
+    with _lock:
+        _catalogs[catalog] = (now, names)
+    return names
+
+
+def item_names(db: Session) -> Dict[str, str]:
+    return catalog_names(db, "items")
+
+
+def customer_names(db: Session) -> Dict[str, str]:
+    return catalog_names(db, "customers")
+
+
+def supplier_names(db: Session) -> Dict[str, str]:
+    return catalog_names(db, "suppliers")
+
+
+def invalidate_catalogs(*catalogs: str):
+    """Drop the named catalogs (all of them when called without arguments)"""
+    with _lock:
+        if not catalogs:
+            _catalogs.clear()
+        for catalog in catalogs:
+            _catalogs.pop(catalog, None)
+
+
+def _catalog_for(obj) -> Optional[str]:
+    for catalog, model in _catalog_models().items():
+        if isinstance(obj, model):
+            return catalog
+    return None
+
+
+@event.listens_for(Session, "after_flush")
+def _remember_catalog_changes(session, flush_context):
+    changed = session.info.setdefault("changed_catalogs", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        catalog = _catalog_for(obj)
+        if catalog:
+            changed.add(catalog)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_catalogs(session):
+    # Invalidate on commit, not flush, so a concurrent reload can't cache uncommitted rows
+    changed = session.info.pop("changed_catalogs", None)
+    if changed:
+        invalidate_catalogs(*changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_catalog_changes(session):
+    session.info.pop("changed_catalogs", None)
@@ -31,6 +31,49 @@ class Settings(BaseSettings):
     # Environment
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
     
+    # Time zone that decides which day/month a transaction belongs to in reports - empty = database session zone
+    BUSINESS_TIMEZONE: str = os.getenv("BUSINESS_TIMEZONE", "")
+    
+    # Observability - Prometheus-style /metrics endpoint
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    
+    # SQL query budget per request (N+1 detection) - violations are logged
+    QUERY_BUDGET_ENABLED: bool = os.getenv("QUERY_BUDGET_ENABLED", "true").lower() == "true"
+    QUERY_BUDGET: int = int(os.getenv("QUERY_BUDGET", "30"))
+    QUERY_REPEAT_BUDGET: int = int(os.getenv("QUERY_REPEAT_BUDGET", "5"))  # identical statements per request
+    
+    # Create missing tables and build the maintained rollups before serving (app/db/migrate.py); turn off
+    # when scripts/migrate.py runs as a release step instead
+    MIGRATE_ON_STARTUP: bool = os.getenv("MIGRATE_ON_STARTUP", "true").lower() == "true"
+    
+    # Startup warm-up (connections, compiled SQL, catalogs, PDF fonts) - /health is 503 until done
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_TIMEOUT: float = float(os.getenv("WARMUP_TIMEOUT", "20"))  # seconds for the whole stage
+    WARMUP_CONNECTIONS: int = int(os.getenv("WARMUP_CONNECTIONS", "2"))
+    
+    # Cost of goods sold: 'fifo' (oldest purchases first) or 'wac' (perpetual weighted average, app/db/costing.py)
+    COSTING_METHOD: str = os.getenv("COSTING_METHOD", "fifo").lower()
+    
+    # Demand forecasts (GET /stocks/forecast) - days of sales history fitted, supplier lead time and the share
+    # of lead times the safety stock should cover without running out
+    FORECAST_HISTORY_DAYS: int = int(os.getenv("FORECAST_HISTORY_DAYS", "182"))
+    REORDER_LEAD_TIME_DAYS: int = int(os.getenv("REORDER_LEAD_TIME_DAYS", "7"))
+    REORDER_SERVICE_LEVEL: float = float(os.getenv("REORDER_SERVICE_LEVEL", "0.95"))
+    
+    # Stock alert stream (GET /stocks/alerts/stream) - seconds between checks of the open alerts
+    ALERT_STREAM_INTERVAL: float = float(os.getenv("ALERT_STREAM_INTERVAL", "5"))
+    
+    # Bulk invoice ZIPs (POST /invoices/bundle) - render processes (0 = render in threads) and ids per request
+    INVOICE_WORKERS: int = int(os.getenv("INVOICE_WORKERS", str(min(4, os.cpu_count() or 1))))
+    INVOICE_BUNDLE_MAX: int = int(os.getenv("INVOICE_BUNDLE_MAX", "500"))
+    
+    # Read replica for reports/dashboards (get_read_db) - empty = everything on the primary
+    READ_DATABASE_URL: str = os.getenv("READ_DATABASE_URL", "")
+    READ_REPLICA_MAX_LAG: float = float(os.getenv("READ_REPLICA_MAX_LAG", "5"))  # seconds of replay lag tolerated
+    READ_REPLICA_FALLBACK: bool = os.getenv("READ_REPLICA_FALLBACK", "true").lower() == "true"  # use primary when replica is down/lagging
+    READ_REPLICA_CHECK_INTERVAL: float = float(os.getenv("READ_REPLICA_CHECK_INTERVAL", "2"))  # seconds between lag probes
+    READ_YOUR_WRITES_SECONDS: float = float(os.getenv("READ_YOUR_WRITES_SECONDS", "15"))  # keep a writer on the primary
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
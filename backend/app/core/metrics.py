@@ -0,0 +1,296 @@
+"""
+Prometheus-style metrics
+Small in-process registry rendered in the text exposition format at /metrics
+"""
+
+from app.db.query_stats import track_queries
+from typing import Callable, Dict, List, Tuple
+import bisect
+import threading
+import time
+
+# Latency buckets (seconds) - same defaults as the Prometheus client libraries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback: Callable[[], float] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self):
+        if self._callback is not None:
+            try:
+                value = self._callback()
+            except Exception:
+                return []
+            if value is None:
+                return []
+            return [f"{self.name} {_format_value(value)}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            inf = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ===== HTTP =====
+http_requests_total = REGISTRY.register(Counter(
+    "http_requests_total", "Total HTTP requests by templated route and status", ("method", "route", "status")))
+http_request_duration_seconds = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Request latency by templated route", ("method", "route")))
+http_requests_in_flight = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Requests currently being served", ("method",)))
+http_response_size_bytes = REGISTRY.register(Histogram(
+    "http_response_size_bytes", "Response body size by templated route", ("method", "route"), buckets=SIZE_BUCKETS))
+
+# ===== Database (per request) =====
+http_request_db_statements = REGISTRY.register(Histogram(
+    "http_request_db_statements", "SQL statements executed per request", ("method", "route"), buckets=COUNT_BUCKETS))
+http_request_db_seconds = REGISTRY.register(Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per request", ("method", "route")))
+db_pool_checkout_wait_seconds = REGISTRY.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time each request spent waiting for pooled connections", ("route",)))
+db_statements_total = REGISTRY.register(Counter(
+    "db_statements_total", "SQL statements executed while serving requests", ("route",)))
+db_read_sessions_total = REGISTRY.register(Counter(
+    "db_read_sessions_total", "Read sessions (get_read_db) by target database and routing reason", ("target", "reason")))
+
+# ===== Caches =====
+cache_lookups_total = REGISTRY.register(Counter(
+    "cache_lookups_total", "Cache lookups by cache name and result (hit/miss)", ("cache", "result")))
+
+# ===== Commit-time rollups =====
+rollup_refresh_failures_total = REGISTRY.register(Counter(
+    "rollup_refresh_failures_total", "Commits rolled back because a maintained table failed to refresh", ("table",)))
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Count a cache lookup; hit ratio = hits / (hits + misses)"""
+    cache_lookups_total.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_refresh_failure(table: str):
+    rollup_refresh_failures_total.inc(table=table)
+
+
+def record_read_session(target: str, reason: str):
+    db_read_sessions_total.inc(target=target, reason=reason)
+
+
+def register_replica_gauges(router):
+    """Expose the last measured replica lag (-1 while unreachable)"""
+    REGISTRY.register(Gauge("db_replica_lag_seconds", "Read replica replay lag at the last probe",
+                            callback=lambda: router.last_lag if router.last_lag is not None else -1))
+
+
+def register_pool_gauges(engine):
+    """Expose connection pool occupancy for pools that track it (QueuePool)"""
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return
+    REGISTRY.register(Gauge("db_pool_checked_out", "Connections currently checked out of the pool",
+                            callback=lambda: pool.checkedout()))
+    REGISTRY.register(Gauge("db_pool_size", "Configured connection pool size",
+                            callback=lambda: pool.size()))
+    REGISTRY.register(Gauge("db_pool_overflow", "Connections opened beyond pool_size",
+                            callback=lambda: max(pool.overflow(), 0)))
+
+
+def route_template(scope) -> str:
+    """Templated path of the matched route (e.g. /api/v1/sales/{bill_number}).
+
+    Taken from the route the router matched, so a path value that happens to
+    equal a segment (a bill number "sales") can't change the label. FastAPI
+    keeps routers included with a prefix apart and records the prefixed
+    route as the effective route context; scope["route"] is then the route
+    as the router declared it. Apps mounted under a path add the mount
+    prefix, which the router leaves in root_path.
+    """
+    route = (scope.get("fastapi") or {}).get("effective_route_context") or scope.get("route")
+    template = getattr(route, "path_format", None)
+    if template is None:
+        return "unmatched"
+    if "app_root_path" not in scope:  # only set once a Mount matched
+        return template
+    return scope["root_path"][len(scope["app_root_path"]):] + template
+
+
+def render_latest() -> str:
+    return REGISTRY.render()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, response size and SQL usage per route"""
+
+    skip_paths = {"/metrics"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_holder = {"status": 500, "size": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                status_holder["size"] += len(message.get("body", b""))
+            await send(message)
+
+        http_requests_in_flight.inc(method=method)
+        start = time.perf_counter()
+        with track_queries(reuse=True) as stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                duration = time.perf_counter() - start
+                http_requests_in_flight.dec(method=method)
+                route = route_template(scope)
+                http_requests_total.inc(method=method, route=route, status=str(status_holder["status"]))
+                http_request_duration_seconds.observe(duration, method=method, route=route)
+                http_response_size_bytes.observe(status_holder["size"], method=method, route=route)
+                http_request_db_statements.observe(stats.statements, method=method, route=route)
+                http_request_db_seconds.observe(stats.duration, method=method, route=route)
+                db_statements_total.inc(stats.statements, route=route)
+                if stats.pool_checkouts:
+                    db_pool_checkout_wait_seconds.observe(stats.pool_wait, route=route)
@@ -0,0 +1,111 @@
+"""
+Edge middleware
+One pure ASGI layer for request timing, HTTPS redirect rewriting and the React SPA fallback.
+Replaces the stacked @app.middleware("http") functions and BaseHTTPMiddleware SPA layer,
+which each added a task hop and buffered streaming responses.
+"""
+
+from app.core.static_assets import StaticAssetIndex, serve_asset
+from pathlib import Path
+from typing import Optional
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Backend paths that must reach the routers even though they are not under /api
+# ("/" stays with the SPA when dist is served; its root route redirects to /dashboard)
+BACKEND_PATHS = {"/health", "/health/db", "/keep-alive", "/config", "/metrics", "/docs", "/redoc", "/openapi.json"}
+BACKEND_PREFIXES = ("/api", "/debug/")
+
+# Requests slower than this are logged as warnings
+SLOW_REQUEST_SECONDS = 1.0
+TIMING_SKIP_PATHS = {"/keep-alive", "/health", "/api/v1/stocks/alerts/stream"}  # the stream stays open by design
+
+
+class EdgeMiddleware:
+    """Timing + HTTPS redirect rewriting + SPA fallback in a single ASGI layer.
+
+    Responses are passed through message by message, so StreamingResponse
+    exports are never buffered here.
+    """
+
+    def __init__(self, app, frontend_dist: Optional[Path] = None):
+        self.app = app
+        self.frontend_dist = frontend_dist if frontend_dist and frontend_dist.exists() else None
+        # dist is indexed once; a rebuilt frontend needs a restart (vite dev server covers local work)
+        self.assets = StaticAssetIndex(self.frontend_dist) if self.frontend_dist else None
+        self.index_asset = self.assets.get("/index.html") if self.assets else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if self.frontend_dist is not None and self._is_spa_request(scope["method"], path):
+            await self._serve_spa(path, scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+                if 300 <= message["status"] < 400:
+                    message = self._force_https_location(message)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if path not in TIMING_SKIP_PATHS:
+                self._log_timing(scope["method"], path, time.perf_counter() - start, status_holder["status"])
+
+    def _is_spa_request(self, method: str, path: str) -> bool:
+        if method not in ("GET", "HEAD"):
+            return False
+        if path in BACKEND_PATHS or path.startswith(BACKEND_PREFIXES):
+            return False
+        return True
+
+    async def _serve_spa(self, path, scope, receive, send):
+        # Dict lookup against the startup index - no filesystem access, no ../ traversal
+        asset = self.assets.get(path)
+        if asset is not None:
+            await serve_asset(asset, scope, receive, send)
+            return
+        if path.startswith("/assets/"):
+            # Missing hashed bundle - a 404 is better than HTML with a JS mime type
+            await self._not_found(send)
+            return
+        if self.index_asset is not None:
+            logger.debug(f"📄 Serving index.html for SPA route: {path}")
+            await serve_asset(self.index_asset, scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _not_found(send):
+        await send({"type": "http.response.start", "status": 404,
+                    "headers": [(b"content-type", b"text/plain; charset=utf-8")]})
+        await send({"type": "http.response.body", "body": b"Not Found"})
+
+    @staticmethod
+    def _force_https_location(message):
+        """Ensure redirects use HTTPS to prevent mixed-content errors behind the proxy"""
+        headers = []
+        for name, value in message.get("headers", []):
+            if name.lower() == b"location" and value.startswith(b"http://"):
+                value = b"https://" + value[len(b"http://"):]
+                logger.warning(f"🔒 FIXED HTTPS downgrade in redirect: {value.decode('latin-1')}")
+            headers.append((name, value))
+        return {**message, "headers": headers}
+
+    @staticmethod
+    def _log_timing(method, path, duration, status):
+        if duration > SLOW_REQUEST_SECONDS:
+            logger.warning(f"🐌 SLOW REQUEST: {method} {path} took {duration:.2f}s (status: {status})")
+        else:
+            logger.debug(f"✅ {method} {path} completed in {duration:.3f}s (status: {status})")
@@ -0,0 +1,218 @@
+"""
+Reporting periods
+A Period is a half-open range of business days [start, end): a calendar month,
+an ISO week or any from/to range. It compiles to
+
+    column >= <start> AND column < <end>
+
+so the date indexes stay usable, unlike extract('month', column) = m, which
+has to evaluate every row.
+
+Days follow BUSINESS_TIMEZONE (e.g. "Asia/Karachi"). Set it, and the
+boundaries become midnights in that zone as aware datetimes, so a sale at
+01:00 local time lands on the right day whatever the database session zone
+is. Leave it empty, and boundaries are naive and the database session zone
+decides, as extract() did. Changing it moves rows between days, so rebuild
+the daily facts afterwards (scripts/rebuild_daily_facts.py).
+"""
+
+from app.core.config import settings
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from fastapi import HTTPException, Query
+from sqlalchemy import Date, DateTime, and_, func
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import calendar
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _business_zone() -> Optional[ZoneInfo]:
+    if not settings.BUSINESS_TIMEZONE:
+        return None
+    try:
+        return ZoneInfo(settings.BUSINESS_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.error(f"❌ Unknown BUSINESS_TIMEZONE '{settings.BUSINESS_TIMEZONE}', using the database session time zone")
+        return None
+
+
+BUSINESS_TZ = _business_zone()
+
+
+def business_now() -> datetime:
+    return datetime.now(BUSINESS_TZ) if BUSINESS_TZ else datetime.now()
+
+
+def business_today() -> date:
+    return business_now().date()
+
+
+def day_start(day: date) -> datetime:
+    """Midnight opening the business day (aware when BUSINESS_TIMEZONE is set)"""
+    return datetime.combine(day, time.min, tzinfo=BUSINESS_TZ)
+
+
+def business_date(value) -> Optional[date]:
+    """Business day of a datetime/date loaded from the database"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if BUSINESS_TZ and value.tzinfo is not None:
+            value = value.astimezone(BUSINESS_TZ)
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])  # SQLite returns date() as text
+
+
+def business_day(column):
+    """SQL expression for the business day of a timestamp column"""
+    if BUSINESS_TZ:
+        return func.date(func.timezone(settings.BUSINESS_TIMEZONE, column))
+    return func.date(column)
+
+
+@dataclass(frozen=True)
+class Period:
+    start: date  # first day
+    end: date    # day after the last one
+    kind: str = "range"  # 'month', 'week' or 'range'
+
+    # ===== Constructors =====
+
+    @classmethod
+    def month(cls, year: int, month: int) -> "Period":
+        start = date(year, month, 1)
+        return cls(start, date(year + month // 12, month % 12 + 1, 1), "month")
+
+    @classmethod
+    def iso_week(cls, year: int, week: int) -> "Period":
+        start = date.fromisocalendar(year, week, 1)
+        return cls(start, start + timedelta(days=7), "week")
+
+    @classmethod
+    def between(cls, first: date, last: date) -> "Period":
+        """Custom range, both days included"""
+        return cls(first, last + timedelta(days=1), "range")
+
+    @classmethod
+    def current_month(cls) -> "Period":
+        today = business_today()
+        return cls.month(today.year, today.month)
+
+    # ===== Navigation =====
+
+    @property
+    def last_day(self) -> date:
+        return self.end - timedelta(days=1)
+
+    @property
+    def year(self) -> int:
+        return self.start.year
+
+    @property
+    def month_number(self) -> int:
+        return self.start.month
+
+    def previous(self) -> "Period":
+        if self.kind == "month":
+            before = self.start - timedelta(days=1)
+            return Period.month(before.year, before.month)
+        length = self.end - self.start
+        return Period(self.start - length, self.start, self.kind)
+
+    def next(self) -> "Period":
+        if self.kind == "month":
+            return Period.month(self.end.year, self.end.month)
+        return Period(self.end, self.end + (self.end - self.start), self.kind)
+
+    # ===== SQL =====
+
+    def bounds(self, column=None) -> tuple:
+        """(lower, upper) values to compare the column with - dates for Date columns, instants otherwise"""
+        column_type = getattr(column, "type", None)
+        if isinstance(column_type, Date) and not isinstance(column_type, DateTime):
+            return self.start, self.end
+        return day_start(self.start), day_start(self.end)
+
+    def filter(self, column):
+        """column >= start AND column < end"""
+        lower, upper = self.bounds(column)
+        return and_(column >= lower, column < upper)
+
+    def before(self, column):
+        """column < start (everything ahead of the period, e.g. for opening balances)"""
+        return column < self.bounds(column)[0]
+
+    # ===== Presentation =====
+
+    @property
+    def label(self) -> str:
+        if self.kind == "month":
+            return f"{calendar.month_name[self.start.month]} {self.start.year}"
+        if self.kind == "week":
+            iso = self.start.isocalendar()
+            return f"Week {iso.week}, {iso.year}"
+        if self.start == self.last_day:
+            return self.start.strftime("%d %b %Y")
+        return f"{self.start.strftime('%d %b %Y')} - {self.last_day.strftime('%d %b %Y')}"
+
+    @property
+    def slug(self) -> str:
+        """Filename-safe name"""
+        if self.kind == "month":
+            return f"{self.start.year}_{self.start.month}"
+        if self.kind == "week":
+            iso = self.start.isocalendar()
+            return f"{iso.year}_W{iso.week:02d}"
+        return f"{self.start.isoformat()}_{self.last_day.isoformat()}"
+
+    def as_dict(self) -> dict:
+        return {"kind": self.kind, "start": self.start.isoformat(), "end": self.last_day.isoformat(), "label": self.label}
+
+
+def resolve_period(
+    month: Optional[int] = None,
+    year: Optional[int] = None,
+    week: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> Period:
+    """Build a Period from request parameters (HTTPException 400 when they don't make one)
+
+    date_from/date_to (both days included) win over week, which wins over
+    month; a missing year or month defaults to today's.
+    """
+    if date_from or date_to:
+        if not (date_from and date_to):
+            raise HTTPException(status_code=400, detail="date_from and date_to must be given together")
+        if date_to < date_from:
+            raise HTTPException(status_code=400, detail="date_to must not be before date_from")
+        return Period.between(date_from, date_to)
+
+    today = business_today()
+    year = year or today.year
+    if week is not None:
+        try:
+            return Period.iso_week(year, week)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid ISO week {week} for {year}")
+    month = month or today.month
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="month must be between 1 and 12")
+    return Period.month(year, month)
+
+
+def period_query(
+    month: Optional[int] = Query(None, description="Calendar month (1-12), with year"),
+    year: Optional[int] = Query(None, description="Year of the month or ISO week"),
+    week: Optional[int] = Query(None, description="ISO week number, with year"),
+    date_from: Optional[date] = Query(None, description="First day of a custom range (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, description="Last day of a custom range, included"),
+) -> Period:
+    """FastAPI dependency: the requested period, defaulting to the current month"""
+    return resolve_period(month, year, week, date_from, date_to)
+
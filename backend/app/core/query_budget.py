@@ -0,0 +1,98 @@
+"""
+SQL query budget and N+1 detection
+Flags requests that run too many statements or repeat the same statement per row
+"""
+
+from app.core.config import settings
+from app.core.metrics import route_template
+from app.db.query_stats import QueryStats, track_queries
+from contextlib import contextmanager
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Per-endpoint statement budgets ("METHOD /templated/path" -> max statements).
+# Endpoints not listed here use settings.QUERY_BUDGET.
+ROUTE_QUERY_BUDGETS: Dict[str, int] = {
+    "GET /api/v1/stocks/items": 5,
+    "GET /api/v1/stocks/alerts": 5,
+    "GET /api/v1/sales/": 10,
+    "GET /api/v1/purchases/": 10,
+    "GET /api/v1/dashboard/summary": 15,
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by assert_query_budget when a block runs too many statements"""
+
+
+def budget_for(method: str, route: str) -> int:
+    return ROUTE_QUERY_BUDGETS.get(f"{method} {route}", settings.QUERY_BUDGET)
+
+
+def budget_violations(stats: QueryStats, budget: int, max_repeats: int) -> list:
+    """Human readable list of budget problems (empty when within budget)"""
+    problems = []
+    if stats.statements > budget:
+        problems.append(f"{stats.statements} statements (budget {budget})")
+    if stats.max_repeats() > max_repeats:
+        problems.append(f"same statement repeated {stats.max_repeats()}x (limit {max_repeats})")
+    return problems
+
+
+def describe_repeats(stats: QueryStats) -> str:
+    return "; ".join(f"{count}x {sql}" for sql, count in stats.worst_repeats())
+
+
+@contextmanager
+def assert_query_budget(max_statements: int, max_repeats: Optional[int] = None):
+    """Fail (AssertionError) if the block executes more statements than allowed.
+
+    Usage in tests or scripts that call services directly:
+        with assert_query_budget(3):
+            get_items(db)
+    """
+    with track_queries() as stats:
+        yield stats
+    repeat_limit = max_repeats if max_repeats is not None else settings.QUERY_REPEAT_BUDGET
+    problems = budget_violations(stats, max_statements, repeat_limit)
+    if problems:
+        raise QueryBudgetExceeded(f"Query budget exceeded: {', '.join(problems)}. Repeated: {describe_repeats(stats)}")
+
+
+class QueryBudgetMiddleware:
+    """Pure ASGI middleware: X-DB-* headers outside production, warnings on budget violations"""
+
+    def __init__(self, app):
+        self.app = app
+        self.expose_headers = settings.ENVIRONMENT != "production"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries(reuse=True) as stats:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start" and self.expose_headers:
+                    budget = budget_for(scope["method"], route_template(scope))
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-queries", str(stats.statements).encode()))
+                    headers.append((b"x-db-time", f"{stats.duration * 1000:.1f}ms".encode()))
+                    headers.append((b"x-db-repeats", str(stats.max_repeats()).encode()))
+                    headers.append((b"x-db-budget", str(budget).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = route_template(scope)
+                budget = budget_for(scope["method"], route)
+                problems = budget_violations(stats, budget, settings.QUERY_REPEAT_BUDGET)
+                if problems:
+                    logger.warning(
+                        f"🐢 QUERY BUDGET: {scope['method']} {route} - {', '.join(problems)}; "
+                        f"{stats.duration * 1000:.0f}ms in SQL. Repeated: {describe_repeats(stats)}"
+                    )
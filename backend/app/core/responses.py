@@ -0,0 +1,71 @@
+"""
+JSON responses
+orjson-backed default response class and a fast path for large list endpoints.
+
+Two ways to skip FastAPI's per-object validation + jsonable_encoder pass:
+  - model_list_response(rows, Schema): validates ORM objects/dicts with a cached
+    TypeAdapter and dumps them to JSON bytes in one pydantic-core pass
+  - json_response(content): already-shaped dicts/lists straight to orjson, no validation
+"""
+
+from decimal import Decimal
+from fastapi.responses import JSONResponse, Response
+from functools import lru_cache
+from pydantic import BaseModel, TypeAdapter
+from typing import Any, Iterable, List, Optional, Sequence, Type
+import orjson
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj):
+    # Same wire format as jsonable_encoder so dict endpoints keep returning numbers
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """orjson.dumps with Decimal support (datetime/date/UUID are native)"""
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """Default response class: JSONResponse rendered with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """TypeAdapter for List[model], built once per schema"""
+    return TypeAdapter(List[model])
+
+
+def model_list_response(rows: Iterable[Any], model: Type[BaseModel], status_code: int = 200) -> Response:
+    """Serialize ORM objects (or dicts) as List[model] in a single pydantic-core pass"""
+    adapter = list_adapter(model)
+    items = adapter.validate_python(list(rows), from_attributes=True)
+    return Response(adapter.dump_json(items), status_code=status_code, media_type="application/json")
+
+
+def model_response(instance: BaseModel, status_code: int = 200) -> Response:
+    """Send an already-built schema instance without FastAPI validating it a second time"""
+    return Response(instance.model_dump_json(), status_code=status_code, media_type="application/json")
+
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    """Pre-shaped dicts/lists straight to orjson - no validation, no jsonable_encoder"""
+    return Response(dumps(content), status_code=status_code, media_type="application/json")
+
+
+def rows_to_dicts(rows: Iterable[Sequence[Any]], columns: Optional[Sequence[str]] = None) -> List[dict]:
+    """Turn SQLAlchemy Row objects (or plain tuples + column names) into dicts"""
+    if columns is None:
+        return [row._asdict() for row in rows]
+    return [dict(zip(columns, row)) for row in rows]
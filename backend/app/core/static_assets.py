@@ -0,0 +1,217 @@
+"""
+Static asset serving for the bundled React frontend
+Indexes frontend/dist once at startup and serves files from memory with
+gzip/brotli negotiation, ETags and long-lived caching for hashed assets.
+
+Startup only reads the files: .br/.gz files shipped next to the bundle are
+used as they are, and any other compressible file is compressed the first
+time a client accepts that encoding, in a worker thread, then kept.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from starlette.responses import FileResponse
+from typing import Dict, Optional, Set
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:  # optional - gzip only without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Vite puts content-hashed bundles here; their URL changes whenever content does
+HASHED_PREFIX = "/assets/"
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# Files bigger than this are streamed from disk instead of kept in memory
+MAX_IN_MEMORY_BYTES = 10 * 1024 * 1024
+# Not worth compressing tiny files
+MIN_COMPRESS_BYTES = 1024
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/xml", "image/svg+xml")
+
+# Preferred order when the client accepts several encodings
+ENCODING_PREFERENCE = ("br", "gzip")
+PREBUILT_SUFFIXES = {".br": "br", ".gz": "gzip"}
+
+
+@dataclass
+class StaticAsset:
+    """One file from dist with its precompressed variants"""
+    path: Path
+    media_type: str
+    etag: str
+    cache_control: str
+    size: int
+    body: Optional[bytes] = None  # None when the file is streamed from disk
+    variants: Dict[str, bytes] = field(default_factory=dict)  # encoding -> compressed body
+    compressible: bool = False  # variants missing from the build may be made on first request
+    declined: Set[str] = field(default_factory=set)  # encodings that didn't save enough to keep
+
+    def offers(self, encoding: str) -> bool:
+        """Whether a variant exists or may still be made for this encoding"""
+        if encoding in self.variants:
+            return True
+        if not self.compressible or encoding in self.declined:
+            return False
+        return encoding != "br" or brotli is not None
+
+
+def _is_compressible(media_type: str) -> bool:
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        # Quality 9 compresses within a few % of 11 at a fraction of the time;
+        # ship .br files next to the bundle for maximum compression
+        return brotli.compress(body, quality=9)
+    return gzip.compress(body, compresslevel=9, mtime=0)
+
+
+def parse_accept_encoding(header: str) -> set:
+    """Encodings the client accepts (q=0 means explicitly refused)"""
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(token)
+    if "*" in accepted:
+        accepted.update(ENCODING_PREFERENCE)
+    return accepted
+
+
+class StaticAssetIndex:
+    """In-memory index of a built frontend directory, keyed by URL path"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.assets: Dict[str, StaticAsset] = {}
+        self._build()
+
+    def _build(self):
+        files = [Path(dirpath) / name for dirpath, _, names in os.walk(self.root) for name in names]
+        file_set = set(files)
+        for file_path in sorted(files):
+            # foo.js.br / foo.js.gz produced by the build are variants of foo.js, not assets
+            if file_path.suffix in PREBUILT_SUFFIXES and file_path.with_suffix("") in file_set:
+                continue
+            url_path = "/" + file_path.relative_to(self.root).as_posix()
+            self.assets[url_path] = self._load(url_path, file_path)
+
+        total = sum(a.size for a in self.assets.values())
+        prebuilt = {enc: sum(1 for a in self.assets.values() if enc in a.variants) for enc in ENCODING_PREFERENCE}
+        logger.info(
+            f"📦 Indexed {len(self.assets)} static assets ({total // 1024} KB; prebuilt "
+            + ", ".join(f"{enc} {count}" for enc, count in prebuilt.items())
+            + ")"
+        )
+
+    def _load(self, url_path: str, file_path: Path) -> StaticAsset:
+        media_type = mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type == "application/javascript":
+            media_type += "; charset=utf-8"
+        cache_control = IMMUTABLE_CACHE if url_path.startswith(HASHED_PREFIX) else REVALIDATE_CACHE
+        size = file_path.stat().st_size
+
+        if size > MAX_IN_MEMORY_BYTES:
+            stat = file_path.stat()
+            etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+            return StaticAsset(file_path, media_type, etag, cache_control, size)
+
+        body = file_path.read_bytes()
+        asset = StaticAsset(file_path, media_type, f'"{hashlib.sha1(body).hexdigest()[:20]}"', cache_control, size, body)
+
+        for suffix, encoding in PREBUILT_SUFFIXES.items():
+            prebuilt = file_path.with_name(file_path.name + suffix)
+            if prebuilt.is_file():
+                asset.variants[encoding] = prebuilt.read_bytes()
+        asset.compressible = size >= MIN_COMPRESS_BYTES and _is_compressible(media_type)
+        return asset
+
+    def get(self, url_path: str) -> Optional[StaticAsset]:
+        return self.assets.get(url_path)
+
+
+async def _compressed(asset: StaticAsset, encoding: str) -> bool:
+    """Make the asset's variant for this encoding off the event loop; False when it isn't worth keeping.
+
+    Two first requests may both compress; the second result just replaces
+    the first.
+    """
+    compressed = await asyncio.to_thread(_compress, asset.body, encoding)
+    # Keep the variant only when it actually saves bytes
+    if len(compressed) >= asset.size * 0.9:
+        asset.declined.add(encoding)
+        return False
+    asset.variants[encoding] = compressed
+    return True
+
+
+async def _negotiate(asset: StaticAsset, accepted: set) -> Optional[str]:
+    """The preferred encoding the client accepts and the asset has (or gets) a variant for"""
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in accepted or not asset.offers(encoding):
+            continue
+        if encoding in asset.variants or await _compressed(asset, encoding):
+            return encoding
+    return None
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+async def serve_asset(asset: StaticAsset, scope, receive, send, status: int = 200):
+    """Send an indexed asset, negotiating Content-Encoding and honouring If-None-Match"""
+    request_headers = {name.lower(): value for name, value in scope["headers"]}
+    accepted = parse_accept_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+    encoding = await _negotiate(asset, accepted)
+
+    # Each representation needs its own validator
+    etag = asset.etag if encoding is None else f'{asset.etag[:-1]}-{encoding}"'
+    headers = [
+        (b"etag", etag.encode()),
+        (b"cache-control", asset.cache_control.encode()),
+    ]
+    if asset.variants or asset.compressible:
+        headers.append((b"vary", b"Accept-Encoding"))
+
+    if_none_match = request_headers.get(b"if-none-match")
+    if if_none_match is not None and _etag_matches(if_none_match.decode("latin-1"), etag):
+        await send({"type": "http.response.start", "status": 304, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    if asset.body is None:
+        response = FileResponse(asset.path, status_code=status, media_type=asset.media_type,
+                                headers={k.decode(): v.decode() for k, v in headers})
+        await response(scope, receive, send)
+        return
+
+    body = asset.variants[encoding] if encoding else asset.body
+    headers.append((b"content-type", asset.media_type.encode()))
+    headers.append((b"content-length", str(len(body)).encode()))
+    if encoding:
+        headers.append((b"content-encoding", encoding.encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
@@ -0,0 +1,147 @@
+"""
+Startup warm-up
+Runs from the FastAPI lifespan after a deploy or wake-up so the first users
+don't pay for cold paths: new DB connections, first SQL compilation, catalog
+lookups and reportlab font/stylesheet initialisation.
+
+Only caches and connections are primed here - nothing the app needs to be
+correct. Tables and the maintained rollups are prepared before serving by
+app/db/migrate.py. The whole stage is time-boxed by WARMUP_TIMEOUT; /health
+reports ready once it has finished (or given up), whatever the individual
+steps returned. A step cut off by the time box keeps running in its thread
+until done, which is harmless for a cache fill.
+"""
+
+from app.core.config import settings
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmupState:
+    status: str = "pending"  # pending -> running -> ready | disabled
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    steps: Dict[str, dict] = field(default_factory=dict)
+
+    @property
+    def ready(self) -> bool:
+        return self.status in ("ready", "disabled")
+
+    def as_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "steps": self.steps,
+        }
+
+
+warmup_state = WarmupState()
+
+
+def open_connections():
+    """Open a few connections up front (fills the QueuePool; with NullPool it still warms DNS/TLS)"""
+    from app.db.database import engine
+    from sqlalchemy import text
+    connections = [engine.connect() for _ in range(max(settings.WARMUP_CONNECTIONS, 1))]
+    try:
+        for connection in connections:
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def compile_hot_statements():
+    """Run the hot list queries once (LIMIT 1) so their compiled SQL is cached on the engine"""
+    from app.db.database import SessionLocal
+    from app.models.item import Item, Stock
+    from app.models.party import Customer, Supplier
+    from app.models.transaction import Purchase, Sale
+    from sqlalchemy import func
+    from sqlalchemy.orm import selectinload
+
+    # Same statement shapes as the endpoints - limit/offset are bound parameters,
+    # so these share a compiled-cache entry with the real requests
+    with SessionLocal() as db:
+        db.query(Sale).options(selectinload(Sale.line_items)).order_by(Sale.date.desc()).offset(0).limit(1).all()
+        db.query(Purchase).options(selectinload(Purchase.line_items)).order_by(Purchase.date.desc()).offset(0).limit(1).all()
+        db.query(
+            Item.id, Item.name, Item.type, Item.size, Item.grade, Item.unit,
+            func.coalesce(Stock.quantity, 0).label("current_stock")
+        ).outerjoin(Stock, Stock.item_id == Item.id).limit(1).all()
+        db.query(Customer).limit(1).all()
+        db.query(Supplier).limit(1).all()
+
+
+def load_catalogs():
+    """Fill the item/customer/supplier name caches"""
+    from app.core.cache import customer_names, item_names, supplier_names
+    from app.db.database import SessionLocal
+    with SessionLocal() as db:
+        item_names(db)
+        customer_names(db)
+        supplier_names(db)
+
+
+def render_throwaway_invoice():
+    """Import reportlab and build one invoice so fonts and stylesheets are initialised"""
+    from app.utils.invoice_pdf_generator import InvoiceReportGenerator
+    InvoiceReportGenerator().generate_invoice_pdf(
+        invoice_no="WARMUP",
+        invoice_date=datetime.now().strftime('%d-%m-%Y'),
+        bill_to_name="Warm-up",
+        items=[{'item_name': 'Warm-up', 'quantity': 1, 'unit_price': 1.0, 'amount': 1.0}],
+    )
+
+
+WARMUP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("connections", open_connections),
+    ("statements", compile_hot_statements),
+    ("catalogs", load_catalogs),
+    ("invoice_pdf", render_throwaway_invoice),
+]
+
+
+async def run_warmup(state: WarmupState = warmup_state):
+    """Run every warm-up step in a worker thread, within the overall time box"""
+    if not settings.WARMUP_ENABLED:
+        state.status = "disabled"
+        return state
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.WARMUP_TIMEOUT
+    state.status = "running"
+    state.started_at = datetime.now()
+    logger.info(f"🔥 Warm-up started (timeout {settings.WARMUP_TIMEOUT:.0f}s)")
+
+    for name, step in WARMUP_STEPS:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            state.steps[name] = {"status": "skipped"}
+            continue
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.to_thread(step), timeout=remaining)
+            result = {"status": "ok"}
+        except asyncio.TimeoutError:
+            result = {"status": "timeout"}
+            logger.warning(f"⏱️ Warm-up step '{name}' hit the {settings.WARMUP_TIMEOUT:.0f}s time box")
+        except Exception as e:
+            result = {"status": "failed", "error": str(e)}
+            logger.warning(f"⚠️ Warm-up step '{name}' failed: {e}")
+        result["ms"] = round((time.perf_counter() - start) * 1000, 1)
+        state.steps[name] = result
+
+    state.status = "ready"
+    state.finished_at = datetime.now()
+    total = (state.finished_at - state.started_at).total_seconds()
+    logger.info(f"✅ Warm-up finished in {total:.2f}s: " + ", ".join(f"{n}={s['status']}" for n, s in state.steps.items()))
+    return state
@@ -0,0 +1,177 @@
+"""
+Stock alerts from per-item thresholds
+
+stock_thresholds holds an optional minimum and maximum per item, and
+stock_alerts the items outside them:
+
+    out   nothing on hand (items with a minimum)
+    low   below the minimum
+    over  above the maximum
+
+Alerts are kept current like the party balances (app/db/balances.py): each
+flush records the items whose Stock row or threshold was added, changed or
+deleted - sales, purchases, blows, wastes and manual movements all move
+stock through the item's Stock row - and just before commit only those
+items are checked, inside the same transaction. An item has at most one
+open alert (resolved_at empty); it is updated while the kind stays the
+same, and resolved (with a new one raised if the kind changes) otherwise.
+Reading the warnings is then a lookup of the open alerts, never a scan of
+the stocks. Writes that bypass the unit of work must call mark_items().
+"""
+
+from app.core.cache import item_names
+from app.db.maintenance import ALERTS_LOCK, lock_keys, refresh_at_commit
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import case, event, func, insert, select, update
+from sqlalchemy.orm import Session, attributes
+import logging
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("out", "low", "over")  # most urgent first
+
+# IN lists of item ids are checked in chunks of this size
+KEY_CHUNK = 500
+
+ALERT_ITEMS = "alerts_items"
+
+
+def alert_kind(quantity: int, min_quantity: Optional[int], max_quantity: Optional[int]) -> Optional[str]:
+    """'out', 'low', 'over' or None when the quantity is within the thresholds"""
+    if min_quantity is not None and quantity <= 0:
+        return "out"
+    if min_quantity is not None and quantity < min_quantity:
+        return "low"
+    if max_quantity is not None and quantity > max_quantity:
+        return "over"
+    return None
+
+
+# ===== Checking items =====
+
+def check_items(connection, item_ids: Iterable[str]) -> Dict[str, int]:
+    """Raise, update or resolve the alerts of these items; returns how many of each happened"""
+    from app.models.item import Item, Stock, StockAlert, StockThreshold
+
+    changes = {"raised": 0, "updated": 0, "resolved": 0}
+    item_ids = sorted(set(item_ids))
+    # Two commits moving the same item would both raise an alert for it
+    lock_keys(connection, ALERTS_LOCK, item_ids)
+    for i in range(0, len(item_ids), KEY_CHUNK):
+        chunk = item_ids[i:i + KEY_CHUNK]
+        query = select(
+            Item.id, func.coalesce(Stock.quantity, 0), StockThreshold.min_quantity, StockThreshold.max_quantity,
+            StockAlert.id, StockAlert.kind, StockAlert.quantity, StockAlert.threshold,
+        ).outerjoin(Stock, Stock.item_id == Item.id) \
+         .outerjoin(StockThreshold, StockThreshold.item_id == Item.id) \
+         .outerjoin(StockAlert, (StockAlert.item_id == Item.id) & StockAlert.resolved_at.is_(None)) \
+         .where(Item.id.in_(chunk))
+
+        raised, resolved = [], []
+        for item_id, quantity, min_quantity, max_quantity, alert_id, open_kind, open_quantity, open_threshold in \
+                connection.execute(query):
+            kind = alert_kind(quantity, min_quantity, max_quantity)
+            threshold = max_quantity if kind == "over" else min_quantity
+            if alert_id is not None and kind == open_kind:
+                if (open_quantity, open_threshold) != (quantity, threshold):
+                    connection.execute(update(StockAlert).where(StockAlert.id == alert_id)
+                                       .values(quantity=quantity, threshold=threshold))
+                    changes["updated"] += 1
+                continue
+            if alert_id is not None:
+                resolved.append(alert_id)
+            if kind is not None:
+                raised.append({"item_id": item_id, "kind": kind, "quantity": quantity, "threshold": threshold})
+
+        if resolved:
+            connection.execute(update(StockAlert).where(StockAlert.id.in_(resolved)).values(resolved_at=func.now()))
+        if raised:
+            connection.execute(insert(StockAlert), raised)
+        changes["raised"] += len(raised)
+        changes["resolved"] += len(resolved)
+    return changes
+
+
+def check_all_items(connection) -> Dict[str, int]:
+    """Check every item (after bulk imports or manual SQL on the stocks)"""
+    from app.models.item import Item
+    return check_items(connection, connection.execute(select(Item.id)).scalars())
+
+
+# ===== Reading alerts =====
+
+def open_alerts(db: Session) -> List[dict]:
+    """The open alerts, most urgent kind first, from the open-alert index"""
+    from app.models.item import StockAlert
+
+    urgency = case(*[(StockAlert.kind == kind, rank) for rank, kind in enumerate(KINDS)], else_=len(KINDS))
+    rows = db.execute(
+        select(StockAlert.id, StockAlert.item_id, StockAlert.kind, StockAlert.quantity, StockAlert.threshold,
+               StockAlert.raised_at)
+        .where(StockAlert.resolved_at.is_(None))
+        .order_by(urgency, StockAlert.item_id)
+    ).all()
+    names = item_names(db)
+    return [{**row._asdict(), "item_name": names.get(row.item_id)} for row in rows]
+
+
+def alert_counts(alerts: List[dict]) -> Dict[str, int]:
+    counts = dict.fromkeys(KINDS, 0)
+    for alert in alerts:
+        counts[alert["kind"]] = counts.get(alert["kind"], 0) + 1
+    return counts
+
+
+def open_alert_counts(db: Session) -> Dict[str, int]:
+    """kind -> open alerts, in one query (for the dashboard badges)"""
+    from app.models.item import StockAlert
+
+    counts = dict.fromkeys(KINDS, 0)
+    counts.update(db.execute(
+        select(StockAlert.kind, func.count()).where(StockAlert.resolved_at.is_(None)).group_by(StockAlert.kind)
+    ).all())
+    return counts
+
+
+# ===== Incremental maintenance =====
+
+def mark_items(session: Session, item_ids: Iterable[str]):
+    """Have the next commit check these items (for writes the session events can't see)"""
+    session.info.setdefault(ALERT_ITEMS, set()).update(item_ids)
+
+
+def _touched_items(session) -> Set[str]:
+    from app.models.item import Stock, StockThreshold
+
+    items = set()
+    dirty = session.dirty
+    for obj in (*session.new, *dirty, *session.deleted):
+        if not isinstance(obj, (Stock, StockThreshold)):
+            continue
+        if obj in dirty and not session.is_modified(obj):
+            continue
+        history = attributes.get_history(obj, "item_id")
+        items.update(item_id for item_id in (*history.added, *history.unchanged, *history.deleted) if item_id)
+    return items
+
+
+@event.listens_for(Session, "before_flush")
+def _remember_items(session, flush_context, instances):
+    items = _touched_items(session)
+    if items:
+        mark_items(session, items)
+
+
+@event.listens_for(Session, "before_commit")
+def _check_touched_items(session):
+    session.flush()  # the hook above needs to see the last changes first
+    items = session.info.pop(ALERT_ITEMS, None)
+    if not items:
+        return
+    connection = session.connection()
+    refresh_at_commit("stock_alerts", items, lambda: check_items(connection, items))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_touched_items(session):
+    session.info.pop(ALERT_ITEMS, None)
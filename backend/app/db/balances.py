@@ -0,0 +1,283 @@
+"""
+Party balances behind the balance sheet, ledgers and dashboard
+
+party_balances holds one row per customer and supplier with what the party
+was billed, what it paid, what is outstanding and when it last had a bill,
+over its non-cancelled bills. Balance sheet and dashboard totals add up
+these rows instead of summing every sale and purchase, and a ledger opens a
+period at the stored balance minus the bills dated in or after the period,
+without scanning the party's history.
+
+A bill marked 'paid' counts as paid in full whatever its paid_amount
+(older rows were marked paid without one); other bills count paid_amount.
+
+Rows are kept current like the daily facts (app/db/facts.py): each flush
+records the parties whose sales or purchases were added, edited or deleted,
+and just before commit their rows are recomputed from their bills inside
+the same transaction, under a per-party lock so two commits for the same
+party take turns (app/db/maintenance.py); a failed refresh fails the commit. Writes that bypass the unit of work must call
+mark_parties() or be followed by a rebuild; the verifier reports drift:
+
+    python scripts/rebuild_party_balances.py [--check]
+"""
+
+from app.db.maintenance import BALANCES_LOCK, lock_keys, refresh_at_commit
+from collections import defaultdict
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import case, delete, event, func, insert, inspect, or_, select, true
+from sqlalchemy.orm import Session, attributes
+import logging
+
+logger = logging.getLogger(__name__)
+
+PARTY_TYPES = ("customer", "supplier")
+
+# Bills without a party (walk-in sales) are kept under this party_id
+NO_PARTY = ""
+
+# IN lists of party ids are refreshed in chunks of this size
+KEY_CHUNK = 500
+
+# Edits touching only these attributes leave every balance unchanged
+UNRELATED_ATTRIBUTES = {
+    "payment_method", "due_date", "notes", "editable_by_admin_only", "created_by", "line_items",
+}
+
+CENT = Decimal("0.01")
+
+MEASURES = ("billed", "paid", "outstanding", "bills", "open_bills")
+
+PARTY_KEYS = "balances_parties"
+
+
+@lru_cache(maxsize=None)
+def bill_columns() -> Dict[str, tuple]:
+    """party type -> (bill model, party column, total column)"""
+    from app.models.transaction import Purchase, Sale
+    return {
+        "customer": (Sale, Sale.customer_id, Sale.total_price),
+        "supplier": (Purchase, Purchase.supplier_id, Purchase.total_amount),
+    }
+
+
+def settled_sql(model, total_column):
+    """What a bill counts as paid: its total when marked 'paid', else paid_amount"""
+    return case(
+        (model.payment_status == "paid", func.coalesce(total_column, 0)),
+        else_=func.coalesce(model.paid_amount, 0),
+    )
+
+
+def _party_filter(party_column, party_ids: Optional[List[str]]):
+    if party_ids is None:
+        return true()
+    named = [party_id for party_id in party_ids if party_id != NO_PARTY]
+    filters = [party_column.in_(named)] if named else []
+    if NO_PARTY in party_ids:
+        filters.append(party_column.is_(None))
+    return or_(*filters)
+
+
+# ===== Recomputing balances =====
+
+def _balance_rows(connection, party_type: str, party_ids: Optional[List[str]] = None) -> List[dict]:
+    """Balance rows of the given parties (all of them when None) computed from their bills"""
+    model, party_column, total_column = bill_columns()[party_type]
+    query = select(
+        party_column.label("party_id"),
+        func.sum(func.coalesce(total_column, 0)).label("billed"),
+        func.sum(settled_sql(model, total_column)).label("paid"),
+        func.count().label("bills"),
+        func.sum(case((model.payment_status.in_(["pending", "partial"]), 1), else_=0)).label("open_bills"),
+        func.max(model.date).label("last_activity"),
+    ).where(
+        func.coalesce(model.status, "") != "cancelled",
+        _party_filter(party_column, party_ids),
+    ).group_by(party_column)
+
+    rows = []
+    for row in connection.execute(query):
+        billed = Decimal(row.billed or 0).quantize(CENT)
+        paid = Decimal(row.paid or 0).quantize(CENT)
+        rows.append({
+            "party_type": party_type, "party_id": row.party_id or NO_PARTY,
+            "billed": billed, "paid": paid, "outstanding": billed - paid,
+            "bills": row.bills, "open_bills": row.open_bills or 0,
+            "last_activity": row.last_activity,
+        })
+    return rows
+
+
+def refresh_parties(connection, customers: Iterable[str] = (), suppliers: Iterable[str] = ()) -> int:
+    """Recompute the balance rows of the given parties from their bills; returns rows written"""
+    from app.models.party import PartyBalance
+
+    table = PartyBalance.__table__
+    parties = {
+        party_type: sorted({party_id or NO_PARTY for party_id in party_ids})
+        for party_type, party_ids in (("customer", customers), ("supplier", suppliers))
+    }
+    # Wait for any other commit refreshing one of these parties, then recompute with its bills included
+    lock_keys(connection, BALANCES_LOCK,
+              (f"{party_type}:{party_id}" for party_type, party_ids in parties.items() for party_id in party_ids))
+
+    written = 0
+    for party_type, party_ids in parties.items():
+        for i in range(0, len(party_ids), KEY_CHUNK):
+            chunk = party_ids[i:i + KEY_CHUNK]
+            rows = _balance_rows(connection, party_type, chunk)
+            connection.execute(delete(table).where(table.c.party_type == party_type, table.c.party_id.in_(chunk)))
+            if rows:
+                connection.execute(insert(table), rows)
+            written += len(rows)
+    return written
+
+
+def rebuild_balances(connection) -> int:
+    """Recompute every balance row; returns rows written"""
+    from app.models.party import PartyBalance
+
+    table = PartyBalance.__table__
+    connection.execute(delete(table))
+    rows = [row for party_type in PARTY_TYPES for row in _balance_rows(connection, party_type)]
+    if rows:
+        connection.execute(insert(table), rows)
+    return len(rows)
+
+
+def verify_balances(connection) -> List[dict]:
+    """Stored rows that differ from a recomputation: [{party_type, party_id, field: (stored, expected)}]"""
+    from app.models.party import PartyBalance
+
+    table = PartyBalance.__table__
+    stored = {(row.party_type, row.party_id): row._mapping for row in connection.execute(select(table))}
+    expected = {
+        (row["party_type"], row["party_id"]): row
+        for party_type in PARTY_TYPES for row in _balance_rows(connection, party_type)
+    }
+    fields = MEASURES + ("last_activity",)
+    mismatches = []
+    for key in sorted(set(stored) | set(expected)):
+        have, want = stored.get(key), expected.get(key)
+        differences = {
+            field: (have[field] if have else None, want[field] if want else None)
+            for field in fields
+            if have is None or want is None or have[field] != want[field]
+        }
+        if differences:
+            mismatches.append({"party_type": key[0], "party_id": key[1], **differences})
+    return mismatches
+
+
+def ensure_party_balances(engine=None):
+    """Create party_balances if missing and build it once when it is empty but bills exist"""
+    from app.models.party import PartyBalance
+    from app.models.transaction import Purchase, Sale
+    if engine is None:
+        from app.db.database import engine
+
+    PartyBalance.__table__.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        if connection.execute(select(PartyBalance.party_id).limit(1)).first() is not None:
+            return
+        has_bills = (
+            connection.execute(select(Sale.bill_number).limit(1)).first() is not None
+            or connection.execute(select(Purchase.bill_number).limit(1)).first() is not None
+        )
+        if has_bills:
+            written = rebuild_balances(connection)
+            logger.info(f"📊 Built party balances ({written} rows)")
+
+
+# ===== Reading balances =====
+
+def balance_totals(db: Session) -> Dict[str, Dict[str, float]]:
+    """party type -> sums of the balance measures over all its parties, in one query"""
+    from app.models.party import PartyBalance
+
+    rows = db.query(PartyBalance.party_type, *[
+        func.sum(getattr(PartyBalance, measure)).label(measure) for measure in MEASURES
+    ]).group_by(PartyBalance.party_type).all()
+    totals = {party_type: {measure: 0.0 for measure in MEASURES} for party_type in PARTY_TYPES}
+    for row in rows:
+        if row.party_type in totals:
+            totals[row.party_type] = {measure: float(getattr(row, measure) or 0) for measure in MEASURES}
+    return totals
+
+
+def balance_before(db: Session, party_type: str, party_id: str, period) -> Dict[str, float]:
+    """billed/paid/outstanding of the party's bills dated before the period starts
+
+    The stored balance minus the bills from the period start on - an indexed
+    range on (party, date) instead of the whole history.
+    """
+    from app.models.party import PartyBalance
+
+    model, party_column, total_column = bill_columns()[party_type]
+    stored = db.query(PartyBalance).filter(
+        PartyBalance.party_type == party_type, PartyBalance.party_id == party_id
+    ).first()
+    since = db.query(
+        func.sum(func.coalesce(total_column, 0)).label("billed"),
+        func.sum(settled_sql(model, total_column)).label("paid"),
+    ).filter(
+        party_column == party_id,
+        model.date >= period.bounds(model.date)[0],
+        func.coalesce(model.status, "") != "cancelled",
+    ).one()
+
+    billed = float(stored.billed if stored else 0) - float(since.billed or 0)
+    paid = float(stored.paid if stored else 0) - float(since.paid or 0)
+    return {"billed": billed, "paid": paid, "outstanding": billed - paid}
+
+
+# ===== Incremental maintenance =====
+
+def mark_parties(session: Session, customers: Iterable[str] = (), suppliers: Iterable[str] = ()):
+    """Have the next commit refresh these parties (for writes the session events can't see)"""
+    parties = session.info.setdefault(PARTY_KEYS, defaultdict(set))
+    parties["customer"].update(party_id or NO_PARTY for party_id in customers)
+    parties["supplier"].update(party_id or NO_PARTY for party_id in suppliers)
+
+
+def _party_ids(obj, attribute) -> Set[str]:
+    """Current and previous party of a bill (NO_PARTY when it has none)"""
+    history = attributes.get_history(obj, attribute)
+    values = {*history.added, *history.unchanged, *history.deleted}
+    return {value or NO_PARTY for value in values} or {NO_PARTY}
+
+
+def _changes_balance(obj) -> bool:
+    changed = {attr.key for attr in inspect(obj).attrs if attr.history.has_changes()}
+    return bool(changed - UNRELATED_ATTRIBUTES)
+
+
+@event.listens_for(Session, "before_flush")
+def _remember_parties(session, flush_context, instances):
+    bills = {model: (party_type, party_column.key) for party_type, (model, party_column, _) in bill_columns().items()}
+    dirty = session.dirty
+    for obj in (*session.new, *dirty, *session.deleted):
+        spec = bills.get(type(obj))
+        if spec and (obj not in dirty or _changes_balance(obj)):
+            party_type, attribute = spec
+            session.info.setdefault(PARTY_KEYS, defaultdict(set))[party_type].update(_party_ids(obj, attribute))
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_touched_parties(session):
+    session.flush()  # the hook above needs to see the last changes first
+    parties = session.info.pop(PARTY_KEYS, None)
+    if not parties:
+        return
+    connection = session.connection()
+    touched = [f"{party_type}:{party_id}" for party_type, ids in parties.items() for party_id in ids]
+    refresh_at_commit("party_balances", touched,
+                      lambda: refresh_parties(connection, parties["customer"], parties["supplier"]),
+                      "scripts/rebuild_party_balances.py")
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_touched_parties(session):
+    session.info.pop(PARTY_KEYS, None)
@@ -0,0 +1,136 @@
+"""
+Blow yield and efficiency: how much of each preform comes out as bottles, and what the good bottles cost
+
+Read from daily_blow_facts (app/db/facts.py), kept current on every blow
+write, so a year of trends adds up a few thousand fact rows instead of the
+blows themselves. The period's rows are grouped by preform → bottle pair
+and/or operator and bucketed by day, week, month or the whole period:
+
+    yield_pct          output / input
+    waste_pct          waste / input
+    blow_cost_per_unit blow charge per bottle
+    cost_per_good_unit produced cost (preform + blow) per bottle, costed blows only
+    waste_cost         the preform cost the wasted units took
+"""
+
+from app.core.periods import Period, business_date
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from typing import Dict, Optional, Tuple
+
+GROUPINGS = ("pair", "operator")
+GRAINS = ("day", "week", "month", "period")
+SUMS = ("blows", "qty_input", "qty_output", "qty_waste", "blow_cost", "costed_output", "produced_cost", "waste_cost")
+
+CENT = Decimal("0.01")
+UNIT_PLACES = Decimal("0.0001")
+
+
+@dataclass
+class YieldQuery:
+    """Which blows to measure and how to group them"""
+    period: Period
+    group_by: Tuple[str, ...] = ("pair",)
+    grain: str = "period"
+    filters: Dict[str, str] = field(default_factory=dict)  # from_item_id / to_item_id / user_id -> value
+
+    def __post_init__(self):
+        unknown = [name for name in self.group_by if name not in GROUPINGS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown grouping(s): {', '.join(unknown)}")
+        if self.grain not in GRAINS:
+            raise HTTPException(status_code=400, detail=f"grain must be one of: {', '.join(GRAINS)}")
+
+    def header(self) -> dict:
+        return {
+            "period": self.period.as_dict(),
+            "group_by": list(self.group_by),
+            "grain": self.grain,
+            "filters": self.filters,
+        }
+
+
+def _bucket(day: date, grain: str, period: Period) -> date:
+    """First day of the bucket the day falls in"""
+    if grain == "day":
+        return day
+    if grain == "week":
+        return day - timedelta(days=day.weekday())
+    if grain == "month":
+        return day.replace(day=1)
+    return period.start
+
+
+def _keys(query: YieldQuery):
+    from app.models.facts import DailyBlowFact
+
+    keys = []
+    if "pair" in query.group_by:
+        keys += [DailyBlowFact.from_item_id, DailyBlowFact.to_item_id]
+    if "operator" in query.group_by:
+        keys.append(DailyBlowFact.user_id)
+    return keys
+
+
+def _metrics(sums: dict) -> dict:
+    qty_input, qty_output, costed_output = sums["qty_input"], sums["qty_output"], sums["costed_output"]
+    money = {name: Decimal(str(sums[name] or 0)).quantize(CENT) for name in ("blow_cost", "produced_cost", "waste_cost")}
+    return {
+        "blows": sums["blows"],
+        "qty_input": qty_input,
+        "qty_output": qty_output,
+        "qty_waste": sums["qty_waste"],
+        "yield_pct": round(qty_output / qty_input * 100, 2) if qty_input else None,
+        "waste_pct": round(sums["qty_waste"] / qty_input * 100, 2) if qty_input else None,
+        **money,
+        "blow_cost_per_unit": (money["blow_cost"] / qty_output).quantize(UNIT_PLACES) if qty_output else None,
+        "costed_output": costed_output,
+        "cost_per_good_unit": (money["produced_cost"] / costed_output).quantize(UNIT_PLACES) if costed_output else None,
+    }
+
+
+def blow_yield(connection, query: YieldQuery, items: Dict[str, str], operators: Dict[str, str]) -> dict:
+    """{"totals": {...}, "rows": [...]}: rows by grouping, then bucket; items / operators: id -> name"""
+    from app.models.facts import DailyBlowFact
+
+    keys = _keys(query)
+    day = [DailyBlowFact.day] if query.grain != "period" else []
+    statement = select(*keys, *day, *[
+        func.sum(getattr(DailyBlowFact, name)).label(name) for name in SUMS
+    ]).where(
+        query.period.filter(DailyBlowFact.day),
+        *[getattr(DailyBlowFact, name) == value for name, value in query.filters.items()],
+    )
+    if keys or day:
+        statement = statement.group_by(*keys, *day)
+
+    groups: Dict[tuple, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(SUMS, 0))
+    totals = dict.fromkeys(SUMS, 0)
+    for row in connection.execute(statement):
+        values = tuple(row[:len(keys)])
+        bucket = _bucket(business_date(row.day), query.grain, query.period) if day else query.period.start
+        group = groups[(values, bucket)]
+        for name in SUMS:
+            value = getattr(row, name) or 0
+            group[name] += value
+            totals[name] += value
+
+    rows = []
+    for (values, bucket), sums in sorted(groups.items(), key=lambda group: (tuple(group[0][0]), group[0][1])):
+        entry: Dict[str, Optional[object]] = {"bucket": bucket}
+        named = dict(zip([key.name for key in keys], values))
+        if "pair" in query.group_by:
+            entry.update(
+                from_item_id=named["from_item_id"], from_item_name=items.get(named["from_item_id"]),
+                to_item_id=named["to_item_id"], to_item_name=items.get(named["to_item_id"]),
+            )
+        if "operator" in query.group_by:
+            user_id = named["user_id"] or None  # '' in the facts: no operator recorded
+            entry.update(user_id=user_id, operator=operators.get(user_id) if user_id else None)
+        entry.update(_metrics(sums))
+        rows.append(entry)
+    return {"totals": _metrics(totals), "rows": rows}
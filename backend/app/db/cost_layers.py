@@ -0,0 +1,424 @@
+"""
+FIFO cost layers: what each lot of stock cost and where its units went
+
+With COSTING_METHOD=fifo every receipt opens a layer in cost_layers (a
+purchase line, a blow's output, units found or returned) and every issue
+takes units from the item's oldest layers with stock left, noting which ones
+in cost_layer_issues. Both happen in the transaction that moves the stock, so costing a sale is a read of a few
+open layers instead of a scan over purchase and sale history:
+
+  - add_layer(): purchases and other receipts
+  - consume_layers(): sales, wastes and lost stock; returns the FIFO unit
+    cost - with COSTING_METHOD=fifo that is the sale's cost_basis
+  - produce_layers(): a blow consumes preform layers and opens a layer of
+    bottles at their cost plus blow_cost_per_unit, spread over the output,
+    so blown bottles carry their real cost into the sales that take them
+  - restore_layers() / remove_layers(): deleting a sale, blow or purchase
+
+The remaining quantities of an item's layers add up to its stock. Units
+issued with nothing on hand are taken from a 'short' layer (negative
+remaining, at the last known cost) which the next receipt fills first.
+Layers are consumed in the order they were opened; a backdated entry is only
+placed in date order by a rebuild, which replays the history in one pass and
+can restamp sale cost_basis and blow produced_unit_cost:
+
+    python scripts/rebuild_cost_layers.py [--check] [--restamp]
+"""
+
+from app.db.costing import CENT, FALLBACK_COST_SHARE, VALUE_PLACES, WRITE_CHUNK, ZERO, _events
+from collections import deque
+from decimal import Decimal
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _take(layers: list, qty: int) -> Tuple[List[tuple], int]:
+    """Take qty units from the oldest layers with stock left; returns [(layer, units)] and the units still short"""
+    allocations = []
+    for layer in layers:
+        if qty <= 0:
+            break
+        if layer.remaining <= 0:
+            continue
+        units = min(qty, layer.remaining)
+        layer.remaining -= units
+        qty -= units
+        allocations.append((layer, units))
+    return allocations, max(qty, 0)
+
+
+def _fill_short(layers: list, qty: int) -> int:
+    """Fill the item's short layers from a receipt of qty units; returns the units left for the new layer"""
+    for layer in layers:
+        if qty <= 0:
+            break
+        if layer.remaining < 0:
+            filled = min(qty, -layer.remaining)
+            layer.remaining += filled
+            qty -= filled
+    return qty
+
+
+def _unit_cost(allocations: List[tuple], qty: int) -> Decimal:
+    total = sum((Decimal(layer.unit_cost) * units for layer, units in allocations), ZERO)
+    return (total / qty).quantize(VALUE_PLACES) if qty else ZERO
+
+
+# ===== Live updates =====
+
+# Open layers read per round trip while taking units out; a sale rarely needs more than one page
+PAGE = 20
+
+
+def _short_layers(db: Session, item_id: str) -> list:
+    """The item's short layers still waiting for stock, oldest first, locked until commit"""
+    from app.models.item import CostLayer
+
+    db.flush()  # the session doesn't autoflush; layers touched earlier in this transaction count
+    return (
+        db.query(CostLayer)
+        .filter(CostLayer.item_id == item_id, CostLayer.remaining < 0)
+        .order_by(CostLayer.id)
+        .with_for_update()
+        .all()
+    )
+
+
+def _take_oldest(db: Session, item_id: str, qty: int) -> Tuple[List[tuple], int]:
+    """_take() over the item's layers with stock left, read a page at a time and locked until commit"""
+    from app.models.item import CostLayer
+
+    db.flush()
+    allocations, after = [], 0
+    while qty > 0:
+        page = (
+            db.query(CostLayer)
+            .filter(CostLayer.item_id == item_id, CostLayer.remaining > 0, CostLayer.id > after)
+            .order_by(CostLayer.id)
+            .limit(PAGE)
+            .with_for_update()
+            .all()
+        )
+        taken, qty = _take(page, qty)
+        allocations.extend(taken)
+        if len(page) < PAGE:
+            break
+        after = page[-1].id
+    return allocations, qty
+
+
+def _last_cost(db: Session, item_id: str) -> Optional[Decimal]:
+    from app.models.item import CostLayer
+
+    return db.execute(
+        select(CostLayer.unit_cost).where(CostLayer.item_id == item_id).order_by(CostLayer.id.desc()).limit(1)
+    ).scalar()
+
+
+def add_layer(db: Session, item_id: str, qty: int, unit_cost, source: str, ref: Optional[str] = None,
+              at=None):
+    """Open a layer of qty units at unit_cost (the item's last known cost when None)"""
+    from app.models.item import CostLayer
+
+    if unit_cost is None:
+        unit_cost = _last_cost(db, item_id) or ZERO
+    layer = CostLayer(
+        item_id=item_id, source=source, source_ref=ref, received_at=at, quantity=qty,
+        remaining=_fill_short(_short_layers(db, item_id), qty), unit_cost=Decimal(unit_cost).quantize(VALUE_PLACES),
+    )
+    db.add(layer)
+    return layer
+
+
+def consume_layers(db: Session, item_id: str, qty: int, ref_type: str, ref: Optional[str] = None, at=None,
+                   fallback: Optional[Decimal] = None) -> Decimal:
+    """Take qty units FIFO and note where they came from; returns their unit cost"""
+    from app.models.item import CostLayer, CostLayerIssue
+
+    allocations, short = _take_oldest(db, item_id, qty)
+    if short:
+        layer = next((layer for layer in _short_layers(db, item_id) if layer.source == "short"), None)
+        if layer is None:
+            unit_cost = _last_cost(db, item_id)
+            if unit_cost is None:
+                unit_cost = fallback if fallback is not None else ZERO
+            layer = CostLayer(item_id=item_id, source="short", source_ref=ref, received_at=at, quantity=0,
+                              remaining=0, unit_cost=Decimal(unit_cost).quantize(VALUE_PLACES))
+            db.add(layer)
+        layer.quantity += short
+        layer.remaining -= short
+        allocations.append((layer, short))
+    for layer, units in allocations:
+        db.add(CostLayerIssue(layer=layer, ref_type=ref_type, ref=ref, quantity=units, issued_at=at))
+    return _unit_cost(allocations, qty)
+
+
+def restore_layers(db: Session, item_id: str, qty: int, ref_type: str, ref: str, unit_cost=None, at=None) -> None:
+    """Put the units an issue took back into their layers (a returned remainder opens a layer at unit_cost)"""
+    from app.models.item import CostLayerIssue
+
+    issues = (
+        db.query(CostLayerIssue)
+        .filter(CostLayerIssue.ref_type == ref_type, CostLayerIssue.ref == ref)
+        .with_for_update()
+        .all()
+    )
+    restored = 0
+    for issue in issues:
+        if issue.layer.item_id != item_id:
+            continue
+        issue.layer.remaining += issue.quantity
+        restored += issue.quantity
+        db.delete(issue)
+    if qty > restored:
+        # Layers removed since (their purchase was deleted) come back as a return at what they cost
+        add_layer(db, item_id, qty - restored, unit_cost, "return", ref, at)
+
+
+def remove_layers(db: Session, item_id: str, qty: int, source: str, ref: str, at=None) -> None:
+    """Take a receipt back out: drop its layers and issue whatever of it was already used from the other layers"""
+    from app.models.item import CostLayer, CostLayerIssue
+
+    layers = (
+        db.query(CostLayer)
+        .filter(CostLayer.item_id == item_id, CostLayer.source == source, CostLayer.source_ref == ref)
+        .with_for_update()
+        .all()
+    )
+    left = sum(layer.remaining for layer in layers)
+    if layers:
+        ids = [layer.id for layer in layers]
+        db.execute(delete(CostLayerIssue).where(CostLayerIssue.layer_id.in_(ids)))
+        for layer in layers:
+            db.delete(layer)
+    if qty > left:
+        consume_layers(db, item_id, qty - left, "reversal", ref, at)
+    elif qty < left:
+        add_layer(db, item_id, left - qty, layers[0].unit_cost, "adjustment", ref, at)
+
+
+def produce_layers(db: Session, blow_id: str, from_item_id: str, input_qty: int, to_item_id: str,
+                   output_qty: int, blow_cost_per_unit, at=None) -> Optional[Decimal]:
+    """Blow: consume preform layers, open a bottle layer at their cost; returns the produced unit cost"""
+    input_value = consume_layers(db, from_item_id, input_qty, "blow", blow_id, at) * input_qty
+    if output_qty <= 0:
+        return None
+    unit_cost = ((input_value + Decimal(blow_cost_per_unit or 0) * output_qty) / output_qty).quantize(VALUE_PLACES)
+    add_layer(db, to_item_id, output_qty, unit_cost, "blow", blow_id, at)
+    return unit_cost
+
+
+def unproduce_layers(db: Session, blow_id: str, from_item_id: str, input_qty: int, to_item_id: str,
+                     output_qty: int) -> None:
+    """Reverse produce_layers() for a deleted blow"""
+    if output_qty > 0:
+        remove_layers(db, to_item_id, output_qty, "blow", blow_id)
+    restore_layers(db, from_item_id, input_qty, "blow", blow_id)
+
+
+def adjust_layers(db: Session, item_id: str, qty_change: int, ref: Optional[str] = None) -> None:
+    """Manual stock correction: units found open a layer at the last cost, units lost go out FIFO"""
+    if qty_change > 0:
+        add_layer(db, item_id, qty_change, None, "adjustment", ref)
+    elif qty_change < 0:
+        consume_layers(db, item_id, -qty_change, "adjustment", ref)
+
+
+# ===== Replaying history =====
+
+class _Lot:
+    """A cost layer while replaying; the rows are written once the pass is done"""
+    __slots__ = ("item_id", "source", "source_ref", "received_at", "quantity", "remaining", "unit_cost")
+
+    def __init__(self, item_id, source, source_ref, received_at, quantity, remaining, unit_cost):
+        self.item_id, self.source, self.source_ref, self.received_at = item_id, source, source_ref, received_at
+        self.quantity, self.remaining, self.unit_cost = quantity, remaining, unit_cost
+
+
+class _Replay:
+    """FIFO layers of every item built from the ordered history"""
+
+    def __init__(self):
+        self.lots: List[_Lot] = []
+        self.issues: List[tuple] = []  # (lot, ref_type, ref, units, at)
+        self.open: Dict[str, deque] = {}  # lots with stock left, oldest first
+        self.short: Dict[str, _Lot] = {}  # the lot units were issued from while nothing was on hand
+        self.last_cost: Dict[str, Decimal] = {}
+
+    def receive(self, item_id, qty, unit_cost, source, ref, at):
+        if unit_cost is None:
+            unit_cost = self.last_cost.get(item_id, ZERO)
+        short = self.short.get(item_id)
+        remaining = _fill_short([short], qty) if short is not None else qty
+        if short is not None and short.remaining == 0:
+            del self.short[item_id]
+        lot = _Lot(item_id, source, ref, at, qty, remaining, Decimal(unit_cost).quantize(VALUE_PLACES))
+        self.lots.append(lot)
+        if remaining > 0:
+            self.open.setdefault(item_id, deque()).append(lot)
+        self.last_cost[item_id] = lot.unit_cost
+
+    def issue(self, item_id, qty, ref_type, ref, at, fallback=None) -> Decimal:
+        layers = self.open.setdefault(item_id, deque())
+        allocations, short = [], qty
+        while short > 0 and layers:
+            lot = layers[0]
+            units = min(short, lot.remaining)
+            lot.remaining -= units
+            short -= units
+            allocations.append((lot, units))
+            if lot.remaining == 0:
+                layers.popleft()
+        if short:
+            lot = self.short.get(item_id)
+            if lot is None:
+                unit_cost = self.last_cost.get(item_id, fallback if fallback is not None else ZERO)
+                lot = self.short[item_id] = _Lot(item_id, "short", ref, at, 0, 0, Decimal(unit_cost).quantize(VALUE_PLACES))
+                self.lots.append(lot)
+            lot.quantity += short
+            lot.remaining -= short
+            allocations.append((lot, short))
+        self.issues.extend((lot, ref_type, ref, units, at) for lot, units in allocations)
+        return _unit_cost(allocations, qty)
+
+
+def replay_layers(connection, stamp_sale: Optional[Callable] = None,
+                  stamp_blow: Optional[Callable] = None) -> _Replay:
+    """Every item's layers after its whole history, in one ordered pass
+
+    stamp_sale(line_id, unit_cost) and stamp_blow(blow_id, produced_unit_cost)
+    are called with the FIFO cost of each sale line and blow.
+    """
+    replay = _Replay()
+    result = connection.execute(_events().execution_options(yield_per=WRITE_CHUNK))
+    for event in result:
+        if not event.item_id or not event.qty:
+            continue
+        if event.kind == "purchase":
+            replay.receive(event.item_id, event.qty, Decimal(event.price or 0), "purchase", event.ref, event.at)
+        elif event.kind == "blow":
+            input_value = replay.issue(event.item_id, event.qty, "blow", event.ref, event.at) * event.qty
+            if event.to_item_id and event.output_qty and event.output_qty > 0:
+                produced = ((input_value + Decimal(event.price or 0) * event.output_qty)
+                            / event.output_qty).quantize(VALUE_PLACES)
+                replay.receive(event.to_item_id, event.output_qty, produced, "blow", event.ref, event.at)
+                if stamp_blow:
+                    stamp_blow(event.ref, produced)
+        elif event.kind == "adjustment":
+            if event.qty > 0:
+                replay.receive(event.item_id, event.qty, None, "adjustment", event.ref, event.at)
+            else:
+                replay.issue(event.item_id, -event.qty, "adjustment", event.ref, event.at)
+        elif event.kind == "sale":
+            fallback = Decimal(event.price) * FALLBACK_COST_SHARE if event.price is not None else None
+            unit_cost = replay.issue(event.item_id, event.qty, "sale", event.line_id, event.at, fallback)
+            if stamp_sale:
+                stamp_sale(event.line_id, unit_cost)
+        else:
+            replay.issue(event.item_id, event.qty, event.kind, event.ref, event.at)
+    return replay
+
+
+def _on_hand(lots) -> Dict[str, tuple]:
+    """item_id -> (quantity, value) of what the layers still hold"""
+    totals: Dict[str, tuple] = {}
+    for lot in lots:
+        qty, value = totals.get(lot.item_id, (0, ZERO))
+        totals[lot.item_id] = (qty + lot.remaining, value + lot.remaining * Decimal(lot.unit_cost))
+    return totals
+
+
+def rebuild_cost_layers(connection, restamp: bool = False) -> Tuple[int, int, int]:
+    """Replace every layer with the replayed history; returns (layers, sale lines restamped, blows restamped)
+
+    restamp rewrites each sale line's cost_basis and each blow's produced_unit_cost with their FIFO cost.
+    """
+    from app.models.item import CostLayer, CostLayerIssue
+    from app.models.transaction import Blow, SaleLineItem
+
+    sale_stamps: List[dict] = []
+    blow_stamps: List[dict] = []
+    replay = replay_layers(
+        connection,
+        (lambda line_id, unit_cost: sale_stamps.append({"row": line_id, "cost": unit_cost.quantize(CENT)}))
+        if restamp else None,
+        (lambda blow_id, unit_cost: blow_stamps.append({"row": blow_id, "cost": unit_cost.quantize(CENT)}))
+        if restamp else None,
+    )
+
+    for model, column, stamps in (
+        (SaleLineItem, "cost_basis", sale_stamps),
+        (Blow, "produced_unit_cost", blow_stamps),
+    ):
+        table = model.__table__
+        statement = update(table).where(table.c.id == bindparam("row")).values({column: bindparam("cost")})
+        for i in range(0, len(stamps), WRITE_CHUNK):
+            connection.execute(statement, stamps[i:i + WRITE_CHUNK])
+
+    layers, issues = CostLayer.__table__, CostLayerIssue.__table__
+    connection.execute(delete(issues))
+    connection.execute(delete(layers))
+    ids: Dict[int, int] = {}
+    insert_layers = insert(layers).returning(layers.c.id, sort_by_parameter_order=True)
+    for i in range(0, len(replay.lots), WRITE_CHUNK):
+        chunk = replay.lots[i:i + WRITE_CHUNK]
+        rows = [
+            {"item_id": lot.item_id, "source": lot.source, "source_ref": lot.source_ref,
+             "received_at": lot.received_at, "quantity": lot.quantity, "remaining": lot.remaining,
+             "unit_cost": lot.unit_cost}
+            for lot in chunk
+        ]
+        for lot, layer_id in zip(chunk, connection.execute(insert_layers, rows).scalars()):
+            ids[id(lot)] = layer_id
+    rows = [
+        {"layer_id": ids[id(lot)], "ref_type": ref_type, "ref": ref, "quantity": units, "issued_at": at}
+        for lot, ref_type, ref, units, at in replay.issues
+    ]
+    for i in range(0, len(rows), WRITE_CHUNK):
+        connection.execute(insert(issues), rows[i:i + WRITE_CHUNK])
+    return len(replay.lots), len(sale_stamps), len(blow_stamps)
+
+
+def verify_cost_layers(connection) -> List[dict]:
+    """Items whose stored layers hold a different quantity or value than a replay: [{item_id, field: (stored, expected)}]"""
+    from app.models.item import CostLayer
+
+    stored = {
+        item_id: (int(qty), Decimal(value))
+        for item_id, qty, value in connection.execute(
+            select(CostLayer.item_id, func.sum(CostLayer.remaining), func.sum(CostLayer.remaining * CostLayer.unit_cost))
+            .group_by(CostLayer.item_id)
+        )
+    }
+    expected = _on_hand(replay_layers(connection).lots)
+    mismatches = []
+    for item_id in sorted(set(stored) | set(expected)):
+        have, want = stored.get(item_id, (0, ZERO)), expected.get(item_id, (0, ZERO))
+        differences = {}
+        if have[0] != want[0]:
+            differences["on_hand_qty"] = (have[0], want[0])
+        if abs(have[1] - want[1]) > CENT:
+            differences["on_hand_value"] = (have[1].quantize(CENT), want[1].quantize(CENT))
+        if differences:
+            mismatches.append({"item_id": item_id, **differences})
+    return mismatches
+
+
+def ensure_cost_layers(engine=None):
+    """Create the cost layer tables if missing and build them once when empty but stock exists"""
+    from app.models.item import CostLayer, CostLayerIssue, Stock
+    if engine is None:
+        from app.db.database import engine
+
+    CostLayer.__table__.create(engine, checkfirst=True)
+    CostLayerIssue.__table__.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        if connection.execute(select(CostLayer.id).limit(1)).first() is not None:
+            return
+        if connection.execute(select(Stock.item_id).limit(1)).first() is not None:
+            layers, _, _ = rebuild_cost_layers(connection)
+            logger.info(f"📊 Built FIFO cost layers ({layers} layers)")
@@ -0,0 +1,350 @@
+"""
+Perpetual weighted-average cost (WAC) of every item, kept next to stocks
+
+item_costs holds per item the quantity on hand, what it cost and the average
+unit cost. With COSTING_METHOD=wac every stock movement updates the item's
+row in O(1), in the transaction that moves the stock (with fifo the cost
+layers of app/db/cost_layers.py are kept instead):
+
+  - receive(): purchases (at their unit price), returns and reversals
+  - issue(): sales and wastes take units out at the current average and
+    return it - with COSTING_METHOD=wac that is the sale's cost_basis
+  - produce(): a blow issues the preforms and receives the bottles at the
+    preforms' cost plus blow_cost_per_unit, spread over the output
+
+Stock may go negative here; units issued with nothing on hand go out at the
+last known average and the next receipt starts a fresh average. Entries are
+costed in the order they are made - a backdated purchase only changes the
+costs of earlier-dated sales after a rebuild. Deleting a sale or editing or
+deleting a blow reverses it at the cost kept on the document (cost_basis,
+produced_unit_cost), which is stored to the cent, so a reversal can leave
+a fraction of a cent per unit that the rebuild evens out.
+
+replay_costs() recomputes every row from the history in one ordered pass
+(purchases, blows, sales, wastes and manual stock adjustments), optionally
+restamping each sale line's cost_basis:
+
+    python scripts/rebuild_item_costs.py [--check] [--restamp]
+
+Only the configured method is kept current. costing_state records which one
+that is, and ensure_costing() (run before serving, app/db/migrate.py)
+rebuilds the newly configured one from the history when the setting changes.
+"""
+
+from app.core.config import settings
+from decimal import Decimal
+from sqlalchemy import Integer, Numeric, String, bindparam, delete, insert, literal, null, select, union_all, update
+from sqlalchemy.orm import Session
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+VALUE_PLACES = Decimal("0.0001")
+
+CENT = Decimal("0.01")
+
+ZERO = Decimal("0")
+
+# Sales of an item with no known cost count this share of the selling price (as FIFO does)
+FALLBACK_COST_SHARE = Decimal("0.6")
+
+# Rows per batch when writing replay results
+WRITE_CHUNK = 1000
+
+# Event order within one timestamp: stock comes in before it goes out
+RANKS = {"purchase": 0, "adjustment": 1, "blow": 2, "sale": 3, "waste": 4}
+
+
+class Position(NamedTuple):
+    """An item's stock on hand, its cost and its average unit cost"""
+    qty: int = 0
+    value: Decimal = ZERO
+    unit_cost: Optional[Decimal] = None
+
+
+def weighted_average() -> bool:
+    return settings.COSTING_METHOD == "wac"
+
+
+def _receive(position: Position, qty: int, unit_cost: Optional[Decimal]) -> Position:
+    """Add qty units at unit_cost (a negative qty reverses a receipt at that cost)"""
+    if unit_cost is None:
+        unit_cost = position.unit_cost if position.unit_cost is not None else ZERO
+    on_hand = position.qty + qty
+    value = position.value + qty * unit_cost
+    if qty > 0 and position.qty <= 0 < on_hand:
+        # Units issued while short were costed already; what is on hand now is this receipt
+        value = on_hand * unit_cost
+    if on_hand == 0:
+        value = ZERO
+    average = value / on_hand if on_hand > 0 else (unit_cost if qty > 0 else position.unit_cost)
+    return Position(on_hand, value.quantize(VALUE_PLACES), average.quantize(VALUE_PLACES) if average is not None else None)
+
+
+def _issue(position: Position, qty: int, fallback: Optional[Decimal] = None) -> Tuple[Position, Decimal]:
+    """Take qty units out at the average cost; returns the new position and the unit cost used"""
+    if position.qty > 0:
+        unit_cost = position.value / position.qty
+    elif position.unit_cost is not None:
+        unit_cost = position.unit_cost
+    else:
+        unit_cost = fallback if fallback is not None else ZERO
+    unit_cost = unit_cost.quantize(VALUE_PLACES)
+    on_hand = position.qty - qty
+    value = ZERO if on_hand == 0 else (position.value - qty * unit_cost if position.qty > 0 else on_hand * unit_cost)
+    return Position(on_hand, value.quantize(VALUE_PLACES), unit_cost), unit_cost
+
+
+# ===== Live updates =====
+
+def _row(db: Session, item_id: str):
+    """The item's cost row, locked until commit (created empty for a new item)"""
+    from app.models.item import ItemCost
+
+    row = db.get(ItemCost, item_id, with_for_update=True)
+    if row is None:
+        row = ItemCost(item_id=item_id, on_hand_qty=0, on_hand_value=ZERO, unit_cost=None)
+        db.add(row)
+    return row
+
+
+def _position(row) -> Position:
+    unit_cost = Decimal(row.unit_cost) if row.unit_cost is not None else None
+    return Position(row.on_hand_qty or 0, Decimal(row.on_hand_value or 0), unit_cost)
+
+
+def _store(row, position: Position):
+    row.on_hand_qty, row.on_hand_value, row.unit_cost = position
+
+
+def receive(db: Session, item_id: str, qty: int, unit_cost: Optional[Decimal] = None) -> Decimal:
+    """Stock in at unit_cost (the current average when None); returns the item's new average"""
+    row = _row(db, item_id)
+    position = _receive(_position(row), qty, Decimal(unit_cost) if unit_cost is not None else None)
+    _store(row, position)
+    return position.unit_cost
+
+
+def issue(db: Session, item_id: str, qty: int, fallback: Optional[Decimal] = None) -> Decimal:
+    """Stock out at the current average; returns the unit cost of what went out"""
+    row = _row(db, item_id)
+    position, unit_cost = _issue(_position(row), qty, fallback)
+    _store(row, position)
+    return unit_cost
+
+
+def produce(db: Session, from_item_id: str, input_qty: int, to_item_id: str, output_qty: int,
+            blow_cost_per_unit) -> Optional[Decimal]:
+    """Blow: preforms out, bottles in at their cost; returns the produced unit cost (None without output)"""
+    input_value = issue(db, from_item_id, input_qty) * input_qty
+    if output_qty <= 0:
+        return None
+    unit_cost = ((input_value + Decimal(blow_cost_per_unit or 0) * output_qty) / output_qty).quantize(VALUE_PLACES)
+    receive(db, to_item_id, output_qty, unit_cost)
+    return unit_cost
+
+
+def unproduce(db: Session, from_item_id: str, input_qty: int, to_item_id: str, output_qty: int,
+              blow_cost_per_unit, produced_unit_cost) -> None:
+    """Reverse produce() for a deleted blow: bottles out at their produced cost, preforms back at theirs"""
+    if produced_unit_cost is None:
+        receive(db, to_item_id, -output_qty)
+        receive(db, from_item_id, input_qty)
+        return
+    produced = Decimal(produced_unit_cost)
+    receive(db, to_item_id, -output_qty, produced)
+    if input_qty > 0:
+        input_value = (produced - Decimal(blow_cost_per_unit or 0)) * output_qty
+        receive(db, from_item_id, input_qty, (input_value / input_qty).quantize(VALUE_PLACES))
+
+
+def adjust(db: Session, item_id: str, qty_change: int) -> None:
+    """Manual stock correction: units found come in at the average, units lost go out at it"""
+    if qty_change > 0:
+        receive(db, item_id, qty_change)
+    elif qty_change < 0:
+        issue(db, item_id, -qty_change)
+
+
+# ===== Replaying history =====
+
+def stock_events():
+    """Every stock event as (at, rank, ref, kind, item_id, qty, price, to_item_id, output_qty, line_id), unordered
+
+    A blow is one event: input qty of item_id out, output_qty of to_item_id in,
+    with blow_cost_per_unit as price. Adjustments carry their signed change.
+    """
+    from app.models.stock_movement import StockMovement
+    from app.models.transaction import Blow, Purchase, PurchaseLineItem, Sale, SaleLineItem, Waste
+
+    def text(value=None):
+        return literal(value, String) if value is not None else null().cast(String)
+
+    def number(type_=Numeric(12, 2)):
+        return null().cast(type_)
+
+    purchases = select(
+        Purchase.date.label("at"), literal(RANKS["purchase"], Integer).label("rank"),
+        PurchaseLineItem.bill_number.label("ref"), text("purchase").label("kind"),
+        PurchaseLineItem.item_id.label("item_id"), PurchaseLineItem.quantity.label("qty"),
+        PurchaseLineItem.unit_price.label("price"), text().label("to_item_id"),
+        number(Integer).label("output_qty"), text().label("line_id"),
+    ).join(Purchase, Purchase.bill_number == PurchaseLineItem.bill_number)
+    sales = select(
+        Sale.date, literal(RANKS["sale"], Integer), SaleLineItem.bill_number, text("sale"),
+        SaleLineItem.item_id, SaleLineItem.quantity, SaleLineItem.unit_price, text(),
+        number(Integer), SaleLineItem.id,
+    ).join(Sale, Sale.bill_number == SaleLineItem.bill_number)
+    blows = select(
+        Blow.date_time, literal(RANKS["blow"], Integer), Blow.id, text("blow"),
+        Blow.from_item_id, Blow.input_quantity, Blow.blow_cost_per_unit, Blow.to_item_id,
+        Blow.output_quantity, text(),
+    )
+    wastes = select(
+        Waste.date, literal(RANKS["waste"], Integer), Waste.id, text("waste"),
+        Waste.item_id, Waste.quantity, number(), text(), number(Integer), text(),
+    )
+    # Manual corrections only: the other movement types are replayed from their documents, and
+    # reversals written when a blow was deleted belong to a blow that no longer exists
+    adjustments = select(
+        StockMovement.movement_date, literal(RANKS["adjustment"], Integer), StockMovement.reference_id,
+        text("adjustment"), StockMovement.item_id, StockMovement.quantity_change, number(), text(),
+        number(Integer), text(),
+    ).where(
+        StockMovement.movement_type.notin_(["purchase", "sale", "production", "waste"]),
+        ~StockMovement.notes.like("Stock reversal:%") | StockMovement.notes.is_(None),
+    )
+    return union_all(purchases, sales, blows, wastes, adjustments)
+
+
+def _events():
+    """stock_events() in the order they are replayed"""
+    events = stock_events().subquery()
+    return select(events).order_by(events.c.at, events.c.rank, events.c.ref)
+
+
+def replay_costs(connection, stamp=None) -> Dict[str, Position]:
+    """Every item's position after its whole history, in one ordered pass
+
+    stamp(line_id, unit_cost) is called with the average cost of each sale line.
+    """
+    positions: Dict[str, Position] = {}
+    result = connection.execute(_events().execution_options(yield_per=WRITE_CHUNK))
+    for event in result:
+        if not event.item_id or not event.qty:
+            continue
+        current = positions.get(event.item_id, Position())
+        if event.kind == "purchase":
+            positions[event.item_id] = _receive(current, event.qty, Decimal(event.price or 0))
+        elif event.kind == "blow":
+            positions[event.item_id], unit_cost = _issue(current, event.qty)
+            if event.to_item_id and event.output_qty and event.output_qty > 0:
+                produced = (unit_cost * event.qty + Decimal(event.price or 0) * event.output_qty) / event.output_qty
+                target = positions.get(event.to_item_id, Position())
+                positions[event.to_item_id] = _receive(target, event.output_qty, produced.quantize(VALUE_PLACES))
+        elif event.kind == "adjustment":
+            if event.qty > 0:
+                positions[event.item_id] = _receive(current, event.qty, None)
+            else:
+                positions[event.item_id], _ = _issue(current, -event.qty)
+        else:
+            fallback = Decimal(event.price) * FALLBACK_COST_SHARE if event.price is not None else None
+            positions[event.item_id], unit_cost = _issue(current, event.qty, fallback)
+            if stamp and event.kind == "sale":
+                stamp(event.line_id, unit_cost)
+    return positions
+
+
+def _rows(positions: Dict[str, Position]) -> List[dict]:
+    return [
+        {"item_id": item_id, "on_hand_qty": p.qty, "on_hand_value": p.value, "unit_cost": p.unit_cost}
+        for item_id, p in sorted(positions.items())
+    ]
+
+
+def rebuild_item_costs(connection, restamp: bool = False) -> Tuple[int, int]:
+    """Replace every item_costs row with the replayed history; returns (items, sale lines restamped)"""
+    from app.models.item import ItemCost
+    from app.models.transaction import SaleLineItem
+
+    stamps: List[dict] = []
+    positions = replay_costs(
+        connection,
+        (lambda line_id, unit_cost: stamps.append({"line": line_id, "cost": unit_cost.quantize(CENT)}))
+        if restamp else None,
+    )
+
+    lines = SaleLineItem.__table__
+    restamp_statement = update(lines).where(lines.c.id == bindparam("line")).values(cost_basis=bindparam("cost"))
+    for i in range(0, len(stamps), WRITE_CHUNK):
+        connection.execute(restamp_statement, stamps[i:i + WRITE_CHUNK])
+
+    table = ItemCost.__table__
+    connection.execute(delete(table))
+    rows = _rows(positions)
+    for i in range(0, len(rows), WRITE_CHUNK):
+        connection.execute(insert(table), rows[i:i + WRITE_CHUNK])
+    return len(rows), len(stamps)
+
+
+def verify_item_costs(connection) -> List[dict]:
+    """Stored rows that differ from a replay: [{item_id, field: (stored, expected)}]"""
+    from app.models.item import ItemCost
+
+    stored = {row.item_id: row for row in connection.execute(select(ItemCost.__table__))}
+    expected = {row["item_id"]: row for row in _rows(replay_costs(connection))}
+    mismatches = []
+    for item_id in sorted(set(stored) | set(expected)):
+        have, want = stored.get(item_id), expected.get(item_id)
+        differences = {}
+        for field, tolerance in (("on_hand_qty", 0), ("on_hand_value", CENT)):
+            stored_value = getattr(have, field) if have is not None else None
+            expected_value = want[field] if want is not None else None
+            if abs(Decimal(stored_value or 0) - Decimal(expected_value or 0)) > tolerance:
+                differences[field] = (stored_value, expected_value)
+        if differences:
+            mismatches.append({"item_id": item_id, **differences})
+    return mismatches
+
+
+def ensure_item_costs(engine=None):
+    """Create item_costs if missing and build it once when it is empty but stock exists"""
+    from app.models.item import ItemCost, Stock
+    if engine is None:
+        from app.db.database import engine
+
+    ItemCost.__table__.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        if connection.execute(select(ItemCost.item_id).limit(1)).first() is not None:
+            return
+        if connection.execute(select(Stock.item_id).limit(1)).first() is not None:
+            items, _ = rebuild_item_costs(connection)
+            logger.info(f"📊 Built item costs ({items} items)")
+
+
+def ensure_costing(engine=None):
+    """Build the configured method's cost tables once, and from scratch when COSTING_METHOD has changed"""
+    from app.db.cost_layers import ensure_cost_layers, rebuild_cost_layers
+    from app.models.item import CostingState
+    if engine is None:
+        from app.db.database import engine
+
+    method = "wac" if weighted_average() else "fifo"
+    with engine.begin() as connection:
+        kept = connection.execute(select(CostingState.method)).scalar()
+    if kept in (None, method):
+        # Without a costing_state row both methods were still kept current
+        (ensure_item_costs if weighted_average() else ensure_cost_layers)(engine)
+    with engine.begin() as connection:
+        if kept not in (None, method):
+            # The other method was kept until now: this one missed every movement since the last switch
+            if weighted_average():
+                items, _ = rebuild_item_costs(connection)
+                logger.info(f"📊 Costing switched from {kept} to wac: rebuilt item costs ({items} items)")
+            else:
+                layers, _, _ = rebuild_cost_layers(connection)
+                logger.info(f"📊 Costing switched from {kept} to fifo: rebuilt cost layers ({layers} layers)")
+        if kept != method:
+            connection.execute(delete(CostingState))
+            connection.execute(insert(CostingState).values(method=method))
@@ -3,6 +3,14 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool, NullPool
 from app.core.config import settings
+from app.db.query_stats import instrument_engine, timed_pool
+from app.db.replica import REPLICA, ReplicaUnavailable, client_key, read_router
+from app.db import facts  # noqa: F401 - registers the daily facts session hooks
+from app.db import balances  # noqa: F401 - registers the party balance session hooks
+from app.db import payments  # noqa: F401 - registers the bill payment session hooks
+from app.db import alerts  # noqa: F401 - registers the stock alert session hooks
+from app.core.metrics import record_read_session
+from fastapi import HTTPException, Request
 import os
 import logging
 
@@ -17,25 +25,33 @@ is_render = "RENDER" in os.environ or "onrender.com" in os.getenv("DATABASE_URL"
 logger.info(f"🔧 Environment: {environment}, Is Railway: {is_railway}, Is Render: {is_render}")
 
 # Use NullPool for Railway/Render/production, QueuePool for local development
-if is_railway or is_render or environment == "production":
-    # Production/Railway/Render: Use NullPool to avoid connection pooling issues
-    # Neon handles connection management, we just create fresh connections
-    logger.info("🔧 Using NullPool for Railway/Render/production (Neon serverless)")
-    engine = create_engine(
-        settings.DATABASE_URL,
-        poolclass=NullPool,
-        connect_args={
-            "connect_timeout": 10,
-            "keepalives": 1,
-            "keepalives_idle": 30,
-        }
-    )
-else:
+def create_db_engine(url: str, label: str = "primary"):
+    if url.startswith("sqlite"):
+        # SQLite (benchmarks / local experiments): no psycopg connect args, allow use from threadpool workers
+        logger.info(f"🔧 Using SQLite engine ({label})")
+        return create_engine(
+            url,
+            poolclass=timed_pool(QueuePool),
+            connect_args={"check_same_thread": False},
+        )
+    if is_railway or is_render or environment == "production":
+        # Production/Railway/Render: Use NullPool to avoid connection pooling issues
+        # Neon handles connection management, we just create fresh connections
+        logger.info(f"🔧 Using NullPool for Railway/Render/production (Neon serverless, {label})")
+        return create_engine(
+            url,
+            poolclass=timed_pool(NullPool),
+            connect_args={
+                "connect_timeout": 10,
+                "keepalives": 1,
+                "keepalives_idle": 30,
+            }
+        )
     # Local development: Use QueuePool with optimized settings
-    logger.info("🔧 Using QueuePool for local development")
-    engine = create_engine(
-        settings.DATABASE_URL,
-        poolclass=QueuePool,
+    logger.info(f"🔧 Using QueuePool for local development ({label})")
+    return create_engine(
+        url,
+        poolclass=timed_pool(QueuePool),
         pool_size=5,
         max_overflow=10,
         pool_pre_ping=True,  # Test connections before using them
@@ -47,12 +63,53 @@ else:
         }
     )
 
+
+engine = create_db_engine(settings.DATABASE_URL)
+
+# Optional read replica for reports / dashboards (see app/db/replica.py)
+read_engine = create_db_engine(settings.READ_DATABASE_URL, "read replica") if settings.READ_DATABASE_URL else None
+
+# Count statements / pool waits per request (feeds /metrics)
+instrument_engine(engine)
+if read_engine is not None:
+    instrument_engine(read_engine)
+read_router.configure(
+    read_engine,
+    max_lag=settings.READ_REPLICA_MAX_LAG,
+    fallback=settings.READ_REPLICA_FALLBACK,
+    pin_seconds=settings.READ_YOUR_WRITES_SECONDS,
+    check_interval=settings.READ_REPLICA_CHECK_INTERVAL,
+)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine or engine)
 
 Base = declarative_base()
 
-def get_db():
+def get_db(request: Request = None):
     db = SessionLocal()
+    # Lets a commit pin this caller to the primary for its following reads
+    db.info["client_key"] = client_key(request)
+    try:
+        yield db
+    except Exception as e:
+        logger.error(f"Database session error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def get_read_db(request: Request = None):
+    """Session for read-only endpoints: the replica when it is reachable and
+    fresh enough and the caller hasn't just written, otherwise the primary"""
+    try:
+        target, reason = read_router.choose(client_key(request))
+    except ReplicaUnavailable:
+        record_read_session(REPLICA, "unavailable")
+        raise HTTPException(status_code=503, detail="Reporting database is unavailable, try again shortly")
+    record_read_session(target, reason)
+    db = ReadSessionLocal() if target == REPLICA else SessionLocal()
+    db.info["read_only"] = True
     try:
         yield db
     except Exception as e:
@@ -63,5 +120,6 @@ def get_db():
         db.close()
 
 def init_db():
-    """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    """Create the tables and build the maintained rollups (app/db/migrate.py)"""
+    from app.db.migrate import migrate
+    migrate(engine)
@@ -0,0 +1,447 @@
+"""
+Daily rollups behind the period reports (profit, weekly, dashboard)
+
+daily_item_facts holds one row per (day, item) with everything the reports
+sum - sales, COGS, purchases, blows and waste - daily_expenditures one row
+per (day, expense type) and daily_blow_facts one row per (day, preform,
+bottle, operator) with the blow yield and cost sums. Reports add up a few
+hundred fact rows instead of re-aggregating the transaction tables on every
+call.
+
+The facts are kept current by session events: each flush records the days
+touched by sales, purchases, their line items, blows, wastes and extra
+expenditures, and just before commit those days are recomputed from the
+source rows inside the same transaction, under a per-day lock so two commits
+on the same day take turns (app/db/maintenance.py); a failed refresh fails
+the commit. Writes that bypass the unit of work
+(Core inserts, bulk query(...).update()) must call mark_days() or be followed
+by a rebuild:
+
+    python scripts/rebuild_daily_facts.py [--from 2025-01-01] [--to 2025-12-31]
+
+A day is the business day of app/core/periods.py (BUSINESS_TIMEZONE), the
+same day a Period filter puts the raw rows in.
+"""
+
+from collections import defaultdict
+from app.core.periods import business_date, business_day, day_start
+from app.db.maintenance import FACTS_LOCK, lock_keys, refresh_at_commit
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import and_, case, delete, event, func, insert, inspect, literal_column, or_, select, true, union_all
+from sqlalchemy.orm import Session, attributes
+import logging
+
+logger = logging.getLogger(__name__)
+
+ITEM_MEASURES = (
+    "qty_sold", "revenue", "cogs", "blow_price",
+    "qty_purchased", "purchase_cost",
+    "qty_produced", "blow_cost", "qty_blow_input",
+    "qty_wasted", "waste_recovery",
+)
+
+BLOW_MEASURES = (
+    "blows", "qty_input", "qty_output", "qty_waste",
+    "blow_cost", "costed_output", "produced_cost", "waste_cost",
+)
+
+# IN lists of keys are resolved in chunks of this size
+KEY_CHUNK = 500
+
+# More separate day runs than this are refreshed as one range from the first to the last
+MAX_SPANS = 16
+
+# Edits touching only these attributes leave every fact unchanged (payment updates)
+UNRELATED_ATTRIBUTES = {
+    "payment_status", "payment_method", "paid_amount", "due_date", "notes", "editable_by_admin_only",
+}
+
+ITEM_DAYS = "facts_item_days"
+EXPENSE_DAYS = "facts_expense_days"
+BLOW_DAYS = "facts_blow_days"
+FACT_DAYS = (ITEM_DAYS, EXPENSE_DAYS, BLOW_DAYS)
+PENDING_KEYS = "facts_pending_keys"
+
+
+def _spans(days: Iterable[date]) -> List[Tuple[date, date]]:
+    """Collapse days into half-open [start, end) runs of consecutive days"""
+    spans: List[Tuple[date, date]] = []
+    for day in sorted(set(days)):
+        if spans and spans[-1][1] == day:
+            spans[-1] = (spans[-1][0], day + timedelta(days=1))
+        else:
+            spans.append((day, day + timedelta(days=1)))
+    if len(spans) > MAX_SPANS:
+        # Long OR lists plan badly - recomputing the days in between is cheaper
+        spans = [(spans[0][0], spans[-1][1])]
+    return spans
+
+
+def _within(column, spans, is_datetime: bool = True):
+    """Index-friendly filter: column falls inside one of the spans (no filter when spans is None)"""
+    if spans is None:
+        return true()
+    if is_datetime:
+        bounds = [(day_start(start), day_start(end)) for start, end in spans]
+    else:
+        bounds = spans
+    return or_(*[and_(column >= start, column < end) for start, end in bounds])
+
+
+# ===== Recomputing facts =====
+
+def _measures(**sums):
+    """Every measure column in ITEM_MEASURES order, 0 for those this source doesn't feed"""
+    return [sums.get(measure, literal_column("0")).label(measure) for measure in ITEM_MEASURES]
+
+
+def _item_queries(spans):
+    from app.models.transaction import Blow, Purchase, PurchaseLineItem, Sale, SaleLineItem, Waste
+
+    sale_day = business_day(Sale.date)
+    purchase_day = business_day(Purchase.date)
+    blow_day = business_day(Blow.date_time)
+    waste_day = business_day(Waste.date)
+    return [
+        select(sale_day.label("day"), SaleLineItem.item_id.label("item_id"), *_measures(
+            qty_sold=func.sum(SaleLineItem.quantity),
+            revenue=func.sum(SaleLineItem.total_price),
+            cogs=func.sum(SaleLineItem.cost_basis * SaleLineItem.quantity),
+            blow_price=func.sum(SaleLineItem.blow_price * SaleLineItem.quantity),
+        )).join(Sale, Sale.bill_number == SaleLineItem.bill_number)
+        .where(_within(Sale.date, spans), func.coalesce(Sale.status, "") != "cancelled")
+        .group_by(sale_day, SaleLineItem.item_id),
+        select(purchase_day.label("day"), PurchaseLineItem.item_id.label("item_id"), *_measures(
+            qty_purchased=func.sum(PurchaseLineItem.quantity),
+            purchase_cost=func.sum(PurchaseLineItem.total_price),
+        )).join(Purchase, Purchase.bill_number == PurchaseLineItem.bill_number)
+        .where(_within(Purchase.date, spans), func.coalesce(Purchase.status, "") != "cancelled")
+        .group_by(purchase_day, PurchaseLineItem.item_id),
+        select(blow_day.label("day"), Blow.to_item_id.label("item_id"), *_measures(
+            qty_produced=func.sum(Blow.quantity),
+            blow_cost=func.sum(Blow.blow_cost_per_unit * Blow.quantity),
+        )).where(_within(Blow.date_time, spans))
+        .group_by(blow_day, Blow.to_item_id),
+        select(blow_day.label("day"), Blow.from_item_id.label("item_id"), *_measures(
+            qty_blow_input=func.sum(Blow.input_quantity),
+        )).where(_within(Blow.date_time, spans))
+        .group_by(blow_day, Blow.from_item_id),
+        select(waste_day.label("day"), Waste.item_id.label("item_id"), *_measures(
+            qty_wasted=func.sum(Waste.quantity),
+            waste_recovery=func.sum(Waste.total_price),
+        )).where(_within(Waste.date, spans))
+        .group_by(waste_day, Waste.item_id),
+    ]
+
+
+def _item_rows(connection, spans) -> List[dict]:
+    """The fact rows for the spans, all sources combined in one UNION ALL query"""
+    parts = union_all(*_item_queries(spans)).subquery()
+    query = select(parts.c.day, parts.c.item_id, *[
+        func.sum(parts.c[measure]).label(measure) for measure in ITEM_MEASURES
+    ]).where(parts.c.day.is_not(None), parts.c.item_id.is_not(None)) \
+      .group_by(parts.c.day, parts.c.item_id)
+    return [
+        {"day": business_date(row.day), "item_id": row.item_id,
+         **{measure: getattr(row, measure) or 0 for measure in ITEM_MEASURES}}
+        for row in connection.execute(query)
+    ]
+
+
+def _expense_rows(connection, spans) -> List[dict]:
+    from app.models.transaction import ExtraExpenditure
+
+    query = select(
+        ExtraExpenditure.date.label("day"), ExtraExpenditure.expense_type,
+        func.sum(ExtraExpenditure.amount).label("amount"),
+        func.count(ExtraExpenditure.id).label("entries"),
+    ).where(_within(ExtraExpenditure.date, spans, is_datetime=False)) \
+     .group_by(ExtraExpenditure.date, ExtraExpenditure.expense_type)
+    return [
+        {"day": business_date(row.day), "expense_type": row.expense_type or "",
+         "amount": row.amount or Decimal("0"), "entries": row.entries}
+        for row in connection.execute(query)
+    ]
+
+
+def _blow_rows(connection, spans) -> List[dict]:
+    """Blow yield and cost sums per (day, preform, bottle, operator)
+
+    A blow's preform cost is what its produced_unit_cost holds beyond the blow
+    charge; its waste cost is the share of that preform cost the wasted units
+    took. Blows without a produced_unit_cost count in the quantities only.
+    """
+    from app.models.transaction import Blow
+
+    blow_day = business_day(Blow.date_time)
+    output = func.coalesce(Blow.output_quantity, 0)
+    costed = Blow.produced_unit_cost.is_not(None)
+    preform_cost = (Blow.produced_unit_cost - func.coalesce(Blow.blow_cost_per_unit, 0)) * output
+    query = select(
+        blow_day.label("day"), Blow.from_item_id, Blow.to_item_id,
+        func.coalesce(Blow.user_id, "").label("user_id"),
+        func.count(Blow.id).label("blows"),
+        func.sum(func.coalesce(Blow.input_quantity, 0)).label("qty_input"),
+        func.sum(output).label("qty_output"),
+        func.sum(func.coalesce(Blow.waste_quantity, 0)).label("qty_waste"),
+        func.sum(func.coalesce(Blow.blow_cost_per_unit, 0) * output).label("blow_cost"),
+        func.sum(case((costed, output), else_=0)).label("costed_output"),
+        func.sum(case((costed, Blow.produced_unit_cost * output), else_=0)).label("produced_cost"),
+        func.sum(case(
+            (and_(costed, Blow.input_quantity > 0),
+             preform_cost * func.coalesce(Blow.waste_quantity, 0) / Blow.input_quantity),
+            else_=0,
+        )).label("waste_cost"),
+    ).where(
+        _within(Blow.date_time, spans), Blow.from_item_id.is_not(None), Blow.to_item_id.is_not(None),
+    ).group_by(blow_day, Blow.from_item_id, Blow.to_item_id, func.coalesce(Blow.user_id, ""))
+    return [
+        {"day": business_date(row.day), "from_item_id": row.from_item_id, "to_item_id": row.to_item_id,
+         "user_id": row.user_id,
+         **{measure: _rounded(getattr(row, measure)) for measure in BLOW_MEASURES}}
+        for row in connection.execute(query)
+    ]
+
+
+def _rounded(value):
+    """Counts as they are, money to the cent (the waste share divides)"""
+    if isinstance(value, (Decimal, float)):
+        return Decimal(str(value)).quantize(Decimal("0.01"))
+    return value or 0
+
+
+def _replace(connection, table, rows, spans):
+    connection.execute(delete(table).where(_within(table.c.day, spans, is_datetime=False)))
+    if rows:
+        connection.execute(insert(table), rows)
+
+
+def refresh_days(connection, item_days: Iterable[date] = (), expense_days: Iterable[date] = (),
+                 blow_days: Iterable[date] = ()) -> int:
+    """Recompute the fact rows of the given days from the source tables; returns rows written"""
+    from app.models.facts import DailyBlowFact, DailyExpenditure, DailyItemFact
+
+    item_spans, expense_spans, blow_spans = (
+        _spans(d for d in days if d is not None) for days in (item_days, expense_days, blow_days)
+    )
+    # Wait for any other commit refreshing one of these days, then recompute with its rows included
+    lock_keys(connection, FACTS_LOCK, (
+        (start + timedelta(days=offset)).isoformat()
+        for spans in (item_spans, expense_spans, blow_spans)
+        for start, end in spans
+        for offset in range((end - start).days)
+    ))
+
+    written = 0
+    if item_spans:
+        rows = _item_rows(connection, item_spans)
+        _replace(connection, DailyItemFact.__table__, rows, item_spans)
+        written += len(rows)
+    if expense_spans:
+        rows = _expense_rows(connection, expense_spans)
+        _replace(connection, DailyExpenditure.__table__, rows, expense_spans)
+        written += len(rows)
+    if blow_spans:
+        rows = _blow_rows(connection, blow_spans)
+        _replace(connection, DailyBlowFact.__table__, rows, blow_spans)
+        written += len(rows)
+    return written
+
+
+def rebuild_facts(connection, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """Recompute every fact row in [start, end) (the whole history by default); returns rows written"""
+    from app.models.facts import DailyBlowFact, DailyExpenditure, DailyItemFact
+
+    if start is None and end is None:
+        spans = None
+    else:
+        spans = [(start or date(1900, 1, 1), end or date(9999, 1, 1))]
+    rows = _item_rows(connection, spans)
+    _replace(connection, DailyItemFact.__table__, rows, spans)
+    expense_rows = _expense_rows(connection, spans)
+    _replace(connection, DailyExpenditure.__table__, expense_rows, spans)
+    blow_rows = _blow_rows(connection, spans)
+    _replace(connection, DailyBlowFact.__table__, blow_rows, spans)
+    return len(rows) + len(expense_rows) + len(blow_rows)
+
+
+def ensure_daily_facts(engine=None):
+    """Create the fact tables if missing and build them once when they are empty but history exists"""
+    from app.models.facts import DailyBlowFact, DailyExpenditure, DailyItemFact
+    from app.models.transaction import Blow, Purchase, Sale
+    if engine is None:
+        from app.db.database import engine
+
+    DailyItemFact.__table__.create(engine, checkfirst=True)
+    DailyExpenditure.__table__.create(engine, checkfirst=True)
+    DailyBlowFact.__table__.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        if connection.execute(select(DailyItemFact.day).limit(1)).first() is not None:
+            # Item facts from before the blow rollup existed: build that one on its own
+            if (connection.execute(select(DailyBlowFact.day).limit(1)).first() is None
+                    and connection.execute(select(Blow.id).limit(1)).first() is not None):
+                rows = _blow_rows(connection, None)
+                _replace(connection, DailyBlowFact.__table__, rows, None)
+                logger.info(f"📊 Built daily blow facts ({len(rows)} rows)")
+            return
+        has_history = (
+            connection.execute(select(Sale.bill_number).limit(1)).first() is not None
+            or connection.execute(select(Purchase.bill_number).limit(1)).first() is not None
+        )
+        if has_history:
+            written = rebuild_facts(connection)
+            logger.info(f"📊 Built daily facts ({written} rows)")
+
+
+# ===== Reading facts =====
+
+def _period_filter(column, start, end):
+    filters = []
+    if start is not None:
+        filters.append(column >= business_date(start))
+    if end is not None:
+        filters.append(column < business_date(end))
+    return filters
+
+
+def fact_totals(db: Session, start=None, end=None) -> Dict[str, float]:
+    """Sum of each daily_item_facts measure over the days in [start, end) (open-ended when None)"""
+    from app.models.facts import DailyItemFact
+
+    row = db.query(*[
+        func.coalesce(func.sum(getattr(DailyItemFact, measure)), 0).label(measure)
+        for measure in ITEM_MEASURES
+    ]).filter(*_period_filter(DailyItemFact.day, start, end)).one()
+    return {measure: float(getattr(row, measure) or 0) for measure in ITEM_MEASURES}
+
+
+def fact_totals_by_month(db: Session, start, end) -> Dict[Tuple[int, int], Dict[str, float]]:
+    """(year, month) -> measure sums over the days in [start, end), in one query"""
+    from app.models.facts import DailyItemFact
+
+    rows = db.query(DailyItemFact.day, *[
+        func.sum(getattr(DailyItemFact, measure)).label(measure) for measure in ITEM_MEASURES
+    ]).filter(*_period_filter(DailyItemFact.day, start, end)).group_by(DailyItemFact.day).all()
+    months: Dict[Tuple[int, int], Dict[str, float]] = defaultdict(lambda: {m: 0.0 for m in ITEM_MEASURES})
+    for row in rows:
+        day = business_date(row.day)
+        totals = months[(day.year, day.month)]
+        for measure in ITEM_MEASURES:
+            totals[measure] += float(getattr(row, measure) or 0)
+    return months
+
+
+def expenditure_total(db: Session, start=None, end=None) -> float:
+    """Extra expenditures over the days in [start, end)"""
+    from app.models.facts import DailyExpenditure
+
+    total = db.query(func.sum(DailyExpenditure.amount)).filter(
+        *_period_filter(DailyExpenditure.day, start, end)
+    ).scalar()
+    return float(total) if total else 0.0
+
+
+# ===== Incremental maintenance =====
+
+@lru_cache(maxsize=None)
+def _tracked() -> Dict[type, tuple]:
+    """model -> (attribute naming the dated row, dated column, its key column, fact kinds)"""
+    from app.models.transaction import (
+        Blow, ExtraExpenditure, Purchase, PurchaseLineItem, Sale, SaleLineItem, Waste,
+    )
+    return {
+        Sale: ("bill_number", Sale.date, Sale.bill_number, (ITEM_DAYS,)),
+        SaleLineItem: ("bill_number", Sale.date, Sale.bill_number, (ITEM_DAYS,)),
+        Purchase: ("bill_number", Purchase.date, Purchase.bill_number, (ITEM_DAYS,)),
+        PurchaseLineItem: ("bill_number", Purchase.date, Purchase.bill_number, (ITEM_DAYS,)),
+        Blow: ("id", Blow.date_time, Blow.id, (ITEM_DAYS, BLOW_DAYS)),
+        Waste: ("id", Waste.date, Waste.id, (ITEM_DAYS,)),
+        ExtraExpenditure: ("id", ExtraExpenditure.date, ExtraExpenditure.id, (EXPENSE_DAYS,)),
+    }
+
+
+def mark_days(session: Session, item_days: Iterable[date] = (), expense_days: Iterable[date] = (),
+              blow_days: Iterable[date] = ()):
+    """Have the next commit refresh these days (for writes the session events can't see)"""
+    session.info.setdefault(ITEM_DAYS, set()).update(business_date(d) for d in item_days)
+    session.info.setdefault(EXPENSE_DAYS, set()).update(business_date(d) for d in expense_days)
+    session.info.setdefault(BLOW_DAYS, set()).update(business_date(d) for d in blow_days)
+
+
+def _keys(obj, attribute) -> Set:
+    """Current and previous values of the attribute linking obj to its dated row"""
+    history = attributes.get_history(obj, attribute, passive=attributes.PASSIVE_NO_INITIALIZE)
+    return {key for key in (*history.added, *history.unchanged, *history.deleted) if key is not None}
+
+
+def _resolve(connection, pending: Dict[tuple, Set]) -> Dict[str, Set[date]]:
+    """Look up the stored day of every pending key"""
+    days: Dict[str, Set[date]] = defaultdict(set)
+    for (date_column, key_column, kinds), keys in pending.items():
+        keys = list(keys)
+        for i in range(0, len(keys), KEY_CHUNK):
+            query = select(date_column).where(key_column.in_(keys[i:i + KEY_CHUNK])).distinct()
+            found = {business_date(value) for value in connection.execute(query).scalars()}
+            for kind in kinds:
+                days[kind].update(found)
+    return days
+
+
+def _changes_facts(obj) -> bool:
+    changed = {attr.key for attr in inspect(obj).attrs if attr.history.has_changes()}
+    return bool(changed - UNRELATED_ATTRIBUTES)
+
+
+def _collect(session: Session, objects, edited=()) -> Dict[tuple, Set]:
+    """Pending keys of the tracked objects; edits (objects in edited) only when they change a fact"""
+    tracked = _tracked()
+    pending: Dict[tuple, Set] = defaultdict(set)
+    for obj in objects:
+        spec = tracked.get(type(obj))
+        if spec and (obj not in edited or _changes_facts(obj)):
+            attribute, date_column, key_column, kinds = spec
+            pending[(date_column, key_column, kinds)].update(_keys(obj, attribute))
+    return pending
+
+
+@event.listens_for(Session, "before_flush")
+def _remember_old_days(session, flush_context, instances):
+    # Rows about to change or disappear: their days as stored right now
+    dirty = session.dirty
+    pending = _collect(session, list(dirty) + list(session.deleted), edited=dirty)
+    if pending:
+        for kind, days in _resolve(session.connection(), pending).items():
+            session.info.setdefault(kind, set()).update(days)
+
+
+@event.listens_for(Session, "after_flush")
+def _remember_new_rows(session, flush_context):
+    # Rows written by this flush: their days are looked up at commit, once all flushes are done
+    dirty = session.dirty
+    pending = _collect(session, list(session.new) + list(dirty), edited=dirty)
+    if pending:
+        stored = session.info.setdefault(PENDING_KEYS, defaultdict(set))
+        for spec, keys in pending.items():
+            stored[spec].update(keys)
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_touched_days(session):
+    session.flush()  # commit would flush next anyway; the hooks above need to see it first
+    if not any(key in session.info for key in (*FACT_DAYS, PENDING_KEYS)):
+        return
+    connection = session.connection()
+    resolved = _resolve(connection, session.info.pop(PENDING_KEYS, {}))
+    item_days, expense_days, blow_days = (session.info.pop(kind, set()) | resolved[kind] for kind in FACT_DAYS)
+    refresh_at_commit("daily_facts", item_days | expense_days | blow_days,
+                      lambda: refresh_days(connection, item_days, expense_days, blow_days),
+                      "scripts/rebuild_daily_facts.py")
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_touched_days(session):
+    for key in (*FACT_DAYS, PENDING_KEYS):
+        session.info.pop(key, None)
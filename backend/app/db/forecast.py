@@ -0,0 +1,240 @@
+"""
+Demand forecasts and reorder points
+
+Daily demand of every item - units sold plus, for preforms, units blown -
+comes out of daily_item_facts (app/db/facts.py) as one items x days NumPy
+matrix, and every model is fitted to all items at once:
+
+    moving_average         mean of the last WINDOW days
+    exponential_smoothing  level updated by ALPHA of each day's demand
+    seasonal               the moving average shaped by the weekday profile of the last SEASON_WEEKS weeks
+
+Each item gets the model with the smallest mean absolute error on the last
+HOLDOUT days (fitted on the days before them), refitted on the whole
+history. The reorder point covers the forecast demand over the supplier
+lead time plus a safety stock for the service level:
+
+    reorder point = lead time demand + z(service level) * sigma * sqrt(lead time)
+
+with sigma the daily error of the chosen model on the holdout days.
+Forecasts are cached per parameters until the next stock movement. NumPy is
+imported on first use, so it stays out of the app's startup.
+"""
+
+from app.core.config import settings
+from app.core.metrics import record_cache_lookup
+from app.core.periods import business_date, business_today
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from statistics import NormalDist
+from typing import TYPE_CHECKING, List, Optional, Tuple
+import math
+import threading
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MODELS = ("moving_average", "exponential_smoothing", "seasonal")
+WINDOW = 28  # days the moving average looks back on
+ALPHA = 0.3  # weight of the latest day in exponential smoothing
+SEASON_WEEKS = 8  # weeks the weekday profile is measured on
+HOLDOUT = 28  # days the models are scored on
+MIN_HISTORY = 2 * HOLDOUT
+
+CACHE_SIZE = 32  # parameter combinations kept
+
+
+@dataclass(frozen=True)
+class ForecastQuery:
+    """Forecast and reorder parameters (HTTPException 400 when out of range)"""
+    horizon: int = 14  # days forecast
+    lead_time: int = settings.REORDER_LEAD_TIME_DAYS
+    service_level: float = settings.REORDER_SERVICE_LEVEL
+    history: int = settings.FORECAST_HISTORY_DAYS  # days of demand fitted
+    item_type: Optional[str] = None
+
+    def __post_init__(self):
+        if not 1 <= self.horizon <= 90:
+            raise HTTPException(status_code=400, detail="horizon must be between 1 and 90 days")
+        if not 0 <= self.lead_time <= 180:
+            raise HTTPException(status_code=400, detail="lead_time must be between 0 and 180 days")
+        if not 0.5 <= self.service_level < 1:
+            raise HTTPException(status_code=400, detail="service_level must be at least 0.5 and below 1")
+        if not MIN_HISTORY <= self.history <= 1095:
+            raise HTTPException(status_code=400, detail=f"history must be between {MIN_HISTORY} and 1095 days")
+
+    def header(self) -> dict:
+        return {"horizon": self.horizon, "lead_time": self.lead_time, "service_level": self.service_level,
+                "history_days": self.history, "item_type": self.item_type}
+
+
+# ===== Demand =====
+
+def demand_matrix(connection, item_ids: List[str], start: date, end: date) -> "np.ndarray":
+    """items x days (start included, end not) of units sold and blown, zero on days without any"""
+    import numpy as np
+    from app.models.facts import DailyItemFact
+
+    demand = np.zeros((len(item_ids), (end - start).days))
+    rows = {item_id: index for index, item_id in enumerate(item_ids)}
+    query = select(
+        DailyItemFact.day, DailyItemFact.item_id, DailyItemFact.qty_sold + DailyItemFact.qty_blow_input,
+    ).where(DailyItemFact.day >= start, DailyItemFact.day < end)
+    found = [(rows[item_id], (business_date(day) - start).days, quantity)
+             for day, item_id, quantity in connection.execute(query) if item_id in rows]
+    if found:
+        item_rows, day_columns, quantities = zip(*found)
+        np.add.at(demand, (np.array(item_rows), np.array(day_columns)), np.array(quantities, dtype=float))
+    return demand
+
+
+# ===== Models =====
+
+def _moving_average(demand: "np.ndarray", horizon: int) -> "np.ndarray":
+    import numpy as np
+
+    level = demand[:, -WINDOW:].mean(axis=1)
+    return np.repeat(level[:, None], horizon, axis=1)
+
+
+def _exponential_smoothing(demand: "np.ndarray", horizon: int) -> "np.ndarray":
+    import numpy as np
+
+    level = demand[:, :WINDOW].mean(axis=1)
+    for day in demand[:, WINDOW:].T:
+        level = ALPHA * day + (1 - ALPHA) * level
+    return np.repeat(level[:, None], horizon, axis=1)
+
+
+def _seasonal(demand: "np.ndarray", horizon: int, first_day: date) -> "np.ndarray":
+    """Moving average times each weekday's share of the recent weeks' demand"""
+    import numpy as np
+
+    days = min(demand.shape[1] // 7, SEASON_WEEKS) * 7
+    recent = demand[:, -days:]
+    # Weekday (Monday 0) of every recent column and of every forecast day
+    weekdays = (np.arange(-days, 0) + first_day.weekday()) % 7
+    ahead = (np.arange(horizon) + first_day.weekday()) % 7
+    by_weekday = np.stack([recent[:, weekdays == weekday].mean(axis=1) for weekday in range(7)], axis=1)
+    mean = recent.mean(axis=1, keepdims=True)
+    profile = np.divide(by_weekday, mean, out=np.ones_like(by_weekday), where=mean > 0)
+    return _moving_average(demand, horizon) * profile[:, ahead]
+
+
+def _forecasts(demand: "np.ndarray", horizon: int, first_day: date) -> "np.ndarray":
+    """models x items x days ahead, first_day being the day after the demand's last column"""
+    import numpy as np
+
+    return np.stack([
+        _moving_average(demand, horizon),
+        _exponential_smoothing(demand, horizon),
+        _seasonal(demand, horizon, first_day),
+    ])
+
+
+def fit(demand: "np.ndarray", first_day: date, horizon: int) -> "Tuple[np.ndarray, np.ndarray, np.ndarray]":
+    """(best model index, forecast items x horizon, daily error sigma) of every item
+
+    The models are scored on the last HOLDOUT columns after fitting the
+    columns before them, then the best one is refitted on every column.
+    """
+    import numpy as np
+
+    items = np.arange(demand.shape[0])
+    holdout = min(HOLDOUT, demand.shape[1] // 2)
+    backtest = _forecasts(demand[:, :-holdout], holdout, first_day - timedelta(days=holdout))
+    errors = backtest - demand[:, -holdout:]
+    best = np.abs(errors).mean(axis=2).argmin(axis=0)
+    forecast = _forecasts(demand, horizon, first_day)[best, items]
+    sigma = errors[best, items].std(axis=1)
+    return best, np.clip(forecast, 0, None), sigma
+
+
+# ===== Reorder points =====
+
+def forecast_items(connection, query: ForecastQuery, today: date) -> List[dict]:
+    """Every item (of the type) with its forecast, reorder point and status: 'out', 'reorder' or 'ok'"""
+    import numpy as np
+    from app.models.item import Item, Stock
+
+    statement = select(Item.id, Item.name, Item.type, Item.size, Item.grade, func.coalesce(Stock.quantity, 0)) \
+        .outerjoin(Stock, Stock.item_id == Item.id).order_by(Item.type, Item.size, Item.grade, Item.id)
+    if query.item_type:
+        statement = statement.where(Item.type == query.item_type)
+    items = connection.execute(statement).all()
+    if not items:
+        return []
+
+    start = today - timedelta(days=query.history)
+    demand = demand_matrix(connection, [item.id for item in items], start, today)
+    # Forecast from today on, far enough to cover the lead time as well
+    best, forecast, sigma = fit(demand, today, max(query.horizon, query.lead_time))
+    lead_demand = forecast[:, :query.lead_time].sum(axis=1)
+    safety = NormalDist().inv_cdf(query.service_level) * sigma * math.sqrt(query.lead_time)
+    reorder_points = np.ceil(lead_demand + safety)
+    horizon = forecast[:, :query.horizon]
+    daily = horizon.mean(axis=1)
+
+    rows = []
+    for index, (item_id, name, type_, size, grade, on_hand) in enumerate(items):
+        reorder_point, expected = int(reorder_points[index]), float(horizon[index].sum())
+        if on_hand <= 0 and expected > 0:
+            status = "out"
+        elif expected > 0 and on_hand <= reorder_point:
+            status = "reorder"
+        else:
+            status = "ok"
+        rows.append({
+            "item_id": item_id, "item_name": name, "type": type_, "size": size, "grade": grade,
+            "on_hand": on_hand,
+            "model": MODELS[best[index]],
+            "average_daily_demand": round(float(demand[index].mean()), 2),
+            "forecast": [round(float(value), 2) for value in horizon[index]],
+            "forecast_total": round(expected, 2),
+            "lead_time_demand": round(float(lead_demand[index]), 2),
+            "safety_stock": round(float(safety[index]), 2),
+            "reorder_point": reorder_point,
+            "days_of_cover": round(on_hand / float(daily[index]), 1) if daily[index] > 0 else None,
+            # Enough to get back over the reorder point and through the horizon
+            "suggested_order": max(0, math.ceil(reorder_point + expected - on_hand)) if status != "ok" else 0,
+            "status": status,
+        })
+    return rows
+
+
+# ===== Cache =====
+
+_lock = threading.Lock()
+_cache: "OrderedDict[tuple, Tuple[tuple, List[dict]]]" = OrderedDict()
+
+
+def stock_fingerprint(connection) -> tuple:
+    """Changes with every stock movement: the stocks table's row count, total and latest update"""
+    from app.models.item import Stock
+
+    return tuple(connection.execute(
+        select(func.count(), func.sum(Stock.quantity), func.max(Stock.last_updated))
+    ).one())
+
+
+def cached_forecast(connection, query: ForecastQuery, today: Optional[date] = None) -> List[dict]:
+    """forecast_items, computed again only once stock has moved (or the day has changed)"""
+    key = (query, today or business_today())
+    fingerprint = stock_fingerprint(connection)
+    with _lock:
+        entry = _cache.get(key)
+    hit = entry is not None and entry[0] == fingerprint
+    record_cache_lookup("forecast", hit)
+    if hit:
+        return entry[1]
+
+    rows = forecast_items(connection, query, key[1])
+    with _lock:
+        _cache[key] = (fingerprint, rows)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return rows
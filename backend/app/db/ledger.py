@@ -0,0 +1,148 @@
+"""
+Customer and supplier ledgers over any period
+
+One computation feeds the JSON, PDF and Excel ledgers:
+
+  - open_ledger() checks the party and carries its balance forward from
+    party_balances (app/db/balances.py) - the stored balance minus the bills
+    dated from the period start on, no scan of older history
+  - ledger_rows() streams the period's bills with the running balance
+    computed by the database as a window sum over (date, bill_number), read
+    in chunks of LEDGER_CHUNK rows
+
+A customer bill puts its paid part in credit and the unpaid part in debit, a
+supplier bill the other way round; the balance moves by credit - debit.
+Cancelled bills are listed with no amount.
+"""
+
+from app.core.periods import Period, business_date
+from app.db.balances import balance_before, bill_columns, settled_sql
+from dataclasses import dataclass
+from fastapi import HTTPException
+from sqlalchemy import case, func, literal, select
+from sqlalchemy.orm import Session
+from typing import Iterator, NamedTuple, Optional
+import datetime
+
+# Rows fetched from the cursor at a time while streaming a ledger
+LEDGER_CHUNK = 1000
+
+
+class LedgerRow(NamedTuple):
+    """One bill of the ledger - the fields of schemas.ledger.LedgerEntry"""
+    date: datetime.date
+    reference_number: str
+    description: str
+    debit: float
+    credit: float
+    balance: float
+    payment_status: str
+    transaction_type: str
+
+
+@dataclass
+class Ledger:
+    """Party, period and opening balance; totals fill in as ledger_rows() is consumed"""
+    party_type: str
+    party_id: str
+    party_name: str
+    period: Period
+    opening_balance: float
+    total_debit: float = 0.0
+    total_credit: float = 0.0
+    closing_balance: Optional[float] = None
+
+    def __post_init__(self):
+        if self.closing_balance is None:
+            self.closing_balance = self.opening_balance
+
+    def header(self) -> dict:
+        """The LedgerResponse fields other than the transactions and totals"""
+        return {
+            "party_id": self.party_id,
+            "party_name": self.party_name,
+            "party_type": self.party_type,
+            "month": self.period.month_number,
+            "year": self.period.year,
+            "period_start": self.period.start,
+            "period_end": self.period.last_day,
+            "period_label": self.period.label,
+            "opening_balance": self.opening_balance,
+        }
+
+    def totals(self) -> dict:
+        return {
+            "closing_balance": self.closing_balance,
+            "total_debit": round(self.total_debit, 2),
+            "total_credit": round(self.total_credit, 2),
+        }
+
+
+def open_ledger(db: Session, party_type: str, party_id: str, period: Period) -> Ledger:
+    """Ledger header of the party for the period (HTTPException 404 for an unknown party)"""
+    from app.models.party import Customer, Supplier
+
+    model = Customer if party_type == "customer" else Supplier
+    party = db.query(model.name).filter(model.id == party_id).first()
+    if not party:
+        raise HTTPException(status_code=404, detail=f"{party_type.capitalize()} not found")
+
+    before = balance_before(db, party_type, party_id, period)
+    if party_type == "customer":
+        opening = before["paid"] - before["outstanding"]
+    else:
+        opening = before["outstanding"] - before["paid"]
+    return Ledger(party_type, party_id, party.name, period, round(opening, 2))
+
+
+def ledger_statement(party_type: str, party_id: str, period: Period):
+    """SELECT of the period's bills with debit, credit and the running credit - debit"""
+    model, party_column, total_column = bill_columns()[party_type]
+    cancelled = func.coalesce(model.status, "") == "cancelled"
+    total = func.coalesce(total_column, 0)
+    paid = case((cancelled, literal(0)), else_=settled_sql(model, total_column))
+    unpaid = case((cancelled, literal(0)), else_=total - settled_sql(model, total_column))
+    debit, credit = (unpaid, paid) if party_type == "customer" else (paid, unpaid)
+
+    return select(
+        model.bill_number,
+        model.date,
+        model.payment_status,
+        debit.label("debit"),
+        credit.label("credit"),
+        func.sum(credit - debit).over(order_by=(model.date, model.bill_number)).label("movement"),
+    ).where(
+        party_column == party_id,
+        period.filter(model.date),
+    ).order_by(model.date, model.bill_number)
+
+
+def ledger_rows(bind, ledger: Ledger) -> Iterator[LedgerRow]:
+    """Stream the ledger's bills on a connection of its own, updating ledger's totals
+
+    Takes the engine (db.get_bind()) rather than the request session so the
+    rows can be read while the response streams, after the request's
+    dependencies are done.
+    """
+    transaction_type = "sale" if ledger.party_type == "customer" else "purchase"
+    label = "Sale" if ledger.party_type == "customer" else "Purchase"
+    statement = ledger_statement(ledger.party_type, ledger.party_id, ledger.period)
+
+    with bind.connect() as connection:
+        result = connection.execution_options(yield_per=LEDGER_CHUNK).execute(statement)
+        for row in result:
+            debit, credit = float(row.debit or 0), float(row.credit or 0)
+            balance = round(ledger.opening_balance + float(row.movement or 0), 2)
+            ledger.total_debit += debit
+            ledger.total_credit += credit
+            ledger.closing_balance = balance
+            yield LedgerRow(
+                date=business_date(row.date),
+                reference_number=row.bill_number,
+                description=f"{label} #{row.bill_number}",
+                debit=debit,
+                credit=credit,
+                balance=balance,
+                payment_status=row.payment_status or "pending",
+                transaction_type=transaction_type,
+            )
@@ -0,0 +1,58 @@
+"""
+Shared plumbing of the tables kept current at commit
+
+The daily facts (app/db/facts.py), party balances (app/db/balances.py) and
+stock alerts (app/db/alerts.py) recompute their rows for the keys a
+transaction touched - days, parties, items - just before it commits.
+
+lock_keys() serialises two transactions recomputing the same key: each
+takes a transaction-scoped Postgres advisory lock per key, so the second
+one waits for the first to commit and then recomputes from rows that
+include it, instead of both deleting and re-inserting the same rows and one
+failing on the primary key. Locks are taken in one statement, ordered by
+lock id, so two commits never wait on each other crosswise; callers take
+them in the order facts, balances, alerts (the order their hooks run in).
+SQLite serialises writers by itself, so there it does nothing.
+
+refresh_at_commit() runs a refresh from a before_commit hook. A failure is
+logged, counted and raised: the commit fails and the write is rolled back
+with it, rather than committed with a rollup that silently misses it. The
+tables exist before the app serves anything (app/db/migrate.py), so a
+failure here is a real bug or an outage, never a missing migration.
+"""
+
+from app.core.metrics import record_refresh_failure
+from sqlalchemy import text
+from typing import Callable, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock namespaces (the first key of pg_advisory_xact_lock(int, int))
+FACTS_LOCK = 1
+BALANCES_LOCK = 2
+ALERTS_LOCK = 3
+
+_LOCK = text(
+    "SELECT pg_advisory_xact_lock(:namespace, hashtext(key)) "
+    "FROM unnest(CAST(:keys AS text[])) AS key ORDER BY hashtext(key)"
+)
+
+
+def lock_keys(connection, namespace: int, keys: Iterable[str]):
+    """Hold a lock on each key until the transaction ends (Postgres only)"""
+    keys = sorted(set(keys))
+    if keys and connection.dialect.name == "postgresql":
+        connection.execute(_LOCK, {"namespace": namespace, "keys": keys})
+
+
+def refresh_at_commit(table: str, keys: Iterable, refresh: Callable[[], object], repair: Optional[str] = None):
+    """Run the refresh; on failure log which keys it was for (and the repair script), then raise"""
+    try:
+        refresh()
+    except Exception as e:
+        record_refresh_failure(table)
+        hint = f"; if this persists run {repair}" if repair else ""
+        logger.error(f"❌ {table} not refreshed for {sorted(map(str, keys))}: {e} "
+                     f"- the transaction is rolled back{hint}")
+        raise
@@ -0,0 +1,190 @@
+"""
+Margin analytics: revenue, COGS and margin of sale lines grouped any way
+
+One statement over sale_line_items joined to sales and items groups the
+period's lines by the chosen dimensions (customer, item, type, size, grade,
+day, week, month) and measures each group:
+
+    revenue      sum(total_price)              - blow price included
+    cogs         sum(cost_basis * quantity)    - what the units cost (FIFO or average)
+    blow_revenue sum(blow_price * quantity)
+    margin       revenue - cogs
+
+With rollup the groups come with a subtotal for every prefix of the
+dimensions (ROLLUP), otherwise only the full grouping and the grand total
+(GROUPING SETS). Postgres computes them in one pass; databases without
+grouping sets (SQLite) get the same rows from a UNION ALL of one GROUP BY per
+level. top keeps the best N rows under each parent row, ranked in the same
+statement, and filters on dimension values drill down into one branch.
+"""
+
+from app.core.periods import Period, business_date, business_day
+from dataclasses import dataclass, field
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import Date, Integer, case, cast, func, literal, or_, select, tuple_, union_all
+from typing import Dict, List, Optional, Tuple
+
+DIMENSIONS = ("customer", "item", "type", "size", "grade", "day", "week", "month")
+PERIOD_DIMENSIONS = ("day", "week", "month")
+MEASURES = ("quantity", "revenue", "cogs", "blow_revenue", "margin")
+
+# Lines without a cost_basis count in revenue but not in COGS; their units are reported per row
+UNCOSTED = "uncosted_quantity"
+
+
+@dataclass
+class MarginQuery:
+    """What to group the period's sale lines by, and which rows to keep"""
+    period: Period
+    group_by: Tuple[str, ...]
+    rollup: bool = True
+    filters: Dict[str, str] = field(default_factory=dict)  # dimension -> value: drill down into one branch
+    order_by: str = "margin"
+    top: Optional[int] = None  # best rows per parent row
+
+    def __post_init__(self):
+        unknown = [name for name in (*self.group_by, *self.filters) if name not in DIMENSIONS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown dimension(s): {', '.join(unknown)}")
+        if len(set(self.group_by)) != len(self.group_by):
+            raise HTTPException(status_code=400, detail="A dimension can only be grouped by once")
+        if self.order_by not in MEASURES:
+            raise HTTPException(status_code=400, detail=f"order_by must be one of: {', '.join(MEASURES)}")
+        if self.top is not None and self.top < 1:
+            raise HTTPException(status_code=400, detail="top must be at least 1")
+
+    def header(self) -> dict:
+        return {
+            "period": self.period.as_dict(),
+            "group_by": list(self.group_by),
+            "rollup": self.rollup,
+            "filters": self.filters,
+            "order_by": self.order_by,
+            "top": self.top,
+        }
+
+
+def _dimension(name: str, dialect: str):
+    from app.models.item import Item
+    from app.models.transaction import Sale, SaleLineItem
+
+    if name == "customer":
+        return Sale.customer_id
+    if name == "item":
+        return SaleLineItem.item_id
+    if name in ("type", "size", "grade"):
+        return getattr(Item, name)
+    day = business_day(Sale.date)
+    if name == "day":
+        return day
+    if dialect == "postgresql":
+        return cast(func.date_trunc(name, day), Date)
+    # SQLite: Monday of the week, first of the month
+    return func.date(day, "weekday 0", "-6 days") if name == "week" else func.date(day, "start of month")
+
+
+def margin_statement(query: MarginQuery, dialect: str):
+    """SELECT of dims, grouped_<dim> flags (1 where a subtotal rolls the dimension up), level and measures"""
+    from app.models.item import Item
+    from app.models.transaction import Sale, SaleLineItem
+
+    dims = {name: _dimension(name, dialect) for name in DIMENSIONS}
+    sums = (*MEASURES[:4], UNCOSTED)  # margin is worked out from revenue and cogs
+    lines = {
+        "quantity": SaleLineItem.quantity,
+        "revenue": SaleLineItem.total_price,
+        "cogs": SaleLineItem.cost_basis * SaleLineItem.quantity,
+        "blow_revenue": func.coalesce(SaleLineItem.blow_price, 0) * SaleLineItem.quantity,
+        UNCOSTED: case((SaleLineItem.cost_basis.is_(None), SaleLineItem.quantity), else_=0),
+    }
+
+    def grouped(select_):
+        select_ = select_.select_from(SaleLineItem).join(Sale, Sale.bill_number == SaleLineItem.bill_number)
+        if {"type", "size", "grade"} & {*query.group_by, *query.filters}:
+            select_ = select_.join(Item, Item.id == SaleLineItem.item_id)
+        return select_.where(
+            query.period.filter(Sale.date),
+            *[dims[name] == value for name, value in query.filters.items()],
+        )
+
+    group_by = list(query.group_by)
+    # Every prefix of the dimensions (ROLLUP), or the full grouping and the grand total
+    levels = [group_by[:size] for size in range(len(group_by), -1, -1)] if query.rollup else [group_by, []]
+    if not group_by:
+        levels = [[]]
+
+    if dialect == "postgresql":
+        columns = [dims[name].label(name) for name in group_by]
+        flags = [func.grouping(dims[name]).label(f"grouped_{name}") for name in group_by]
+        measures = [func.sum(lines[name]).label(name) for name in sums]
+        statement = grouped(select(*columns, *flags, *measures))
+        if group_by:
+            sets = func.rollup(*[dims[name] for name in group_by]) if query.rollup else func.grouping_sets(
+                tuple_(*[dims[name] for name in group_by]), tuple_(),
+            )
+            statement = statement.group_by(sets)
+        cube = statement.subquery("cube")
+    else:
+        parts = []
+        for level in levels:
+            columns = [
+                (dims[name] if name in level else literal(None)).label(name) for name in group_by
+            ]
+            flags = [literal(0 if name in level else 1, Integer).label(f"grouped_{name}") for name in group_by]
+            measures = [func.sum(lines[name]).label(name) for name in sums]
+            part = grouped(select(*columns, *flags, *measures))
+            if level:
+                part = part.group_by(*[dims[name] for name in level])
+            parts.append(part)
+        cube = (union_all(*parts) if len(parts) > 1 else parts[0]).subquery("cube")
+
+    level = sum((1 - cube.c[f"grouped_{name}"] for name in group_by), literal(0, Integer))
+    margin = (func.coalesce(cube.c.revenue, 0) - func.coalesce(cube.c.cogs, 0))
+    measure = margin if query.order_by == "margin" else func.coalesce(cube.c[query.order_by], 0)
+    # Rows under the same parent: the same level and the same values of the dimensions above them
+    parent = [
+        case((cube.c[f"grouped_{group_by[index + 1]}"] == 0, cube.c[name]), else_=None).label(f"parent_{index}")
+        for index, name in enumerate(group_by[:-1])
+    ] if query.rollup else []
+    rank = func.row_number().over(
+        partition_by=[level, *parent], order_by=[measure.desc(), *[cube.c[name] for name in group_by]],
+    )
+    ranked = select(
+        *[cube.c[name] for name in group_by], level.label("level"),
+        cube.c.quantity, cube.c.revenue, cube.c.cogs, cube.c.blow_revenue, margin.label("margin"), cube.c[UNCOSTED],
+        *parent, rank.label("rank"),
+    ).subquery("ranked")
+
+    statement = select(ranked)
+    if query.top:
+        statement = statement.where(or_(ranked.c.level == 0, ranked.c.rank <= query.top))
+    return statement.order_by(ranked.c.level, *[ranked.c[column.name] for column in parent], ranked.c.rank)
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
+def margin_rows(connection, query: MarginQuery, names: Dict[str, Dict[str, str]]) -> List[dict]:
+    """The grouped rows, grand total first, then each level ranked; names: dimension -> {id: name}"""
+    rows = []
+    for row in connection.execute(margin_statement(query, connection.dialect.name)):
+        entry = {"level": row.level}
+        for name in query.group_by:
+            value = getattr(row, name)
+            entry[name] = business_date(value) if name in PERIOD_DIMENSIONS else value
+            if name in names:
+                entry[f"{name}_name"] = names[name].get(value) if value is not None else None
+        revenue, margin = _money(row.revenue), _money(row.margin)
+        entry.update(
+            quantity=int(row.quantity or 0),
+            revenue=revenue,
+            cogs=_money(row.cogs),
+            blow_revenue=_money(row.blow_revenue),
+            margin=margin,
+            margin_pct=round(float(margin / revenue * 100), 2) if revenue else None,
+            uncosted_quantity=int(getattr(row, UNCOSTED) or 0),
+        )
+        rows.append(entry)
+    return rows
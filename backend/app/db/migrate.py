@@ -0,0 +1,80 @@
+"""
+Database preparation, run before the app serves any request
+
+Creates the tables that are missing and builds the maintained tables from
+the history the first time they exist (daily facts, party balances, and the
+item costs or FIFO cost layers of the configured COSTING_METHOD, rebuilt
+when it changes). Each step is a no-op once its table is filled, so
+a normal start costs a few existence checks.
+
+main.py runs it from the lifespan before the server starts listening when
+MIGRATE_ON_STARTUP is on, and a failure stops the startup: the write hooks
+keep these tables current at commit and can't work without them. With it
+off, run scripts/migrate.py as the release step instead.
+
+Several workers starting at once take turns on a Postgres advisory lock, so
+only the first one builds anything.
+"""
+
+from typing import Callable, Dict, List, Tuple
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK = 4_721_906  # pg_advisory_lock key held while preparing
+
+
+def create_tables(engine):
+    from app import models  # noqa: F401 - register every table on Base.metadata
+    from app.db.database import Base
+    Base.metadata.create_all(bind=engine)
+
+
+def build_daily_facts(engine):
+    from app.db.facts import ensure_daily_facts
+    ensure_daily_facts(engine)
+
+
+def build_party_balances(engine):
+    from app.db.balances import ensure_party_balances
+    ensure_party_balances(engine)
+
+
+def build_costing(engine):
+    from app.db.costing import ensure_costing
+    ensure_costing(engine)
+
+
+MIGRATION_STEPS: List[Tuple[str, Callable]] = [
+    ("tables", create_tables),
+    ("daily_facts", build_daily_facts),
+    ("party_balances", build_party_balances),
+    ("costing", build_costing),
+]
+
+
+def migrate(engine=None) -> Dict[str, float]:
+    """Run every step in order; step -> ms. Raises on the first failure"""
+    if engine is None:
+        from app.db.database import engine
+
+    timings = {}
+    with engine.connect() as lock:
+        if engine.dialect.name == "postgresql":
+            lock.exec_driver_sql(f"SELECT pg_advisory_lock({MIGRATION_LOCK})")
+        try:
+            for name, step in MIGRATION_STEPS:
+                start = time.perf_counter()
+                try:
+                    step(engine)
+                except Exception as e:
+                    logger.error(f"❌ Database preparation step '{name}' failed: {e}")
+                    raise
+                timings[name] = round((time.perf_counter() - start) * 1000, 1)
+        finally:
+            if engine.dialect.name == "postgresql":
+                lock.exec_driver_sql(f"SELECT pg_advisory_unlock({MIGRATION_LOCK})")
+                lock.commit()
+    logger.info("🗄️ Database ready: " + ", ".join(f"{name}={ms}ms" for name, ms in timings.items()))
+    return timings
@@ -0,0 +1,312 @@
+"""
+Bill payments: what was paid against each sale and purchase
+
+paid_amount and payment_status of a bill are kept consistent on every write,
+in the transaction that makes it, so nothing ever has to repair them on a
+read path:
+
+  - a 'paid' bill has paid_amount equal to its total, a 'pending' one has
+    nothing paid, and a 'partial' one something in between
+  - ORM edits are settled before each flush: setting payment_status moves
+    paid_amount with it, setting paid_amount or changing the bill's total
+    decides payment_status; every change of paid_amount is written to
+    payments with its difference. A write that would need a recorded amount
+    cut down (over the total, 'partial' on a bill paid in full) is rejected
+    with PaymentError, which the API answers with a 400
+  - record_payments() and settle_bills() pay many bills at once with a few
+    set-based statements (lock, insert the payments, update the bills)
+
+repair_payments() brings older rows in line once (scripts/repair_payments.py):
+paid bills saved without a paid_amount, amounts that don't match the status,
+and amounts set before their payments were recorded.
+
+Writes here bypass the unit of work, so they mark the touched parties for a
+party balance refresh (app/db/balances.py) at commit.
+"""
+
+from app.db.balances import bill_columns, mark_parties
+from decimal import Decimal
+from fastapi import HTTPException
+from functools import lru_cache
+from sqlalchemy import and_, bindparam, case, event, func, insert, inspect, literal, or_, select, update
+from sqlalchemy.orm import Session, attributes
+from typing import Dict, Iterable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+BILL_TYPES = ("sale", "purchase")
+
+ZERO = Decimal("0.00")
+
+
+class PaymentError(ValueError):
+    """A bill write that can't be settled without cutting a recorded amount down"""
+
+
+@lru_cache(maxsize=None)
+def bill_tables() -> Dict[str, tuple]:
+    """bill type -> (bill model, party column, total column, party type)"""
+    columns = bill_columns()
+    return {
+        "sale": (*columns["customer"], "customer"),
+        "purchase": (*columns["supplier"], "supplier"),
+    }
+
+
+def payment_status_for(paid: Decimal, total: Decimal) -> str:
+    """The status an amount paid gives a bill"""
+    if total > 0 and paid >= total:
+        return "paid"
+    return "partial" if paid > 0 else "pending"
+
+
+def _mark(session: Session, party_type: str, party_ids: Iterable[Optional[str]]):
+    if party_type == "customer":
+        mark_parties(session, customers=party_ids)
+    else:
+        mark_parties(session, suppliers=party_ids)
+
+
+# ===== Paying bills =====
+
+def _open_bills(db: Session, bill_type: str, bill_numbers: List[str]) -> Dict[str, tuple]:
+    """bill_number -> (party id, total, paid) of the non-cancelled bills, locked until commit"""
+    model, party_column, total_column, _ = bill_tables()[bill_type]
+    rows = db.execute(
+        select(
+            model.bill_number,
+            party_column,
+            func.coalesce(total_column, 0),
+            func.coalesce(model.paid_amount, 0),
+        ).where(
+            model.bill_number.in_(bill_numbers),
+            func.coalesce(model.status, "") != "cancelled",
+        ).with_for_update()
+    ).all()
+    return {bill_number: (party_id, Decimal(total), Decimal(paid)) for bill_number, party_id, total, paid in rows}
+
+
+def _apply(db: Session, bill_type: str, bills: Dict[str, tuple], amounts: Dict[str, Decimal],
+           method: Optional[str], notes: Optional[str], user_id: Optional[str]):
+    """Insert the payments and add them to the bills: one INSERT and one batched UPDATE"""
+    from app.models.transaction import Payment
+
+    if not amounts:
+        return
+    model, _, total_column, party_type = bill_tables()[bill_type]
+    db.execute(insert(Payment), [
+        {"bill_type": bill_type, "bill_number": bill_number, "amount": amount, "method": method,
+         "notes": notes, "recorded_by": user_id}
+        for bill_number, amount in amounts.items()
+    ])
+
+    # On the table, not the model: a list of parameters is then a plain executemany
+    table = model.__table__
+    paid = func.coalesce(table.c.paid_amount, 0) + bindparam("added")
+    total = func.coalesce(table.c[total_column.key], 0)
+    db.execute(
+        update(table)
+        .where(table.c.bill_number == bindparam("bill"))
+        .values(
+            paid_amount=paid,
+            payment_status=case((and_(total > 0, paid >= total), literal("paid")), else_=literal("partial")),
+        ),
+        [{"bill": bill_number, "added": amount} for bill_number, amount in amounts.items()],
+    )
+    _mark(db, party_type, (bills[bill_number][0] for bill_number in amounts))
+    # Loaded bills would still show the old amounts
+    db.expire_all()
+
+
+def record_payments(db: Session, bill_type: str, amounts: Dict[str, Decimal], user_id: Optional[str] = None,
+                    method: Optional[str] = None, notes: Optional[str] = None) -> Dict:
+    """Pay the given amount on each bill (HTTPException 404/400 for unknown bills and overpayments)"""
+    bills = _open_bills(db, bill_type, list(amounts))
+    for bill_number, amount in amounts.items():
+        if bill_number not in bills:
+            raise HTTPException(status_code=404, detail=f"{bill_type.capitalize()} {bill_number} not found")
+        _, total, paid = bills[bill_number]
+        if amount <= 0 or amount > total - paid:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Payment for {bill_number} must be between 0 and {total - paid:.2f}",
+            )
+    _apply(db, bill_type, bills, amounts, method, notes, user_id)
+    return {"bill_type": bill_type, "paid": len(amounts), "amount": float(sum(amounts.values(), ZERO))}
+
+
+def settle_bills(db: Session, bill_type: str, bill_numbers: List[str], user_id: Optional[str] = None,
+                 method: Optional[str] = None, notes: Optional[str] = None) -> Dict:
+    """Mark the bills paid in full, paying what each still owes; returns the counts and {bill: reason} skipped"""
+    bill_numbers = list(dict.fromkeys(bill_numbers))
+    bills = _open_bills(db, bill_type, bill_numbers)
+    amounts = {
+        bill_number: total - paid
+        for bill_number, (_, total, paid) in bills.items()
+        if total - paid > 0
+    }
+    skipped = {
+        bill_number: "not found or cancelled" if bill_number not in bills else "already paid"
+        for bill_number in bill_numbers if bill_number not in amounts
+    }
+    _apply(db, bill_type, bills, amounts, method, notes or "Marked paid", user_id)
+    return {
+        "bill_type": bill_type,
+        "paid": len(amounts),
+        "amount": float(sum(amounts.values(), ZERO)),
+        "skipped": skipped,
+    }
+
+
+# ===== Repair =====
+
+def _unsettled(db: Session, bill_type: str) -> List[tuple]:
+    """(bill number, party, total, paid_amount, status) of the bills whose amount and status disagree, locked"""
+    model, party_column, total_column, _ = bill_tables()[bill_type]
+    total = func.coalesce(total_column, 0)
+    paid = func.coalesce(model.paid_amount, 0)
+    return db.execute(
+        select(model.bill_number, party_column, total, model.paid_amount, model.payment_status)
+        .where(or_(
+            and_(model.payment_status == "paid", or_(model.paid_amount.is_(None), model.paid_amount != total)),
+            and_(model.payment_status != "paid", total > 0, paid >= total),
+            and_(model.payment_status == "pending", paid > 0),
+            model.paid_amount.is_(None),
+        ))
+        .with_for_update()
+    ).all()
+
+
+def _unrecorded(db: Session, bill_type: str) -> List[tuple]:
+    """(bill number, paid_amount - sum of its payments) of the bills whose payments don't add up"""
+    from app.models.transaction import Payment
+
+    model = bill_tables()[bill_type][0]
+    recorded = select(Payment.bill_number, func.sum(Payment.amount).label("amount")) \
+        .where(Payment.bill_type == bill_type).group_by(Payment.bill_number).subquery()
+    difference = func.coalesce(model.paid_amount, 0) - func.coalesce(recorded.c.amount, 0)
+    return db.execute(
+        select(model.bill_number, difference)
+        .outerjoin(recorded, recorded.c.bill_number == model.bill_number)
+        .where(difference != 0)
+    ).all()
+
+
+def repair_payments(db: Session) -> Dict[str, int]:
+    """Bring older bills in line; bill type -> bills fixed
+
+    Bills whose paid_amount and payment_status disagree (paid bills saved
+    without an amount, amounts that don't match the status) are settled the
+    way the ORM hook would, then every bill whose payments don't add up to
+    its paid_amount - amounts set before payments were recorded - gets one
+    payment for the difference. Run once for old data
+    (scripts/repair_payments.py); the write paths keep bills in line after.
+    """
+    from app.models.transaction import Payment
+
+    fixed = {}
+    for bill_type, (model, _, _, party_type) in bill_tables().items():
+        settled = []
+        for bill_number, party_id, total, paid, status in _unsettled(db, bill_type):
+            total, paid = Decimal(total), Decimal(paid or 0)
+            if status == "paid" or (total > 0 and paid >= total):
+                paid, status = total, "paid"
+            elif paid > 0:
+                status = "partial"
+            settled.append({"bill": bill_number, "new_paid": paid, "new_status": status, "party": party_id})
+        if settled:
+            table = model.__table__
+            db.execute(
+                update(table).where(table.c.bill_number == bindparam("bill"))
+                .values(paid_amount=bindparam("new_paid"), payment_status=bindparam("new_status")),
+                settled,
+            )
+
+        unrecorded = _unrecorded(db, bill_type)
+        if unrecorded:
+            db.execute(insert(Payment), [
+                {"bill_type": bill_type, "bill_number": bill_number, "amount": amount,
+                 "notes": "Paid before payments were recorded"}
+                for bill_number, amount in unrecorded
+            ])
+        _mark(db, party_type, {row["party"] for row in settled})
+        fixed[bill_type] = len({row["bill"] for row in settled} | {bill_number for bill_number, _ in unrecorded})
+    # Loaded bills would still show the old amounts
+    db.expire_all()
+    return fixed
+
+
+# ===== ORM writes =====
+
+def _settle(bill, total: Decimal) -> Decimal:
+    """Bring a bill's paid_amount and payment_status in line; returns the change of paid_amount
+
+    A set amount decides the status, a set status moves the amount, and a
+    changed total re-derives the status from the amount already paid; a
+    'partial' status goes by the amount too, so one with nothing paid is
+    pending. An amount over the total, or 'partial' on a bill its recorded
+    amount already covers, is rejected (PaymentError) rather than cut down.
+    """
+    state = inspect(bill)
+    amount_history = attributes.get_history(bill, "paid_amount")
+    before = Decimal(amount_history.deleted[0] or 0) if amount_history.deleted else (
+        ZERO if state.pending else Decimal(bill.paid_amount or 0)
+    )
+    paid = Decimal(bill.paid_amount or 0)
+    status = bill.payment_status or "pending"
+    if paid < 0:
+        raise PaymentError(f"Paid amount of {bill.bill_number} can't be negative")
+
+    amount_set = amount_history.has_changes() and (not state.pending or paid > 0)
+    status_set = attributes.get_history(bill, "payment_status").has_changes() or state.pending
+    # Rows saved before paid_amount was kept (None) go by their status as well
+    if not amount_set and (status_set or bill.paid_amount is None):
+        if status == "paid":
+            paid = total
+        elif status == "pending":
+            paid = ZERO
+        elif paid > 0 and paid >= total:
+            raise PaymentError(
+                f"{bill.bill_number} has {paid:.2f} paid of {total:.2f} - "
+                f"set paid_amount below the total to mark it partial"
+            )
+        else:
+            status = payment_status_for(paid, total)
+    else:
+        status = payment_status_for(paid, total)
+    if paid > max(total, ZERO):
+        raise PaymentError(
+            f"{bill.bill_number} would have {paid:.2f} paid of a {total:.2f} total - record a refund first"
+        )
+
+    if bill.paid_amount is None or Decimal(bill.paid_amount) != paid:
+        bill.paid_amount = paid
+    if bill.payment_status != status:
+        bill.payment_status = status
+    return paid - before
+
+
+@event.listens_for(Session, "before_flush")
+def _settle_bills(session, flush_context, instances):
+    from app.models.transaction import Payment
+
+    tables = {model: (bill_type, total_column.key) for bill_type, (model, _, total_column, _) in bill_tables().items()}
+    for bill in (*session.new, *session.dirty):
+        spec = tables.get(type(bill))
+        if not spec:
+            continue
+        bill_type, total_attribute = spec
+        history = [attributes.get_history(bill, name) for name in ("paid_amount", "payment_status", total_attribute)]
+        if bill in session.dirty and not any(h.has_changes() for h in history):
+            continue
+        change = _settle(bill, Decimal(getattr(bill, total_attribute) or 0))
+        if change:
+            session.add(Payment(
+                bill_type=bill_type,
+                bill_number=bill.bill_number,
+                amount=change,
+                method=getattr(bill, "payment_method", None),
+                notes=f"Payment status set to {bill.payment_status}",
+                recorded_by=bill.created_by if bill in session.new else None,
+            ))
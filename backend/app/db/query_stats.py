@@ -0,0 +1,127 @@
+"""
+Per-request database statistics
+Counts SQL statements, statement time and pool checkout waits for the request being served
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from sqlalchemy import event
+import re
+import time
+
+
+@dataclass
+class QueryStats:
+    """Database activity accumulated while serving one request"""
+    statements: int = 0
+    duration: float = 0.0  # seconds spent executing statements
+    pool_checkouts: int = 0
+    pool_wait: float = 0.0  # seconds spent waiting for a pooled connection
+    # SQL text -> executions; statements are parametrized, so repeats of the
+    # same text are the same query run for different rows (N+1 pattern)
+    repeats: Counter = field(default_factory=Counter)
+
+    def max_repeats(self) -> int:
+        return max(self.repeats.values(), default=0)
+
+    def worst_repeats(self, limit: int = 3) -> List[Tuple[str, int]]:
+        """Most repeated statements as (fingerprint, count), repeats only"""
+        return [(fingerprint(sql), n) for sql, n in self.repeats.most_common(limit) if n > 1]
+
+
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"%\(\w+\)s|\?|:\w+|\$\d+|__\[POSTCOMPILE_\w+\]")
+_IN_LIST = re.compile(r"IN \((?:\?,\s*)*\?\)", re.IGNORECASE)
+
+
+def fingerprint(sql: str, max_length: int = 300) -> str:
+    """Normalise SQL so that the same query shape compares equal in logs"""
+    text = _WHITESPACE.sub(" ", sql).strip()
+    text = _STRING_LITERAL.sub("?", text)
+    text = _PARAMETER.sub("?", text)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _IN_LIST.sub("IN (?)", text)
+    return text if len(text) <= max_length else text[:max_length] + "..."
+
+
+@contextmanager
+def track_queries(reuse: bool = False):
+    """Collect statement counts for everything executed inside the block.
+
+    The stats object is shared by reference, so work done in threadpool
+    dependencies (which copy the context) is still counted. With
+    ``reuse=True`` an already active collector is reused instead of being
+    shadowed, so stacked middlewares see the same numbers.
+    """
+    active = current_query_stats.get()
+    if reuse and active is not None:
+        yield active
+        return
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_query_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's execution context, not on the connection: a statement that
+    # raises never reaches after_cursor_execute, and its start time must not outlive it
+    context._query_stats_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_stats_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.duration += elapsed
+        stats.repeats[statement] += 1
+
+
+def instrument_engine(engine):
+    """Attach the statement counters to an engine (safe to call once per engine)"""
+    if getattr(engine, "_query_stats_instrumented", False):
+        return engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    engine._query_stats_instrumented = True
+    return engine
+
+
+def record_pool_wait(seconds: float):
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.pool_checkouts += 1
+        stats.pool_wait += seconds
+
+
+def timed_pool(pool_cls):
+    """Return a subclass of ``pool_cls`` that records how long each checkout waited.
+
+    With NullPool this is the cost of opening a fresh connection; with
+    QueuePool it is the time spent blocked on an exhausted pool.
+    """
+    class TimedPool(pool_cls):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                record_pool_wait(time.perf_counter() - start)
+
+    TimedPool.__name__ = f"Timed{pool_cls.__name__}"
+    TimedPool.__qualname__ = TimedPool.__name__
+    return TimedPool
@@ -0,0 +1,170 @@
+"""
+Read-replica routing for the read-heavy endpoints (reports, dashboard, stock statements)
+
+get_read_db (app/db/database.py) asks the router which engine to use:
+  - no READ_DATABASE_URL              -> primary
+  - the caller wrote recently         -> primary (read-your-writes pin)
+  - replica unreachable               -> primary, or 503 with READ_REPLICA_FALLBACK=false
+  - replica lag > READ_REPLICA_MAX_LAG -> primary, or the stale replica without fallback
+  - otherwise                         -> replica
+
+Callers are identified by their bearer token. A commit that changed rows
+pins that caller to the primary for READ_YOUR_WRITES_SECONDS, long enough
+for the replica to replay the write. Pins are per process, so with several
+instances the window should cover normal replication lag rather than rely on
+sticky routing.
+"""
+
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind the primary. Zero when it has replayed
+# everything it received, so an idle primary doesn't look like lag.
+POSTGRES_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+PRIMARY = "primary"
+REPLICA = "replica"
+
+
+class ReplicaUnavailable(Exception):
+    """Replica is down or lagging and falling back to the primary is disabled"""
+
+
+def client_key(request) -> Optional[str]:
+    """Stable key for the caller (hash of the bearer token), None when anonymous"""
+    if request is None:
+        return None
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    return hashlib.blake2b(authorization.encode(), digest_size=12).hexdigest()
+
+
+class ReadRouter:
+    def __init__(self):
+        self.read_engine = None
+        self.max_lag = 5.0
+        self.fallback = True
+        self.pin_seconds = 15.0
+        self.check_interval = 2.0
+        self._pins: Dict[str, float] = {}
+        self._lag: Optional[float] = None  # None = unknown / unreachable
+        self._checked_at = float("-inf")
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def configure(self, read_engine, max_lag: float = 5.0, fallback: bool = True,
+                  pin_seconds: float = 15.0, check_interval: float = 2.0):
+        self.read_engine = read_engine
+        self.max_lag = max_lag
+        self.fallback = fallback
+        self.pin_seconds = pin_seconds
+        self.check_interval = check_interval
+        self._lag = None
+        self._checked_at = float("-inf")
+        self._pins.clear()
+
+    @property
+    def enabled(self) -> bool:
+        return self.read_engine is not None
+
+    @property
+    def last_lag(self) -> Optional[float]:
+        return self._lag
+
+    # ===== Read-your-writes =====
+
+    def pin(self, key: Optional[str]):
+        if not key or not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._pins[key] = now + self.pin_seconds
+            if len(self._pins) > 10_000:
+                self._pins = {k: until for k, until in self._pins.items() if until > now}
+
+    def is_pinned(self, key: Optional[str]) -> bool:
+        if not key:
+            return False
+        until = self._pins.get(key)
+        return until is not None and until > time.monotonic()
+
+    # ===== Replica health =====
+
+    def _probe(self) -> float:
+        with self.read_engine.connect() as connection:
+            if connection.dialect.name != "postgresql":
+                connection.exec_driver_sql("SELECT 1")
+                return 0.0
+            return float(connection.exec_driver_sql(POSTGRES_LAG_SQL).scalar() or 0)
+
+    def replica_lag(self) -> Optional[float]:
+        """Replica lag in seconds (cached for check_interval), None if unreachable"""
+        with self._lock:
+            if self._probing or time.monotonic() - self._checked_at < self.check_interval:
+                return self._lag
+            self._probing = True
+        lag = None
+        try:
+            lag = self._probe()
+        except Exception as e:
+            logger.warning(f"⚠️ Read replica unreachable: {e}")
+        finally:
+            with self._lock:
+                self._lag, self._checked_at, self._probing = lag, time.monotonic(), False
+        return lag
+
+    def choose(self, key: Optional[str] = None) -> Tuple[str, str]:
+        """(target, reason) for a read session - target is PRIMARY or REPLICA"""
+        if not self.enabled:
+            return PRIMARY, "no_replica"
+        if self.is_pinned(key):
+            return PRIMARY, "pinned"
+        lag = self.replica_lag()
+        if lag is None:
+            if not self.fallback:
+                raise ReplicaUnavailable("Read replica is unavailable")
+            return PRIMARY, "unavailable"
+        if lag > self.max_lag:
+            if self.fallback:
+                return PRIMARY, "lagging"
+            return REPLICA, "lagging"
+        return REPLICA, "healthy"
+
+
+read_router = ReadRouter()
+
+
+@event.listens_for(Session, "before_flush")
+def _reject_writes_on_read_sessions(session, flush_context, instances):
+    if session.info.get("read_only") and (session.new or session.dirty or session.deleted):
+        raise RuntimeError("Attempted to write through a read session (get_read_db) - use get_db for writes")
+
+
+@event.listens_for(Session, "after_flush")
+def _remember_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _pin_writer(session):
+    if session.info.pop("wrote", False):
+        read_router.pin(session.info.get("client_key"))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_write(session):
+    session.info.pop("wrote", None)
@@ -0,0 +1,249 @@
+"""
+FIFO lot traceability: which lots - and which supplier bills - a sale's units came from
+
+One SQL statement allocates units to lots the way FIFO does, without replaying
+history in Python. For each item the database numbers the units that came in
+(purchase lines, blow output, units found) and the units that went out (sales,
+blow input, wastes, units lost) with running sums in stock order, so every
+receipt and every issue covers an interval of unit numbers:
+
+    receipt covers (upto - qty, upto]      issue covers (upto - qty, upto]
+
+A sale line took from every lot whose interval overlaps its own, as many units
+as the overlap. Units sold while nothing was on hand overlap the next receipt,
+as a short cost layer is filled by it (app/db/cost_layers.py); units beyond
+everything received have no lot yet.
+
+Blown bottles are traced one step further: the blow that made a bottle lot is
+itself an issue of preforms, and the same overlap against the preform lots
+gives the supplier bills behind it, in proportion to the blow's input.
+"""
+
+from app.core.periods import Period, business_date
+from app.db.costing import stock_events
+from dataclasses import dataclass
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import and_, case, func, literal, or_, select
+from sqlalchemy.orm import Session
+from typing import Iterator, NamedTuple, Optional, Tuple
+import datetime
+
+# Rows fetched from the cursor at a time while streaming allocations
+TRACE_CHUNK = 1000
+
+# Receipts open lots; everything else takes units out of them
+RECEIPT_KINDS = ("purchase", "blow", "adjustment")
+ISSUE_KINDS = ("sale", "blow", "waste", "adjustment")
+
+
+class TraceRow(NamedTuple):
+    """Units of one sale line traced to one lot (and, for blown lots, one preform lot)"""
+    date: datetime.date
+    bill_number: str
+    line_id: str
+    customer_id: Optional[str]
+    sold_quantity: int
+    lot_source: Optional[str]  # 'purchase', 'blow', 'adjustment'; None for units not received yet
+    lot_reference: Optional[str]
+    lot_date: Optional[datetime.date]
+    lot_unit_cost: Optional[float]
+    lot_quantity: int  # units of the sale line from this lot
+    quantity: float  # ... and from this origin, for a blown lot
+    origin_source: Optional[str]  # lot of the preforms behind a blown lot
+    origin_bill: Optional[str]  # its purchase bill (or other reference)
+    origin_supplier_id: Optional[str]
+    origin_date: Optional[datetime.date]
+    origin_unit_cost: Optional[float]
+
+
+@dataclass
+class Trace:
+    """Item and period being traced"""
+    item_id: str
+    item_name: str
+    period: Period
+    bill_number: Optional[str] = None
+    # The item and the preforms its blows were made from: their lots are traced with it
+    item_ids: Tuple[str, ...] = ()
+
+    def header(self) -> dict:
+        return {
+            "item_id": self.item_id,
+            "item_name": self.item_name,
+            "bill_number": self.bill_number,
+            "period": self.period.as_dict(),
+        }
+
+
+def open_trace(db: Session, item_id: str, period: Period, bill_number: Optional[str] = None) -> Trace:
+    """Trace header for the item (HTTPException 404 for an unknown item)"""
+    from app.models.item import Item
+    from app.models.transaction import Blow
+
+    item = db.query(Item.name).filter(Item.id == item_id).first()
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    preforms = db.scalars(select(Blow.from_item_id).where(Blow.to_item_id == item_id).distinct())
+    return Trace(item_id, item.name, period, bill_number, (item_id, *sorted(set(preforms) - {item_id})))
+
+
+def _least(a, b):
+    return case((a < b, a), else_=b)
+
+
+def _greatest(a, b):
+    return case((a > b, a), else_=b)
+
+
+def _overlap(a, b):
+    """Units shared by two (upto - qty, upto] intervals"""
+    return _least(a.c.upto, b.c.upto) - _greatest(a.c.upto - a.c.qty, b.c.upto - b.c.qty)
+
+
+def _overlaps(a, b):
+    return and_(b.c.upto - b.c.qty < a.c.upto, a.c.upto - a.c.qty < b.c.upto)
+
+
+def trace_statement(trace: Trace):
+    """SELECT of the period's sale lines of the item against the lots they took units from"""
+    from app.models.transaction import Blow, Purchase, Sale
+
+    events = stock_events().subquery("events")
+    # Their running sums need their whole history; plain IN lists reach each document's item index
+    item_ids = trace.item_ids or (trace.item_id,)
+    receipt_item = case((events.c.kind == "blow", events.c.to_item_id), else_=events.c.item_id)
+    receipt_qty = case((events.c.kind == "blow", events.c.output_qty), else_=events.c.qty)
+    receipt_items = or_(
+        and_(events.c.kind != "blow", events.c.item_id.in_(item_ids)),
+        and_(events.c.kind == "blow", events.c.to_item_id.in_(item_ids)),
+    )
+    stock_order = (events.c.at, events.c.rank, events.c.ref)
+
+    lots = select(
+        receipt_item.label("item_id"), events.c.at, events.c.kind, events.c.ref, events.c.price,
+        receipt_qty.label("qty"),
+        func.sum(receipt_qty).over(partition_by=receipt_item, order_by=stock_order, rows=(None, 0)).label("upto"),
+    ).where(
+        receipt_items,
+        events.c.kind.in_(RECEIPT_KINDS),
+        receipt_qty > 0,
+    ).cte("lots")
+
+    issue_qty = func.abs(events.c.qty)
+    issues = select(
+        events.c.item_id, events.c.at, events.c.kind, events.c.ref, events.c.line_id,
+        issue_qty.label("qty"),
+        func.sum(issue_qty).over(partition_by=events.c.item_id, order_by=stock_order, rows=(None, 0)).label("upto"),
+    ).where(
+        events.c.item_id.in_(item_ids),
+        events.c.kind.in_(ISSUE_KINDS),
+        or_(events.c.kind != "adjustment", events.c.qty < 0),
+        events.c.qty != 0,
+    ).cte("issues")
+
+    sold = issues.alias("sold")
+    lot = lots.alias("lot")
+    blow_input = issues.alias("blow_input")
+    origin = lots.alias("origin")
+    produced = Blow.__table__.alias("produced")
+    origin_bill = Purchase.__table__.alias("origin_bill")
+
+    # A blown lot's units split over the preform lots in proportion to the blow's input
+    share = case(
+        (origin.c.upto.is_(None), literal(1)),
+        else_=_overlap(blow_input, origin) * literal(Decimal("1.0")) / blow_input.c.qty,
+    )
+    statement = (
+        select(
+            sold.c.at.label("date"), sold.c.ref.label("bill_number"), sold.c.line_id, Sale.customer_id,
+            sold.c.qty.label("sold_quantity"),
+            lot.c.kind.label("lot_source"), lot.c.ref.label("lot_reference"), lot.c.at.label("lot_date"),
+            case((lot.c.kind == "blow", produced.c.produced_unit_cost), else_=lot.c.price).label("lot_unit_cost"),
+            _overlap(sold, lot).label("lot_quantity"), (_overlap(sold, lot) * share).label("quantity"),
+            origin.c.kind.label("origin_source"), origin.c.ref.label("origin_bill"), origin_bill.c.supplier_id.label("origin_supplier_id"),
+            origin.c.at.label("origin_date"), origin.c.price.label("origin_unit_cost"),
+        )
+        .select_from(sold)
+        .join(Sale, Sale.bill_number == sold.c.ref)
+        .outerjoin(lot, and_(lot.c.item_id == sold.c.item_id, _overlaps(sold, lot)))
+        .outerjoin(produced, and_(lot.c.kind == "blow", produced.c.id == lot.c.ref))
+        .outerjoin(blow_input, and_(lot.c.kind == "blow", blow_input.c.kind == "blow", blow_input.c.ref == lot.c.ref))
+        .outerjoin(origin, and_(
+            origin.c.item_id == blow_input.c.item_id,
+            _overlaps(blow_input, origin),
+        ))
+        .outerjoin(origin_bill, and_(origin.c.kind == "purchase", origin_bill.c.bill_number == origin.c.ref))
+        .where(
+            sold.c.kind == "sale",
+            sold.c.item_id == trace.item_id,
+            trace.period.filter(sold.c.at),
+        )
+        .order_by(sold.c.at, sold.c.ref, lot.c.upto, origin.c.upto)
+    )
+    if trace.bill_number:
+        statement = statement.where(sold.c.ref == trace.bill_number)
+    return statement
+
+
+def _number(value) -> Optional[float]:
+    return round(float(value), 4) if value is not None else None
+
+
+def trace_rows(bind, trace: Trace) -> Iterator[TraceRow]:
+    """Stream the allocations on a connection of its own (the engine, as ledger_rows() takes it)"""
+    with bind.connect() as connection:
+        result = connection.execute(trace_statement(trace).execution_options(yield_per=TRACE_CHUNK))
+        for row in result:
+            yield TraceRow(
+                date=business_date(row.date),
+                bill_number=row.bill_number,
+                line_id=row.line_id,
+                customer_id=row.customer_id,
+                sold_quantity=row.sold_quantity,
+                lot_source=row.lot_source,
+                lot_reference=row.lot_reference,
+                lot_date=business_date(row.lot_date),
+                lot_unit_cost=_number(row.lot_unit_cost),
+                lot_quantity=row.lot_quantity or 0,
+                quantity=_number(row.quantity) or 0.0,
+                origin_source=row.origin_source,
+                origin_bill=row.origin_bill,
+                origin_supplier_id=row.origin_supplier_id,
+                origin_date=business_date(row.origin_date),
+                origin_unit_cost=_number(row.origin_unit_cost),
+            )
+
+
+def trace_sales(rows: Iterator[TraceRow]) -> Iterator[dict]:
+    """Group the allocations per sale line: {bill_number, ..., lots: [{..., origins: [...]}], untraced}"""
+    current = None
+    for row in rows:
+        if current is None or current["line_id"] != row.line_id:
+            if current is not None:
+                yield _close(current)
+            current = {
+                "date": row.date, "bill_number": row.bill_number, "line_id": row.line_id,
+                "customer_id": row.customer_id, "quantity": row.sold_quantity, "lots": [],
+            }
+        if row.lot_source is None:
+            continue
+        lots = current["lots"]
+        if not lots or lots[-1]["reference"] != row.lot_reference or lots[-1]["source"] != row.lot_source:
+            lots.append({
+                "source": row.lot_source, "reference": row.lot_reference, "date": row.lot_date,
+                "unit_cost": row.lot_unit_cost, "quantity": row.lot_quantity, "origins": [],
+            })
+        if row.origin_source is not None:
+            lots[-1]["origins"].append({
+                "source": row.origin_source, "reference": row.origin_bill, "supplier_id": row.origin_supplier_id,
+                "date": row.origin_date, "unit_cost": row.origin_unit_cost, "quantity": row.quantity,
+            })
+    if current is not None:
+        yield _close(current)
+
+
+def _close(sale: dict) -> dict:
+    traced = sum(lot["quantity"] for lot in sale["lots"])
+    sale["untraced"] = max(sale["quantity"] - traced, 0)
+    return sale
@@ -0,0 +1,121 @@
+"""
+Inventory valuation at cost, as of any day
+
+Stock on hand is worth what its cost layers (app/db/cost_layers.py) say the
+units left in them cost. For a past day the valuation starts from today's
+open layers and gives back what was issued after that day:
+
+    on hand at the close of D = units left now in layers received by D
+                              + units issued from those layers after D
+
+so it reads the partial open-layer index plus the issues since D, and a
+month-end close costs the month's movements instead of a replay of every
+item's FIFO history. Short layers are left out: units issued with nothing
+on hand value the item at nothing rather than below zero, and the receipt
+that covered them counts only what it left on hand.
+
+The layers are only kept with COSTING_METHOD=fifo. With wac the stock is
+valued at its running average (item_costs), which exists for today only.
+"""
+
+from app.core.periods import business_today, day_start
+from app.db.costing import weighted_average
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import func, select, union_all
+from typing import List, NamedTuple
+
+CENT = Decimal("0.01")
+UNIT_PLACES = Decimal("0.0001")
+
+# Totals are broken down by these item attributes
+GROUPINGS = ("type", "size", "grade")
+
+
+class ItemValuation(NamedTuple):
+    """An item's stock on hand and its cost at the close of the day"""
+    item_id: str
+    item_name: str
+    type: str
+    size: str
+    grade: str
+    quantity: int
+    value: Decimal
+    unit_cost: Decimal  # value / quantity
+
+
+def valuation_statement(as_of: date):
+    """SELECT of the items with stock at the close of as_of: item columns, quantity and value"""
+    from app.models.item import CostLayer, CostLayerIssue, Item
+
+    after = day_start(as_of + timedelta(days=1))
+    layers = CostLayer.__table__.c
+    open_layers = select(
+        layers.item_id, layers.remaining.label("qty"), (layers.remaining * layers.unit_cost).label("value"),
+    ).where(layers.remaining != 0, layers.source != "short", layers.received_at < after)
+    issued_after = select(
+        layers.item_id, CostLayerIssue.quantity, CostLayerIssue.quantity * layers.unit_cost,
+    ).join(CostLayer.__table__, layers.id == CostLayerIssue.layer_id).where(
+        CostLayerIssue.issued_at >= after, layers.source != "short", layers.received_at < after,
+    )
+
+    movements = union_all(open_layers, issued_after).subquery("movements")
+    on_hand = (
+        select(movements.c.item_id, func.sum(movements.c.qty).label("quantity"),
+               func.sum(movements.c.value).label("value"))
+        .group_by(movements.c.item_id)
+        .subquery("on_hand")
+    )
+    return (
+        select(Item.id, Item.name, Item.type, Item.size, Item.grade, on_hand.c.quantity, on_hand.c.value)
+        .join(on_hand, on_hand.c.item_id == Item.id)
+        .where(on_hand.c.quantity != 0)
+        .order_by(Item.type, Item.size, Item.grade, Item.id)
+    )
+
+
+def average_valuation_statement():
+    """SELECT of the items with stock now at their weighted-average cost (item_costs)"""
+    from app.models.item import Item, ItemCost
+
+    return (
+        select(Item.id, Item.name, Item.type, Item.size, Item.grade, ItemCost.on_hand_qty, ItemCost.on_hand_value)
+        .join(ItemCost, ItemCost.item_id == Item.id)
+        .where(ItemCost.on_hand_qty > 0)
+        .order_by(Item.type, Item.size, Item.grade, Item.id)
+    )
+
+
+def item_valuations(connection, as_of: date) -> List[ItemValuation]:
+    """The valued items, by type, size and grade (HTTPException 400 for a past day with COSTING_METHOD=wac)"""
+    if weighted_average():
+        if as_of < business_today():
+            raise HTTPException(status_code=400, detail="Past days can only be valued with COSTING_METHOD=fifo")
+        statement = average_valuation_statement()
+    else:
+        statement = valuation_statement(as_of)
+    rows = []
+    for item_id, name, type_, size, grade, quantity, value in connection.execute(statement):
+        value = Decimal(str(value or 0)).quantize(CENT)
+        rows.append(ItemValuation(
+            item_id, name, type_, size, grade, int(quantity), value, (value / quantity).quantize(UNIT_PLACES),
+        ))
+    return rows
+
+
+def valuation_totals(rows: List[ItemValuation]) -> dict:
+    """{"quantity", "value", "by_type": [...], "by_size": [...], "by_grade": [...]}"""
+    totals = {"quantity": sum(row.quantity for row in rows), "value": sum((row.value for row in rows), Decimal("0.00"))}
+    for grouping in GROUPINGS:
+        groups = defaultdict(lambda: [0, Decimal("0.00")])
+        for row in rows:
+            group = groups[getattr(row, grouping)]
+            group[0] += row.quantity
+            group[1] += row.value
+        totals[f"by_{grouping}"] = [
+            {grouping: key, "quantity": quantity, "value": value}
+            for key, (quantity, value) in sorted(groups.items())
+        ]
+    return totals
@@ -1,30 +1,46 @@
 from fastapi import FastAPI, APIRouter, Depends, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, render_latest
+from app.core.middleware import EdgeMiddleware
+from app.core.responses import ORJSONResponse
+from app.core.warmup import run_warmup, warmup_state
+from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
+import asyncio
 import logging
 import os
-import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tables and rollups must exist before the first write; if this fails the server doesn't start
+    if settings.MIGRATE_ON_STARTUP:
+        from app.db.migrate import migrate
+        await asyncio.to_thread(migrate)
+    # Warm up in the background so the server accepts connections immediately;
+    # /health answers 503 until it is done
+    warmup_task = asyncio.create_task(run_warmup())
+    yield
+    if not warmup_task.done():
+        warmup_task.cancel()
+    from app.utils.invoice_bundle import shutdown_invoice_workers
+    shutdown_invoice_workers()
+
+
 app = FastAPI(
     title="Water Bottle Inventory API",
     description="Professional inventory management system for water bottle manufacturing",
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
-)
-
-# Trust proxy headers (for Railway, Vercel, etc.)
-# CRITICAL: This tells FastAPI to trust X-Forwarded-* headers from Railway's proxy
-app.add_middleware(
-    TrustedHostMiddleware,
-    allowed_hosts=["*"],  # Railway adds proxy headers
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # CORS Configuration - Allow all origins for development/local
@@ -38,60 +54,14 @@ app.add_middleware(
     max_age=3600,
 )
 
-# Middleware to preserve HTTPS protocol from Railway's proxy headers
-@app.middleware("http")
-async def preserve_https_protocol(request: Request, call_next):
-    """
-    Railway proxies requests through HTTP internally but sends X-Forwarded-Proto: https.
-    This middleware ensures we respect the original protocol.
-    """
-    response = await call_next(request)
-    return response
-
-# Middleware to ensure HTTPS is used in redirects
-@app.middleware("http")
-async def enforce_https_redirects(request: Request, call_next):
-    """Ensure that any redirects use HTTPS protocol to prevent mixed-content errors."""
-    response = await call_next(request)
-    
-    # If this is a redirect response (3xx), ensure Location header uses HTTPS
-    if 300 <= response.status_code < 400:
-        location = response.headers.get("location")
-        if location and location.startswith("http://"):
-            location = location.replace("http://", "https://")
-            response.headers["location"] = location
-            logger.warning(f"🔒 FIXED HTTPS downgrade in redirect: {location}")
-    
-    return response
-
-# Middleware to log requests and preserve HTTPS protocol
-@app.middleware("http")
-async def log_request_timing(request: Request, call_next):
-    """Log the execution time of each request to identify bottlenecks."""
-    # Skip logging for health checks and keep-alive (too noisy)
-    skip_paths = {"/keep-alive", "/health"}
-    if request.url.path in skip_paths:
-        return await call_next(request)
-    
-    start_time = time.time()
-    response = await call_next(request)
-    duration = time.time() - start_time
-    
-    # Log slow requests (>1 second) or all requests if in debug mode
-    if duration > 1.0:  # Only log slow requests
-        logger.warning(
-            f"🐌 SLOW REQUEST: {request.method} {request.url.path} "
-            f"took {duration:.2f}s (status: {response.status_code})"
-        )
-    else:
-        logger.debug(
-            f"✅ {request.method} {request.url.path} "
-            f"completed in {duration:.3f}s (status: {response.status_code})"
-        )
-    
-    return response
-
 # Basic endpoints first (don't require database)
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint - per-route latency, response sizes, SQL counts"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {
@@ -103,12 +73,15 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint - doesn't require database"""
-    return {
-        "status": "healthy",
+    """Readiness check - 503 until the startup warm-up has finished (doesn't query the database)"""
+    body = {
+        "status": "healthy" if warmup_state.ready else "warming_up",
+        "ready": warmup_state.ready,
         "environment": os.getenv("ENVIRONMENT", "unknown"),
-        "database_connected": os.getenv("DATABASE_URL", "NOT_SET") != "NOT_SET"
+        "database_connected": os.getenv("DATABASE_URL", "NOT_SET") != "NOT_SET",
+        "warmup": warmup_state.as_dict(),
     }
+    return JSONResponse(body, status_code=200 if warmup_state.ready else 503)
 
 @app.get("/health/db")
 async def health_check_db():
@@ -165,7 +138,8 @@ async def config_check():
 # API Routes - import after app setup
 def setup_routes():
     try:
-        from app.api.v1 import auth, purchases, sales, blows, wastes, stocks, suppliers, customers, reports, dashboard, users, extra_expenditures, invoices, stock_balance, stock_verification
+        from app.api.v1 import auth, purchases, sales, blows, wastes, stocks, suppliers, customers, reports, dashboard, users, extra_expenditures, invoices, payments, stock_balance, stock_verification
+        from app.db.payments import PaymentError
         # Don't import models - they initialize when the modules are imported
         
         app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
@@ -173,6 +147,8 @@ def setup_routes():
         app.include_router(dashboard.router, prefix="/api/v1/dashboard", tags=["Dashboard"])
         app.include_router(purchases.router, prefix="/api/v1/purchases", tags=["Purchases"])
         app.include_router(sales.router, prefix="/api/v1/sales", tags=["Sales"])
+        app.include_router(payments.router, prefix="/api/v1/payments", tags=["Payments"])
+        app.add_exception_handler(PaymentError, payments.payment_error_handler)
         app.include_router(blows.router, prefix="/api/v1/blows", tags=["Blow Process"])
         app.include_router(wastes.router, prefix="/api/v1/wastes", tags=["Waste Management"])
         app.include_router(extra_expenditures.router, prefix="/api/v1/extra-expenditures", tags=["Extra Expenditures"])
@@ -233,48 +209,32 @@ async def reload_routes():
         "message": "Routes reloaded"
     }
 
-# ===== SERVE REACT FRONTEND (SPA) =====
-# Mount frontend dist folder to serve React app
+# ===== SERVE REACT FRONTEND (SPA) + REQUEST TIMING + HTTPS REDIRECTS =====
+# A single pure ASGI layer (see app/core/middleware.py). API routes and backend
+# endpoints (/health, /metrics, ...) pass through; every other GET serves the
+# built frontend from frontend/dist, falling back to index.html for SPA routing.
 from pathlib import Path
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import FileResponse
-import mimetypes
 
 frontend_dist = Path(__file__).parent.parent.parent / "frontend" / "dist"
 
-class SPAMiddleware(BaseHTTPMiddleware):
-    """Middleware to serve React app for all non-API routes"""
-    async def dispatch(self, request, call_next):
-        # Let routers handle API routes
-        path = request.url.path
-        
-        # Check if it's an API route or docs
-        if path.startswith("/api") or path in ["/docs", "/redoc", "/openapi.json"]:
-            return await call_next(request)
-        
-        # Check if it's a static file
-        if path.startswith("/dist/") or path.startswith("/assets/"):
-            return await call_next(request)
-        
-        # For all other routes, check if file exists
-        file_path = frontend_dist / path.lstrip("/")
-        if file_path.exists() and file_path.is_file():
-            # Serve the file
-            return FileResponse(file_path)
-        
-        # If no file found, serve index.html for SPA routing
-        index_file = frontend_dist / "index.html"
-        if index_file.exists():
-            logger.debug(f"📄 Serving index.html for SPA route: {path}")
-            return FileResponse(index_file, media_type="text/html")
-        
-        # If index.html doesn't exist, let the request proceed (will 404)
-        return await call_next(request)
-
-# Add SPA middleware after routes are registered
-# This must come AFTER API routes so they take precedence
 if frontend_dist.exists():
     logger.info(f"✅ SPA middleware configured to serve from {frontend_dist}")
-    app.add_middleware(SPAMiddleware)
 else:
     logger.warning(f"⚠️ Frontend dist folder not found at {frontend_dist}")
+app.add_middleware(EdgeMiddleware, frontend_dist=frontend_dist)
+
+# Query budget / N+1 detector (X-DB-* headers outside production)
+if settings.QUERY_BUDGET_ENABLED:
+    from app.core.query_budget import QueryBudgetMiddleware
+    app.add_middleware(QueryBudgetMiddleware)
+
+# Metrics wrap everything else (added last = outermost) so timings include all middleware
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    if routes_loaded:
+        from app.db.database import engine
+        from app.db.replica import read_router
+        from app.core.metrics import register_pool_gauges, register_replica_gauges
+        register_pool_gauges(engine)
+        if read_router.enabled:
+            register_replica_gauges(read_router)
@@ -1,19 +1,31 @@
 from app.models.user import User
-from app.models.item import Item
-from app.models.party import Supplier, Customer
-from app.models.transaction import Purchase, Sale, Blow, Waste
+from app.models.item import Item, ItemCost, CostingState, CostLayer, CostLayerIssue, StockThreshold, StockAlert
+from app.models.party import Supplier, Customer, PartyBalance
+from app.models.transaction import Purchase, Sale, Payment, Blow, Waste
 from app.models.stock_movement import StockMovement
 from app.models.report import WeeklyReport
+from app.models.facts import DailyItemFact, DailyExpenditure, DailyBlowFact
 
 __all__ = [
     'User',
     'Item',
+    'ItemCost',
+    'CostingState',
+    'CostLayer',
+    'CostLayerIssue',
+    'StockThreshold',
+    'StockAlert',
     'Supplier',
     'Customer',
+    'PartyBalance',
     'Purchase',
     'Sale',
+    'Payment',
     'Blow',
     'Waste',
     'StockMovement',
     'WeeklyReport',
+    'DailyItemFact',
+    'DailyExpenditure',
+    'DailyBlowFact',
 ]
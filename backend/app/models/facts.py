@@ -0,0 +1,59 @@
+from sqlalchemy import Column, String, Integer, Numeric, Date, ForeignKey
+from app.db.database import Base
+
+
+class DailyItemFact(Base):
+    """One row per (day, item): the per-day sums the period reports need (maintained by app/db/facts.py)"""
+    __tablename__ = "daily_item_facts"
+
+    day = Column(Date, primary_key=True)
+    item_id = Column(String, ForeignKey("items.id"), primary_key=True, index=True)
+
+    # Sales (line items of non-cancelled sales)
+    qty_sold = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
+    cogs = Column(Numeric(14, 2), nullable=False, default=0)  # sum(cost_basis * quantity)
+    blow_price = Column(Numeric(14, 2), nullable=False, default=0)  # sum(blow_price * quantity)
+
+    # Purchases (line items)
+    qty_purchased = Column(Integer, nullable=False, default=0)
+    purchase_cost = Column(Numeric(14, 2), nullable=False, default=0)
+
+    # Blow processes: output of the bottle (to_item), input of the preform (from_item)
+    qty_produced = Column(Integer, nullable=False, default=0)
+    blow_cost = Column(Numeric(14, 2), nullable=False, default=0)  # sum(blow_cost_per_unit * quantity)
+    qty_blow_input = Column(Integer, nullable=False, default=0)
+
+    # Waste
+    qty_wasted = Column(Integer, nullable=False, default=0)
+    waste_recovery = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class DailyExpenditure(Base):
+    """One row per (day, expense type) of extra expenditures"""
+    __tablename__ = "daily_expenditures"
+
+    day = Column(Date, primary_key=True)
+    expense_type = Column(String, primary_key=True)
+    amount = Column(Numeric(14, 2), nullable=False, default=0)
+    entries = Column(Integer, nullable=False, default=0)
+
+
+class DailyBlowFact(Base):
+    """One row per (day, preform, bottle, operator) of blow processes: yield and cost sums"""
+    __tablename__ = "daily_blow_facts"
+
+    day = Column(Date, primary_key=True)
+    from_item_id = Column(String, ForeignKey("items.id"), primary_key=True)
+    to_item_id = Column(String, ForeignKey("items.id"), primary_key=True)
+    user_id = Column(String, primary_key=True)  # '' when the blow has no operator
+
+    blows = Column(Integer, nullable=False, default=0)
+    qty_input = Column(Integer, nullable=False, default=0)
+    qty_output = Column(Integer, nullable=False, default=0)
+    qty_waste = Column(Integer, nullable=False, default=0)
+    blow_cost = Column(Numeric(14, 2), nullable=False, default=0)  # sum(blow_cost_per_unit * output)
+    # Blows with a produced_unit_cost only
+    costed_output = Column(Integer, nullable=False, default=0)
+    produced_cost = Column(Numeric(14, 2), nullable=False, default=0)  # sum(produced_unit_cost * output)
+    waste_cost = Column(Numeric(14, 2), nullable=False, default=0)  # preform cost of the wasted units
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, Numeric, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
 from app.db.database import Base
 
 class Item(Base):
@@ -19,3 +20,85 @@ class Stock(Base):
     item_id = Column(String, ForeignKey("items.id"), primary_key=True)
     quantity = Column(Integer, nullable=False, default=0)
     last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ItemCost(Base):
+    """Perpetual weighted-average cost of an item's stock on hand (app/db/costing.py)"""
+    __tablename__ = "item_costs"
+
+    item_id = Column(String, ForeignKey("items.id"), primary_key=True)
+    on_hand_qty = Column(Integer, nullable=False, default=0)
+    on_hand_value = Column(Numeric(16, 4), nullable=False, default=0)
+    unit_cost = Column(Numeric(12, 4))  # average cost per unit; the last known one while nothing is on hand
+    last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class CostingState(Base):
+    """The costing method item_costs / cost_layers are kept current for; one row (app/db/costing.py)"""
+    __tablename__ = "costing_state"
+
+    method = Column(String(10), primary_key=True)  # 'fifo' or 'wac'
+    since = Column(DateTime(timezone=True), server_default=func.now())
+
+class CostLayer(Base):
+    """A lot of stock at one unit cost: a purchase line, a blow's output, a return (app/db/cost_layers.py)"""
+    __tablename__ = "cost_layers"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    item_id = Column(String, ForeignKey("items.id"), nullable=False)
+    source = Column(String(20), nullable=False)  # 'purchase', 'blow', 'adjustment', 'return', 'short'
+    source_ref = Column(String)  # purchase bill number, blow id, ...
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+    quantity = Column(Integer, nullable=False)
+    remaining = Column(Integer, nullable=False)  # negative on a 'short' layer: units issued with nothing on hand
+    unit_cost = Column(Numeric(12, 4), nullable=False)
+
+    __table_args__ = (
+        Index("ix_cost_layers_item_id_id", "item_id", "id"),  # an item's layers, oldest first
+        Index("ix_cost_layers_open", "item_id", "id",
+              postgresql_where=remaining != 0, sqlite_where=remaining != 0),  # layers with stock left or short
+        Index("ix_cost_layers_source_source_ref", "source", "source_ref"),  # layers of a purchase or blow
+    )
+
+class CostLayerIssue(Base):
+    """Units taken out of a cost layer by a sale line, blow, waste or adjustment"""
+    __tablename__ = "cost_layer_issues"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    layer_id = Column(Integer, ForeignKey("cost_layers.id", ondelete="CASCADE"), nullable=False, index=True)
+    ref_type = Column(String(20), nullable=False)  # 'sale', 'blow', 'waste', 'adjustment', 'reversal'
+    ref = Column(String)  # sale line id, blow id, waste id, ...
+    quantity = Column(Integer, nullable=False)
+    issued_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    layer = relationship("CostLayer")
+
+    __table_args__ = (
+        Index("ix_cost_layer_issues_ref_type_ref", "ref_type", "ref"),  # what a sale line took
+        Index("ix_cost_layer_issues_issued_at", "issued_at"),  # issues after a valuation date
+    )
+
+class StockThreshold(Base):
+    """Stock level an item should stay within; either bound may be left open (app/db/alerts.py)"""
+    __tablename__ = "stock_thresholds"
+
+    item_id = Column(String, ForeignKey("items.id"), primary_key=True)
+    min_quantity = Column(Integer)  # alert below this
+    max_quantity = Column(Integer)  # alert above this
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class StockAlert(Base):
+    """An item outside its thresholds: open while resolved_at is empty, one open alert per item at most"""
+    __tablename__ = "stock_alerts"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    item_id = Column(String, ForeignKey("items.id"), nullable=False)
+    kind = Column(String(10), nullable=False)  # 'out', 'low' or 'over'
+    quantity = Column(Integer, nullable=False)  # stock at the latest check
+    threshold = Column(Integer)  # the bound crossed (min_quantity, max_quantity)
+    raised_at = Column(DateTime(timezone=True), server_default=func.now())
+    resolved_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_stock_alerts_open", "item_id",
+              postgresql_where=resolved_at.is_(None), sqlite_where=resolved_at.is_(None)),  # the open alerts
+        Index("ix_stock_alerts_item_id_raised_at", "item_id", "raised_at"),  # an item's alert history
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text
+from sqlalchemy import Column, String, Text, Integer, Numeric, DateTime
 from app.db.database import Base
 
 class Supplier(Base):
@@ -18,3 +18,16 @@ class Customer(Base):
     contact = Column(String)
     address = Column(String)
     notes = Column(Text)
+
+class PartyBalance(Base):
+    """Running account of a customer or supplier over its non-cancelled bills (maintained by app/db/balances.py)"""
+    __tablename__ = "party_balances"
+
+    party_type = Column(String, primary_key=True)  # 'customer' or 'supplier'
+    party_id = Column(String, primary_key=True)  # '' for bills without a party (walk-in sales)
+    billed = Column(Numeric(14, 2), nullable=False, default=0)
+    paid = Column(Numeric(14, 2), nullable=False, default=0)  # bills marked 'paid' count in full
+    outstanding = Column(Numeric(14, 2), nullable=False, default=0)  # billed - paid
+    bills = Column(Integer, nullable=False, default=0)
+    open_bills = Column(Integer, nullable=False, default=0)  # payment_status 'pending' or 'partial'
+    last_activity = Column(DateTime(timezone=True))  # date of the latest bill
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.db.database import Base
 
@@ -13,5 +13,9 @@ class StockMovement(Base):
     before_quantity = Column(Integer)
     after_quantity = Column(Integer)
     recorded_by = Column(String, ForeignKey("users.id"))
-    movement_date = Column(DateTime(timezone=True), server_default=func.now())
+    movement_date = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     notes = Column(Text)
+
+    __table_args__ = (
+        Index("ix_stock_movements_item_id_movement_date", "item_id", "movement_date"),  # per-item history / statements
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Numeric, DateTime, Date, ForeignKey, Boolean, Text
+from sqlalchemy import Column, String, Integer, Numeric, DateTime, Date, ForeignKey, Boolean, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -15,17 +15,21 @@ class Purchase(Base):
     due_date = Column(Date)
     notes = Column(Text)
     created_by = Column(String, ForeignKey("users.id"))
-    date = Column(DateTime(timezone=True))  # Removed server_default so we can set it from due_date
+    date = Column(DateTime(timezone=True), index=True)  # Removed server_default so we can set it from due_date
     
     # Relationship to line items
     line_items = relationship("PurchaseLineItem", back_populates="purchase", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_purchases_supplier_id_date", "supplier_id", "date"),  # supplier ledger
+    )
+
 class PurchaseLineItem(Base):
     __tablename__ = "purchase_line_items"
     
     id = Column(String, primary_key=True, index=True)
-    bill_number = Column(String, ForeignKey("purchases.bill_number", ondelete="CASCADE"))
-    item_id = Column(String, ForeignKey("items.id"))
+    bill_number = Column(String, ForeignKey("purchases.bill_number", ondelete="CASCADE"), index=True)
+    item_id = Column(String, ForeignKey("items.id"), index=True)  # FIFO cost basis
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Numeric(12, 2))
     total_price = Column(Numeric(12, 2))
@@ -47,17 +51,21 @@ class Sale(Base):
     notes = Column(Text)
     editable_by_admin_only = Column(Boolean, default=False)
     created_by = Column(String, ForeignKey("users.id"))
-    date = Column(DateTime(timezone=True))  # Removed server_default so we can set it from due_date
+    date = Column(DateTime(timezone=True), index=True)  # Removed server_default so we can set it from due_date
     
     # Relationship to line items
     line_items = relationship("SaleLineItem", back_populates="sale", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_sales_customer_id_date", "customer_id", "date"),  # customer ledger
+    )
+
 class SaleLineItem(Base):
     __tablename__ = "sale_line_items"
     
     id = Column(String, primary_key=True, index=True)
-    bill_number = Column(String, ForeignKey("sales.bill_number", ondelete="CASCADE"))
-    item_id = Column(String, ForeignKey("items.id"))
+    bill_number = Column(String, ForeignKey("sales.bill_number", ondelete="CASCADE"), index=True)
+    item_id = Column(String, ForeignKey("items.id"), index=True)  # FIFO cost basis
     quantity = Column(Integer)
     unit_price = Column(Numeric(12, 2))
     blow_price = Column(Numeric(12, 2), default=0.00)
@@ -68,6 +76,24 @@ class SaleLineItem(Base):
     sale = relationship("Sale", back_populates="line_items")
 
 
+class Payment(Base):
+    """Money received for a sale or paid for a purchase; a negative amount reverses an earlier payment"""
+    __tablename__ = "payments"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    bill_type = Column(String, nullable=False)  # 'sale', 'purchase'
+    bill_number = Column(String, nullable=False)
+    amount = Column(Numeric(12, 2), nullable=False)
+    method = Column(String(50))
+    notes = Column(Text)
+    recorded_by = Column(String, ForeignKey("users.id"))
+    paid_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    __table_args__ = (
+        Index("ix_payments_bill_type_bill_number", "bill_type", "bill_number"),  # payments of a bill
+    )
+
+
 class Blow(Base):
     __tablename__ = "blows"
 
@@ -85,6 +111,10 @@ class Blow(Base):
     notes = Column(Text)
     date_time = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_blows_to_item_id_date_time", "to_item_id", "date_time"),  # latest blow for an item
+    )
+
 class Waste(Base):
     __tablename__ = "wastes"
 
@@ -95,7 +125,7 @@ class Waste(Base):
     price_per_unit = Column(Numeric(12, 2))
     total_price = Column(Numeric(12, 2))
     notes = Column(Text)
-    date = Column(DateTime(timezone=True), server_default=func.now())
+    date = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # daily export, facts refresh
 
 
 class ExtraExpenditure(Base):
@@ -105,7 +135,7 @@ class ExtraExpenditure(Base):
     expense_type = Column(String, nullable=False)  # 'Lunch', 'Electricity', 'Office Supplies', etc.
     description = Column(Text)
     amount = Column(Numeric(12, 2), nullable=False)
-    date = Column(Date, nullable=False)
+    date = Column(Date, nullable=False, index=True)
     notes = Column(Text)
     created_by = Column(String, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
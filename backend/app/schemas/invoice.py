@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal
+
+
+class InvoiceBundleRequest(BaseModel):
+    """Invoices to bundle into one ZIP: the ids (bill numbers for sales/purchases) of one document type"""
+    type: Literal["sale", "purchase", "blow", "waste", "expenditure"]
+    ids: List[str] = Field(..., min_length=1)
@@ -34,6 +34,10 @@ class StockResponse(StockBase):
     class Config:
         from_attributes = True
 
+class StockThresholdUpdate(BaseModel):
+    min_quantity: Optional[int] = None  # alert below this (None = no minimum)
+    max_quantity: Optional[int] = None  # alert above this (None = no maximum)
+
 class StockMovementBase(BaseModel):
     item_id: str
     movement_type: str
@@ -22,8 +22,11 @@ class LedgerResponse(BaseModel):
     party_id: str
     party_name: str
     party_type: str  # 'customer' or 'supplier'
-    month: int
+    month: int  # month/year the period starts in
     year: int
+    period_start: Optional[date] = None
+    period_end: Optional[date] = None  # last day, included
+    period_label: Optional[str] = None
     opening_balance: float = 0.00
     closing_balance: float = 0.00
     total_debit: float = 0.00
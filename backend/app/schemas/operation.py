@@ -28,6 +28,7 @@ class BlowResponse(BlowBase):
     output_quantity: int
     waste_quantity: int
     efficiency_rate: Decimal
+    produced_unit_cost: Optional[Decimal] = None  # preform cost + blow cost per good unit
     date_time: datetime
 
     class Config:
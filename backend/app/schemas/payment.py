@@ -0,0 +1,35 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from datetime import datetime
+from decimal import Decimal
+
+
+class PaymentCreate(BaseModel):
+    """A payment against one sale or purchase"""
+    bill_type: Literal["sale", "purchase"]
+    bill_number: str
+    amount: Decimal = Field(..., gt=0)
+    method: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class SettleRequest(BaseModel):
+    """Bills of one type to mark paid in full"""
+    bill_type: Literal["sale", "purchase"]
+    bill_numbers: List[str] = Field(..., min_length=1)
+    method: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class PaymentResponse(BaseModel):
+    id: int
+    bill_type: str
+    bill_number: str
+    amount: Decimal
+    method: Optional[str] = None
+    notes: Optional[str] = None
+    recorded_by: Optional[str] = None
+    paid_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,230 @@
+"""
+Bulk invoice bundles: many invoice PDFs in one streamed ZIP
+
+load_invoices() fetches the bills of one document type with their line
+items, parties and items in a handful of queries and turns each into a
+render job of plain, picklable snapshots. invoice_zip() renders the jobs
+in a pool of INVOICE_WORKERS processes (reportlab holds the GIL, threads
+would render one at a time) and streams the ZIP, adding each PDF as soon
+as it is done - the ZIP entries are in completion order, not request order.
+"""
+
+from app.core.config import settings
+from dataclasses import dataclass
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, selectinload
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import io
+import logging
+import multiprocessing
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_TYPES = ("sale", "purchase", "blow", "waste", "expenditure")
+
+# Renders queued per worker - enough to keep every worker busy without rendering far ahead of the client
+JOBS_PER_WORKER = 2
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class InvoiceJob:
+    """One invoice to render: generate_<renderer> from invoice_pdf_generator with these arguments"""
+    filename: str
+    renderer: str
+    arguments: Dict
+
+
+# ===== Loading =====
+
+def _snapshot(obj) -> Optional[SimpleNamespace]:
+    """Column values of an ORM object, detached from the session so a worker process can take them"""
+    if obj is None:
+        return None
+    return SimpleNamespace(**{attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs})
+
+
+def _stamp(value) -> str:
+    return value.strftime('%Y%m%d') if value else 'unknown'
+
+
+def _by_id(db: Session, model, ids) -> Dict[str, SimpleNamespace]:
+    ids = {i for i in ids if i}
+    if not ids:
+        return {}
+    return {str(row.id): _snapshot(row) for row in db.query(model).filter(model.id.in_(ids)).all()}
+
+
+def _bill_jobs(db: Session, doc_type: str, ids: List[str]):
+    from app.models.item import Item
+    from app.models.party import Customer, Supplier
+    from app.models.transaction import Purchase, Sale
+
+    model, party_model, party_attr = (
+        (Sale, Customer, "customer_id") if doc_type == "sale" else (Purchase, Supplier, "supplier_id")
+    )
+    bills = db.query(model).options(selectinload(model.line_items)).filter(model.bill_number.in_(ids)).all()
+    parties = _by_id(db, party_model, (getattr(bill, party_attr) for bill in bills))
+    items = _by_id(db, Item, (line.item_id for bill in bills for line in bill.line_items))
+
+    jobs, skipped = [], {}
+    for bill in bills:
+        if not bill.line_items:
+            skipped[bill.bill_number] = "no line items"
+            continue
+        line_items = [_snapshot(line) for line in bill.line_items]
+        arguments = {
+            f"{doc_type}_bill": _snapshot(bill),
+            "customer" if doc_type == "sale" else "supplier": parties.get(getattr(bill, party_attr)),
+            "line_items": line_items,
+            "items_db": [items[line.item_id] for line in line_items if line.item_id in items],
+        }
+        prefix, renderer = ("invoice", "sales_invoice_pdf") if doc_type == "sale" else ("purchase_invoice", "purchase_invoice_pdf")
+        jobs.append(InvoiceJob(f"{prefix}_{bill.bill_number}_{_stamp(bill.date)}.pdf", renderer, arguments))
+    return jobs, skipped, {bill.bill_number for bill in bills}
+
+
+def load_invoices(db: Session, doc_type: str, ids: List[str], current_user) -> Tuple[List[InvoiceJob], Dict[str, str]]:
+    """Render jobs for the requested ids, and {id: reason} for those that can't have an invoice"""
+    from app.models.item import Item
+    from app.models.transaction import Blow, ExtraExpenditure, Waste
+
+    ids = list(dict.fromkeys(ids))  # drop duplicates, keep order
+    if doc_type in ("sale", "purchase"):
+        jobs, skipped, found = _bill_jobs(db, doc_type, ids)
+
+    elif doc_type == "blow":
+        blows = db.query(Blow).filter(Blow.id.in_(ids)).all()
+        items = _by_id(db, Item, [i for blow in blows for i in (blow.from_item_id, blow.to_item_id)])
+        user = SimpleNamespace(username=current_user.username)
+        jobs, skipped = [], {}
+        for blow in blows:
+            from_item, to_item = items.get(blow.from_item_id), items.get(blow.to_item_id)
+            if not from_item or not to_item:
+                skipped[blow.id] = "items not found"
+                continue
+            jobs.append(InvoiceJob(f"blow_process_{blow.id}_{_stamp(blow.date_time)}.pdf", "blow_invoice_pdf",
+                                   {"blow": _snapshot(blow), "from_item": from_item, "to_item": to_item,
+                                    "current_user": user}))
+        found = {blow.id for blow in blows}
+
+    elif doc_type == "waste":
+        wastes = db.query(Waste).filter(Waste.id.in_(ids)).all()
+        items = _by_id(db, Item, (waste.item_id for waste in wastes))
+        jobs, skipped = [], {}
+        for waste in wastes:
+            if waste.item_id not in items:
+                skipped[waste.id] = "item not found"
+                continue
+            jobs.append(InvoiceJob(f"waste_record_{waste.id}_{_stamp(waste.date)}.pdf", "waste_invoice_pdf",
+                                   {"waste": _snapshot(waste), "item": items[waste.item_id]}))
+        found = {waste.id for waste in wastes}
+
+    else:
+        expenditures = db.query(ExtraExpenditure).filter(ExtraExpenditure.id.in_(ids)).all()
+        jobs = [
+            InvoiceJob(f"expense_record_{e.id}_{_stamp(e.date)}.pdf", "expenditure_invoice_pdf",
+                       {"expenditure": _snapshot(e)})
+            for e in expenditures
+        ]
+        skipped = {}
+        found = {e.id for e in expenditures}
+
+    skipped.update({i: "not found" for i in ids if i not in found})
+    return jobs, skipped
+
+
+# ===== Rendering =====
+
+def render_invoice(renderer: str, arguments: Dict) -> bytes:
+    """Runs in a worker process: one invoice PDF as bytes"""
+    from app.utils import invoice_pdf_generator
+    return getattr(invoice_pdf_generator, f"generate_{renderer}")(**arguments).getvalue()
+
+
+def _workers() -> Optional[ProcessPoolExecutor]:
+    """The shared render pool, started on first use (None when INVOICE_WORKERS is 0)"""
+    global _pool
+    if settings.INVOICE_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that holds DB connections and server threads is not safe
+            _pool = ProcessPoolExecutor(max_workers=settings.INVOICE_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+            logger.info(f"🧾 Started {settings.INVOICE_WORKERS} invoice render workers")
+        return _pool
+
+
+def shutdown_invoice_workers():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only, unseekable sink for ZipFile - what it writes is collected until drain()"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def invoice_zip(jobs: List[InvoiceJob], skipped: Dict[str, str]) -> AsyncIterator[bytes]:
+    """Render the jobs in parallel and yield the ZIP bytes as each PDF is added"""
+    loop = asyncio.get_running_loop()
+    pool = _workers()
+    limit = max(1, settings.INVOICE_WORKERS) * JOBS_PER_WORKER
+
+    def submit(job):
+        if pool is None:
+            return asyncio.ensure_future(asyncio.to_thread(render_invoice, job.renderer, job.arguments))
+        return loop.run_in_executor(pool, render_invoice, job.renderer, job.arguments)
+
+    sink = _ZipStream()
+    # PDFs are compressed already - store them as they are
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+    queue = list(reversed(jobs))
+    running: Dict[asyncio.Future, InvoiceJob] = {}
+    try:
+        while queue or running:
+            while queue and len(running) < limit:
+                job = queue.pop()
+                running[submit(job)] = job
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    archive.writestr(job.filename, future.result())
+                except Exception as e:
+                    logger.error(f"❌ Invoice {job.filename} failed: {e}")
+                    skipped[job.filename] = f"render failed: {e}"
+            yield sink.drain()
+
+        if skipped:
+            archive.writestr("skipped.txt", "".join(f"{key}: {reason}\n" for key, reason in skipped.items()))
+        archive.close()
+        yield sink.drain()
+    finally:
+        for future in running:
+            future.cancel()
@@ -9,17 +9,42 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch, mm
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
 from reportlab.pdfgen import canvas
+from reportlab import rl_config
 from datetime import datetime
 from decimal import Decimal
+from functools import lru_cache
 import io
 import os
 
+# Plain zlib streams: ASCII85 on top is encoded in pure Python here (most of an
+# invoice's render time) and makes the file a quarter larger
+rl_config.useA85 = 0
+
+# Logo and signatures are resampled to this resolution for the box they are drawn in
+IMAGE_DPI = 200
+
 try:
     from num2words import num2words
 except ImportError:
     num2words = None
 
 
+@lru_cache(maxsize=16)
+def _print_ready_png(path, modified, width_px, height_px):
+    """The image resized to the pixels it is printed at, as PNG bytes (cached per file version)"""
+    from PIL import Image as PILImage
+    with PILImage.open(path) as image:
+        buffer = io.BytesIO()
+        image.resize((width_px, height_px), PILImage.LANCZOS).save(buffer, format="PNG", optimize=False)
+    return buffer.getvalue()
+
+
+def print_ready_image(path, width, height):
+    """Image flowable for path drawn at width x height points, from a downscaled copy"""
+    data = _print_ready_png(path, os.path.getmtime(path), round(width / inch * IMAGE_DPI), round(height / inch * IMAGE_DPI))
+    return Image(io.BytesIO(data), width=width, height=height)
+
+
 class InvoiceReportGenerator:
     """Generate professional invoice PDFs matching the Care Packages format"""
     
@@ -137,7 +162,7 @@ class InvoiceReportGenerator:
             logo_path = os.path.join(project_root, 'Waze_logo.png')
             if os.path.exists(logo_path):
                 # Scale logo to 2.0 x 1.0 inch for better appearance
-                logo_element = Image(logo_path, width=2.5*inch, height=1*inch)
+                logo_element = print_ready_image(logo_path, width=2.5*inch, height=1*inch)
         except Exception as e:
             pass
         
@@ -364,7 +389,7 @@ class InvoiceReportGenerator:
             sig_path = os.path.join(app_dir, 'static', 'uploads', 'zeeshan_signature.png')
             if os.path.exists(sig_path):
                 # Load with width=2.0 inches and height 3 inches for larger display
-                zeeshan_sig_element = Image(sig_path, width=2.2*inch, height=1.4*inch)
+                zeeshan_sig_element = print_ready_image(sig_path, width=2.2*inch, height=1.4*inch)
                 print(f"✓ Zeeshan signature loaded: {sig_path} (2.0\" x 3.0\")")
             else:
                 print(f"✗ Zeeshan signature not found: {sig_path}")
@@ -378,7 +403,7 @@ class InvoiceReportGenerator:
             sig_path = os.path.join(app_dir, 'static', 'uploads', 'Waheed_sign.png')
             if os.path.exists(sig_path):
                 # Load with width=1.5 inches and height=1.5 inches for larger display
-                waheed_sig_element = Image(sig_path, width=2*inch, height=1.2*inch)
+                waheed_sig_element = print_ready_image(sig_path, width=2*inch, height=1.2*inch)
                 print(f"✓ Waheed signature loaded: {sig_path} (2\" x 1.2\")")
             else:
                 print(f"✗ Waheed signature not found: {sig_path}")
@@ -0,0 +1,154 @@
+"""
+Ledger renderers: JSON, PDF and Excel from the same row stream (app/db/ledger.py)
+
+Each renderer consumes ledger_rows() once and yields the response body in
+chunks, so a multi-year statement never holds its bills in memory. PDF and
+Excel files are assembled in a spooled temporary file (in memory while
+small, on disk beyond SPOOL_BYTES) and streamed back from there.
+"""
+
+from app.core.responses import dumps
+from app.db.ledger import Ledger, LedgerRow
+from tempfile import SpooledTemporaryFile
+from typing import IO, Iterable, Iterator
+
+# Spooled files stay in memory up to this size
+SPOOL_BYTES = 4 * 1024 * 1024
+
+# Bytes per chunk when streaming a finished file
+FILE_CHUNK = 64 * 1024
+
+# Ledger rows per JSON chunk
+JSON_ROWS_PER_CHUNK = 500
+
+
+def _file_chunks(build) -> Iterator[bytes]:
+    """Run build(file) into a spooled file, then yield the file in chunks"""
+    with SpooledTemporaryFile(max_size=SPOOL_BYTES) as file:
+        build(file)
+        file.seek(0)
+        while chunk := file.read(FILE_CHUNK):
+            yield chunk
+
+
+def ledger_json(ledger: Ledger, rows: Iterable[LedgerRow]) -> Iterator[bytes]:
+    """LedgerResponse as JSON, transactions first and the totals once they are known"""
+    header = dumps(ledger.header())
+    yield header[:-1] + b',"transactions":['
+    batch = []
+    first = True
+    for row in rows:
+        batch.append(dumps(row._asdict()))
+        if len(batch) >= JSON_ROWS_PER_CHUNK:
+            yield (b"" if first else b",") + b",".join(batch)
+            batch, first = [], False
+    if batch:
+        yield (b"" if first else b",") + b",".join(batch)
+    yield b"]," + dumps(ledger.totals())[1:]
+
+
+def _write_pdf(ledger: Ledger, rows: Iterable[LedgerRow], file: IO[bytes]):
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+
+    pdf_canvas = canvas.Canvas(file, pagesize=A4)
+    title = "Customer" if ledger.party_type == "customer" else "Supplier"
+
+    # Title
+    pdf_canvas.setFont("Helvetica-Bold", 16)
+    pdf_canvas.drawString(50, 800, f"{title} Ledger")
+
+    # Party info
+    pdf_canvas.setFont("Helvetica", 10)
+    pdf_canvas.drawString(50, 780, f"{title}: {ledger.party_name}")
+    pdf_canvas.drawString(50, 765, f"Period: {ledger.period.label}")
+
+    def draw_headers(y):
+        pdf_canvas.setFont("Helvetica-Bold", 9)
+        pdf_canvas.drawString(50, y, "Date")
+        pdf_canvas.drawString(120, y, "Reference")
+        pdf_canvas.drawString(200, y, "Debit")
+        pdf_canvas.drawString(280, y, "Credit")
+        pdf_canvas.drawString(360, y, "Balance")
+        pdf_canvas.drawString(460, y, "Status")
+        pdf_canvas.setFont("Helvetica", 9)
+
+    draw_headers(740)
+    y = 725
+    pdf_canvas.drawString(120, y, "Opening balance")
+    pdf_canvas.drawString(360, y, f"{ledger.opening_balance:.2f}")
+    y -= 15
+
+    for row in rows:
+        pdf_canvas.drawString(50, y, row.date.strftime('%Y-%m-%d') if row.date else "")
+        pdf_canvas.drawString(120, y, row.reference_number)
+        pdf_canvas.drawString(200, y, f"{row.debit:.2f}")
+        pdf_canvas.drawString(280, y, f"{row.credit:.2f}")
+        pdf_canvas.drawString(360, y, f"{row.balance:.2f}")
+        pdf_canvas.drawString(460, y, row.payment_status)
+
+        y -= 15
+        if y < 50:
+            pdf_canvas.showPage()
+            draw_headers(800)
+            y = 785
+
+    # Totals
+    if y < 80:
+        pdf_canvas.showPage()
+        y = 800
+    y -= 5
+    pdf_canvas.setFont("Helvetica-Bold", 9)
+    totals = ledger.totals()
+    pdf_canvas.drawString(120, y, "Totals")
+    pdf_canvas.drawString(200, y, f"{totals['total_debit']:.2f}")
+    pdf_canvas.drawString(280, y, f"{totals['total_credit']:.2f}")
+    pdf_canvas.drawString(120, y - 15, "Closing balance")
+    pdf_canvas.drawString(360, y - 15, f"{totals['closing_balance']:.2f}")
+
+    pdf_canvas.save()
+
+
+def ledger_pdf(ledger: Ledger, rows: Iterable[LedgerRow]) -> Iterator[bytes]:
+    """Ledger PDF: opening balance, one line per bill, totals and closing balance"""
+    return _file_chunks(lambda file: _write_pdf(ledger, rows, file))
+
+
+def _write_excel(ledger: Ledger, rows: Iterable[LedgerRow], file: IO[bytes]):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    # write_only: rows go straight to the file instead of an in-memory sheet
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Ledger")
+    bold = Font(bold=True)
+
+    def cells(*values, font=None):
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            if font:
+                cell.font = font
+            row.append(cell)
+        return row
+
+    title = "Customer" if ledger.party_type == "customer" else "Supplier"
+    ws.append(cells(f"{title} Ledger - {ledger.party_name}", font=Font(bold=True, size=14)))
+    ws.append(cells("Period", ledger.period.label))
+    ws.append([])
+    ws.append(cells("Date", "Reference", "Description", "Debit", "Credit", "Balance", "Status", font=bold))
+    ws.append(["", "", "Opening balance", None, None, ledger.opening_balance])
+    for row in rows:
+        ws.append([row.date, row.reference_number, row.description, row.debit, row.credit,
+                   row.balance, row.payment_status])
+
+    totals = ledger.totals()
+    ws.append(cells("", "", "Totals", totals["total_debit"], totals["total_credit"], font=bold))
+    ws.append(cells("", "", "Closing balance", None, None, totals["closing_balance"], font=bold))
+    wb.save(file)
+
+
+def ledger_excel(ledger: Ledger, rows: Iterable[LedgerRow]) -> Iterator[bytes]:
+    """Ledger workbook with the same lines as the PDF"""
+    return _file_chunks(lambda file: _write_excel(ledger, rows, file))
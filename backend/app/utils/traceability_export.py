@@ -0,0 +1,99 @@
+"""
+Traceability renderers: JSON, Excel and CSV from the same row stream (app/db/traceability.py)
+
+JSON groups the rows per sale line (lots, and the preform bills behind blown
+lots); Excel and CSV keep one row per sale line, lot and origin so they can
+be filtered and pivoted. All of them consume trace_rows() once and stream.
+"""
+
+from app.core.responses import dumps
+from app.db.traceability import Trace, TraceRow, trace_sales
+from app.utils.ledger_export import JSON_ROWS_PER_CHUNK, _file_chunks
+from typing import Dict, IO, Iterable, Iterator
+import csv
+import io
+
+COLUMNS = (
+    "Date", "Bill", "Customer", "Sold Qty", "Lot Source", "Lot Reference", "Lot Date", "Lot Unit Cost",
+    "Qty From Lot", "Origin Source", "Origin Reference", "Supplier", "Origin Date", "Origin Unit Cost",
+    "Qty From Origin",
+)
+
+
+def trace_json(trace: Trace, rows: Iterable[TraceRow], customers: Dict[str, str],
+               suppliers: Dict[str, str]) -> Iterator[bytes]:
+    """{item, period, sales: [{..., customer_name, lots: [{..., origins: [{..., supplier_name}]}], untraced}]}"""
+    header = dumps(trace.header())
+    yield header[:-1] + b',"sales":['
+    batch = []
+    first = True
+    for sale in trace_sales(rows):
+        sale["customer_name"] = customers.get(sale["customer_id"])
+        for lot in sale["lots"]:
+            for origin in lot["origins"]:
+                origin["supplier_name"] = suppliers.get(origin["supplier_id"])
+        batch.append(dumps(sale))
+        if len(batch) >= JSON_ROWS_PER_CHUNK:
+            yield (b"" if first else b",") + b",".join(batch)
+            batch, first = [], False
+    if batch:
+        yield (b"" if first else b",") + b",".join(batch)
+    yield b"]}"
+
+
+def _flat(row: TraceRow, customers: Dict[str, str], suppliers: Dict[str, str]) -> list:
+    return [
+        row.date, row.bill_number, customers.get(row.customer_id, row.customer_id), row.sold_quantity,
+        row.lot_source or "not received", row.lot_reference, row.lot_date, row.lot_unit_cost,
+        row.lot_quantity if row.lot_source else row.sold_quantity,
+        row.origin_source, row.origin_bill, suppliers.get(row.origin_supplier_id, row.origin_supplier_id),
+        row.origin_date, row.origin_unit_cost, row.quantity if row.origin_source else None,
+    ]
+
+
+def _write_excel(trace: Trace, rows: Iterable[TraceRow], customers, suppliers, file: IO[bytes]):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Traceability")
+    bold = Font(bold=True)
+
+    def cells(*values, font=None):
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            if font:
+                cell.font = font
+            row.append(cell)
+        return row
+
+    ws.append(cells(f"Lot Traceability - {trace.item_name}", font=Font(bold=True, size=14)))
+    ws.append(cells("Period", trace.period.label))
+    ws.append([])
+    ws.append(cells(*COLUMNS, font=bold))
+    for row in rows:
+        ws.append(_flat(row, customers, suppliers))
+    wb.save(file)
+
+
+def trace_excel(trace: Trace, rows: Iterable[TraceRow], customers: Dict[str, str],
+                suppliers: Dict[str, str]) -> Iterator[bytes]:
+    """Workbook with one row per sale line, lot and origin"""
+    return _file_chunks(lambda file: _write_excel(trace, rows, customers, suppliers, file))
+
+
+def trace_csv(trace: Trace, rows: Iterable[TraceRow], customers: Dict[str, str],
+              suppliers: Dict[str, str]) -> Iterator[bytes]:
+    """The Excel rows as CSV, a chunk of lines at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(_flat(row, customers, suppliers))
+        if count % JSON_ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
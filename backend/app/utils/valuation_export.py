@@ -0,0 +1,68 @@
+"""
+Inventory valuation renderers: Excel and CSV of the same rows (app/db/valuation.py)
+
+The workbook has the items on one sheet and the totals by type, size and
+grade on a second; the CSV is the item sheet alone, for spreadsheets and
+closing imports.
+"""
+
+from app.db.valuation import GROUPINGS, ItemValuation
+from app.utils.ledger_export import _file_chunks
+from datetime import date
+from typing import IO, Iterator, List
+import csv
+import io
+
+COLUMNS = ("Item ID", "Item", "Type", "Size", "Grade", "Quantity", "Unit Cost", "Value")
+
+
+def _values(row: ItemValuation) -> list:
+    return [row.item_id, row.item_name, row.type, row.size, row.grade, row.quantity, row.unit_cost, row.value]
+
+
+def _write_excel(as_of: date, rows: List[ItemValuation], totals: dict, file: IO[bytes]):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    wb = Workbook(write_only=True)
+    bold = Font(bold=True)
+
+    def cells(ws, *values, font=None):
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            if font:
+                cell.font = font
+            row.append(cell)
+        return row
+
+    ws = wb.create_sheet("Valuation")
+    ws.append(cells(ws, f"Inventory Valuation at Cost - {as_of:%d %b %Y}", font=Font(bold=True, size=14)))
+    ws.append([])
+    ws.append(cells(ws, *COLUMNS, font=bold))
+    for row in rows:
+        ws.append(_values(row))
+    ws.append(cells(ws, "", "Total", "", "", "", totals["quantity"], None, totals["value"], font=bold))
+
+    ws = wb.create_sheet("Totals")
+    for grouping in GROUPINGS:
+        ws.append(cells(ws, grouping.title(), "Quantity", "Value", font=bold))
+        for group in totals[f"by_{grouping}"]:
+            ws.append([group[grouping], group["quantity"], group["value"]])
+        ws.append([])
+    wb.save(file)
+
+
+def valuation_excel(as_of: date, rows: List[ItemValuation], totals: dict) -> Iterator[bytes]:
+    """Workbook: the valued items and their totals"""
+    return _file_chunks(lambda file: _write_excel(as_of, rows, totals, file))
+
+
+def valuation_csv(rows: List[ItemValuation]) -> bytes:
+    """One line per valued item"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    writer.writerows(_values(row) for row in rows)
+    return buffer.getvalue().encode()
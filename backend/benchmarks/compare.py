@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Compare two benchmark result files (benchmarks/run.py output).
+
+Prints median latency and SQL statement counts side by side and flags cases
+that got slower than the threshold.
+
+Run from backend folder:
+  python benchmarks/compare.py results/base.json results/new.json [--threshold 10] [--fail-on-regression]
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    base, new = load(args.base), load(args.new)
+    for label, report in (("base", base), ("new", new)):
+        meta = report["meta"]
+        print(f"{label}: {meta.get('commit')} {meta['scale']} on {meta['database']} ({meta['timestamp']})")
+    if base["meta"]["sale_lines"] != new["meta"]["sale_lines"] or base["meta"]["database"] != new["meta"]["database"]:
+        print("⚠️ Different scale or database - numbers are not directly comparable")
+
+    print(f"\n{'case':<24} {'base ms':>10} {'new ms':>10} {'change':>8} {'sql':>11}")
+    regressions = []
+    for name in sorted(set(base["results"]) | set(new["results"])):
+        old, cur = base["results"].get(name, {}), new["results"].get(name, {})
+        if old.get("status") != "ok" or cur.get("status") != "ok":
+            print(f"{name:<24} {old.get('status', '-'):>10} {cur.get('status', '-'):>10}")
+            continue
+        change = (cur["median_ms"] - old["median_ms"]) / old["median_ms"] * 100 if old["median_ms"] else 0.0
+        sql = f"{old.get('db_statements')}->{cur.get('db_statements')}"
+        flag = ""
+        if change > args.threshold:
+            flag = " ❌"
+            regressions.append(name)
+        elif change < -args.threshold:
+            flag = " ✅"
+        print(f"{name:<24} {old['median_ms']:>10.1f} {cur['median_ms']:>10.1f} {change:>+7.1f}% {sql:>11}{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than {args.threshold:.0f}%: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Deterministic synthetic dataset for the benchmark suite.
+
+Size is expressed in sale line items (the scale factor); every other table is
+derived from it with ratios modelled on the shop's real mix:
+  - ~3 line items per sale, 60% paid / 25% pending / 15% partial
+  - 0.4 purchase lines (preforms) per sale line, 2 lines per purchase
+  - one blow run (preform -> bottle) per 20 sale lines
+  - one waste record per 100 sale lines, one expenditure per 200
+
+Events are spread over two years and generated in date order, so stock
+movements carry consistent before/after quantities. Same scale + seed always
+produces the same rows.
+"""
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Iterator, Tuple
+import math
+import random
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+START = datetime(2023, 7, 1, tzinfo=timezone.utc)
+DAYS = 730
+BENCH_USER_ID = "bench-admin"
+BENCH_USERNAME = "bench-admin"
+
+SIZES = {"250ml": 6, "330ml": 7, "500ml": 9, "600ml": 10, "1000ml": 14, "1500ml": 18}  # preform Rs/unit
+GRADES = {"A": Decimal("1.00"), "B": Decimal("0.90"), "C": Decimal("0.80")}
+EXPENSE_TYPES = ["Electricity", "Lunch", "Fuel", "Maintenance", "Office Supplies", "Transport"]
+
+# Load order respects foreign keys; stocks come last (final quantities)
+TABLE_ORDER = [
+    "users", "items", "customers", "suppliers",
+    "purchases", "purchase_line_items", "sales", "sale_line_items",
+    "blows", "wastes", "extra_expenditures", "stock_movements", "stocks",
+]
+
+Row = Tuple[str, Dict]
+
+
+def parse_scale(value: str) -> int:
+    """'100k' / '1m' / '2500' -> number of sale lines"""
+    if value.lower() in SCALES:
+        return SCALES[value.lower()]
+    return int(value)
+
+
+def _money(value) -> Decimal:
+    return Decimal(value).quantize(Decimal("0.01"))
+
+
+class DatasetGenerator:
+    def __init__(self, sale_lines: int, seed: int = 42):
+        self.sale_lines = sale_lines
+        self.rng = random.Random(seed)
+        self.stock: Dict[str, int] = {}
+        self.counts: Dict[str, int] = {table: 0 for table in TABLE_ORDER}
+
+        self.preforms = []
+        self.bottles = []
+        self.preform_cost: Dict[str, Decimal] = {}
+        self.bottle_for: Dict[str, str] = {}
+        self.customers = [f"CUST-{i:05d}" for i in range(max(50, sale_lines // 200))]
+        self.suppliers = [f"SUPP-{i:04d}" for i in range(max(10, sale_lines // 2000))]
+
+    def _row(self, table: str, row: dict) -> Row:
+        self.counts[table] += 1
+        return table, row
+
+    def _movement(self, item_id, movement_type, change, reference_id, when, notes=None) -> Row:
+        before = self.stock.get(item_id, 0)
+        after = before + change
+        self.stock[item_id] = after
+        return self._row("stock_movements", {
+            "item_id": item_id, "movement_type": movement_type, "quantity_change": change,
+            "reference_id": reference_id, "before_quantity": before, "after_quantity": after,
+            "recorded_by": BENCH_USER_ID, "movement_date": when, "notes": notes,
+        })
+
+    def rows(self) -> Iterator[Row]:
+        yield from self._reference_rows()
+
+        n_sales = math.ceil(self.sale_lines / 3)
+        n_purchases = max(1, round(self.sale_lines * 0.2))
+        n_blows = max(1, self.sale_lines // 20)
+        n_wastes = max(1, self.sale_lines // 100)
+        n_expenses = max(1, self.sale_lines // 200)
+        totals = {"purchase": n_purchases, "blow": n_blows, "sale": n_sales, "waste": n_wastes, "expense": n_expenses}
+        done = {kind: 0 for kind in totals}
+        lines_left = self.sale_lines
+
+        for day in range(DAYS):
+            # Spread each event type evenly over the period
+            events = []
+            for kind, total in totals.items():
+                target = total * (day + 1) // DAYS
+                events.extend((self.rng.randint(6 * 3600, 20 * 3600), kind) for _ in range(target - done[kind]))
+                done[kind] = target
+            events.sort()
+            day_start = START + timedelta(days=day)
+            for seconds, kind in events:
+                when = day_start + timedelta(seconds=seconds)
+                if kind == "purchase":
+                    yield from self._purchase(when)
+                elif kind == "blow":
+                    yield from self._blow(when)
+                elif kind == "sale" and lines_left > 0:
+                    lines = min(lines_left, self.rng.choice((2, 3, 3, 4)))
+                    lines_left -= lines
+                    yield from self._sale(when, lines)
+                elif kind == "waste":
+                    yield from self._waste(when)
+                elif kind == "expense":
+                    yield from self._expense(when)
+
+        for item_id in self.preforms + self.bottles:
+            yield self._row("stocks", {"item_id": item_id, "quantity": self.stock.get(item_id, 0),
+                                       "last_updated": START + timedelta(days=DAYS)})
+
+    def _reference_rows(self) -> Iterator[Row]:
+        yield self._row("users", {"id": BENCH_USER_ID, "username": BENCH_USERNAME, "email": "bench@example.com",
+                                  "password_hash": "!", "role": "admin", "created_at": START})
+        for size, price in SIZES.items():
+            for grade, factor in GRADES.items():
+                preform_id = f"PRE-{size}-{grade}"
+                bottle_id = f"BTL-{size}-{grade}"
+                self.preforms.append(preform_id)
+                self.bottles.append(bottle_id)
+                self.preform_cost[preform_id] = _money(Decimal(price) * factor)
+                self.bottle_for[preform_id] = bottle_id
+                yield self._row("items", {"id": preform_id, "name": f"Preform {size} {grade}", "type": "preform",
+                                          "size": size, "grade": grade, "unit": "pcs", "created_at": START})
+                yield self._row("items", {"id": bottle_id, "name": f"Bottle {size} {grade}", "type": "bottle",
+                                          "size": size, "grade": grade, "unit": "pcs", "created_at": START})
+        for i, customer_id in enumerate(self.customers):
+            yield self._row("customers", {"id": customer_id, "name": f"Customer {i}", "contact": f"0300-{i:07d}",
+                                          "address": f"Shop {i}, Rawalpindi", "notes": None})
+        for i, supplier_id in enumerate(self.suppliers):
+            yield self._row("suppliers", {"id": supplier_id, "name": f"Supplier {i}", "contact": f"051-{i:07d}",
+                                          "address": f"Plot {i}, Industrial Area", "notes": None})
+
+    def _payment(self, total: Decimal) -> Tuple[str, Decimal]:
+        roll = self.rng.random()
+        if roll < 0.60:
+            return "paid", total
+        if roll < 0.85:
+            return "pending", Decimal("0.00")
+        return "partial", _money(total / 2)
+
+    def _purchase(self, when: datetime) -> Iterator[Row]:
+        bill = f"PUR-{self.counts['purchases'] + 1:07d}"
+        lines = []
+        for item_id in self.rng.sample(self.preforms, 2):
+            quantity = self.rng.randint(400, 1400)
+            unit_price = _money(self.preform_cost[item_id] * Decimal(self.rng.uniform(0.95, 1.05)))
+            lines.append((item_id, quantity, unit_price, _money(unit_price * quantity)))
+        total = sum(line[3] for line in lines)
+        status, paid = self._payment(total)
+        yield self._row("purchases", {
+            "bill_number": bill, "supplier_id": self.rng.choice(self.suppliers), "total_amount": total,
+            "status": "pending", "payment_status": status, "paid_amount": paid, "due_date": when.date(),
+            "notes": None, "created_by": BENCH_USER_ID, "date": when,
+        })
+        for item_id, quantity, unit_price, line_total in lines:
+            yield self._row("purchase_line_items", {
+                "id": f"{bill}-{item_id}", "bill_number": bill, "item_id": item_id,
+                "quantity": quantity, "unit_price": unit_price, "total_price": line_total,
+            })
+            yield self._movement(item_id, "purchase", quantity, bill, when, "Purchase - Line item")
+
+    def _blow(self, when: datetime) -> Iterator[Row]:
+        blow_id = f"BLOW-{self.counts['blows'] + 1:06d}"
+        from_item = self.rng.choice(self.preforms)
+        to_item = self.bottle_for[from_item]
+        input_quantity = self.rng.randint(4000, 8000)
+        waste_quantity = int(input_quantity * self.rng.uniform(0.005, 0.03))
+        output_quantity = input_quantity - waste_quantity
+        blow_cost = _money(Decimal(self.rng.uniform(2.0, 4.0)))
+        yield self._row("blows", {
+            "id": blow_id, "user_id": BENCH_USER_ID, "from_item_id": from_item, "to_item_id": to_item,
+            "quantity": output_quantity, "blow_cost_per_unit": blow_cost,
+            "produced_unit_cost": self.preform_cost[from_item] + blow_cost,
+            "input_quantity": input_quantity, "output_quantity": output_quantity, "waste_quantity": waste_quantity,
+            "efficiency_rate": _money(Decimal(output_quantity * 100) / Decimal(input_quantity)),
+            "notes": None, "date_time": when,
+        })
+        yield self._movement(from_item, "production", -input_quantity, blow_id, when, "Blow - preform consumed")
+        yield self._movement(to_item, "production", output_quantity, blow_id, when, "Blow - bottles produced")
+
+    def _sale(self, when: datetime, lines: int) -> Iterator[Row]:
+        bill = f"SAL-{self.counts['sales'] + 1:07d}"
+        rows = []
+        for item_id in self.rng.sample(self.bottles, lines):
+            preform = "PRE-" + item_id[4:]
+            cost_basis = self.preform_cost[preform] + Decimal("3.00")
+            unit_price = _money(cost_basis * Decimal(self.rng.uniform(1.15, 1.45)))
+            quantity = self.rng.randint(50, 500)
+            rows.append((item_id, quantity, unit_price, _money(unit_price * quantity), cost_basis))
+        total = sum(row[3] for row in rows)
+        status, paid = self._payment(total)
+        yield self._row("sales", {
+            "bill_number": bill, "customer_id": self.rng.choice(self.customers), "total_price": total,
+            "status": "confirmed", "payment_status": status, "payment_method": "cash", "paid_amount": paid,
+            "due_date": when.date(), "notes": None, "editable_by_admin_only": False,
+            "created_by": BENCH_USER_ID, "date": when,
+        })
+        for item_id, quantity, unit_price, line_total, cost_basis in rows:
+            yield self._row("sale_line_items", {
+                "id": f"{bill}-{item_id}", "bill_number": bill, "item_id": item_id, "quantity": quantity,
+                "unit_price": unit_price, "blow_price": Decimal("0.00"), "total_price": line_total,
+                "cost_basis": cost_basis,
+            })
+            yield self._movement(item_id, "sale", -quantity, bill, when, "Sale to customer - Line item")
+
+    def _waste(self, when: datetime) -> Iterator[Row]:
+        waste_id = f"WST-{self.counts['wastes'] + 1:06d}"
+        item_id = self.rng.choice(self.bottles)
+        quantity = self.rng.randint(10, 200)
+        price = _money(Decimal(self.rng.uniform(1.0, 3.0)))
+        yield self._row("wastes", {
+            "id": waste_id, "user_id": BENCH_USER_ID, "item_id": item_id, "quantity": quantity,
+            "price_per_unit": price, "total_price": _money(price * quantity), "notes": None, "date": when,
+        })
+        yield self._movement(item_id, "waste", -quantity, waste_id, when, "Waste recovery")
+
+    def _expense(self, when: datetime) -> Iterator[Row]:
+        expense_id = f"EXP-{self.counts['extra_expenditures'] + 1:06d}"
+        yield self._row("extra_expenditures", {
+            "id": expense_id, "expense_type": self.rng.choice(EXPENSE_TYPES), "description": "Synthetic expense",
+            "amount": _money(Decimal(self.rng.uniform(500, 15000))), "date": when.date(), "notes": None,
+            "created_by": BENCH_USER_ID, "created_at": when,
+        })
+
+
+def generate(sale_lines: int, seed: int = 42) -> Tuple[DatasetGenerator, Iterator[Row]]:
+    """Return the generator (for row counts once exhausted) and its row stream"""
+    generator = DatasetGenerator(sale_lines, seed)
+    return generator, generator.rows()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""HTTP load test: simulated shop clerks running the daily frontend flows.
+
+Each virtual clerk picks a weighted scenario, runs the same requests the
+page in frontend/src/pages makes, waits a think time and repeats. Reports
+throughput, p50/p95/p99 latency and error rate per scenario and per request.
+
+Scenarios (default weights):
+  sales_page       35  Sales.jsx mount: /sales/, /customers/, /stocks/items
+  create_sale      15  new sale form: /reports/count/sale, then POST /sales with 2-4 lines
+  download_invoice 20  Sales.jsx PDF button: /invoices/invoice/sale/{bill}
+  dashboard        20  Dashboard.jsx mount: summary, stats/monthly, expenditure total (parallel)
+  month_statement  10  Ledger.jsx: /reports/ledger/customer/{id}?year=&month=
+
+Run against a local server (from backend folder), e.g. on the benchmark dataset:
+  DATABASE_URL=sqlite:///benchmarks/.data/bench-10k-42.sqlite uvicorn app.main:app --workers 2
+  python benchmarks/loadtest.py --users 20 --duration 60
+  python benchmarks/loadtest.py --users 50 --think-time 0 --weights sales_page=1,dashboard=1
+
+Without --token/--username a token for the benchmark admin is minted with the
+local SECRET_KEY, so the server must share the same settings.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.dataset import BENCH_USER_ID
+from benchmarks.run import percentile
+
+API = "/api/v1"
+
+DEFAULT_WEIGHTS = {
+    "sales_page": 35,
+    "create_sale": 15,
+    "download_invoice": 20,
+    "dashboard": 20,
+    "month_statement": 10,
+}
+
+
+class Stats:
+    """Latency samples and outcomes, keyed by scenario or request name"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.statuses = defaultdict(Counter)
+
+    def record(self, name, elapsed_ms, ok, status):
+        self.latencies[name].append(elapsed_ms)
+        self.statuses[name][status] += 1
+        if not ok:
+            self.errors[name] += 1
+
+    def summary(self, seconds):
+        report = {}
+        for name, samples in sorted(self.latencies.items()):
+            report[name] = {
+                "count": len(samples),
+                "per_second": round(len(samples) / seconds, 2),
+                "error_rate": round(self.errors[name] / len(samples), 4),
+                "p50_ms": round(percentile(samples, 50), 1),
+                "p95_ms": round(percentile(samples, 95), 1),
+                "p99_ms": round(percentile(samples, 99), 1),
+                "max_ms": round(max(samples), 1),
+                "statuses": {str(k): v for k, v in self.statuses[name].items()},
+            }
+        return report
+
+
+class Clerk:
+    """One virtual user; shares the catalog (customers, items, bills) with the others"""
+
+    def __init__(self, client, catalog, stats, rng, number):
+        self.client = client
+        self.catalog = catalog
+        self.stats = stats
+        self.rng = rng
+        self.number = number
+        self.created = 0
+        self.failed = False
+
+    async def request(self, name, method, url, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        response = None
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = response.status_code
+            await response.aread()
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        ok = isinstance(status, int) and 200 <= status < 300
+        self.stats.record(name, (time.perf_counter() - start) * 1000, ok, status)
+        if not ok:
+            self.failed = True
+        return response if ok else None
+
+    async def sales_page(self):
+        # Sales.jsx fetches these one after the other
+        sales = await self.request("GET /sales/", "GET", f"{API}/sales/")
+        await self.request("GET /customers/", "GET", f"{API}/customers/")
+        await self.request("GET /stocks/items", "GET", f"{API}/stocks/items")
+        if sales is not None:
+            self.catalog.remember_sales(sales.json())
+
+    async def create_sale(self):
+        await self.request("GET /reports/count/sale", "GET", f"{API}/reports/count/sale")
+        # The frontend derives the number from the count, which races between
+        # concurrent clerks; use a unique number so failures mean real errors
+        self.created += 1
+        bill = f"LOAD-{os.getpid()}-{self.number}-{self.created}"
+        lines = self.rng.sample(self.catalog.sellable, min(len(self.catalog.sellable), self.rng.randint(2, 4)))
+        body = {
+            "bill_number": bill,
+            "customer_id": self.rng.choice(self.catalog.customers),
+            "due_date": time.strftime("%Y-%m-%d"),
+            "payment_status": self.rng.choice(("paid", "pending")),
+            "payment_method": "cash",
+            "line_items": [
+                {"item_id": item_id, "quantity": self.rng.randint(5, 40), "unit_price": round(self.rng.uniform(10, 30), 2)}
+                for item_id in lines
+            ],
+        }
+        if await self.request("POST /sales", "POST", f"{API}/sales/", json=body) is not None:
+            self.catalog.bills.append(bill)
+
+    async def download_invoice(self):
+        bill = self.rng.choice(self.catalog.bills)
+        await self.request("GET /invoices/invoice/sale/{bill}", "GET", f"{API}/invoices/invoice/sale/{bill}")
+
+    async def dashboard(self):
+        # Dashboard.jsx loads these with Promise.all
+        await asyncio.gather(
+            self.request("GET /dashboard/summary", "GET", f"{API}/dashboard/summary"),
+            self.request("GET /dashboard/stats/monthly", "GET", f"{API}/dashboard/stats/monthly"),
+            self.request("GET /extra-expenditures/total", "GET", f"{API}/extra-expenditures/total"),
+        )
+
+    async def month_statement(self):
+        customer_id, year, month = self.rng.choice(self.catalog.statements)
+        await self.request("GET /reports/ledger/customer/{id}", "GET", f"{API}/reports/ledger/customer/{customer_id}",
+                           params={"year": year, "month": month})
+
+    async def run_scenario(self, name):
+        self.failed = False
+        start = time.perf_counter()
+        await getattr(self, name)()
+        return (time.perf_counter() - start) * 1000, not self.failed
+
+
+class Catalog:
+    """Ids the scenarios draw from, discovered from the API before the run"""
+
+    def __init__(self, customers, items, sales):
+        self.customers = [c["id"] for c in customers]
+        # Bottles with plenty of stock, so sales don't fail on availability
+        self.sellable = [i["id"] for i in items if i.get("type") == "bottle" and (i.get("current_stock") or 0) >= 1000]
+        if len(self.sellable) < 2:
+            self.sellable = [i["id"] for i in items]
+        self.bills = []
+        self.statements = []
+        self.remember_sales(sales)
+
+    def remember_sales(self, sales):
+        for sale in sales[:200]:
+            self.bills.append(sale["bill_number"])
+            date = sale.get("date") or ""
+            if len(date) >= 7 and sale.get("customer_id"):
+                self.statements.append((sale["customer_id"], int(date[:4]), int(date[5:7])))
+        del self.bills[:-500]
+        del self.statements[:-500]
+
+
+async def wait_until_ready(client, timeout):
+    """/health answers 503 while the app is warming up"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise SystemExit(f"❌ Server not healthy after {timeout}s")
+        await asyncio.sleep(1)
+
+
+async def authenticate(client, args):
+    if args.token:
+        return args.token
+    if args.username:
+        response = await client.post(f"{API}/auth/login", json={"username": args.username, "password": args.password})
+        response.raise_for_status()
+        return response.json()["access_token"]
+    # Same claims as app.core.security.create_access_token, without importing the database layer
+    from jose import jwt
+    from app.core.config import settings
+    expire = datetime.utcnow() + timedelta(hours=12)
+    return jwt.encode({"sub": BENCH_USER_ID, "exp": expire}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+async def clerk_loop(clerk, weights, start_at, measure_from, stop_at, think_time, scenario_stats):
+    names = list(weights)
+    values = list(weights.values())
+    await asyncio.sleep(max(0.0, start_at - time.monotonic()))
+    while time.monotonic() < stop_at:
+        name = clerk.rng.choices(names, weights=values)[0]
+        began = time.monotonic()
+        elapsed_ms, ok = await clerk.run_scenario(name)
+        if began >= measure_from:
+            scenario_stats.record(name, elapsed_ms, ok, "ok" if ok else "error")
+        if think_time > 0:
+            await asyncio.sleep(clerk.rng.expovariate(1 / think_time))
+
+
+def parse_weights(value):
+    weights = dict(DEFAULT_WEIGHTS)
+    if value:
+        weights = {}
+        for part in value.split(","):
+            name, _, weight = part.partition("=")
+            if name not in DEFAULT_WEIGHTS:
+                raise SystemExit(f"Unknown scenario '{name}' (choose from {', '.join(DEFAULT_WEIGHTS)})")
+            weights[name] = float(weight or 1)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+def print_table(title, report):
+    print(f"\n{title:<36} {'count':>7} {'/s':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, row in report.items():
+        print(f"{name:<36} {row['count']:>7} {row['per_second']:>8.2f} {row['error_rate'] * 100:>5.1f}% "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+
+
+async def main_async(args):
+    weights = parse_weights(args.weights)
+    limits = httpx.Limits(max_connections=args.users * 3, max_keepalive_connections=args.users * 3)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        await wait_until_ready(client, args.ready_timeout)
+        client.headers["Authorization"] = f"Bearer {await authenticate(client, args)}"
+
+        customers = (await client.get(f"{API}/customers/")).raise_for_status().json()
+        items = (await client.get(f"{API}/stocks/items")).raise_for_status().json()
+        sales = (await client.get(f"{API}/sales/", params={"limit": 200})).raise_for_status().json()
+        catalog = Catalog(customers, items, sales)
+        if not catalog.customers or not catalog.sellable:
+            raise SystemExit("❌ Need at least one customer and item (load the benchmark dataset first)")
+        if not catalog.bills:
+            weights.pop("download_invoice", None)
+            weights.pop("month_statement", None)
+
+        request_stats, scenario_stats = Stats(), Stats()
+        now = time.monotonic()
+        measure_from = now + args.ramp_up
+        stop_at = measure_from + args.duration
+        clerks = [Clerk(client, catalog, request_stats, random.Random(args.seed + i), i) for i in range(args.users)]
+        print(f"🚀 {args.users} clerks against {args.base_url}: {args.ramp_up}s ramp-up, {args.duration}s measured")
+        await asyncio.gather(*(
+            clerk_loop(clerk, weights, now + args.ramp_up * i / args.users, measure_from, stop_at,
+                       args.think_time, scenario_stats)
+            for i, clerk in enumerate(clerks)
+        ))
+        # Requests from the ramp-up are in request_stats too; the scenario table is the headline
+        seconds = time.monotonic() - measure_from
+
+    scenarios = scenario_stats.summary(seconds)
+    requests = request_stats.summary(time.monotonic() - now)
+    total = sum(row["count"] for row in scenarios.values())
+    errors = sum(scenario_stats.errors.values())
+    print_table("scenario", scenarios)
+    print_table("request", requests)
+    print(f"\n✅ {total} scenarios in {seconds:.1f}s = {total / seconds:.2f}/s, "
+          f"error rate {errors / max(total, 1) * 100:.2f}%")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "meta": {"base_url": args.base_url, "users": args.users, "duration": args.duration,
+                         "ramp_up": args.ramp_up, "think_time": args.think_time, "weights": weights},
+                "throughput_per_second": round(total / seconds, 2),
+                "scenarios": scenarios,
+                "requests": requests,
+            }, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=10, help="concurrent clerks")
+    parser.add_argument("--duration", type=float, default=60, help="measured seconds (after ramp-up)")
+    parser.add_argument("--ramp-up", type=float, default=10, help="seconds to start all clerks; not measured")
+    parser.add_argument("--think-time", type=float, default=2.0, help="mean pause between scenarios, 0 = flat out")
+    parser.add_argument("--weights", help="e.g. sales_page=3,dashboard=1 (unlisted scenarios are dropped)")
+    parser.add_argument("--token", help="bearer token to use")
+    parser.add_argument("--username", help="log in with this user instead")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--ready-timeout", type=float, default=60, help="wait this long for /health")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
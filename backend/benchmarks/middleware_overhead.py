@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Middleware overhead benchmark: legacy http/BaseHTTPMiddleware stack vs EdgeMiddleware.
+
+Drives both stacks directly over ASGI (no sockets) so only middleware cost is
+measured:
+  - trivial JSON endpoint: mean / p95 latency per request
+  - large streaming export: total time, time-to-first-byte and how many body
+    chunks reached the server before the response finished (buffering check)
+
+Run from backend folder:
+  python benchmarks/middleware_overhead.py [--requests 3000] [--export-mb 32] [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.middleware import EdgeMiddleware
+
+FRONTEND_DIST = Path(ROOT).parent / "frontend" / "dist"
+CHUNK = b"x" * 65536
+
+
+def add_endpoints(app: FastAPI, export_chunks: int):
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/api/export")
+    async def export():
+        async def body():
+            for _ in range(export_chunks):
+                yield CHUNK
+        return StreamingResponse(body(), media_type="application/octet-stream")
+
+
+def build_legacy_app(export_chunks: int) -> FastAPI:
+    """The middleware stack app/main.py used before the EdgeMiddleware rewrite"""
+    app = FastAPI()
+    app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
+    app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True,
+                       allow_methods=["*"], allow_headers=["*"], expose_headers=["*"], max_age=3600)
+
+    @app.middleware("http")
+    async def preserve_https_protocol(request: Request, call_next):
+        return await call_next(request)
+
+    @app.middleware("http")
+    async def enforce_https_redirects(request: Request, call_next):
+        response = await call_next(request)
+        if 300 <= response.status_code < 400:
+            location = response.headers.get("location")
+            if location and location.startswith("http://"):
+                response.headers["location"] = location.replace("http://", "https://")
+        return response
+
+    @app.middleware("http")
+    async def log_request_timing(request: Request, call_next):
+        if request.url.path in {"/keep-alive", "/health"}:
+            return await call_next(request)
+        start_time = time.time()
+        response = await call_next(request)
+        time.time() - start_time
+        return response
+
+    class SPAMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            path = request.url.path
+            if path.startswith("/api") or path in ["/docs", "/redoc", "/openapi.json", "/metrics"]:
+                return await call_next(request)
+            if path.startswith("/dist/") or path.startswith("/assets/"):
+                return await call_next(request)
+            file_path = FRONTEND_DIST / path.lstrip("/")
+            if file_path.exists() and file_path.is_file():
+                return FileResponse(file_path)
+            index_file = FRONTEND_DIST / "index.html"
+            if index_file.exists():
+                return FileResponse(index_file, media_type="text/html")
+            return await call_next(request)
+
+    app.add_middleware(SPAMiddleware)
+    add_endpoints(app, export_chunks)
+    return app
+
+
+def build_edge_app(export_chunks: int) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True,
+                       allow_methods=["*"], allow_headers=["*"], expose_headers=["*"], max_age=3600)
+    app.add_middleware(EdgeMiddleware, frontend_dist=FRONTEND_DIST)
+    add_endpoints(app, export_chunks)
+    return app
+
+
+async def asgi_request(app, path: str):
+    """Issue one GET over raw ASGI; returns (total_s, ttfb_s, body_bytes, chunks)"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench"), (b"origin", b"http://localhost:5173")],
+        "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+    state = {"first": None, "bytes": 0, "chunks": 0, "received": False}
+    finished = asyncio.Event()
+
+    async def receive():
+        # Like a real server: deliver the (empty) body once, then block until
+        # the response is complete and report the disconnect
+        if not state["received"]:
+            state["received"] = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            if state["first"] is None:
+                state["first"] = time.perf_counter()
+            state["bytes"] += len(message["body"])
+            state["chunks"] += 1
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            finished.set()
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    end = time.perf_counter()
+    finished.set()
+    return end - start, (state["first"] or end) - start, state["bytes"], state["chunks"]
+
+
+async def bench_trivial(app, requests: int) -> dict:
+    for _ in range(50):  # warm-up
+        await asgi_request(app, "/api/ping")
+    samples = []
+    for _ in range(requests):
+        total, _, _, _ = await asgi_request(app, "/api/ping")
+        samples.append(total)
+    samples.sort()
+    return {
+        "mean_us": statistics.mean(samples) * 1e6,
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p95_us": samples[int(len(samples) * 0.95)] * 1e6,
+    }
+
+
+async def bench_streaming(app, runs: int = 3) -> dict:
+    results = [await asgi_request(app, "/api/export") for _ in range(runs)]
+    total = min(r[0] for r in results)
+    ttfb = min(r[1] for r in results)
+    size = results[0][2]
+    return {
+        "total_ms": total * 1000,
+        "ttfb_ms": ttfb * 1000,
+        "mb_per_s": size / total / 1e6,
+        "chunks_delivered": results[0][3],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--export-mb", type=int, default=32)
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    args = parser.parse_args()
+
+    export_chunks = args.export_mb * 1024 * 1024 // len(CHUNK)
+    results = {}
+    for name, builder in (("legacy", build_legacy_app), ("edge", build_edge_app)):
+        app = builder(export_chunks)
+        results[name] = {
+            "trivial": await bench_trivial(app, args.requests),
+            "streaming": await bench_streaming(app),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    legacy, edge = results["legacy"], results["edge"]
+    print(f"Trivial endpoint ({args.requests} requests)")
+    for key in ("mean_us", "p50_us", "p95_us"):
+        print(f"  {key:<10} legacy {legacy['trivial'][key]:>9.1f}   edge {edge['trivial'][key]:>9.1f}")
+    saved = legacy["trivial"]["mean_us"] - edge["trivial"]["mean_us"]
+    print(f"  overhead removed per request: {saved:.1f} us")
+    print(f"\nStreaming export ({args.export_mb} MB in {export_chunks} chunks)")
+    for key in ("total_ms", "ttfb_ms", "mb_per_s", "chunks_delivered"):
+        print(f"  {key:<16} legacy {legacy['streaming'][key]:>9.1f}   edge {edge['streaming'][key]:>9.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
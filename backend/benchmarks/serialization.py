@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Serialization benchmark for large list responses (no database needed).
+
+Compares, on N sales with 3 line items each (ORM objects) and N pre-shaped
+item rows (dicts with Decimal/datetime):
+  - legacy:  response_model validation -> python dicts -> json.dumps
+             (what FastAPI did before serializing straight to bytes)
+  - fastapi: response_model validation -> dump_json (current FastAPI fast path)
+  - fast:    app.core.responses.model_list_response / json_response
+
+Run from backend folder:
+  python benchmarks/serialization.py [--rows 10000] [--repeat 5] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+from decimal import Decimal
+from typing import List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.core.responses import json_response, model_list_response
+from app.models.transaction import Sale, SaleLineItem
+from app.schemas.transaction import SaleResponse
+
+
+def make_sales(rows: int) -> List[Sale]:
+    """Transient ORM objects shaped like GET /sales/ results"""
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    sales = []
+    for i in range(rows):
+        sale = Sale(
+            bill_number=f"S-{i:06d}", customer_id=f"CUST-{i % 200:03d}", total_price=Decimal("1234.50"),
+            status="confirmed", payment_status="pending", payment_method="cash", paid_amount=Decimal("0.00"),
+            editable_by_admin_only=False, created_by="admin", date=base + timedelta(minutes=i),
+            due_date=(base + timedelta(days=30)).date(),
+        )
+        sale.line_items = [
+            SaleLineItem(id=f"{sale.bill_number}-{n}", item_id=f"ITEM-{n}", quantity=100 + n,
+                         unit_price=Decimal("4.15"), blow_price=Decimal("0.50"),
+                         total_price=Decimal("415.00"), cost_basis=Decimal("3.20"))
+            for n in range(3)
+        ]
+        sales.append(sale)
+    return sales
+
+
+def make_rows(rows: int) -> List[dict]:
+    """Pre-shaped dicts like the stock statement / stock list endpoints"""
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        {"item_id": f"ITEM-{i:05d}", "item_name": f"Bottle {i}", "quantity": i * 3,
+         "unit_cost": Decimal("12.35"), "value": Decimal(i) * Decimal("12.35"),
+         "last_updated": base + timedelta(seconds=i)}
+        for i in range(rows)
+    ]
+
+
+def timed(fn, repeat: int):
+    fn()  # warm-up (builds cached adapters)
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(fn())
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    args = parser.parse_args()
+
+    sales = make_sales(args.rows)
+    rows = make_rows(args.rows)
+    adapter = TypeAdapter(List[SaleResponse])
+
+    cases = {
+        "models/legacy": lambda: json.dumps(
+            adapter.dump_python(adapter.validate_python(sales, from_attributes=True), mode="json")).encode(),
+        "models/fastapi": lambda: adapter.dump_json(adapter.validate_python(sales, from_attributes=True)),
+        "models/fast": lambda: model_list_response(sales, SaleResponse).body,
+        "rows/legacy": lambda: json.dumps(jsonable_encoder(rows)).encode(),
+        "rows/fast": lambda: json_response(rows).body,
+    }
+    results = {}
+    for name, fn in cases.items():
+        ms, size = timed(fn, args.repeat)
+        results[name] = {"ms": round(ms, 2), "bytes": size}
+
+    if args.json:
+        print(json.dumps({"rows": args.rows, "results": results}, indent=2))
+        return
+
+    print(f"Serializing {args.rows} rows (best of {args.repeat})")
+    for name, result in results.items():
+        group = name.split("/")[0]
+        speedup = results[f"{group}/legacy"]["ms"] / result["ms"] if result["ms"] else 0
+        print(f"  {name:<16} {result['ms']:>9.2f} ms  {result['bytes'] / 1024:>8.0f} KB  x{speedup:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Create the secondary indexes declared on the models (date, foreign key and
+per-item lookups) on an existing database. create_all() only adds them to
+new tables, so run this once on Render/Neon after upgrading.
+
+Safe to run repeatedly - existing indexes are skipped.
+"""
+from sqlalchemy import inspect
+from app.db.database import Base, engine
+from app import models  # noqa: F401 - register every table on Base.metadata
+
+
+def create_indexes():
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = 0
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            print(f"⚠️ Table {table.name} does not exist yet, skipping")
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name in existing:
+                print(f"ℹ️ {index.name} already exists")
+                continue
+            print(f"📝 Creating {index.name} on {table.name}({', '.join(c.name for c in index.columns)})...")
+            index.create(bind=engine)
+            created += 1
+
+    if engine.dialect.name == "postgresql" and created:
+        with engine.begin() as connection:
+            connection.exec_driver_sql("ANALYZE")
+    print(f"\n✅ Done - {created} index(es) created")
+
+
+if __name__ == "__main__":
+    create_indexes()
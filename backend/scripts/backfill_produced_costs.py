@@ -3,23 +3,27 @@
 
 This script will:
  - add the `produced_unit_cost` column to `blows` table if missing (best-effort),
- - compute produced_unit_cost = preform_purchase_price_at_blow + blow_cost_per_unit
-   using the latest purchase for the preform at or before the blow date (fallback to last purchase).
+ - compute produced_unit_cost by replaying the FIFO cost layers (app/db/cost_layers.py):
+   the cost of the preform lots each blow consumed plus blow_cost_per_unit, spread over
+   its output. Blows created since cost layers exist get this cost when they are saved,
+   so only older rows need it.
 
 Run from backend folder:
-  python scripts/backfill_produced_costs.py
+  python scripts/backfill_produced_costs.py          # blows without a produced_unit_cost
+  python scripts/backfill_produced_costs.py --all    # every blow
 """
+import argparse
 import os
 import sys
-from decimal import Decimal
 
 # Make backend package importable
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
-from app.db.database import SessionLocal, engine
-from app.models.transaction import Blow, Purchase
+from app.db.cost_layers import replay_layers
+from app.db.costing import CENT
+from app.db.database import engine
 from sqlalchemy import text
 
 def ensure_column():
@@ -41,75 +45,27 @@ def ensure_column():
     finally:
         conn.close()
 
-def backfill():
-    db = SessionLocal()
-    updated = 0
-    skipped = 0
-    try:
-        # Ensure the column exists before attempting to read/update it.
-        col_ok = ensure_column()
-
-        # Use raw SQL to fetch blows (avoid selecting produced_unit_cost directly so the query
-        # won't fail if the column still isn't visible to this session).
-        rows = db.execute(text("SELECT id, from_item_id, to_item_id, quantity, blow_cost_per_unit, input_quantity, output_quantity, waste_quantity, efficiency_rate, notes, date_time FROM blows ORDER BY date_time ASC")).fetchall()
-        total = len(rows)
-        for row in rows:
-            # Row may be a MappingRow or a positional-only Row; use _mapping for safe keyed access
-            mapping = None
-            try:
-                mapping = row._mapping
-            except Exception:
-                mapping = None
-
-            if mapping is not None:
-                b_id = mapping.get('id')
-                blow_date = mapping.get('date_time')
-                from_item = mapping.get('from_item_id')
-                blow_cost = mapping.get('blow_cost_per_unit')
-            else:
-                # positional fallback
-                b_id = row[0]
-                blow_date = row[10]
-                from_item = row[1]
-                blow_cost = row[4]
-
-            produced_val = None
-
-            # find purchase for preform at or before blow date
-            preform_purchase = None
-            if blow_date:
-                preform_purchase = db.execute(text("SELECT unit_price, date FROM purchases WHERE item_id = :item AND date <= :dt ORDER BY date DESC LIMIT 1"), {"item": from_item, "dt": blow_date}).fetchone()
-            if not preform_purchase:
-                preform_purchase = db.execute(text("SELECT unit_price, date FROM purchases WHERE item_id = :item ORDER BY date DESC LIMIT 1"), {"item": from_item}).fetchone()
-
-            if preform_purchase and preform_purchase[0] is not None:
-                try:
-                    preform_price = float(preform_purchase[0])
-                    blow_cost_unit = float(blow_cost or 0)
-                    produced_val = Decimal(preform_price + blow_cost_unit)
-                except Exception:
-                    produced_val = None
-
-            if produced_val is not None:
-                # update row via raw SQL; ensure column exists first
-                if col_ok:
-                    try:
-                        db.execute(text("UPDATE blows SET produced_unit_cost = :val WHERE id = :id"), {"val": produced_val, "id": b_id})
-                        updated += 1
-                    except Exception:
-                        skipped += 1
-                else:
-                    skipped += 1
-            else:
-                skipped += 1
-
-        db.commit()
-        print(f'Backfill complete. updated={updated}, skipped={skipped}, total_blows={total}')
-    finally:
-        db.close()
+def backfill(every_blow=False):
+    costs = []
+    with engine.begin() as conn:
+        # One ordered pass over the stock history instead of a purchase lookup per blow
+        replay_layers(conn, stamp_blow=lambda blow_id, unit_cost: costs.append(
+            {"id": blow_id, "val": unit_cost.quantize(CENT)}
+        ))
+        if not every_blow:
+            missing = set(conn.execute(text("SELECT id FROM blows WHERE produced_unit_cost IS NULL")).scalars())
+            costs = [cost for cost in costs if cost["id"] in missing]
+        if costs:
+            conn.execute(text("UPDATE blows SET produced_unit_cost = :val WHERE id = :id"), costs)
+        updated = len(costs)
+        total = conn.execute(text("SELECT COUNT(*) FROM blows")).scalar()
+    print(f'Backfill complete. updated={updated}, skipped={total - updated}, total_blows={total}')
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--all', action='store_true', help='recompute every blow, not only those without a cost')
+    args = parser.parse_args()
     print('Ensuring produced_unit_cost column on blows...')
     ensure_column()
     print('Running backfill...')
-    backfill()
+    backfill(every_blow=args.all)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Create missing tables and build the maintained rollups (app/db/migrate.py).
+
+The app does this itself at startup unless MIGRATE_ON_STARTUP=false; then
+run this as the release step, before the new version starts serving:
+
+  python scripts/migrate.py   # exit 1 if any step fails
+"""
+import logging
+import os
+import sys
+
+# Make backend package importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.db.migrate import migrate
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    try:
+        timings = migrate()
+    except Exception as e:
+        print(f"❌ Database preparation failed: {e}")
+        sys.exit(1)
+    print(f"✅ Database ready ({sum(timings.values()) / 1000:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
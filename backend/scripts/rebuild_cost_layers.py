@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Verify or rebuild the FIFO cost layers (cost_layers, cost_layer_issues).
+
+The layers are normally kept current on every stock movement (app/db/cost_layers.py).
+A rebuild replays the whole stock history in one ordered pass - run it after
+bulk imports, backdated entries or manual SQL fixes. --restamp also rewrites
+each sale line's cost_basis and each blow's produced_unit_cost with their FIFO
+cost (for COSTING_METHOD=fifo) and rebuilds the daily facts that sum them:
+
+  python scripts/rebuild_cost_layers.py --check     # report differences, exit 1 if any
+  python scripts/rebuild_cost_layers.py             # recompute every layer
+  python scripts/rebuild_cost_layers.py --restamp   # ... and the sales' and blows' costs
+"""
+import argparse
+import os
+import sys
+import time
+
+# Make backend package importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.db.cost_layers import rebuild_cost_layers, verify_cost_layers
+from app.db.database import engine
+from app.db.facts import rebuild_facts
+from app.models.item import CostLayer, CostLayerIssue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only compare the stored layers with a replay")
+    parser.add_argument("--restamp", action="store_true",
+                        help="also rewrite sale line cost_basis and blow produced_unit_cost from the replay")
+    args = parser.parse_args()
+
+    CostLayer.__table__.create(engine, checkfirst=True)
+    CostLayerIssue.__table__.create(engine, checkfirst=True)
+
+    start = time.perf_counter()
+    if args.check:
+        with engine.connect() as connection:
+            mismatches = verify_cost_layers(connection)
+        for mismatch in mismatches:
+            item = f"item '{mismatch.pop('item_id')}'"
+            details = ", ".join(f"{field} {stored} != {expected}" for field, (stored, expected) in mismatch.items())
+            print(f"❌ {item}: {details}")
+        if mismatches:
+            print(f"❌ {len(mismatches)} items' cost layers out of date - run without --check to rebuild")
+            sys.exit(1)
+        print(f"✅ Cost layers match the stock history ({time.perf_counter() - start:.1f}s)")
+        return
+
+    with engine.begin() as connection:
+        layers, sale_lines, blows = rebuild_cost_layers(connection, restamp=args.restamp)
+        if sale_lines or blows:
+            # COGS and the blow cost facts are sums of the restamped costs
+            rebuild_facts(connection)
+    print(f"✅ Rebuilt cost layers: {layers} layers, {sale_lines} sale lines and {blows} blows restamped "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
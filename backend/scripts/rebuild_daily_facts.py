@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Rebuild the daily report rollups (daily_item_facts, daily_expenditures,
+daily_blow_facts).
+
+The rollups are normally kept current on every write (app/db/facts.py).
+Run this after bulk imports, manual SQL fixes or restoring a backup:
+
+  python scripts/rebuild_daily_facts.py                       # whole history
+  python scripts/rebuild_daily_facts.py --from 2025-06-01 --to 2025-07-01
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+# Make backend package importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.db.database import engine
+from app.db.facts import rebuild_facts
+from app.models.facts import DailyBlowFact, DailyExpenditure, DailyItemFact
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="first day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="day after the last one to rebuild (exclusive)")
+    args = parser.parse_args()
+
+    DailyItemFact.__table__.create(engine, checkfirst=True)
+    DailyExpenditure.__table__.create(engine, checkfirst=True)
+    DailyBlowFact.__table__.create(engine, checkfirst=True)
+
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        written = rebuild_facts(connection, args.start, args.end)
+    period = f"{args.start or 'start'} to {args.end or 'today'}"
+    print(f"✅ Rebuilt daily facts for {period}: {written} rows in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Verify or rebuild the weighted-average item costs (item_costs).
+
+The costs are normally kept current on every stock movement (app/db/costing.py).
+A rebuild replays the whole stock history in one ordered pass - run it after
+bulk imports, backdated entries or manual SQL fixes. --restamp also rewrites
+each sale line's cost_basis with the average cost at the time of the sale
+(for COSTING_METHOD=wac) and rebuilds the daily facts that sum them:
+
+  python scripts/rebuild_item_costs.py --check     # report differences, exit 1 if any
+  python scripts/rebuild_item_costs.py             # recompute every row
+  python scripts/rebuild_item_costs.py --restamp   # ... and the sales' cost_basis
+"""
+import argparse
+import os
+import sys
+import time
+
+# Make backend package importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.db.costing import rebuild_item_costs, verify_item_costs
+from app.db.database import engine
+from app.db.facts import rebuild_facts
+from app.models.item import ItemCost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only compare the stored rows with a replay")
+    parser.add_argument("--restamp", action="store_true", help="also rewrite sale line cost_basis from the replay")
+    args = parser.parse_args()
+
+    ItemCost.__table__.create(engine, checkfirst=True)
+
+    start = time.perf_counter()
+    if args.check:
+        with engine.connect() as connection:
+            mismatches = verify_item_costs(connection)
+        for mismatch in mismatches:
+            item = f"item '{mismatch.pop('item_id')}'"
+            details = ", ".join(f"{field} {stored} != {expected}" for field, (stored, expected) in mismatch.items())
+            print(f"❌ {item}: {details}")
+        if mismatches:
+            print(f"❌ {len(mismatches)} item costs out of date - run without --check to rebuild")
+            sys.exit(1)
+        print(f"✅ Item costs match the stock history ({time.perf_counter() - start:.1f}s)")
+        return
+
+    with engine.begin() as connection:
+        items, restamped = rebuild_item_costs(connection, restamp=args.restamp)
+        if restamped:
+            # COGS is a sum of the restamped costs
+            rebuild_facts(connection)
+    print(f"✅ Rebuilt item costs: {items} items, {restamped} sale lines restamped in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
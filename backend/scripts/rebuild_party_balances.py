@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Verify or rebuild the party balances (party_balances).
+
+The balances are normally kept current on every write (app/db/balances.py).
+Run --check from cron to catch drift, and a rebuild after bulk imports,
+manual SQL fixes or restoring a backup:
+
+  python scripts/rebuild_party_balances.py --check   # report differences, exit 1 if any
+  python scripts/rebuild_party_balances.py           # recompute every row
+"""
+import argparse
+import os
+import sys
+import time
+
+# Make backend package importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.db.balances import rebuild_balances, verify_balances
+from app.db.database import engine
+from app.models.party import PartyBalance
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only compare the stored rows with a recomputation")
+    args = parser.parse_args()
+
+    PartyBalance.__table__.create(engine, checkfirst=True)
+
+    start = time.perf_counter()
+    if args.check:
+        with engine.connect() as connection:
+            mismatches = verify_balances(connection)
+        for mismatch in mismatches:
+            party = f"{mismatch.pop('party_type')} '{mismatch.pop('party_id')}'"
+            details = ", ".join(f"{field} {stored} != {expected}" for field, (stored, expected) in mismatch.items())
+            print(f"❌ {party}: {details}")
+        if mismatches:
+            print(f"❌ {len(mismatches)} party balances out of date - run without --check to rebuild")
+            sys.exit(1)
+        print(f"✅ Party balances match the bills ({time.perf_counter() - start:.1f}s)")
+        return
+
+    with engine.begin() as connection:
+        written = rebuild_balances(connection)
+    print(f"✅ Rebuilt party balances: {written} rows in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Bring the payment fields of older bills in line (app/db/payments.py repair_payments).
+
+Bills saved before payments were kept consistent can have a paid_amount
+that disagrees with payment_status, or no payments adding up to it. Run
+this once after upgrading; the write paths keep bills in line afterwards:
+
+  python scripts/repair_payments.py --check   # report what would change, exit 1 if anything
+  python scripts/repair_payments.py           # settle the bills and record the missing payments
+"""
+import argparse
+import os
+import sys
+import time
+
+# Make backend package importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sqlalchemy.orm import Session
+
+from app.db.database import engine
+from app.db.payments import repair_payments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only report the bills that need repair")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with Session(bind=engine) as db:
+        fixed = repair_payments(db)
+        if args.check:
+            db.rollback()
+        else:
+            db.commit()
+
+    details = ", ".join(f"{count} {bill_type}s" for bill_type, count in fixed.items())
+    if args.check:
+        if any(fixed.values()):
+            print(f"❌ Payment fields out of line on {details} - run without --check to repair")
+            sys.exit(1)
+        print(f"✅ Every bill's payments are in line ({time.perf_counter() - start:.1f}s)")
+        return
+    print(f"✅ Repaired {details} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
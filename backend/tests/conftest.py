@@ -0,0 +1,91 @@
+"""
+Shared pytest fixtures
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.query_budget import QueryBudgetExceeded
+from app.db.database import Base
+from app import models  # noqa: F401 - register every table on Base.metadata
+
+
+@pytest.fixture
+def sqlite_sessions(tmp_path):
+    """sessionmaker on a fresh SQLite file holding every table.
+
+    The commit hooks (facts, balances, alerts, payments, costing) run on it as
+    on Postgres, minus the advisory locks. Modules seed their rows on top:
+
+        @pytest.fixture
+        def db(sqlite_sessions):
+            with sqlite_sessions() as db:
+                db.add(Item(...))
+                db.commit()
+                yield db
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def query_budget():
+    """Fail the test when a response ran more SQL than its endpoint budget.
+
+    Relies on the X-DB-* headers that QueryBudgetMiddleware adds outside
+    production. The budget comes from ROUTE_QUERY_BUDGETS / QUERY_BUDGET
+    (X-DB-Budget header) unless one is passed explicitly. A streaming
+    response sends its headers before the body runs, so only the statements
+    before it count here (the middleware's warning covers the whole body):
+
+        def test_items(client, query_budget):
+            query_budget(client.get("/api/v1/stocks/items"))
+            query_budget(client.get("/api/v1/sales/"), max_statements=4)
+    """
+    def check(response, max_statements: int = None, max_repeats: int = None):
+        if "x-db-queries" not in response.headers:
+            pytest.fail("Response has no X-DB-Queries header - is QueryBudgetMiddleware installed?")
+        statements = int(response.headers["x-db-queries"])
+        repeats = int(response.headers["x-db-repeats"])
+        budget = max_statements if max_statements is not None else int(response.headers["x-db-budget"])
+        request = response.request
+        if statements > budget:
+            raise QueryBudgetExceeded(
+                f"{request.method} {request.url.path} ran {statements} SQL statements (budget {budget})"
+            )
+        if max_repeats is not None and repeats > max_repeats:
+            raise QueryBudgetExceeded(
+                f"{request.method} {request.url.path} repeated one statement {repeats}x (limit {max_repeats})"
+            )
+        return statements
+
+    return check
+
+
+@pytest.fixture
+def api(sqlite_sessions):
+    """TestClient on app.main with its sessions on the SQLite file and an admin signed in.
+
+    The lifespan doesn't run (no migration or warm-up); sessions don't
+    autoflush, like SessionLocal.
+    """
+    from fastapi.testclient import TestClient
+    from app.core.security import get_current_admin_user, get_current_user
+    from app.db.database import get_db, get_read_db
+    from app.main import app
+    from app.models.user import User
+
+    def session():
+        with sqlite_sessions(autoflush=False) as db:
+            yield db
+
+    admin = User(id="USER-1", username="admin", password_hash="-", role="admin")
+    overrides = {get_db: session, get_read_db: session,
+                 get_current_user: lambda: admin, get_current_admin_user: lambda: admin}
+    app.dependency_overrides.update(overrides)
+    yield TestClient(app)
+    for dependency in overrides:
+        app.dependency_overrides.pop(dependency, None)
@@ -0,0 +1,104 @@
+"""
+Concurrent commits touching the same rollup keys (app/db/maintenance.py lock_keys)
+
+SQLite serialises writers, so these need Postgres: they run on the scratch
+database of the plan tests (EXPLAIN_DATABASE_URL, see test_query_plans.py),
+on a day far in the future, and remove their rows afterwards.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+from app import models  # noqa: F401 - register every table on Base.metadata
+from app.models.facts import DailyItemFact
+from app.models.item import Item
+from app.models.party import Customer, PartyBalance
+from app.models.transaction import Sale, SaleLineItem
+
+EXPLAIN_DATABASE_URL = os.getenv("EXPLAIN_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not EXPLAIN_DATABASE_URL, reason="set EXPLAIN_DATABASE_URL to a scratch Postgres database"
+)
+
+WRITERS = 4
+WHEN = datetime(2031, 3, 3, 12)
+PREFIX = "CONCURRENT-"
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(EXPLAIN_DATABASE_URL, pool_size=WRITERS + 1)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.merge(Item(id=f"{PREFIX}BTL", name="Concurrent bottle", type="bottle", size="500ml", grade="A"))
+        db.merge(Customer(id=f"{PREFIX}CUST", name="Concurrent customer"))
+        db.commit()
+    yield factory
+    with factory() as db:
+        db.execute(delete(SaleLineItem).where(SaleLineItem.bill_number.like(f"{PREFIX}%")))
+        for sale in db.scalars(select(Sale).where(Sale.bill_number.like(f"{PREFIX}%"))):
+            db.delete(sale)  # through the session, so the day's facts are refreshed
+        db.commit()
+        db.delete(db.get(Item, f"{PREFIX}BTL"))
+        db.delete(db.get(Customer, f"{PREFIX}CUST"))
+        db.execute(delete(PartyBalance).where(PartyBalance.party_id == f"{PREFIX}CUST"))
+        db.commit()
+    engine.dispose()
+
+
+def commit_together(session_factory, write):
+    """Run write(db, n) in WRITERS sessions and commit them all at the same moment; returns the errors"""
+    barrier = threading.Barrier(WRITERS)
+    errors = []
+
+    def run(n):
+        with session_factory() as db:
+            write(db, n)
+            db.flush()
+            barrier.wait()
+            try:
+                db.commit()
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def add_sale(db, n, customer_id=None, when=WHEN):
+    bill_number = f"{PREFIX}{n}"
+    db.add(Sale(bill_number=bill_number, customer_id=customer_id, total_price=Decimal("10.00"), date=when))
+    db.add(SaleLineItem(id=f"{bill_number}-1", bill_number=bill_number, item_id=f"{PREFIX}BTL", quantity=1,
+                        unit_price=Decimal("10.00"), blow_price=Decimal("0"), total_price=Decimal("10.00"),
+                        cost_basis=Decimal("1.00")))
+
+
+def test_sales_on_one_day_all_reach_the_facts(session_factory):
+    assert commit_together(session_factory, add_sale) == []
+    with session_factory() as db:
+        sold = db.scalar(select(DailyItemFact.qty_sold).where(
+            DailyItemFact.day == WHEN.date(), DailyItemFact.item_id == f"{PREFIX}BTL"))
+    assert sold == WRITERS
+
+
+def test_bills_of_one_party_all_reach_the_balance(session_factory):
+    # A day each, so the facts' day locks don't already serialise them
+    errors = commit_together(session_factory, lambda db, n: add_sale(
+        db, n, customer_id=f"{PREFIX}CUST", when=WHEN + timedelta(days=n)))
+    assert errors == []
+    with session_factory() as db:
+        balance = db.get(PartyBalance, ("customer", f"{PREFIX}CUST"))
+    assert (balance.bills, balance.billed) == (WRITERS, Decimal("10.00") * WRITERS)
@@ -0,0 +1,102 @@
+"""
+FIFO cost layers (app/db/cost_layers.py): blows rolling preform cost into bottles, live updates against a
+replay of the history
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from app.db.cost_layers import (
+    add_layer, consume_layers, produce_layers, rebuild_cost_layers, restore_layers, unproduce_layers,
+    verify_cost_layers,
+)
+from app.models.item import CostLayer, CostLayerIssue, Item
+from app.models.transaction import Blow, Purchase, PurchaseLineItem, Sale, SaleLineItem
+
+JUNE_2 = datetime(2025, 6, 2)
+JUNE_3 = datetime(2025, 6, 3)
+JUNE_4 = datetime(2025, 6, 4)
+
+
+@pytest.fixture
+def db(sqlite_sessions):
+    with sqlite_sessions() as db:
+        db.add_all([
+            Item(id="PRE-1", name="Preform", type="preform", size="500ml", grade="A"),
+            Item(id="BTL-1", name="Bottle", type="bottle", size="500ml", grade="A"),
+        ])
+        db.commit()
+        yield db
+
+
+def purchase(db, bill_number, qty, unit_price, at):
+    db.add(Purchase(bill_number=bill_number, total_amount=Decimal(unit_price) * qty, date=at))
+    db.add(PurchaseLineItem(id=f"{bill_number}-PRE-1", bill_number=bill_number, item_id="PRE-1", quantity=qty,
+                            unit_price=Decimal(unit_price), total_price=Decimal(unit_price) * qty))
+    add_layer(db, "PRE-1", qty, Decimal(unit_price), "purchase", bill_number, at=at)
+
+
+def on_hand(db, item_id):
+    return [(layer.source, layer.remaining, layer.unit_cost) for layer in db.scalars(
+        select(CostLayer).where(CostLayer.item_id == item_id, CostLayer.remaining != 0).order_by(CostLayer.id)
+    )]
+
+
+def test_blown_bottles_carry_the_preform_lots_they_consumed(db):
+    purchase(db, "P-1", 1000, "9.00", JUNE_2)
+    purchase(db, "P-2", 1000, "12.00", JUNE_3)
+
+    # 1200 preforms: 1000 from P-1 at 9.00 and 200 from P-2 at 12.00, blown into 1180 bottles at 1.50 each
+    produced = produce_layers(db, "B-1", "PRE-1", 1200, "BTL-1", 1180, Decimal("1.50"), at=JUNE_3)
+    assert produced == Decimal("11.1610")  # (9000 + 2400 + 1770) / 1180
+    db.add(Blow(id="B-1", from_item_id="PRE-1", to_item_id="BTL-1", input_quantity=1200, output_quantity=1180,
+                quantity=1180, blow_cost_per_unit=Decimal("1.50"), produced_unit_cost=produced, date_time=JUNE_3))
+
+    cost_basis = consume_layers(db, "BTL-1", 500, "sale", "S-1-BTL-1", at=JUNE_4)
+    db.add(Sale(bill_number="S-1", total_price=Decimal("10000.00"), date=JUNE_4))
+    db.add(SaleLineItem(id="S-1-BTL-1", bill_number="S-1", item_id="BTL-1", quantity=500,
+                        unit_price=Decimal("20.00"), total_price=Decimal("10000.00"), cost_basis=cost_basis))
+    db.commit()
+
+    assert cost_basis == produced
+    assert on_hand(db, "PRE-1") == [("purchase", 800, Decimal("12.0000"))]
+    assert on_hand(db, "BTL-1") == [("blow", 680, Decimal("11.1610"))]
+    assert verify_cost_layers(db.connection()) == []
+
+    assert rebuild_cost_layers(db.connection(), restamp=True) == (3, 1, 1)
+    db.commit()
+    assert db.get(SaleLineItem, "S-1-BTL-1").cost_basis == Decimal("11.16")
+    assert verify_cost_layers(db.connection()) == []
+
+
+def test_short_issues_are_filled_by_the_next_receipt(db):
+    purchase(db, "P-1", 100, "9.00", JUNE_2)
+    assert consume_layers(db, "PRE-1", 150, "waste", "W-1") == Decimal("9.0000")  # 50 short at the last cost
+    assert on_hand(db, "PRE-1") == [("short", -50, Decimal("9.0000"))]
+
+    purchase(db, "P-2", 80, "10.00", JUNE_3)
+    db.commit()
+    assert on_hand(db, "PRE-1") == [("purchase", 30, Decimal("10.0000"))]
+
+
+def test_deletes_put_units_back_where_they_came_from(db):
+    purchase(db, "P-1", 100, "9.00", JUNE_2)
+    purchase(db, "P-2", 100, "12.00", JUNE_3)
+    produce_layers(db, "B-1", "PRE-1", 150, "BTL-1", 150, Decimal("1.00"))
+    consume_layers(db, "BTL-1", 40, "sale", "S-1-BTL-1")
+    db.commit()
+
+    # Deleting the sale returns the bottles to the blow's layer
+    restore_layers(db, "BTL-1", 40, "sale", "S-1-BTL-1", Decimal("11.00"))
+    db.commit()
+    assert on_hand(db, "BTL-1") == [("blow", 150, Decimal("11.0000"))]
+
+    # Deleting the blow removes the bottles and returns the preforms to both purchase lots
+    unproduce_layers(db, "B-1", "PRE-1", 150, "BTL-1", 150)
+    db.commit()
+    assert on_hand(db, "PRE-1") == [("purchase", 100, Decimal("9.0000")), ("purchase", 100, Decimal("12.0000"))]
+    assert on_hand(db, "BTL-1") == []
+    assert db.scalar(select(CostLayerIssue.id).limit(1)) is None
@@ -0,0 +1,116 @@
+"""
+Weighted-average item costs (app/db/costing.py): live updates against a replay of the history
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.db.costing import (
+    Position, _issue, _receive, ensure_costing, issue, produce, rebuild_item_costs, receive, verify_item_costs,
+)
+from app.models.item import CostingState, CostLayer, Item, ItemCost, Stock
+from app.models.transaction import Blow, Purchase, PurchaseLineItem, Sale, SaleLineItem
+
+JUNE_2 = datetime(2025, 6, 2)
+JUNE_3 = datetime(2025, 6, 3)
+
+
+def test_average_moves_with_receipts_and_issues():
+    position = _receive(Position(), 100, Decimal("10"))
+    position = _receive(position, 100, Decimal("12"))
+    assert position == (200, Decimal("2200.0000"), Decimal("11.0000"))
+
+    position, unit_cost = _issue(position, 150)
+    assert unit_cost == Decimal("11.0000") and position.qty == 50 and position.value == Decimal("550.0000")
+
+    # Short: the extra units go out at the last average, the next receipt starts over
+    position, unit_cost = _issue(position, 80)
+    assert (position.qty, position.value, unit_cost) == (-30, Decimal("-330.0000"), Decimal("11.0000"))
+    position = _receive(position, 50, Decimal("13"))
+    assert position == (20, Decimal("260.0000"), Decimal("13.0000"))
+
+    # A reversed receipt takes its own cost back out
+    assert _receive(position, -20, Decimal("13")) == (0, Decimal("0"), Decimal("13.0000"))
+
+
+@pytest.fixture
+def db(sqlite_sessions):
+    with sqlite_sessions() as db:
+        db.add_all([
+            Item(id="PRE-1", name="Preform", type="preform", size="500ml", grade="A"),
+            Item(id="BTL-1", name="Bottle", type="bottle", size="500ml", grade="A"),
+        ])
+        db.commit()
+        yield db
+
+
+def test_live_updates_match_the_replay(db):
+    # Purchase 1000 preforms at 9.00, blow 600 into 590 bottles at 1.50 each, sell 300 bottles
+    db.add(Purchase(bill_number="P-1", total_amount=Decimal("9000.00"), date=JUNE_2))
+    db.add(PurchaseLineItem(id="P-1-PRE-1", bill_number="P-1", item_id="PRE-1", quantity=1000,
+                            unit_price=Decimal("9.00"), total_price=Decimal("9000.00")))
+    receive(db, "PRE-1", 1000, Decimal("9.00"))
+
+    produced = produce(db, "PRE-1", 600, "BTL-1", 590, Decimal("1.50"))
+    assert produced == Decimal("10.6525")  # (600 x 9.00 + 590 x 1.50) / 590
+    db.add(Blow(id="B-1", from_item_id="PRE-1", to_item_id="BTL-1", input_quantity=600, output_quantity=590,
+                quantity=590, blow_cost_per_unit=Decimal("1.50"), produced_unit_cost=produced, date_time=JUNE_2))
+
+    cost_basis = issue(db, "BTL-1", 300)
+    db.add(Sale(bill_number="S-1", total_price=Decimal("6000.00"), date=JUNE_3))
+    db.add(SaleLineItem(id="S-1-BTL-1", bill_number="S-1", item_id="BTL-1", quantity=300,
+                        unit_price=Decimal("20.00"), total_price=Decimal("6000.00"), cost_basis=Decimal("0")))
+    db.commit()
+
+    assert cost_basis == produced
+    assert db.get(ItemCost, "PRE-1").on_hand_qty == 400
+    assert db.get(ItemCost, "BTL-1").on_hand_qty == 290
+    assert verify_item_costs(db.connection()) == []
+
+    assert rebuild_item_costs(db.connection(), restamp=True) == (2, 1)
+    db.commit()
+    assert db.get(SaleLineItem, "S-1-BTL-1").cost_basis == Decimal("10.65")
+    assert verify_item_costs(db.connection()) == []
+
+
+def test_verifier_reports_drift(db):
+    receive(db, "PRE-1", 10, Decimal("5.00"))  # no purchase behind it
+    db.commit()
+    assert verify_item_costs(db.connection()) == [
+        {"item_id": "PRE-1", "on_hand_qty": (10, None), "on_hand_value": (Decimal("50.0000"), None)},
+    ]
+
+
+def test_switching_method_rebuilds_the_one_now_kept(db, monkeypatch):
+    def purchase(bill_number, quantity):
+        db.add(Purchase(bill_number=bill_number, total_amount=Decimal(quantity * 9), date=JUNE_2))
+        db.add(PurchaseLineItem(id=f"{bill_number}-PRE-1", bill_number=bill_number, item_id="PRE-1",
+                                quantity=quantity, unit_price=Decimal("9.00"), total_price=Decimal(quantity * 9)))
+        stock = db.get(Stock, "PRE-1") or Stock(item_id="PRE-1", quantity=0)
+        stock.quantity += quantity
+        db.add(stock)
+        db.commit()
+
+    def layered():
+        return sum(layer.remaining for layer in db.query(CostLayer).filter(CostLayer.item_id == "PRE-1"))
+
+    purchase("P-1", 100)
+    monkeypatch.setattr("app.db.costing.settings.COSTING_METHOD", "fifo")
+    ensure_costing(db.get_bind())
+    assert (layered(), db.get(ItemCost, "PRE-1"), db.get(CostingState, "fifo") is not None) == (100, None, True)
+
+    # Kept as FIFO layers only; the switch to wac builds the averages from the history
+    purchase("P-2", 50)
+    monkeypatch.setattr("app.db.costing.settings.COSTING_METHOD", "wac")
+    ensure_costing(db.get_bind())
+    db.expire_all()
+    assert db.get(ItemCost, "PRE-1").on_hand_qty == 150
+    assert [state.method for state in db.query(CostingState)] == ["wac"]
+
+    purchase("P-3", 25)
+    monkeypatch.setattr("app.db.costing.settings.COSTING_METHOD", "fifo")
+    ensure_costing(db.get_bind())
+    db.expire_all()
+    assert layered() == 175
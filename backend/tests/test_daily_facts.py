@@ -0,0 +1,171 @@
+"""
+Daily report rollups (app/db/facts.py), maintained by the session hooks
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from app.core.periods import Period
+from app.db.blow_yield import YieldQuery, blow_yield
+from app.db.facts import expenditure_total, fact_totals, mark_days, rebuild_facts
+from app.models.facts import DailyBlowFact, DailyExpenditure, DailyItemFact
+from app.models.item import Item
+from app.models.transaction import Blow, ExtraExpenditure, Purchase, PurchaseLineItem, Sale, SaleLineItem
+
+JUNE_2 = datetime(2025, 6, 2, 10, 30)
+JUNE_3 = datetime(2025, 6, 3, 9, 0)
+
+
+@pytest.fixture
+def Session(sqlite_sessions):
+    with sqlite_sessions() as db:
+        db.add_all([
+            Item(id="PRE-500", name="Preform 500ml", type="preform", size="500ml", grade="A"),
+            Item(id="BTL-500", name="Bottle 500ml", type="bottle", size="500ml", grade="A"),
+        ])
+        db.commit()
+    yield sqlite_sessions
+
+
+def add_sale(db, bill_number, when, quantity=10, unit_price="5.00", cost_basis="3.00"):
+    total = Decimal(unit_price) * quantity
+    db.add(Sale(bill_number=bill_number, customer_id=None, total_price=total, date=when))
+    db.add(SaleLineItem(id=f"{bill_number}-BTL-500", bill_number=bill_number, item_id="BTL-500",
+                        quantity=quantity, unit_price=Decimal(unit_price), blow_price=Decimal("0"),
+                        total_price=total, cost_basis=Decimal(cost_basis)))
+
+
+def facts(db):
+    return {(row.day, row.item_id): row for row in db.query(DailyItemFact).all()}
+
+
+def rebuilt_matches(Session):
+    """The incrementally maintained rows equal a from-scratch rebuild"""
+    with Session() as db:
+        connection = db.connection()
+        rows = lambda: sorted(tuple(r) for r in connection.execute(select(DailyItemFact.__table__)))
+        expenses = lambda: sorted(tuple(r) for r in connection.execute(select(DailyExpenditure.__table__)))
+        blows = lambda: sorted(tuple(r) for r in connection.execute(select(DailyBlowFact.__table__)))
+        before = rows(), expenses(), blows()
+        rebuild_facts(connection)
+        after = rows(), expenses(), blows()
+        db.rollback()
+    return before == after
+
+
+def test_sale_commit_updates_its_day(Session):
+    with Session() as db:
+        add_sale(db, "S-1", JUNE_2)
+        add_sale(db, "S-2", JUNE_2, quantity=4)
+        db.commit()
+        fact = facts(db)[(date(2025, 6, 2), "BTL-500")]
+        assert (fact.qty_sold, fact.revenue, fact.cogs) == (14, Decimal("70.00"), Decimal("42.00"))
+    assert rebuilt_matches(Session)
+
+
+def test_rollback_leaves_facts_untouched(Session):
+    with Session() as db:
+        add_sale(db, "S-1", JUNE_2)
+        db.flush()
+        db.rollback()
+        assert facts(db) == {}
+        db.commit()
+        assert facts(db) == {}
+
+
+def test_delete_and_move_refresh_old_and_new_days(Session):
+    with Session() as db:
+        add_sale(db, "S-1", JUNE_2)
+        add_sale(db, "S-2", JUNE_2, quantity=4)
+        db.commit()
+
+        sale = db.get(Sale, "S-2")
+        sale.date = JUNE_3
+        db.commit()
+        assert facts(db)[(date(2025, 6, 2), "BTL-500")].qty_sold == 10
+        assert facts(db)[(date(2025, 6, 3), "BTL-500")].qty_sold == 4
+
+        # Same shape as delete_sale: bulk delete of the lines, then the header
+        db.query(SaleLineItem).filter(SaleLineItem.bill_number == "S-1").delete()
+        db.delete(db.get(Sale, "S-1"))
+        db.commit()
+        assert (date(2025, 6, 2), "BTL-500") not in facts(db)
+    assert rebuilt_matches(Session)
+
+
+def test_payment_updates_skip_the_refresh(Session, monkeypatch):
+    with Session() as db:
+        add_sale(db, "S-1", JUNE_2)
+        db.commit()
+
+        refreshed = []
+        monkeypatch.setattr("app.db.facts.refresh_days", lambda *args: refreshed.append(args))
+        sale = db.get(Sale, "S-1")
+        sale.payment_status, sale.paid_amount = "paid", sale.total_price
+        db.commit()
+        assert refreshed == []
+
+
+def test_purchases_blows_and_expenditures(Session):
+    with Session() as db:
+        db.add(Purchase(bill_number="P-1", supplier_id=None, total_amount=Decimal("200.00"), date=JUNE_2))
+        db.add(PurchaseLineItem(id="P-1-PRE-500", bill_number="P-1", item_id="PRE-500", quantity=100,
+                                unit_price=Decimal("2.00"), total_price=Decimal("200.00")))
+        db.add(Blow(id="B-1", from_item_id="PRE-500", to_item_id="BTL-500", quantity=95, input_quantity=100,
+                    output_quantity=95, blow_cost_per_unit=Decimal("1.50"), date_time=JUNE_2))
+        db.add(ExtraExpenditure(id="E-1", expense_type="Electricity", amount=Decimal("80.00"), date=date(2025, 6, 2)))
+        db.commit()
+
+        totals = fact_totals(db, date(2025, 6, 1), date(2025, 7, 1))
+        assert totals["purchase_cost"] == 200.0
+        assert (totals["qty_produced"], totals["qty_blow_input"], totals["blow_cost"]) == (95, 100, 142.5)
+        assert expenditure_total(db, date(2025, 6, 1), date(2025, 7, 1)) == 80.0
+        assert fact_totals(db, date(2025, 7, 1), date(2025, 8, 1))["purchase_cost"] == 0.0
+    assert rebuilt_matches(Session)
+
+
+def test_mark_days_covers_core_writes(Session):
+    with Session() as db:
+        db.execute(Sale.__table__.insert().values(bill_number="S-9", total_price=Decimal("50.00"), date=JUNE_3))
+        db.execute(SaleLineItem.__table__.insert().values(
+            id="S-9-BTL-500", bill_number="S-9", item_id="BTL-500", quantity=10,
+            unit_price=Decimal("5.00"), total_price=Decimal("50.00"), cost_basis=Decimal("3.00")))
+        mark_days(db, item_days=[JUNE_3])
+        db.commit()
+        assert facts(db)[(date(2025, 6, 3), "BTL-500")].revenue == Decimal("50.00")
+
+
+def test_blow_yield_by_pair_and_operator(Session):
+    def blow(db, blow_id, when, user_id, input_quantity, output_quantity, produced_unit_cost):
+        db.add(Blow(id=blow_id, user_id=user_id, from_item_id="PRE-500", to_item_id="BTL-500",
+                    quantity=output_quantity, input_quantity=input_quantity, output_quantity=output_quantity,
+                    waste_quantity=input_quantity - output_quantity, blow_cost_per_unit=Decimal("1.00"),
+                    produced_unit_cost=Decimal(produced_unit_cost) if produced_unit_cost else None, date_time=when))
+
+    with Session() as db:
+        # 3.00 a bottle: 2.00 of preform and 1.00 of blowing
+        blow(db, "B-1", JUNE_2, "U-1", 100, 90, "3.00")
+        blow(db, "B-2", JUNE_3, "U-2", 100, 80, "3.00")
+        blow(db, "B-3", datetime(2025, 6, 10, 8, 0), "U-1", 50, 50, None)
+        db.commit()
+        db.get(Blow, "B-2").output_quantity, db.get(Blow, "B-2").waste_quantity = 95, 5
+        db.commit()
+
+        june = Period.month(2025, 6)
+        result = blow_yield(db.connection(), YieldQuery(june), {"PRE-500": "Preform 500ml"}, {})
+        totals = result["totals"]
+        assert (totals["blows"], totals["qty_input"], totals["qty_output"], totals["qty_waste"]) == (3, 250, 235, 15)
+        assert (totals["yield_pct"], totals["waste_pct"]) == (94.0, 6.0)
+        # B-1: 180.00 of preforms for 100 input, 10 wasted -> 18.00; B-2: 190.00, 5 of 100 wasted -> 9.50
+        assert totals["waste_cost"] == Decimal("27.50")
+        assert totals["cost_per_good_unit"] == Decimal("3.0000")  # the uncosted blow left out
+        assert result["rows"][0]["from_item_name"] == "Preform 500ml"
+
+        weekly = blow_yield(db.connection(), YieldQuery(june, ("operator",), "week"), {}, {"U-1": "ali"})
+        assert [(row["operator"], row["bucket"], row["qty_output"]) for row in weekly["rows"]] == [
+            ("ali", date(2025, 6, 2), 90), ("ali", date(2025, 6, 9), 50), (None, date(2025, 6, 2), 95),
+        ]
+    assert rebuilt_matches(Session)
@@ -0,0 +1,96 @@
+"""
+Edge middleware (app/core/middleware.py): backend paths reach the routers, every other GET gets the built SPA
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import RedirectResponse
+from fastapi.testclient import TestClient
+
+from app.core.middleware import EdgeMiddleware
+
+INDEX = b"<!doctype html><div id=root></div>"
+BUNDLE = b"console.log('app')"
+
+
+def backend():
+    app = FastAPI()
+
+    @app.get("/")
+    async def root():
+        return {"status": "running"}
+
+    @app.get("/health")
+    async def health():
+        return {"ready": True}
+
+    @app.get("/api/v1/items")
+    async def items():
+        return []
+
+    @app.post("/reports")
+    async def not_an_api_path():
+        return {"posted": True}
+
+    @app.get("/api/v1/old")
+    async def moved():
+        return RedirectResponse("http://testserver/api/v1/items")
+
+    return app
+
+
+@pytest.fixture
+def dist(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_bytes(INDEX)
+    (tmp_path / "assets" / "index-abc123.js").write_bytes(BUNDLE)
+    (tmp_path / "favicon.ico").write_bytes(b"\x00\x00\x01\x00")
+    return tmp_path
+
+
+@pytest.fixture
+def client(dist):
+    app = backend()
+    app.add_middleware(EdgeMiddleware, frontend_dist=dist)
+    return TestClient(app)
+
+
+def test_backend_paths_reach_the_routers(client):
+    assert client.get("/health").json() == {"ready": True}
+    assert client.get("/api/v1/items").json() == []
+    # Unknown API paths are the API's 404, never index.html
+    response = client.get("/api/v1/nothing")
+    assert response.status_code == 404 and response.headers["content-type"] == "application/json"
+    # Only GET and HEAD are served from dist
+    assert client.post("/reports").json() == {"posted": True}
+
+
+def test_spa_routes_and_assets(client):
+    # / is the SPA's root route (it redirects to /dashboard), not the backend status
+    for path in ("/", "/dashboard", "/sales/S-1", "/index.html"):
+        response = client.get(path)
+        assert (response.status_code, response.content) == (200, INDEX)
+        assert response.headers["content-type"].startswith("text/html")
+        assert response.headers["cache-control"] == "no-cache"
+
+    response = client.get("/assets/index-abc123.js")
+    assert response.content == BUNDLE
+    assert "javascript" in response.headers["content-type"]
+    assert "immutable" in response.headers["cache-control"]
+    assert client.get("/favicon.ico").content == b"\x00\x00\x01\x00"
+    # A missing bundle is a 404, not index.html served as JavaScript
+    response = client.get("/assets/index-old999.js")
+    assert (response.status_code, response.content) == (404, b"Not Found")
+
+
+def test_redirects_stay_on_https(client):
+    response = client.get("/api/v1/old", follow_redirects=False)
+    assert response.headers["location"] == "https://testserver/api/v1/items"
+
+
+def test_without_a_build_everything_reaches_the_app(tmp_path):
+    app = backend()
+    app.add_middleware(EdgeMiddleware, frontend_dist=tmp_path / "missing")
+    client = TestClient(app)
+    assert client.get("/").json() == {"status": "running"}
+    assert client.get("/dashboard").status_code == 404
@@ -0,0 +1,75 @@
+"""
+Demand forecasts and reorder points (app/db/forecast.py), fitted on daily_item_facts
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import insert
+
+from app.db.forecast import ForecastQuery, _cache, cached_forecast, fit, forecast_items
+from app.models.facts import DailyItemFact
+from app.models.item import Item, Stock
+
+TODAY = date(2025, 6, 30)  # a Monday
+
+
+@pytest.fixture
+def db(sqlite_sessions):
+    with sqlite_sessions() as db:
+        db.add_all([
+            Item(id="PRE-1", name="Preform", type="preform", size="500ml", grade="A"),
+            Item(id="BTL-1", name="Bottle", type="bottle", size="500ml", grade="A"),
+            Item(id="BTL-2", name="Bottle 1.5L", type="bottle", size="1500ml", grade="A"),
+            Stock(item_id="PRE-1", quantity=500),
+            Stock(item_id="BTL-1", quantity=1000),
+        ])
+        facts = []
+        for offset in range(1, 113):
+            day = TODAY - timedelta(days=offset)
+            # Preforms: 100 blown every day; bottles: 60 sold on weekdays only
+            facts.append({"day": day, "item_id": "PRE-1", "qty_blow_input": 100})
+            if day.weekday() < 5:
+                facts.append({"day": day, "item_id": "BTL-1", "qty_sold": 60})
+        db.execute(insert(DailyItemFact), facts)
+        db.commit()
+        yield db
+
+
+def test_models_fitted_for_all_items_at_once():
+    first_day = date(2025, 6, 2)  # Monday
+    columns = np.arange(112)
+    weekday = (columns + first_day.weekday() - 112) % 7
+    demand = np.stack([
+        np.full(112, 40.0),
+        np.where(weekday < 5, 70.0, 0.0),
+        np.zeros(112),
+    ])
+    best, forecast, sigma = fit(demand, first_day, 7)
+    assert best[1] == 2  # the weekday profile wins where there is one
+    np.testing.assert_allclose(forecast[0], 40.0)
+    np.testing.assert_allclose(forecast[1], [70, 70, 70, 70, 70, 0, 0])
+    np.testing.assert_allclose(forecast[2], 0.0)
+    np.testing.assert_allclose(sigma, 0.0, atol=1e-9)
+
+
+def test_reorder_points_from_lead_time_and_cache(db):
+    rows = {row["item_id"]: row for row in forecast_items(db.connection(), ForecastQuery(lead_time=7), TODAY)}
+    preform, bottle, unsold = rows["PRE-1"], rows["BTL-1"], rows["BTL-2"]
+    # Steady demand: no error on the holdout, so no safety stock
+    assert (preform["lead_time_demand"], preform["safety_stock"], preform["reorder_point"]) == (700.0, 0.0, 700)
+    assert (preform["status"], preform["days_of_cover"], preform["suggested_order"]) == ("reorder", 5.0, 1600)
+    assert bottle["model"] == "seasonal"
+    assert bottle["forecast"][:7] == [60.0] * 5 + [0.0] * 2
+    assert (bottle["reorder_point"], bottle["status"]) == (300, "ok")
+    assert (unsold["on_hand"], unsold["reorder_point"], unsold["status"]) == (0, 0, "ok")
+
+    _cache.clear()
+    query = ForecastQuery(item_type="preform")
+    first = cached_forecast(db.connection(), query, TODAY)
+    assert cached_forecast(db.connection(), query, TODAY) is first
+    db.get(Stock, "PRE-1").quantity = 2000
+    db.commit()
+    again = cached_forecast(db.connection(), query, TODAY)
+    assert (first[0]["status"], again[0]["status"]) == ("reorder", "ok")
@@ -0,0 +1,60 @@
+"""
+Bulk invoice bundles (app/utils/invoice_bundle.py), rendering in threads
+"""
+
+import asyncio
+import io
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.models.item import Item
+from app.models.party import Customer
+from app.models.transaction import Sale, SaleLineItem
+from app.utils.invoice_bundle import invoice_zip, load_invoices
+
+USER = SimpleNamespace(username="admin")
+
+
+@pytest.fixture
+def db(sqlite_sessions, monkeypatch):
+    monkeypatch.setattr(settings, "INVOICE_WORKERS", 0)
+    with sqlite_sessions() as db:
+        db.add_all([
+            Customer(id="CUST-1", name="Hotel", contact="0300-1234567", address="Mall Road"),
+            Item(id="ITEM-1", name="500ml Bottle", type="bottle", size="500ml", grade="A"),
+        ])
+        for bill_number in ("S-1", "S-2"):
+            db.add(Sale(bill_number=bill_number, customer_id="CUST-1", total_price=Decimal("100.00"),
+                        date=datetime(2025, 6, 2), payment_status="pending", paid_amount=Decimal("0")))
+            db.add(SaleLineItem(id=f"{bill_number}-1", bill_number=bill_number, item_id="ITEM-1", quantity=10,
+                                unit_price=Decimal("10.00"), total_price=Decimal("100.00")))
+        db.add(Sale(bill_number="S-3", customer_id="CUST-1", total_price=Decimal("0"), date=datetime(2025, 6, 3),
+                    payment_status="pending", paid_amount=Decimal("0")))
+        db.commit()
+        yield db
+
+
+async def collect(stream):
+    return b"".join([chunk async for chunk in stream])
+
+
+def test_jobs_and_skipped_ids(db):
+    jobs, skipped = load_invoices(db, "sale", ["S-1", "S-2", "S-1", "S-3", "NOPE"], USER)
+    assert [job.filename for job in jobs] == ["invoice_S-1_20250602.pdf", "invoice_S-2_20250602.pdf"]
+    assert skipped == {"S-3": "no line items", "NOPE": "not found"}
+    assert jobs[0].arguments["customer"].name == "Hotel"
+    assert [item.id for item in jobs[0].arguments["items_db"]] == ["ITEM-1"]
+
+
+def test_zip_holds_every_invoice_and_the_skipped_list(db):
+    jobs, skipped = load_invoices(db, "sale", ["S-1", "S-2", "NOPE"], USER)
+    archive = zipfile.ZipFile(io.BytesIO(asyncio.run(collect(invoice_zip(jobs, skipped)))))
+    assert archive.testzip() is None
+    assert sorted(archive.namelist()) == ["invoice_S-1_20250602.pdf", "invoice_S-2_20250602.pdf", "skipped.txt"]
+    assert archive.read("invoice_S-1_20250602.pdf").startswith(b"%PDF")
+    assert archive.read("skipped.txt") == b"NOPE: not found\n"
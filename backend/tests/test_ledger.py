@@ -0,0 +1,90 @@
+"""
+Ledger engine (app/db/ledger.py) and its renderers (app/utils/ledger_export.py)
+"""
+
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from app.db.ledger import ledger_rows, open_ledger
+from app.core.periods import Period
+from app.models.party import Customer, Supplier
+from app.models.transaction import Purchase, Sale
+from app.utils.ledger_export import ledger_excel, ledger_json, ledger_pdf
+
+JUNE = Period.month(2025, 6)
+
+
+@pytest.fixture
+def db(sqlite_sessions):
+    with sqlite_sessions() as db:
+        db.add_all([Customer(id="CUST-1", name="Hotel"), Supplier(id="SUP-1", name="Preforms Ltd")])
+        for bill_number, when, total, status, paid in [
+            ("S-1", datetime(2025, 5, 20), "100.00", "partial", "30.00"),  # before June: 30 paid, 70 owed
+            ("S-2", datetime(2025, 6, 2), "50.00", "paid", "0"),
+            ("S-3", datetime(2025, 6, 9), "80.00", "pending", "0"),
+            ("S-4", datetime(2025, 7, 1), "10.00", "pending", "0"),  # after June
+        ]:
+            db.add(Sale(bill_number=bill_number, customer_id="CUST-1", total_price=Decimal(total), date=when,
+                        payment_status=status, paid_amount=Decimal(paid)))
+        db.add(Sale(bill_number="S-5", customer_id="CUST-1", total_price=Decimal("999.00"), status="cancelled",
+                    date=datetime(2025, 6, 15), payment_status="pending", paid_amount=Decimal("0")))
+        db.add(Purchase(bill_number="P-1", supplier_id="SUP-1", total_amount=Decimal("200.00"),
+                        date=datetime(2025, 6, 3), payment_status="partial", paid_amount=Decimal("50.00")))
+        db.commit()
+        yield db
+
+
+def test_opening_balance_and_running_balance(db):
+    ledger = open_ledger(db, "customer", "CUST-1", JUNE)
+    assert ledger.opening_balance == -40.0  # 30 paid - 70 owed
+
+    rows = list(ledger_rows(db.get_bind(), ledger))
+    assert [(r.reference_number, r.debit, r.credit, r.balance) for r in rows] == [
+        ("S-2", 0.0, 50.0, 10.0),
+        ("S-3", 80.0, 0.0, -70.0),
+        ("S-5", 0.0, 0.0, -70.0),  # cancelled: listed without an amount
+    ]
+    assert ledger.totals() == {"closing_balance": -70.0, "total_debit": 80.0, "total_credit": 50.0}
+    assert rows[0].date == date(2025, 6, 2)
+
+    # The next period opens where this one closed
+    assert open_ledger(db, "customer", "CUST-1", JUNE.next()).opening_balance == -70.0
+
+
+def test_supplier_ledger_and_unknown_party(db):
+    ledger = open_ledger(db, "supplier", "SUP-1", Period.between(date(2025, 1, 1), date(2025, 12, 31)))
+    rows = list(ledger_rows(db.get_bind(), ledger))
+    assert [(r.debit, r.credit, r.balance) for r in rows] == [(50.0, 150.0, 100.0)]
+
+    with pytest.raises(HTTPException) as error:
+        open_ledger(db, "customer", "NOPE", JUNE)
+    assert error.value.status_code == 404
+
+
+def test_renderers_share_the_row_stream(db):
+    ledger = open_ledger(db, "customer", "CUST-1", JUNE)
+    body = json.loads(b"".join(ledger_json(ledger, ledger_rows(db.get_bind(), ledger))))
+    assert body["opening_balance"] == -40.0 and body["closing_balance"] == -70.0
+    assert body["period_label"] == "June 2025"
+    assert [t["reference_number"] for t in body["transactions"]] == ["S-2", "S-3", "S-5"]
+
+    ledger = open_ledger(db, "customer", "CUST-1", JUNE)
+    assert b"".join(ledger_pdf(ledger, ledger_rows(db.get_bind(), ledger))).startswith(b"%PDF")
+
+    from openpyxl import load_workbook
+    ledger = open_ledger(db, "customer", "CUST-1", JUNE)
+    workbook = load_workbook(io.BytesIO(b"".join(ledger_excel(ledger, ledger_rows(db.get_bind(), ledger)))))
+    values = [row for row in workbook.active.iter_rows(values_only=True)]
+    assert values[-1][2:6] == ("Closing balance", None, None, -70.0)
+
+
+def test_empty_period_keeps_the_opening_balance(db):
+    ledger = open_ledger(db, "customer", "CUST-1", Period.month(2025, 8))
+    body = json.loads(b"".join(ledger_json(ledger, ledger_rows(db.get_bind(), ledger))))
+    assert body["transactions"] == []
+    assert body["opening_balance"] == body["closing_balance"] == -80.0
@@ -0,0 +1,85 @@
+"""
+Margin analytics (app/db/margins.py): rollup levels, top N per parent and drill-down (on SQLite, through the
+GROUP BY per level stand-in for GROUPING SETS)
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.periods import Period
+from app.db.margins import MarginQuery, margin_rows
+from app.models.item import Item
+from app.models.transaction import Sale, SaleLineItem
+
+JUNE = Period.month(2025, 6)
+
+
+@pytest.fixture
+def db(sqlite_sessions):
+    with sqlite_sessions() as db:
+        db.add_all([
+            Item(id="BTL-500", name="Bottle 500ml", type="bottle", size="500ml", grade="A"),
+            Item(id="BTL-1500", name="Bottle 1500ml", type="bottle", size="1500ml", grade="A"),
+            Item(id="PRE-500", name="Preform 500ml", type="preform", size="500ml", grade="B"),
+        ])
+        sales = [
+            # bill, customer, day, item, qty, unit price, blow price, cost basis
+            ("S-1", "C-1", 2, "BTL-500", 100, "20.00", "2.00", "15.00"),
+            ("S-1", "C-1", 2, "PRE-500", 50, "12.00", "0.00", "10.00"),
+            ("S-2", "C-2", 9, "BTL-500", 10, "21.00", "0.00", None),
+            ("S-3", "C-2", 16, "BTL-1500", 40, "30.00", "0.00", "22.00"),
+            ("S-4", "C-1", 3, "BTL-1500", 5, "30.00", "0.00", "22.00"),
+            ("S-5", "C-3", 2, "BTL-500", 999, "20.00", "0.00", "1.00"),  # May: outside the period
+        ]
+        for bill_number, customer_id, day, item_id, qty, unit_price, blow_price, cost_basis in sales:
+            if not db.get(Sale, bill_number):
+                month = 5 if bill_number == "S-5" else 6
+                db.add(Sale(bill_number=bill_number, customer_id=customer_id, date=datetime(2025, month, day)))
+            total = (Decimal(unit_price) + Decimal(blow_price)) * qty
+            db.add(SaleLineItem(id=f"{bill_number}-{item_id}", bill_number=bill_number, item_id=item_id, quantity=qty,
+                                unit_price=Decimal(unit_price), blow_price=Decimal(blow_price), total_price=total,
+                                cost_basis=Decimal(cost_basis) if cost_basis else None))
+        db.commit()
+        yield db
+
+
+def rows(db, *group_by, **options):
+    return margin_rows(db.connection(), MarginQuery(JUNE, group_by, **options), {"item": {"BTL-500": "Bottle 500ml"}})
+
+
+def test_rollup_gives_every_level_with_cogs_from_cost_basis(db):
+    result = rows(db, "type", "item")
+    grand = result[0]
+    assert (grand["level"], grand["quantity"], grand["revenue"], grand["cogs"], grand["margin"]) == (
+        0, 205, Decimal("4360.00"), Decimal("2990.00"), Decimal("1370.00"),
+    )
+    assert grand["blow_revenue"] == Decimal("200.00")
+    assert grand["uncosted_quantity"] == 10
+
+    types = [(row["type"], row["margin"]) for row in result if row["level"] == 1]
+    assert types == [("bottle", Decimal("1270.00")), ("preform", Decimal("100.00"))]
+    items = [(row["type"], row["item"], row["margin"]) for row in result if row["level"] == 2]
+    assert items == [
+        ("bottle", "BTL-500", Decimal("910.00")),  # 2200 + 210 revenue - 1500 cost
+        ("bottle", "BTL-1500", Decimal("360.00")),
+        ("preform", "PRE-500", Decimal("100.00")),
+    ]
+    assert result[-3]["item_name"] == "Bottle 500ml"
+
+
+def test_top_n_per_parent_and_drill_down(db):
+    # Best customer under each item, grand total kept
+    result = rows(db, "item", "customer", top=1, order_by="revenue")
+    best = [(row["item"], row["customer"]) for row in result if row["level"] == 2]
+    assert best == [("BTL-1500", "C-2"), ("BTL-500", "C-1"), ("PRE-500", "C-1")]
+    assert [row["level"] for row in result].count(1) == 1  # top 1 item as well
+
+    # One customer's bottles by month, without subtotals
+    result = rows(db, "month", rollup=False, filters={"customer": "C-1", "type": "bottle"})
+    assert [(row["month"], row["quantity"]) for row in result] == [(None, 105), (date(2025, 6, 1), 105)]
+
+    with pytest.raises(HTTPException):
+        MarginQuery(JUNE, ("colour",))
@@ -0,0 +1,62 @@
+"""
+Request metrics (app/core/metrics.py): the /metrics exposition and the route label of each request
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.metrics import MetricsMiddleware, render_latest
+
+
+def requests_total(text, route, method="GET"):
+    """The http_requests_total samples of one route, by status"""
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("http_requests_total{") and f'route="{route}"' in line and f'method="{method}"' in line:
+            status = line.split('status="')[1].split('"')[0]
+            samples[status] = float(line.rsplit(" ", 1)[1])
+    return samples
+
+
+@pytest.fixture
+def mounted():
+    """A sub-application mounted under /reports, behind the metrics middleware"""
+    reports = FastAPI()
+
+    @reports.get("/sales/{year}")
+    async def sales(year: int):
+        return {"year": year}
+
+    app = FastAPI()
+    app.mount("/reports", reports)
+    app.add_middleware(MetricsMiddleware)
+    return TestClient(app)
+
+
+def test_metrics_exposition(api):
+    response = api.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    for name in ("http_requests_total", "http_request_duration_seconds", "db_statements_total"):
+        assert f"# TYPE {name} " in response.text
+    # The scrape itself isn't counted
+    assert requests_total(api.get("/metrics").text, "/metrics") == {}
+
+
+def test_routes_are_labelled_by_template(api):
+    before = requests_total(render_latest(), "/api/v1/sales/{bill_number}").get("404", 0)
+    # A bill number spelled like a path segment must not change the label
+    for bill_number in ("S-404", "sales", "v1"):
+        assert api.get(f"/api/v1/sales/{bill_number}").status_code == 404
+    text = api.get("/metrics").text
+    assert requests_total(text, "/api/v1/sales/{bill_number}")["404"] == before + 3
+    assert not requests_total(text, "/api/v1/{bill_number}/{bill_number}")
+
+    api.get("/api/v1/no-such-endpoint")
+    assert requests_total(render_latest(), "unmatched")
+
+
+def test_mounted_apps_keep_their_prefix(mounted):
+    assert mounted.get("/reports/sales/2025").json() == {"year": 2025}
+    assert requests_total(render_latest(), "/reports/sales/{year}")["200"] >= 1
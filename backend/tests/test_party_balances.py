@@ -0,0 +1,122 @@
+"""
+Party balances (app/db/balances.py), maintained by the session hooks
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.db.balances import balance_before, balance_totals, mark_parties, rebuild_balances, verify_balances
+from app.core.periods import Period
+from app.models.party import Customer, PartyBalance, Supplier
+from app.models.transaction import Purchase, Sale
+
+MAY_20 = datetime(2025, 5, 20, 10, 0)
+JUNE_2 = datetime(2025, 6, 2, 10, 30)
+
+
+@pytest.fixture
+def Session(sqlite_sessions):
+    with sqlite_sessions() as db:
+        db.add_all([
+            Customer(id="CUST-1", name="Hotel"), Customer(id="CUST-2", name="Shop"),
+            Supplier(id="SUP-1", name="Preforms Ltd"),
+        ])
+        db.commit()
+    yield sqlite_sessions
+
+
+def add_sale(db, bill_number, customer_id, total, when=JUNE_2, payment_status="pending", paid_amount="0"):
+    db.add(Sale(bill_number=bill_number, customer_id=customer_id, total_price=Decimal(total), date=when,
+                payment_status=payment_status, paid_amount=Decimal(paid_amount)))
+
+
+def balance(db, party_type, party_id):
+    row = db.get(PartyBalance, (party_type, party_id))
+    return row and (row.billed, row.paid, row.outstanding, row.bills, row.open_bills)
+
+
+def verified(Session):
+    with Session() as db:
+        return verify_balances(db.connection()) == []
+
+
+def test_sales_and_payments_update_the_party(Session):
+    with Session() as db:
+        add_sale(db, "S-1", "CUST-1", "100.00")
+        add_sale(db, "S-2", "CUST-1", "50.00", payment_status="paid")
+        add_sale(db, "S-3", "CUST-1", "40.00", payment_status="partial", paid_amount="10.00")
+        add_sale(db, "S-4", None, "25.00", payment_status="paid")
+        db.commit()
+        assert balance(db, "customer", "CUST-1") == (Decimal("190.00"), Decimal("60.00"), Decimal("130.00"), 3, 2)
+        assert balance(db, "customer", "")[1] == Decimal("25.00")
+
+        sale = db.get(Sale, "S-1")
+        sale.payment_status, sale.paid_amount = "paid", sale.total_price
+        db.commit()
+        assert balance(db, "customer", "CUST-1")[2] == Decimal("30.00")
+    assert verified(Session)
+
+
+def test_cancel_move_and_delete(Session):
+    with Session() as db:
+        add_sale(db, "S-1", "CUST-1", "100.00")
+        add_sale(db, "S-2", "CUST-1", "50.00")
+        db.commit()
+
+        db.get(Sale, "S-2").customer_id = "CUST-2"
+        db.commit()
+        assert balance(db, "customer", "CUST-1")[0] == Decimal("100.00")
+        assert balance(db, "customer", "CUST-2")[0] == Decimal("50.00")
+
+        db.get(Sale, "S-2").status = "cancelled"
+        db.delete(db.get(Sale, "S-1"))
+        db.commit()
+        assert balance(db, "customer", "CUST-1") is None
+        assert balance(db, "customer", "CUST-2") is None
+    assert verified(Session)
+
+
+def test_rollback_leaves_balances_untouched(Session):
+    with Session() as db:
+        add_sale(db, "S-1", "CUST-1", "100.00")
+        db.flush()
+        db.rollback()
+        db.commit()
+        assert db.query(PartyBalance).count() == 0
+
+
+def test_totals_and_opening_balance(Session):
+    with Session() as db:
+        add_sale(db, "S-1", "CUST-1", "100.00", when=MAY_20, payment_status="partial", paid_amount="30.00")
+        add_sale(db, "S-2", "CUST-1", "50.00")
+        db.add(Purchase(bill_number="P-1", supplier_id="SUP-1", total_amount=Decimal("80.00"), date=MAY_20,
+                        payment_status="pending", paid_amount=Decimal("0")))
+        db.commit()
+
+        totals = balance_totals(db)
+        assert (totals["customer"]["billed"], totals["customer"]["outstanding"]) == (150.0, 120.0)
+        assert totals["supplier"]["outstanding"] == 80.0
+
+        june = Period.month(2025, 6)
+        assert balance_before(db, "customer", "CUST-1", june) == {"billed": 100.0, "paid": 30.0, "outstanding": 70.0}
+        assert balance_before(db, "customer", "CUST-1", Period.month(2025, 5))["billed"] == 0.0
+        assert balance_before(db, "supplier", "SUP-1", june)["outstanding"] == 80.0
+
+
+def test_verifier_reports_core_writes_until_marked(Session):
+    with Session() as db:
+        db.execute(Sale.__table__.insert().values(bill_number="S-9", customer_id="CUST-2",
+                                                  total_price=Decimal("70.00"), status="confirmed",
+                                                  payment_status="pending", paid_amount=Decimal("0"), date=JUNE_2))
+        db.commit()
+        mismatches = verify_balances(db.connection())
+        assert [(m["party_type"], m["party_id"]) for m in mismatches] == [("customer", "CUST-2")]
+
+        mark_parties(db, customers=["CUST-2"])
+        db.commit()
+        assert verify_balances(db.connection()) == []
+
+        rebuild_balances(db.connection())
+        assert balance(db, "customer", "CUST-2")[2] == Decimal("70.00")
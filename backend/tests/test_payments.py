@@ -0,0 +1,190 @@
+"""
+Bill payments (app/db/payments.py): settling ORM writes, set-based payments and repair
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from app.db.balances import verify_balances
+from app.db.payments import PaymentError, record_payments, repair_payments, settle_bills
+from app.models.party import Customer, PartyBalance, Supplier
+from app.models.transaction import Payment, Purchase, Sale
+
+JUNE_2 = datetime(2025, 6, 2, 10, 30)
+
+
+@pytest.fixture
+def Session(sqlite_sessions):
+    with sqlite_sessions() as db:
+        db.add_all([Customer(id="CUST-1", name="Hotel"), Supplier(id="SUP-1", name="Preforms Ltd")])
+        db.commit()
+    yield sqlite_sessions
+
+
+def add_sale(db, bill_number, total, payment_status="pending", paid_amount="0", status="confirmed"):
+    db.add(Sale(bill_number=bill_number, customer_id="CUST-1", total_price=Decimal(total), date=JUNE_2,
+                status=status, payment_status=payment_status, paid_amount=Decimal(paid_amount)))
+
+
+def bill(db, bill_number):
+    sale = db.get(Sale, bill_number)
+    return sale.payment_status, sale.paid_amount
+
+
+def payments(db, bill_number):
+    return [p.amount for p in db.query(Payment).filter(Payment.bill_number == bill_number).order_by(Payment.id)]
+
+
+def test_orm_writes_keep_status_and_amount_together(Session):
+    with Session() as db:
+        add_sale(db, "S-1", "100.00", payment_status="paid")
+        add_sale(db, "S-2", "100.00", paid_amount="40.00")
+        add_sale(db, "S-3", "100.00", payment_status="partial")
+        db.commit()
+        assert bill(db, "S-1") == ("paid", Decimal("100.00"))
+        assert bill(db, "S-2") == ("partial", Decimal("40.00"))
+        # 'partial' with nothing paid is what it is: pending
+        assert bill(db, "S-3") == ("pending", Decimal("0.00"))
+
+        db.get(Sale, "S-1").payment_status = "pending"
+        db.get(Sale, "S-2").paid_amount = Decimal("100.00")
+        db.commit()
+        assert bill(db, "S-1") == ("pending", Decimal("0.00"))
+        assert bill(db, "S-2") == ("paid", Decimal("100.00"))
+        assert payments(db, "S-1") == [Decimal("100.00"), Decimal("-100.00")]
+        assert payments(db, "S-2") == [Decimal("40.00"), Decimal("60.00")]
+        assert payments(db, "S-3") == []
+
+
+def test_settle_marks_open_bills_paid(Session):
+    with Session() as db:
+        add_sale(db, "S-1", "100.00")
+        add_sale(db, "S-2", "50.00", paid_amount="20.00")
+        add_sale(db, "S-3", "70.00", payment_status="paid")
+        add_sale(db, "S-4", "10.00", status="cancelled")
+        db.commit()
+
+        result = settle_bills(db, "sale", ["S-1", "S-2", "S-3", "S-4", "NOPE"], user_id=None)
+        db.commit()
+        assert (result["paid"], result["amount"]) == (2, 130.0)
+        assert result["skipped"] == {"S-3": "already paid", "S-4": "not found or cancelled",
+                                     "NOPE": "not found or cancelled"}
+        assert bill(db, "S-1") == ("paid", Decimal("100.00"))
+        assert bill(db, "S-2") == ("paid", Decimal("50.00"))
+        assert payments(db, "S-2")[-1] == Decimal("30.00")
+        assert db.get(PartyBalance, ("customer", "CUST-1")).outstanding == Decimal("0.00")
+        assert verify_balances(db.connection()) == []
+
+
+def test_record_payment_and_overpayment(Session):
+    with Session() as db:
+        db.add(Purchase(bill_number="P-1", supplier_id="SUP-1", total_amount=Decimal("200.00"), date=JUNE_2))
+        db.commit()
+
+        record_payments(db, "purchase", {"P-1": Decimal("50.00")}, method="cash")
+        db.commit()
+        purchase = db.get(Purchase, "P-1")
+        assert (purchase.payment_status, purchase.paid_amount) == ("partial", Decimal("50.00"))
+        assert db.get(PartyBalance, ("supplier", "SUP-1")).outstanding == Decimal("150.00")
+
+        with pytest.raises(HTTPException) as error:
+            record_payments(db, "purchase", {"P-1": Decimal("150.01")})
+        assert error.value.status_code == 400
+        with pytest.raises(HTTPException) as error:
+            record_payments(db, "purchase", {"P-9": Decimal("1.00")})
+        assert error.value.status_code == 404
+
+
+def test_repair_settles_old_bills_and_records_their_payments(Session):
+    with Session() as db:
+        for bill_number in ("S-1", "S-2", "S-3", "S-4"):
+            add_sale(db, bill_number, "100.00")
+        db.add(Purchase(bill_number="P-1", supplier_id="SUP-1", total_amount=Decimal("80.00"), date=JUNE_2))
+        db.commit()
+        # Rows as older code left them, written past the session hooks
+        for bill_number, values in [
+            ("S-1", {"payment_status": "paid", "paid_amount": 0}),
+            ("S-2", {"paid_amount": Decimal("30.00")}),
+            ("S-3", {"payment_status": "partial", "paid_amount": Decimal("100.00")}),
+            ("S-4", {"payment_status": "partial", "paid_amount": Decimal("20.00")}),  # in line, but no payment
+        ]:
+            db.execute(update(Sale.__table__).where(Sale.bill_number == bill_number).values(**values))
+        db.execute(update(Purchase.__table__).values(payment_status="paid", paid_amount=None))
+        db.commit()
+
+        assert repair_payments(db) == {"sale": 4, "purchase": 1}
+        db.commit()
+        assert bill(db, "S-1") == ("paid", Decimal("100.00"))
+        assert bill(db, "S-2") == ("partial", Decimal("30.00"))
+        assert bill(db, "S-3") == ("paid", Decimal("100.00"))
+        assert bill(db, "S-4") == ("partial", Decimal("20.00"))
+        assert db.get(Purchase, "P-1").paid_amount == Decimal("80.00")
+        for bill_number in ("S-1", "S-2", "S-3", "S-4"):
+            assert sum(payments(db, bill_number)) == db.get(Sale, bill_number).paid_amount
+        assert repair_payments(db) == {"sale": 0, "purchase": 0}
+        assert verify_balances(db.connection()) == []
+
+
+def test_writes_that_would_drop_a_recorded_amount_are_rejected(Session):
+    with Session() as db:
+        add_sale(db, "S-1", "100.00", payment_status="paid")
+        add_sale(db, "S-2", "100.00", paid_amount="40.00")
+        db.commit()
+
+        db.get(Sale, "S-1").payment_status = "partial"
+        with pytest.raises(PaymentError, match="set paid_amount below the total"):
+            db.commit()
+        db.rollback()
+
+        db.get(Sale, "S-2").paid_amount = Decimal("120.00")
+        with pytest.raises(PaymentError, match="record a refund first"):
+            db.commit()
+        db.rollback()
+        assert bill(db, "S-1") == ("paid", Decimal("100.00"))
+        assert bill(db, "S-2") == ("partial", Decimal("40.00"))
+
+        # Marking it partial together with the amount still paid is fine
+        sale = db.get(Sale, "S-1")
+        sale.payment_status, sale.paid_amount = "partial", Decimal("60.00")
+        db.commit()
+        assert bill(db, "S-1") == ("partial", Decimal("60.00"))
+
+
+def test_total_changes_settle_the_bill_again(Session):
+    with Session() as db:
+        add_sale(db, "S-1", "100.00", payment_status="paid")
+        add_sale(db, "S-2", "100.00", paid_amount="40.00")
+        db.commit()
+
+        db.get(Sale, "S-1").total_price = Decimal("120.00")
+        db.get(Sale, "S-2").total_price = Decimal("40.00")
+        db.commit()
+        assert bill(db, "S-1") == ("partial", Decimal("100.00"))
+        assert bill(db, "S-2") == ("paid", Decimal("40.00"))
+        assert db.get(PartyBalance, ("customer", "CUST-1")).outstanding == Decimal("20.00")
+
+        db.get(Sale, "S-2").total_price = Decimal("30.00")
+        with pytest.raises(PaymentError):
+            db.commit()
+        db.rollback()
+        assert payments(db, "S-1") == [Decimal("100.00")]
+
+
+def test_rejected_writes_are_a_400_from_the_api(Session, api):
+    with Session() as db:
+        add_sale(db, "S-1", "100.00", paid_amount="40.00")
+        db.flush()
+        db.get(Sale, "S-1").created_by = "USER-1"
+        db.commit()
+
+    response = api.put("/api/v1/sales/S-1", json={"paid_amount": "120.00"})
+    assert response.status_code == 400
+    assert "record a refund first" in response.json()["detail"]
+    response = api.put("/api/v1/sales/S-1", json={"payment_status": "partial", "paid_amount": "0"})
+    assert response.json()["payment_status"] == "pending"
+    with Session() as db:
+        assert bill(db, "S-1") == ("pending", Decimal("0.00"))
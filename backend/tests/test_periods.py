@@ -0,0 +1,56 @@
+"""
+Reporting periods (app/core/periods.py)
+"""
+
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, Date, DateTime, MetaData, Table
+
+from app.core.periods import Period, resolve_period
+
+rows = Table("rows", MetaData(), Column("day", Date), Column("at", DateTime))
+
+
+def test_month_week_and_range_bounds():
+    december = Period.month(2025, 12)
+    assert (december.start, december.end, december.last_day) == (date(2025, 12, 1), date(2026, 1, 1), date(2025, 12, 31))
+    assert december.label == "December 2025" and december.slug == "2025_12"
+
+    week = Period.iso_week(2025, 1)
+    assert (week.start, week.end) == (date(2024, 12, 30), date(2025, 1, 6))
+    assert week.slug == "2025_W01"
+
+    custom = Period.between(date(2025, 1, 1), date(2025, 3, 31))
+    assert custom.end == date(2025, 4, 1)
+    assert custom.as_dict()["end"] == "2025-03-31"
+
+
+def test_previous_and_next():
+    assert Period.month(2025, 1).previous() == Period.month(2024, 12)
+    assert Period.month(2025, 12).next() == Period.month(2026, 1)
+    assert Period.month(2025, 3).previous().last_day == date(2025, 2, 28)
+    assert Period.iso_week(2025, 10).next() == Period.iso_week(2025, 11)
+
+
+def test_filter_compares_the_raw_column():
+    june = Period.month(2025, 6)
+    sql = str(june.filter(rows.c.day).compile(compile_kwargs={"literal_binds": True}))
+    assert sql == "rows.day >= '2025-06-01' AND rows.day < '2025-07-01'"
+    assert "extract" not in str(june.filter(rows.c.at)).lower()
+    assert june.bounds(rows.c.day) == (date(2025, 6, 1), date(2025, 7, 1))
+
+
+def test_resolve_period_precedence_and_errors():
+    assert resolve_period(month=6, year=2025) == Period.month(2025, 6)
+    assert resolve_period(month=6, year=2025, week=23).kind == "week"
+    assert resolve_period(month=6, year=2025, date_from=date(2025, 6, 3), date_to=date(2025, 6, 3)).label == "03 Jun 2025"
+
+    for kwargs in ({"date_from": date(2025, 6, 1)},
+                   {"date_from": date(2025, 6, 2), "date_to": date(2025, 6, 1)},
+                   {"week": 54, "year": 2025},
+                   {"month": 13, "year": 2025}):
+        with pytest.raises(HTTPException) as error:
+            resolve_period(**kwargs)
+        assert error.value.status_code == 400
@@ -0,0 +1,110 @@
+"""
+Query budgets (app/core/query_budget.py): X-DB-* headers, budgets per route and N+1 warnings, checked
+through the query_budget fixture
+"""
+
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core import query_budget as budgets
+from app.core.config import settings
+from app.core.query_budget import QueryBudgetExceeded, QueryBudgetMiddleware
+from app.db.query_stats import instrument_engine
+
+
+@pytest.fixture
+def app(tmp_path):
+    engine = instrument_engine(create_engine(f"sqlite:///{tmp_path / 'budget.sqlite'}"))
+    app = FastAPI()
+
+    def lookup(connection, n):
+        return connection.execute(text("SELECT :n"), {"n": n}).scalar()
+
+    @app.get("/items/{count}")
+    def items(count: int):
+        # One statement per row: the N+1 shape the repeat limit catches
+        with engine.connect() as connection:
+            return [lookup(connection, n) for n in range(count)]
+
+    @app.get("/summary")
+    def summary():
+        with engine.connect() as connection:
+            return {"total": connection.execute(text("SELECT 1 + 1")).scalar()}
+
+    @app.get("/export")
+    def export():
+        def rows():
+            with engine.connect() as connection:
+                for n in range(6):
+                    yield f"{lookup(connection, n)}\n"
+
+        return StreamingResponse(rows(), media_type="text/csv")
+
+    yield app
+    engine.dispose()
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setattr(settings, "ENVIRONMENT", "development")
+    monkeypatch.setattr(settings, "QUERY_BUDGET", 5)
+    monkeypatch.setattr(settings, "QUERY_REPEAT_BUDGET", 3)
+    app.add_middleware(QueryBudgetMiddleware)
+    return TestClient(app)
+
+
+def test_within_budget(client, query_budget):
+    response = client.get("/summary")
+    assert query_budget(response) == 1
+    assert (response.headers["x-db-repeats"], response.headers["x-db-budget"]) == ("1", "5")
+    assert response.headers["x-db-time"].endswith("ms")
+
+
+def test_statement_limit_exceeded(client, query_budget, caplog):
+    with caplog.at_level(logging.WARNING, logger="app.core.query_budget"):
+        response = client.get("/items/6")
+    with pytest.raises(QueryBudgetExceeded, match=r"GET /items/6 ran 6 SQL statements \(budget 5\)"):
+        query_budget(response)
+    with pytest.raises(QueryBudgetExceeded, match=r"budget 2"):
+        query_budget(client.get("/items/3"), max_statements=2)
+    assert "QUERY BUDGET: GET /items/{count} - 6 statements (budget 5)" in caplog.text
+
+
+def test_route_budgets_use_the_template(client, query_budget, monkeypatch):
+    monkeypatch.setitem(budgets.ROUTE_QUERY_BUDGETS, "GET /items/{count}", 10)
+    response = client.get("/items/6")
+    assert response.headers["x-db-budget"] == "10"
+    assert query_budget(response) == 6
+
+
+def test_repeated_statement(client, query_budget, caplog):
+    with caplog.at_level(logging.WARNING, logger="app.core.query_budget"):
+        response = client.get("/items/4")
+    assert query_budget(response) == 4  # within the statement budget...
+    with pytest.raises(QueryBudgetExceeded, match="repeated one statement 4x"):
+        query_budget(response, max_repeats=3)  # ...but the same lookup ran per row
+    assert "same statement repeated 4x (limit 3)" in caplog.text
+    assert "4x SELECT ?" in caplog.text
+
+
+def test_streaming_counts_the_whole_body(client, query_budget, caplog):
+    with caplog.at_level(logging.WARNING, logger="app.core.query_budget"):
+        response = client.get("/export")
+    assert response.text.split() == ["0", "1", "2", "3", "4", "5"]
+    # The headers leave before the body runs its statements; the warning sees all of them
+    assert query_budget(response) == 0
+    assert "QUERY BUDGET: GET /export - 6 statements (budget 5)" in caplog.text
+
+
+def test_no_headers_in_production(app, query_budget, monkeypatch):
+    monkeypatch.setattr(settings, "ENVIRONMENT", "production")
+    app.add_middleware(QueryBudgetMiddleware)
+    response = TestClient(app).get("/summary")
+    assert "x-db-queries" not in response.headers
+    with pytest.raises(pytest.fail.Exception, match="no X-DB-Queries header"):
+        query_budget(response)
@@ -0,0 +1,49 @@
+"""
+Per-request database statistics (app/db/query_stats.py): statement counts and timings, SQL fingerprints
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.db import query_stats
+from app.db.query_stats import fingerprint, instrument_engine, track_queries
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = instrument_engine(create_engine(f"sqlite:///{tmp_path / 'stats.sqlite'}"))
+    yield engine
+    engine.dispose()
+
+
+def test_statements_are_counted_and_timed(engine):
+    with track_queries() as stats, engine.connect() as connection:
+        for n in range(3):
+            connection.execute(text("SELECT :n"), {"n": n})
+    assert stats.statements == 3
+    assert stats.max_repeats() == 3
+    assert stats.worst_repeats() == [("SELECT ?", 3)]
+    assert stats.duration > 0
+
+
+def test_failed_statements_leave_no_start_time_behind(engine, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr(query_stats, "time", SimpleNamespace(perf_counter=lambda: next(clock)))
+    with engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute(text("SELECT * FROM missing"))  # started at 0, never finished
+        with track_queries() as stats:
+            connection.execute(text("SELECT 1"))  # runs from 1 to 2
+        # A pooled connection carries nothing over to its next checkout
+        assert not any(isinstance(value, list) for value in connection.info.values())
+    assert (stats.statements, stats.duration) == (1, 1)
+
+
+def test_fingerprint():
+    assert fingerprint("SELECT *\n  FROM items WHERE id = 'PRE-1' AND qty > 10") == \
+        "SELECT * FROM items WHERE id = ? AND qty > ?"
+    assert fingerprint("SELECT 1 FROM t WHERE id IN (?, ?, ?)") == "SELECT ? FROM t WHERE id IN (?)"
+    assert fingerprint("SELECT " + "x" * 400).endswith("...")
@@ -0,0 +1,112 @@
+"""
+Read-replica routing (app/db/replica.py), with two SQLite files as primary and replica
+"""
+
+import time
+
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.db.replica import PRIMARY, REPLICA, ReplicaUnavailable, read_router
+
+Base = declarative_base()
+
+
+class Note(Base):
+    __tablename__ = "notes"
+    id = Column(Integer, primary_key=True)
+    text = Column(String)
+
+
+@pytest.fixture
+def databases(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.sqlite'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.sqlite'}")
+    for engine in (primary, replica):
+        Base.metadata.create_all(engine)
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+@pytest.fixture
+def router(databases):
+    """The process-wide router (session events pin through it), restored afterwards"""
+    saved = (read_router.read_engine, read_router.max_lag, read_router.fallback,
+             read_router.pin_seconds, read_router.check_interval)
+    read_router.configure(databases[1], max_lag=5, fallback=True, pin_seconds=60, check_interval=0)
+    yield read_router
+    read_router.configure(*saved)
+
+
+def test_without_replica_reads_use_primary(router):
+    router.configure(None)
+    assert router.choose("clerk") == (PRIMARY, "no_replica")
+
+
+def test_healthy_replica_serves_reads(router):
+    assert router.choose("clerk") == (REPLICA, "healthy")
+    assert router.choose(None) == (REPLICA, "healthy")
+
+
+def test_commit_pins_writer_to_primary(router, databases):
+    session = sessionmaker(bind=databases[0])()
+    session.info["client_key"] = "clerk"
+    session.add(Note(text="sale posted"))
+    session.commit()
+    session.close()
+
+    assert router.choose("clerk") == (PRIMARY, "pinned")
+    assert router.choose("manager") == (REPLICA, "healthy")
+
+
+def test_read_only_commit_does_not_pin(router, databases):
+    session = sessionmaker(bind=databases[0])()
+    session.info["client_key"] = "clerk"
+    session.query(Note).all()
+    session.commit()
+    session.close()
+
+    assert router.choose("clerk") == (REPLICA, "healthy")
+
+
+def test_pin_expires(router):
+    router.pin_seconds = 0.05
+    router.pin("clerk")
+    assert router.choose("clerk")[0] == PRIMARY
+    time.sleep(0.1)
+    assert router.choose("clerk")[0] == REPLICA
+
+
+def test_lagging_replica(router, monkeypatch):
+    monkeypatch.setattr(router, "_probe", lambda: 30.0)
+    assert router.choose("clerk") == (PRIMARY, "lagging")
+    router.fallback = False
+    assert router.choose("clerk") == (REPLICA, "lagging")  # stale reads are preferred over failing
+
+
+def test_unreachable_replica(router, tmp_path):
+    router.configure(create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.sqlite'}"), check_interval=0)
+    assert router.choose("clerk") == (PRIMARY, "unavailable")
+    router.fallback = False
+    with pytest.raises(ReplicaUnavailable):
+        router.choose("clerk")
+
+
+def test_lag_probe_is_cached(router, monkeypatch):
+    calls = []
+    monkeypatch.setattr(router, "_probe", lambda: calls.append(1) or 0.0)
+    router.check_interval = 60
+    for _ in range(5):
+        router.choose("clerk")
+    assert len(calls) == 1
+
+
+def test_read_session_rejects_writes(databases):
+    session = sessionmaker(bind=databases[1])()
+    session.info["read_only"] = True
+    session.add(Note(text="oops"))
+    with pytest.raises(RuntimeError, match="get_db"):
+        session.commit()
+    session.close()
@@ -0,0 +1,93 @@
+"""
+JSON responses (app/core/responses.py): the orjson wire format and the list fast path against FastAPI's own
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.responses import (
+    ORJSONResponse, dumps, json_response, list_adapter, model_list_response, model_response, rows_to_dicts,
+)
+from app.schemas.operation import WasteResponse
+
+WASTES = [
+    SimpleNamespace(id=f"W-{n}", user_id="USER-1", item_id="PRE-1", quantity=n, price_per_unit=Decimal("2.50"),
+                    total_price=Decimal("2.50") * n, notes=None, date=datetime(2025, 6, 2, 10, 30))
+    for n in range(1, 4)
+]
+
+
+@pytest.fixture
+def client():
+    app = FastAPI(default_response_class=ORJSONResponse)
+
+    @app.get("/validated", response_model=List[WasteResponse])
+    async def validated():
+        return WASTES
+
+    @app.get("/fast")
+    async def fast():
+        return model_list_response(WASTES, WasteResponse)
+
+    @app.get("/one")
+    async def one():
+        return model_response(WasteResponse.model_validate(WASTES[0], from_attributes=True), status_code=201)
+
+    @app.get("/shaped")
+    async def shaped():
+        return {"total": Decimal("7.50"), "count": Decimal("3"), "day": date(2025, 6, 2)}
+
+    return TestClient(app)
+
+
+def test_dumps_wire_format():
+    content = {
+        "whole": Decimal("12"), "cents": Decimal("12.50"), "at": datetime(2025, 6, 2, 10, 30), "day": date(2025, 6, 2),
+        "tags": {"a"}, "by_day": {date(2025, 6, 2): 1}, "series": np.array([1.5, 2.0]),
+        "schema": WasteResponse.model_validate(WASTES[0], from_attributes=True),
+    }
+    decoded = json.loads(dumps(content))
+    assert decoded["whole"] == 12 and isinstance(decoded["whole"], int)
+    assert decoded["cents"] == 12.5
+    assert (decoded["at"], decoded["day"]) == ("2025-06-02T10:30:00", "2025-06-02")
+    assert decoded["tags"] == ["a"]
+    assert decoded["by_day"] == {"2025-06-02": 1}
+    assert decoded["series"] == [1.5, 2.0]
+    assert decoded["schema"]["price_per_unit"] == "2.50"
+    with pytest.raises(TypeError, match="not JSON serializable"):
+        dumps({"x": object()})
+
+
+def test_list_fast_path_matches_the_validated_response(client):
+    validated, fast = client.get("/validated"), client.get("/fast")
+    assert fast.headers["content-type"] == "application/json"
+    assert fast.json() == validated.json()
+    assert [waste["id"] for waste in fast.json()] == ["W-1", "W-2", "W-3"]
+    assert list_adapter(WasteResponse) is list_adapter(WasteResponse)
+
+
+def test_single_and_shaped_responses(client):
+    response = client.get("/one")
+    assert response.status_code == 201
+    assert response.json() == client.get("/validated").json()[0]
+    # dicts go through orjson with Decimals as numbers, like jsonable_encoder
+    assert client.get("/shaped").json() == {"total": 7.5, "count": 3, "day": "2025-06-02"}
+    assert json.loads(json_response([{"qty": Decimal("1")}], status_code=202).body) == [{"qty": 1}]
+
+
+def test_rows_to_dicts():
+    assert rows_to_dicts([("PRE-1", 5)], columns=("item_id", "quantity")) == [{"item_id": "PRE-1", "quantity": 5}]
+    assert rows_to_dicts([SimpleNamespace(_asdict=lambda: {"item_id": "PRE-1"})]) == [{"item_id": "PRE-1"}]
+
+
+def test_app_answers_with_orjson(api):
+    assert api.app.router.default_response_class is ORJSONResponse
+    assert api.get("/keep-alive").json()["status"] == "alive"
@@ -0,0 +1,117 @@
+"""
+Static assets (app/core/static_assets.py): encoding negotiation, prebuilt and first-request variants, ETags
+"""
+
+import gzip
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import static_assets
+from app.core.middleware import EdgeMiddleware
+from app.core.static_assets import StaticAssetIndex, parse_accept_encoding
+
+BUNDLE = b"export const rows = [" + b"{id: 1, name: 'bottle'}, " * 200 + b"];\n"
+STYLES = b"body { margin: 0 }\n" * 100
+
+
+@pytest.fixture
+def dist(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_bytes(b"<!doctype html>")
+    (tmp_path / "assets" / "app-1.js").write_bytes(BUNDLE)
+    (tmp_path / "assets" / "app-1.css").write_bytes(STYLES)
+    # Shipped by the build: used as is, never recompressed
+    (tmp_path / "assets" / "app-1.css.br").write_bytes(b"prebuilt brotli")
+    return tmp_path
+
+
+@pytest.fixture
+def compressions(monkeypatch):
+    calls = []
+    compress = static_assets._compress
+
+    def counted(body, encoding):
+        calls.append(encoding)
+        return compress(body, encoding)
+
+    monkeypatch.setattr(static_assets, "_compress", counted)
+    return calls
+
+
+@pytest.fixture
+def client(dist):
+    app = FastAPI()
+    app.add_middleware(EdgeMiddleware, frontend_dist=dist)
+    return TestClient(app)
+
+
+def get(client, path, encoding, **headers):
+    """The response and its body as sent (not decoded)"""
+    with client.stream("GET", path, headers={"accept-encoding": encoding, **headers}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_accept_encoding():
+    assert parse_accept_encoding("gzip, br;q=0.5") == {"gzip", "br"}
+    assert parse_accept_encoding("br;q=0, gzip") == {"gzip"}
+    assert parse_accept_encoding("*") == {"*", "br", "gzip"}
+    assert parse_accept_encoding("") == set()
+
+
+def test_indexing_compresses_nothing(dist, compressions):
+    index = StaticAssetIndex(dist)
+    assert compressions == []
+    assert index.get("/assets/app-1.css").variants == {"br": b"prebuilt brotli"}
+    assert "/assets/app-1.css.br" not in index.assets
+
+
+def test_variants_are_made_once_on_first_request(client, compressions):
+    response, body = get(client, "/assets/app-1.js", "gzip, br")
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert brotli.decompress(body) == BUNDLE
+    get(client, "/assets/app-1.js", "br")
+    assert compressions == ["br"]
+
+    response, body = get(client, "/assets/app-1.js", "gzip, br;q=0")
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body) == BUNDLE
+    assert compressions == ["br", "gzip"]
+
+    response, body = get(client, "/assets/app-1.js", "identity")
+    assert "content-encoding" not in response.headers
+    assert body == BUNDLE
+
+
+def test_prebuilt_variants_are_served_as_shipped(client, compressions):
+    response, body = get(client, "/assets/app-1.css", "br")
+    assert (response.headers["content-encoding"], body) == ("br", b"prebuilt brotli")
+    assert compressions == []
+
+
+def test_small_files_stay_plain(client, compressions):
+    response, _ = get(client, "/index.html", "gzip, br")
+    assert "content-encoding" not in response.headers and "vary" not in response.headers
+    assert compressions == []
+
+
+def test_etags_per_representation(client):
+    plain = get(client, "/assets/app-1.js", "identity")[0].headers["etag"]
+    compressed = get(client, "/assets/app-1.js", "br")[0].headers["etag"]
+    assert plain != compressed and compressed.endswith('-br"')
+
+    response, body = get(client, "/assets/app-1.js", "br", **{"if-none-match": compressed})
+    assert (response.status_code, body) == (304, b"")
+    assert response.headers["etag"] == compressed
+    # The br validator doesn't match the plain representation
+    assert get(client, "/assets/app-1.js", "identity", **{"if-none-match": compressed})[0].status_code == 200
+    assert get(client, "/assets/app-1.js", "identity", **{"if-none-match": f"W/{plain}"})[0].status_code == 304
+
+
+def test_head_sends_headers_only(client):
+    response = client.head("/assets/app-1.js", headers={"accept-encoding": "identity"})
+    assert response.headers["content-length"] == str(len(BUNDLE))
+    assert response.content == b""
@@ -0,0 +1,87 @@
+"""
+Stock alerts (app/db/alerts.py), checked at commit for the items whose stock moved
+"""
+
+import pytest
+from sqlalchemy import select
+
+from app.db.alerts import open_alert_counts, open_alerts
+from app.models.item import Item, Stock, StockAlert, StockThreshold
+
+
+@pytest.fixture
+def db(sqlite_sessions):
+    with sqlite_sessions() as db:
+        db.add_all([
+            Item(id="PRE-1", name="Preform", type="preform", size="500ml", grade="A"),
+            Item(id="BTL-1", name="Bottle", type="bottle", size="500ml", grade="A"),
+            Stock(item_id="PRE-1", quantity=500),
+            Stock(item_id="BTL-1", quantity=50),
+        ])
+        db.commit()
+        yield db
+
+
+def current(db):
+    return {alert["item_id"]: (alert["kind"], alert["quantity"], alert["threshold"]) for alert in open_alerts(db)}
+
+
+def test_alerts_follow_the_stock(db):
+    db.add_all([
+        StockThreshold(item_id="PRE-1", min_quantity=200, max_quantity=1000),
+        StockThreshold(item_id="BTL-1", min_quantity=100),
+    ])
+    db.commit()
+    assert current(db) == {"BTL-1": ("low", 50, 100)}
+
+    # Blowing 350 preforms into bottles: preforms drop under their minimum, bottles recover
+    db.get(Stock, "PRE-1").quantity -= 350
+    db.get(Stock, "BTL-1").quantity += 350
+    db.commit()
+    assert current(db) == {"PRE-1": ("low", 150, 200)}
+    db.get(Stock, "PRE-1").quantity -= 100
+    db.commit()
+    assert current(db) == {"PRE-1": ("low", 50, 200)}  # the same alert, updated
+
+    db.get(Stock, "PRE-1").quantity -= 60
+    db.commit()
+    assert current(db) == {"PRE-1": ("out", -10, 200)}
+    db.get(Stock, "PRE-1").quantity += 2000
+    db.commit()
+    assert current(db) == {"PRE-1": ("over", 1990, 1000)}
+    assert open_alert_counts(db) == {"out": 0, "low": 0, "over": 1}
+
+    history = db.execute(select(StockAlert.kind, StockAlert.resolved_at.is_not(None)).order_by(StockAlert.id)).all()
+    assert history == [("low", True), ("low", True), ("out", True), ("over", False)]
+
+    # Removing the threshold resolves what is open
+    db.delete(db.get(StockThreshold, "PRE-1"))
+    db.commit()
+    assert current(db) == {}
+
+
+def test_only_touched_items_are_checked(db, monkeypatch):
+    checked = []
+    monkeypatch.setattr("app.db.alerts.check_items", lambda connection, items: checked.append(set(items)))
+    db.get(Stock, "BTL-1").quantity -= 5
+    db.commit()
+    item = db.get(Item, "PRE-1")
+    item.unit = "kg"
+    db.commit()
+    db.rollback()
+    db.get(Stock, "PRE-1").quantity -= 5
+    db.rollback()
+    db.commit()
+    assert checked == [{"BTL-1"}]
+
+
+def test_failed_check_rolls_the_write_back(db, monkeypatch):
+    def broken(connection, items):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr("app.db.alerts.check_items", broken)
+    db.get(Stock, "BTL-1").quantity -= 5
+    with pytest.raises(RuntimeError):
+        db.commit()
+    db.rollback()
+    assert db.get(Stock, "BTL-1").quantity == 50
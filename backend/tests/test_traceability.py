@@ -0,0 +1,103 @@
+"""
+FIFO lot traceability (app/db/traceability.py): the one-statement allocation against the cost layers the
+same history leaves behind
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from app.core.periods import Period
+from app.db.cost_layers import rebuild_cost_layers
+from app.db.traceability import open_trace, trace_rows, trace_sales
+from app.models.item import CostLayer, CostLayerIssue, Item
+from app.models.transaction import Blow, Purchase, PurchaseLineItem, Sale, SaleLineItem
+
+JUNE = Period(date(2025, 6, 1), date(2025, 7, 1), "month")
+
+
+@pytest.fixture
+def db(sqlite_sessions):
+    with sqlite_sessions() as db:
+        db.add_all([
+            Item(id="PRE-1", name="Preform", type="preform", size="500ml", grade="A"),
+            Item(id="BTL-1", name="Bottle", type="bottle", size="500ml", grade="A"),
+        ])
+        db.commit()
+        yield db
+
+
+def purchase(db, bill_number, item_id, qty, unit_price, day, supplier_id=None):
+    total = Decimal(unit_price) * qty
+    db.add(Purchase(bill_number=bill_number, supplier_id=supplier_id, total_amount=total, date=datetime(2025, 6, day)))
+    db.add(PurchaseLineItem(id=f"{bill_number}-{item_id}", bill_number=bill_number, item_id=item_id, quantity=qty,
+                            unit_price=Decimal(unit_price), total_price=total))
+
+
+def blow(db, blow_id, input_qty, output_qty, day):
+    db.add(Blow(id=blow_id, from_item_id="PRE-1", to_item_id="BTL-1", input_quantity=input_qty,
+                output_quantity=output_qty, quantity=output_qty, blow_cost_per_unit=Decimal("1.50"),
+                date_time=datetime(2025, 6, day)))
+
+
+def sale(db, bill_number, qty, day, item_id="BTL-1"):
+    db.add(Sale(bill_number=bill_number, total_price=Decimal(20) * qty, date=datetime(2025, 6, day)))
+    db.add(SaleLineItem(id=f"{bill_number}-{item_id}", bill_number=bill_number, item_id=item_id, quantity=qty,
+                        unit_price=Decimal(20), total_price=Decimal(20) * qty))
+
+
+def trace(db, item_id, bill_number=None):
+    return list(trace_sales(trace_rows(db.get_bind(), open_trace(db, item_id, JUNE, bill_number))))
+
+
+def test_sales_are_traced_to_the_layers_fifo_leaves_behind(db):
+    purchase(db, "P-1", "PRE-1", 1000, "9.00", 2, supplier_id="SUP-1")
+    purchase(db, "P-2", "PRE-1", 1000, "12.00", 3, supplier_id="SUP-2")
+    purchase(db, "P-3", "BTL-1", 100, "15.00", 3)
+    blow(db, "B-1", 1200, 1200, 4)  # 1000 preforms of P-1, 200 of P-2
+    sale(db, "S-1", 60, 5)  # the 100 bought bottles go first
+    sale(db, "S-2", 80, 6)  # 40 bought, 40 blown
+    sale(db, "S-3", 2000, 7)  # the other 1160 blown, 840 not made yet
+    db.commit()
+    rebuild_cost_layers(db.connection())
+    db.commit()
+
+    sales = trace(db, "BTL-1")
+    assert [(s["bill_number"], [(lot["reference"], lot["quantity"]) for lot in s["lots"]], s["untraced"])
+            for s in sales] == [
+        ("S-1", [("P-3", 60)], 0),
+        ("S-2", [("P-3", 40), ("B-1", 40)], 0),
+        ("S-3", [("B-1", 1160)], 840),
+    ]
+
+    # The same units the replayed cost layers issued to each line, short layers aside
+    issued = {}
+    for ref, source, source_ref, qty in db.execute(
+        select(CostLayerIssue.ref, CostLayer.source, CostLayer.source_ref, CostLayerIssue.quantity)
+        .join(CostLayer, CostLayer.id == CostLayerIssue.layer_id)
+        .where(CostLayerIssue.ref_type == "sale", CostLayer.source != "short")
+    ):
+        issued[ref, source_ref] = issued.get((ref, source_ref), 0) + qty
+    traced = {(s["line_id"], lot["reference"]): lot["quantity"] for s in sales for lot in s["lots"]}
+    assert traced == issued
+
+    # Blown bottles split over the preform bills in proportion to the blow's input: 5/6 P-1, 1/6 P-2
+    origins = sales[1]["lots"][1]["origins"]
+    assert [(o["reference"], o["supplier_id"], o["quantity"]) for o in origins] == [
+        ("P-1", "SUP-1", pytest.approx(33.3333)), ("P-2", "SUP-2", pytest.approx(6.6667)),
+    ]
+    assert sales[1]["lots"][1]["unit_cost"] is None  # produced_unit_cost not stamped
+
+
+def test_units_sold_short_are_traced_to_the_receipt_that_filled_them(db):
+    sale(db, "S-1", 30, 2, item_id="PRE-1")
+    purchase(db, "P-1", "PRE-1", 100, "9.00", 3)
+    sale(db, "S-2", 50, 4, item_id="PRE-1")
+    db.commit()
+
+    sales = trace(db, "PRE-1", bill_number="S-2")
+    assert [(lot["reference"], lot["quantity"]) for lot in sales[0]["lots"]] == [("P-1", 50)]
+    assert [s["bill_number"] for s in trace(db, "PRE-1")] == ["S-1", "S-2"]
+    assert trace(db, "PRE-1")[0]["lots"][0]["date"] == date(2025, 6, 3)
@@ -0,0 +1,73 @@
+"""
+Inventory valuation (app/db/valuation.py): stock at cost on past days, rolled back from the cost layers a
+replay of the history leaves
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.db.cost_layers import rebuild_cost_layers
+from app.db.valuation import item_valuations, valuation_totals
+from app.models.item import Item
+from app.models.transaction import Blow, Purchase, PurchaseLineItem, Sale, SaleLineItem
+
+
+@pytest.fixture
+def db(sqlite_sessions):
+    with sqlite_sessions() as db:
+        db.add_all([
+            Item(id="PRE-1", name="Preform", type="preform", size="500ml", grade="A"),
+            Item(id="BTL-1", name="Bottle", type="bottle", size="500ml", grade="A"),
+        ])
+        db.commit()
+        yield db
+
+
+def purchase(db, bill_number, qty, unit_price, day):
+    total = Decimal(unit_price) * qty
+    db.add(Purchase(bill_number=bill_number, total_amount=total, date=datetime(2025, 6, day)))
+    db.add(PurchaseLineItem(id=f"{bill_number}-PRE-1", bill_number=bill_number, item_id="PRE-1", quantity=qty,
+                            unit_price=Decimal(unit_price), total_price=total))
+
+
+def sale(db, bill_number, item_id, qty, day):
+    db.add(Sale(bill_number=bill_number, total_price=Decimal(20) * qty, date=datetime(2025, 6, day)))
+    db.add(SaleLineItem(id=f"{bill_number}-{item_id}", bill_number=bill_number, item_id=item_id, quantity=qty,
+                        unit_price=Decimal(20), total_price=Decimal(20) * qty))
+
+
+def on_hand(db, day):
+    return {row.item_id: (row.quantity, row.value) for row in item_valuations(db.connection(), date(2025, 6, day))}
+
+
+def test_stock_is_valued_at_the_close_of_any_past_day(db):
+    purchase(db, "P-1", 100, "9.00", 2)
+    purchase(db, "P-2", 100, "12.00", 3)
+    # 100 preforms at 9.00 and 50 at 12.00, blown into 150 bottles at 1.00 each: 11.00 a bottle
+    db.add(Blow(id="B-1", from_item_id="PRE-1", to_item_id="BTL-1", input_quantity=150, output_quantity=150,
+                quantity=150, blow_cost_per_unit=Decimal("1.00"), date_time=datetime(2025, 6, 4)))
+    sale(db, "S-1", "BTL-1", 40, 5)
+    sale(db, "S-2", "PRE-1", 80, 6)  # 30 more than on hand
+    purchase(db, "P-3", 100, "10.00", 7)
+    db.commit()
+    rebuild_cost_layers(db.connection())
+    db.commit()
+
+    assert on_hand(db, 1) == {}
+    assert on_hand(db, 2) == {"PRE-1": (100, Decimal("900.00"))}
+    assert on_hand(db, 3) == {"PRE-1": (200, Decimal("2100.00"))}
+    assert on_hand(db, 4) == {"PRE-1": (50, Decimal("600.00")), "BTL-1": (150, Decimal("1650.00"))}
+    # Sold short: nothing on hand rather than below zero, then what the next receipt left
+    assert on_hand(db, 6) == {"BTL-1": (110, Decimal("1210.00"))}
+    assert on_hand(db, 7) == {"PRE-1": (70, Decimal("700.00")), "BTL-1": (110, Decimal("1210.00"))}
+    assert on_hand(db, 30) == on_hand(db, 7)
+
+    totals = valuation_totals(item_valuations(db.connection(), date(2025, 6, 7)))
+    assert (totals["quantity"], totals["value"]) == (180, Decimal("1910.00"))
+    assert totals["by_type"] == [
+        {"type": "bottle", "quantity": 110, "value": Decimal("1210.00")},
+        {"type": "preform", "quantity": 70, "value": Decimal("700.00")},
+    ]
+    assert totals["by_size"] == [{"size": "500ml", "quantity": 180, "value": Decimal("1910.00")}]
@@ -0,0 +1,102 @@
+"""
+Startup warm-up (app/core/warmup.py): step outcomes, the time box, and /health answering 503 until it is done
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import warmup
+from app.core.config import settings
+from app.core.warmup import WarmupState, run_warmup, warmup_state
+
+
+def failing():
+    raise RuntimeError("connection refused")
+
+
+@pytest.fixture
+def steps(monkeypatch):
+    """Swap the real steps (which need the production database) for the given ones"""
+    def use(*named):
+        monkeypatch.setattr(warmup, "WARMUP_STEPS", list(named))
+    monkeypatch.setattr(settings, "WARMUP_ENABLED", True)
+    monkeypatch.setattr(settings, "WARMUP_TIMEOUT", 5)
+    return use
+
+
+def test_steps_report_their_outcome(steps):
+    ran = []
+    steps(("connections", lambda: ran.append("connections")), ("catalogs", failing), ("invoice_pdf", lambda: ran.append("pdf")))
+    state = WarmupState()
+    assert not state.ready and state.as_dict()["started_at"] is None
+
+    assert asyncio.run(run_warmup(state)) is state
+    assert state.status == "ready" and state.ready
+    assert state.started_at <= state.finished_at
+    assert {name: step["status"] for name, step in state.steps.items()} == {
+        "connections": "ok", "catalogs": "failed", "invoice_pdf": "ok",
+    }
+    # A failed step doesn't stop the ones after it
+    assert ran == ["connections", "pdf"]
+    assert state.steps["catalogs"]["error"] == "connection refused"
+    assert all(step["ms"] >= 0 for step in state.steps.values())
+
+
+def test_time_box(steps, monkeypatch):
+    monkeypatch.setattr(settings, "WARMUP_TIMEOUT", 0.1)
+    steps(("statements", lambda: time.sleep(0.3)), ("catalogs", lambda: None))
+    state = asyncio.run(run_warmup(WarmupState()))
+    assert state.ready
+    assert state.steps["statements"]["status"] == "timeout"
+    assert state.steps["catalogs"] == {"status": "skipped"}
+
+
+def test_disabled(steps, monkeypatch):
+    monkeypatch.setattr(settings, "WARMUP_ENABLED", False)
+    steps(("connections", failing))
+    state = asyncio.run(run_warmup(WarmupState()))
+    assert (state.status, state.ready, state.steps) == ("disabled", True, {})
+
+
+def test_health_is_503_until_ready(api, monkeypatch):
+    monkeypatch.setattr(warmup_state, "status", "running")
+    response = api.get("/health")
+    assert response.status_code == 503
+    assert (response.json()["status"], response.json()["ready"]) == ("warming_up", False)
+    assert response.json()["warmup"]["status"] == "running"
+
+    monkeypatch.setattr(warmup_state, "status", "ready")
+    response = api.get("/health")
+    assert response.status_code == 200
+    assert (response.json()["status"], response.json()["ready"]) == ("healthy", True)
+
+
+def test_lifespan_serves_while_warming_up(steps, monkeypatch):
+    from app.db import migrate
+    from app.main import app
+
+    migrated, release = [], threading.Event()
+    monkeypatch.setattr(migrate, "migrate", lambda: migrated.append(True))
+    monkeypatch.setattr(settings, "MIGRATE_ON_STARTUP", True)
+    # The lifespan fills the app's own state; restore it afterwards
+    for name, value in vars(WarmupState()).items():
+        monkeypatch.setattr(warmup_state, name, value)
+    steps(("connections", lambda: release.wait(5)))
+
+    with TestClient(app) as client:
+        # Tables are prepared before the first request; the warm-up is still running
+        assert migrated == [True]
+        assert client.get("/health").status_code == 503
+        assert client.get("/keep-alive").json()["status"] == "alive"
+        release.set()
+        for _ in range(100):
+            if warmup_state.ready:
+                break
+            time.sleep(0.01)
+        response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["warmup"]["steps"]["connections"]["status"] == "ok"
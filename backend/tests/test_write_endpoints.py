@@ -0,0 +1,156 @@
+"""
+Write endpoints (app/api/v1) keeping stock, costs and daily facts in step, through the API under both
+COSTING_METHOD settings
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app.core.config import settings
+from app.db.cost_layers import verify_cost_layers
+from app.db.costing import verify_item_costs
+from app.models.facts import DailyBlowFact, DailyItemFact
+from app.models.item import CostLayer, CostLayerIssue, Item, ItemCost, Stock
+from app.models.party import Customer, Supplier
+from app.models.transaction import Purchase, PurchaseLineItem, SaleLineItem
+
+API = "/api/v1"
+
+
+@pytest.fixture(params=["fifo", "wac"])
+def method(request, monkeypatch):
+    monkeypatch.setattr(settings, "COSTING_METHOD", request.param)
+    return request.param
+
+
+@pytest.fixture
+def db(sqlite_sessions, api, method):
+    """The items and parties, and 200 preforms bought at 10.00 through the API"""
+    with sqlite_sessions() as db:
+        db.add_all([
+            Item(id="PRE-1", name="Preform", type="preform", size="500ml", grade="A"),
+            Item(id="BTL-1", name="Bottle", type="bottle", size="500ml", grade="A"),
+            Stock(item_id="PRE-1", quantity=0),
+            Customer(id="CUST-1", name="Hotel"),
+            Supplier(id="SUP-1", name="Preforms Ltd"),
+        ])
+        db.commit()
+        response = api.post(f"{API}/purchases/", json={
+            "bill_number": "P-1", "supplier_id": "SUP-1",
+            "line_items": [{"item_id": "PRE-1", "quantity": 200, "unit_price": "10.00"}],
+        })
+        assert response.status_code == 201, response.text
+        # SQLite stamps blows to the second: keep the purchase clearly first for the replays
+        db.get(Purchase, "P-1").date -= timedelta(days=1)
+        db.commit()
+        yield db
+
+
+def blow(api, output_quantity=100, blow_cost="1.00"):
+    response = api.post(f"{API}/blows/", json={
+        "id": "B-1", "from_item_id": "PRE-1", "input_quantity": 100, "output_quantity": output_quantity,
+        "waste_quantity": 100 - output_quantity, "blow_cost_per_unit": blow_cost,
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def stock(db, item_id):
+    db.expire_all()
+    return db.get(Stock, item_id).quantity
+
+
+def in_step(db, method):
+    """Only the configured method's table is kept, and it matches a replay of the history"""
+    db.expire_all()
+    connection = db.connection()
+    kept, dropped = (ItemCost, CostLayer) if method == "wac" else (CostLayer, ItemCost)
+    assert db.scalar(select(func.count()).select_from(kept)) > 0
+    assert db.scalar(select(func.count()).select_from(dropped)) == 0
+    return (verify_item_costs if method == "wac" else verify_cost_layers)(connection) == []
+
+
+def test_blow_and_sale_cost_and_reach_the_facts(api, db, method):
+    created = blow(api)
+    # 100 preforms at 10.00 plus 1.00 a bottle (costs that are exact to the cent, see app/db/costing.py)
+    assert Decimal(created["produced_unit_cost"]) == Decimal("11.00")
+    assert (stock(db, "PRE-1"), stock(db, "BTL-1")) == (100, 100)
+
+    response = api.post(f"{API}/sales/", json={
+        "bill_number": "S-1", "customer_id": "CUST-1",
+        "line_items": [{"item_id": "BTL-1", "quantity": 10, "unit_price": "20.00"}],
+    })
+    assert response.status_code == 201, response.text
+    assert Decimal(response.json()["line_items"][0]["cost_basis"]) == Decimal("11.00")
+    assert stock(db, "BTL-1") == 90
+    assert in_step(db, method)
+
+    facts = {row.item_id: row for row in db.scalars(select(DailyItemFact))}
+    assert facts["BTL-1"].qty_sold == 10
+    assert db.scalar(select(DailyBlowFact.qty_output)) == 100
+
+    assert api.delete(f"{API}/sales/S-1").status_code == 200
+    assert stock(db, "BTL-1") == 100
+    assert in_step(db, method)
+
+
+def test_editing_a_blow_recosts_its_bottles(api, db, method):
+    blow(api)
+    response = api.put(f"{API}/blows/B-1", json={"output_quantity": 80, "blow_cost_per_unit": "2.00"})
+    assert response.status_code == 200, response.text
+    # The same 1000.00 of preforms over 80 bottles, plus 2.00 each
+    assert Decimal(response.json()["produced_unit_cost"]) == Decimal("14.50")
+    # Re-costed only: stock isn't moved by an edit
+    assert (stock(db, "PRE-1"), stock(db, "BTL-1")) == (100, 100)
+    assert in_step(db, method)
+    assert db.scalar(select(DailyBlowFact.qty_output)) == 80
+
+    assert api.delete(f"{API}/blows/B-1").status_code == 200
+    assert stock(db, "PRE-1") == 200
+    assert in_step(db, method)
+
+
+def test_editing_a_waste_recosts_it(api, db, method):
+    response = api.post(f"{API}/wastes/", json={
+        "id": "W-1", "item_id": "PRE-1", "quantity": 5, "price_per_unit": "2.00",
+    })
+    assert response.status_code == 201, response.text
+    assert stock(db, "PRE-1") == 195
+
+    response = api.put(f"{API}/wastes/W-1", json={"quantity": 8})
+    assert response.status_code == 200, response.text
+    assert Decimal(response.json()["total_price"]) == Decimal("16.00")
+    # Re-costed only: stock isn't moved by an edit or a delete
+    assert stock(db, "PRE-1") == 195
+    assert in_step(db, method)
+    if method == "fifo":
+        issued = select(func.sum(CostLayerIssue.quantity)).where(CostLayerIssue.ref_type == "waste",
+                                                                 CostLayerIssue.ref == "W-1")
+        assert db.scalar(issued) == 8
+
+    assert api.delete(f"{API}/wastes/W-1").status_code == 200
+    assert stock(db, "PRE-1") == 195
+    assert in_step(db, method)
+
+
+def test_recalculating_cogs_refreshes_the_facts(api, db, method):
+    blow(api)
+    response = api.post(f"{API}/sales/", json={
+        "bill_number": "S-1", "customer_id": "CUST-1",
+        "line_items": [{"item_id": "BTL-1", "quantity": 10, "unit_price": "20.00"}],
+    })
+    assert response.status_code == 201, response.text
+    # A price fixed by hand after the fact: the stored costs are now stale
+    db.execute(update(PurchaseLineItem).values(unit_price=Decimal("12.00"), total_price=Decimal("2400.00")))
+    db.commit()
+
+    response = api.post(f"{API}/sales/recalculate-cogs")
+    assert response.status_code == 200, response.text
+    assert response.json()["items_updated"] == 1
+    db.expire_all()
+    # 100 preforms at 12.00 plus 1.00 a bottle, for the 10 sold
+    assert db.scalar(select(SaleLineItem.cost_basis)) == Decimal("13.00")
+    assert db.scalar(select(DailyItemFact.cogs).where(DailyItemFact.item_id == "BTL-1")) == Decimal("130.00")
@@ -3,12 +3,99 @@ import api from '../api/axios';
 import toast from 'react-hot-toast';
 import { DollarSign, X } from 'lucide-react';
 
-const PaymentModal = ({ isOpen, onClose, transaction, transactionType, onSubmit }) => {
+const billTotal = (bill) => parseFloat(bill.total_amount || bill.total_price || 0);
+
+// Bulk mode: pass `transactions` (the selected bills) to mark them all paid in one request
+const SettleBills = ({ onClose, transactions, transactionType, onSubmit }) => {
+  const [loading, setLoading] = useState(false);
+
+  const openBills = transactions.filter(t => t.payment_status !== 'paid');
+  const remainingTotal = openBills.reduce((sum, t) => sum + billTotal(t) - parseFloat(t.paid_amount || 0), 0);
+
+  const handleSettle = async () => {
+    setLoading(true);
+    try {
+      const response = await api.post('/payments/settle', {
+        bill_type: transactionType,
+        bill_numbers: transactions.map(t => t.bill_number),
+      });
+      toast.success(`Marked ${response.data.paid} bill(s) paid`);
+      if (onSubmit) await onSubmit(response.data);
+      onClose();
+    } catch (error) {
+      console.error('Settle bills error:', error);
+      toast.error(error.response?.data?.detail || 'Failed to mark bills paid');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  return (
+    <div className="fixed inset-0 bg-black bg-opacity-50 flex items-center justify-center z-50">
+      <div className="bg-white rounded-xl p-8 max-w-md w-full mx-4">
+        <div className="flex justify-between items-center mb-6">
+          <h2 className="text-xl font-bold text-gray-900">Mark Bills Paid</h2>
+          <button onClick={onClose} className="text-gray-400 hover:text-gray-600">
+            <X className="w-6 h-6" />
+          </button>
+        </div>
+
+        <div className="mb-6 space-y-2">
+          <div className="flex justify-between text-sm">
+            <span className="text-gray-600">Selected Bills:</span>
+            <span className="font-medium">{transactions.length}</span>
+          </div>
+          <div className="flex justify-between text-sm">
+            <span className="text-gray-600">Not Yet Paid:</span>
+            <span className="font-medium">{openBills.length}</span>
+          </div>
+          <div className="flex justify-between text-sm border-t pt-2">
+            <span className="text-gray-600 font-semibold">Remaining:</span>
+            <span className="font-bold text-red-600">
+              {remainingTotal.toFixed(2)} PKR
+            </span>
+          </div>
+        </div>
+
+        <div className="flex gap-3">
+          <button
+            onClick={handleSettle}
+            disabled={loading || openBills.length === 0}
+            className="btn btn-primary flex-1 flex items-center justify-center gap-2"
+          >
+            <DollarSign className="w-4 h-4" />
+            {loading ? 'Recording...' : `Mark ${openBills.length} Paid`}
+          </button>
+          <button
+            type="button"
+            onClick={onClose}
+            className="btn bg-gray-200 text-gray-800 hover:bg-gray-300 flex-1"
+          >
+            Cancel
+          </button>
+        </div>
+      </div>
+    </div>
+  );
+};
+
+const PaymentModal = ({ isOpen, onClose, transaction, transactions, transactionType, onSubmit }) => {
   const [paymentAmount, setPaymentAmount] = useState('');
   const [loading, setLoading] = useState(false);
 
   if (!isOpen) return null;
 
+  if (transactions) {
+    return (
+      <SettleBills
+        onClose={onClose}
+        transactions={transactions}
+        transactionType={transactionType}
+        onSubmit={onSubmit}
+      />
+    );
+  }
+
   const remainingAmount = parseFloat(transaction.total_amount || transaction.total_price) - parseFloat(transaction.paid_amount || 0);
 
   const handleSubmit = async (e) => {
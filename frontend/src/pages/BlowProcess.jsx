@@ -161,49 +161,23 @@ const BlowProcess = () => {
       toast.error('Please select at least one blow process');
       return;
     }
-    let successCount = 0;
-    let failureCount = 0;
-    
-    for (const blowId of selectedBlows) {
-      try {
-        const response = await api.get(`/invoices/invoice/blow/${blowId}`, {
-          responseType: 'blob',
-        });
-        // Check if response is valid PDF
-        if (response.data && response.data.size > 0) {
-          const url = window.URL.createObjectURL(response.data);
-          const link = document.createElement('a');
-          link.href = url;
-          link.setAttribute('download', `blow_process_${blowId}.pdf`);
-          document.body.appendChild(link);
-          link.click();
-          document.body.removeChild(link);
-          // Delay revokeObjectURL to allow download to complete
-          setTimeout(() => window.URL.revokeObjectURL(url), 100);
-          successCount++;
-        } else {
-          failureCount++;
-        }
-      } catch (error) {
-        console.error(`Download error for blow ${blowId}:`, error);
-        // Only count as failure if it's an actual HTTP error
-        if (error.response && error.response.status >= 400) {
-          failureCount++;
-        } else {
-          // Assume download initiated (IDM may have intercepted)
-          successCount++;
-        }
-      }
-      // Small delay between downloads
-      await new Promise(resolve => setTimeout(resolve, 300));
-    }
-    
-    // Show appropriate message
-    if (successCount > 0 && failureCount === 0) {
-      toast.success(`Downloading ${successCount} blow process(es)...`);
-    } else if (successCount > 0) {
-      toast.warning(`Downloaded ${successCount}, failed ${failureCount}`);
-    } else {
+    try {
+      // One ZIP of all selected records, rendered in parallel on the server
+      const response = await api.post('/invoices/bundle', { type: 'blow', ids: selectedBlows }, {
+        responseType: 'blob',
+      });
+      const url = window.URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.setAttribute('download', `blow_invoices_${new Date().toISOString().split('T')[0]}.zip`);
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+      // Delay revokeObjectURL to allow download to complete
+      setTimeout(() => window.URL.revokeObjectURL(url), 100);
+      toast.success(`Downloaded ${selectedBlows.length} blow process(es)`);
+    } catch (error) {
+      console.error('Download selected error:', error);
       toast.error('Failed to download blow processes');
     }
   };
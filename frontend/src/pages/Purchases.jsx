@@ -1,12 +1,13 @@
 import React, { useState, useEffect } from 'react';
 import api from '../api/axios';
 import toast from 'react-hot-toast';
-import { Plus, Trash2, Download, FileDown, X, Edit2 } from 'lucide-react';
+import { Plus, Trash2, Download, FileDown, X, Edit2, CheckCircle } from 'lucide-react';
 import { useAuth } from '../context/AuthContext';
 import { formatCurrency, formatCurrencySimple, formatDate } from '../utils/currency';
 import { generatePurchaseNumber } from '../utils/idGenerator';
 import Pagination from '../components/Pagination';
 import LineItemsForm from '../components/LineItemsForm';
+import PaymentModal from '../components/PaymentModal';
 
 const Purchases = () => {
   const { user } = useAuth();
@@ -20,6 +21,7 @@ const Purchases = () => {
   const [filterSupplier, setFilterSupplier] = useState('');
   const [filterPaymentStatus, setFilterPaymentStatus] = useState('');
   const [selectedBills, setSelectedBills] = useState([]);
+  const [showPaymentModal, setShowPaymentModal] = useState(false);
   const [editMode, setEditMode] = useState(false);
   const [currentPage, setCurrentPage] = useState(1);
   const [pageSize, setPageSize] = useState(10);
@@ -60,17 +62,6 @@ const Purchases = () => {
       setFormData(prev => ({ ...prev, bill_number: billNumber }));
     };
     initializeBillNumber();
-    
-    // Fix existing paid purchases on component mount
-    const fixPaidAmounts = async () => {
-      try {
-        await api.post('/purchases/fix/paid-amounts');
-      } catch (error) {
-        console.log('Paid amounts already fixed or no fixes needed');
-      }
-    };
-    
-    fixPaidAmounts();
     fetchData();
   }, []);
 
@@ -274,24 +265,19 @@ const Purchases = () => {
       return;
     }
     try {
-      // Download each bill as professional Care Packages format invoice
-      for (const billNumber of selectedBills) {
-        const response = await api.get(`/invoices/invoice/purchase/${billNumber}`, {
-          responseType: 'blob'
-        });
-
-        const url = window.URL.createObjectURL(response.data);
-        const link = document.createElement('a');
-        link.href = url;
-        link.setAttribute('download', `purchase_invoice_${billNumber}.pdf`);
-        document.body.appendChild(link);
-        link.click();
-        document.body.removeChild(link);
-        window.URL.revokeObjectURL(url);
-        
-        // Small delay between downloads
-        await new Promise(resolve => setTimeout(resolve, 300));
-      }
+      // One ZIP of all selected invoices, rendered in parallel on the server
+      const response = await api.post('/invoices/bundle', { type: 'purchase', ids: selectedBills }, {
+        responseType: 'blob'
+      });
+
+      const url = window.URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.setAttribute('download', `purchase_invoices_${new Date().toISOString().split('T')[0]}.zip`);
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+      window.URL.revokeObjectURL(url);
       toast.success(`Downloaded ${selectedBills.length} invoice(s)`);
     } catch (error) {
       console.error('Download selected error:', error);
@@ -387,6 +373,18 @@ const Purchases = () => {
           >
             <Download className="w-4 h-4" /> PDF
           </button>
+          <button
+            onClick={() => setShowPaymentModal(true)}
+            disabled={selectedBills.length === 0}
+            className={`px-4 py-2 rounded-lg font-medium transition-all duration-200 flex items-center gap-2 ${
+              selectedBills.length === 0
+                ? 'bg-gray-200 text-gray-400 cursor-not-allowed'
+                : 'bg-amber-100 text-amber-700 hover:bg-amber-200 hover:text-amber-800 border border-amber-300'
+            }`}
+            title="Mark selected purchases as paid"
+          >
+            <CheckCircle className="w-4 h-4" /> Mark Paid
+          </button>
           <button
             onClick={downloadExcelAll}
             className="px-4 py-2 rounded-lg font-medium transition-all duration-200 flex items-center gap-2 bg-green-100 text-green-700 hover:bg-green-200 hover:text-green-800 border border-green-300"
@@ -781,6 +779,14 @@ const Purchases = () => {
         </div>
       )}
 
+      <PaymentModal
+        isOpen={showPaymentModal}
+        onClose={() => setShowPaymentModal(false)}
+        transactions={purchases.filter(bill => selectedBills.includes(bill.bill_number))}
+        transactionType="purchase"
+        onSubmit={fetchData}
+      />
+
       {/* Quick Add Item Modal removed as requested */}
     </div>
   );
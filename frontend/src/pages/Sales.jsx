@@ -1,12 +1,13 @@
 ﻿import React, { useState, useEffect, useCallback } from 'react';
 import api from '../api/axios';
 import toast from 'react-hot-toast';
-import { Plus, Download, FileDown, Edit2, Trash2 } from 'lucide-react';
+import { Plus, Download, FileDown, Edit2, Trash2, CheckCircle } from 'lucide-react';
 import { useAuth } from '../context/AuthContext';
 import { formatCurrency, formatCurrencySimple, formatDate } from '../utils/currency';
 import { generateSaleNumber } from '../utils/idGenerator';
 import Pagination from '../components/Pagination';
 import LineItemsForm from '../components/LineItemsForm';
+import PaymentModal from '../components/PaymentModal';
 
 const Sales = () => {
   const { user } = useAuth();
@@ -21,6 +22,7 @@ const Sales = () => {
   const [filterPaymentStatus, setFilterPaymentStatus] = useState('');
   const [filterPaymentMethod, setFilterPaymentMethod] = useState('');
   const [selectedBills, setSelectedBills] = useState([]);
+  const [showPaymentModal, setShowPaymentModal] = useState(false);
   const [editMode, setEditMode] = useState(false);
   const [currentPage, setCurrentPage] = useState(1);
   const [pageSize, setPageSize] = useState(10);
@@ -208,24 +210,19 @@ const Sales = () => {
       return;
     }
     try {
-      // Download each bill as professional Care Packages format invoice
-      for (const billNumber of selectedBills) {
-        const response = await api.get(`/invoices/invoice/sale/${billNumber}`, {
-          responseType: 'blob'
-        });
-
-        const url = window.URL.createObjectURL(response.data);
-        const link = document.createElement('a');
-        link.href = url;
-        link.setAttribute('download', `invoice_${billNumber}.pdf`);
-        document.body.appendChild(link);
-        link.click();
-        document.body.removeChild(link);
-        window.URL.revokeObjectURL(url);
-        
-        // Small delay between downloads
-        await new Promise(resolve => setTimeout(resolve, 300));
-      }
+      // One ZIP of all selected invoices, rendered in parallel on the server
+      const response = await api.post('/invoices/bundle', { type: 'sale', ids: selectedBills }, {
+        responseType: 'blob'
+      });
+
+      const url = window.URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.setAttribute('download', `sale_invoices_${new Date().toISOString().split('T')[0]}.zip`);
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+      window.URL.revokeObjectURL(url);
       toast.success(`Downloaded ${selectedBills.length} invoice(s)`);
     } catch (error) {
       console.error('Download selected error:', error);
@@ -399,6 +396,18 @@ const Sales = () => {
           >
             <Download className="w-4 h-4" /> PDF
           </button>
+          <button
+            onClick={() => setShowPaymentModal(true)}
+            disabled={selectedBills.length === 0}
+            className={`px-4 py-2 rounded-lg font-medium transition-all duration-200 flex items-center gap-2 ${
+              selectedBills.length === 0
+                ? 'bg-gray-200 text-gray-400 cursor-not-allowed'
+                : 'bg-amber-100 text-amber-700 hover:bg-amber-200 hover:text-amber-800 border border-amber-300'
+            }`}
+            title="Mark selected sales as paid"
+          >
+            <CheckCircle className="w-4 h-4" /> Mark Paid
+          </button>
           <button
             onClick={downloadExcelAll}
             className="px-4 py-2 rounded-lg font-medium transition-all duration-200 flex items-center gap-2 bg-green-100 text-green-700 hover:bg-green-200 hover:text-green-800 border border-green-300"
@@ -784,6 +793,14 @@ const Sales = () => {
         </div>
       )}
 
+      <PaymentModal
+        isOpen={showPaymentModal}
+        onClose={() => setShowPaymentModal(false)}
+        transactions={sales.filter(bill => selectedBills.includes(bill.bill_number))}
+        transactionType="sale"
+        onSubmit={fetchData}
+      />
+
       {/* Quick Add Item Modal removed as requested */}
     </div>
   );
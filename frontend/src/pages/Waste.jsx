@@ -207,49 +207,23 @@ const Waste = () => {
       toast.error('Please select at least one waste record');
       return;
     }
-    let successCount = 0;
-    let failureCount = 0;
-    
-    for (const wasteId of selectedWastes) {
-      try {
-        const response = await api.get(`/invoices/invoice/waste/${wasteId}`, {
-          responseType: 'blob',
-        });
-        // Check if response is valid PDF
-        if (response.data && response.data.size > 0) {
-          const url = window.URL.createObjectURL(response.data);
-          const link = document.createElement('a');
-          link.href = url;
-          link.setAttribute('download', `waste_record_${wasteId}.pdf`);
-          document.body.appendChild(link);
-          link.click();
-          document.body.removeChild(link);
-          // Delay revokeObjectURL to allow download to complete
-          setTimeout(() => window.URL.revokeObjectURL(url), 100);
-          successCount++;
-        } else {
-          failureCount++;
-        }
-      } catch (error) {
-        console.error(`Download error for waste ${wasteId}:`, error);
-        // Only count as failure if it's an actual HTTP error
-        if (error.response && error.response.status >= 400) {
-          failureCount++;
-        } else {
-          // Assume download initiated (IDM may have intercepted)
-          successCount++;
-        }
-      }
-      // Small delay between downloads
-      await new Promise(resolve => setTimeout(resolve, 300));
-    }
-    
-    // Show appropriate message
-    if (successCount > 0 && failureCount === 0) {
-      toast.success(`Downloading ${successCount} waste record(s)...`);
-    } else if (successCount > 0) {
-      toast.warning(`Downloaded ${successCount}, failed ${failureCount}`);
-    } else {
+    try {
+      // One ZIP of all selected records, rendered in parallel on the server
+      const response = await api.post('/invoices/bundle', { type: 'waste', ids: selectedWastes }, {
+        responseType: 'blob',
+      });
+      const url = window.URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.setAttribute('download', `waste_invoices_${new Date().toISOString().split('T')[0]}.zip`);
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+      // Delay revokeObjectURL to allow download to complete
+      setTimeout(() => window.URL.revokeObjectURL(url), 100);
+      toast.success(`Downloaded ${selectedWastes.length} waste record(s)`);
+    } catch (error) {
+      console.error('Download selected error:', error);
       toast.error('Failed to download waste records');
     }
   };